@@ -13,6 +13,32 @@ class ModelConfig:
     # Scene Selection & Prompt Generation
     scene_selection_model: str = "deepseek/deepseek-v3.1-terminus"
 
+    # Ordered candidate models per LLM stage (first = preferred). The model router
+    # reorders them by live latency/error rate and falls back down the list.
+    stage_models: dict = {
+        "scene_selection": [scene_selection_model, "openai/gpt-4o-mini", "anthropic/claude-3.5-sonnet"],
+        "visual_prompt": [scene_selection_model, "openai/gpt-4o-mini", "google/gemini-2.0-flash-001"],
+        "motion_prompt": [scene_selection_model, "openai/gpt-4o-mini", "google/gemini-2.0-flash-001"]
+    }
+
+    # p95 latency (seconds) each stage should stay within; a model over it is demoted
+    # even when every candidate is slow, so the fallbacks get a turn. Visual-prompt
+    # latency is recorded per scene, so chunk size does not decide demotions
+    stage_latency_budgets: dict = {
+        "scene_selection": 60.0,
+        "visual_prompt": 30.0,
+        "motion_prompt": 20.0
+    }
+
+    # List prices in USD per million (prompt, completion) tokens, used for LLM metering
+    # when OpenRouter does not report a call's cost
+    model_pricing: dict = {
+        scene_selection_model: (0.27, 1.00),
+        "openai/gpt-4o-mini": (0.15, 0.60),
+        "anthropic/claude-3.5-sonnet": (3.00, 15.00),
+        "google/gemini-2.0-flash-001": (0.10, 0.40)
+    }
+
 
 class Settings(BaseSettings):
     # Supabase
@@ -28,6 +54,115 @@ class Settings(BaseSettings):
     replicate_api_token: str
     openai_api_key: str
 
+    # OpenRouter HTTP connection pool
+    openrouter_pool_limit: int = 100
+    openrouter_pool_limit_per_host: int = 32
+    openrouter_keepalive_timeout: float = 30.0
+    openrouter_connect_timeout: float = 10.0
+    openrouter_read_timeout: float = 120.0
+
+    # OpenRouter retries and hedging
+    openrouter_max_attempts: int = 3
+    openrouter_retry_base_delay: float = 0.5
+    openrouter_retry_max_delay: float = 20.0
+    openrouter_attempt_timeout: float = 90.0
+    openrouter_hedging_enabled: bool = True
+    openrouter_hedge_percentile: float = 0.95
+    openrouter_hedge_max_ratio: float = 0.1  # At most one hedge per ten calls
+
+    # LLM model routing
+    model_routing_enabled: bool = True
+    model_routing_slow_factor: float = 1.5  # Demote a model whose p95 exceeds this multiple of the fastest candidate's
+    model_routing_max_error_rate: float = 0.5
+    model_routing_circuit_failures: int = 3  # Consecutive failures before a model is skipped
+    model_routing_circuit_seconds: float = 60.0
+    model_routing_explore_ratio: float = 0.05  # Share of calls that try a fallback first to keep its stats fresh
+
+    # LLM response cache
+    llm_cache_enabled: bool = True
+    llm_cache_lru_size: int = 512
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600
+    llm_cache_redis_enabled: bool = True
+    llm_cache_redis_max_entries: int = 10000
+    llm_cache_max_value_bytes: int = 256 * 1024
+
+    # LLM concurrency (AIMD limiter, coordinated across workers through Redis)
+    llm_concurrency_initial: int = 8
+    llm_concurrency_min: int = 1
+    llm_concurrency_max: int = 64
+    llm_concurrency_redis_enabled: bool = True
+    llm_concurrency_lease_seconds: float = 180.0  # Longer than openrouter_read_timeout so live calls keep their lease
+
+    # LLM call metering
+    llm_metering_enabled: bool = True
+    llm_metering_sink: str = "table"  # "table" (llm_call_metrics) | "redis" (stream) | "both" | "none"
+    llm_metering_flush_interval: float = 10.0
+    llm_metering_batch_size: int = 50
+
+    # Transcription
+    audio_download_max_bytes: int = 500 * 1024 * 1024  # Hard cap on downloaded audio
+    audio_download_spool_bytes: int = 16 * 1024 * 1024  # Larger downloads spill from memory to disk
+    audio_download_chunk_bytes: int = 1024 * 1024
+    transcription_backend: str = "api"  # "api" (OpenAI Whisper) or "local" (faster-whisper on CPU)
+    transcription_local_model: str = "small"
+    transcription_local_compute_type: str = "int8"
+    transcription_local_workers: int = 2  # Worker processes, each with its own model copy
+    transcription_local_cpu_threads: int = 4
+    transcription_chunking_enabled: bool = True  # Split long audio and transcribe chunks in parallel
+    transcription_chunk_min_seconds: float = 120.0  # Shorter audio is sent in one request
+    transcription_chunk_seconds: float = 60.0
+    transcription_chunk_search_seconds: float = 8.0  # Window either side of the target for a quiet cut point
+    transcription_chunk_overlap_seconds: float = 2.0
+    transcription_chunk_concurrency: int = 6
+    transcription_vad_enabled: bool = True  # Cut long instrumental/silent spans before upload
+    transcription_vad_min_skip_seconds: float = 4.0
+    transcription_vad_pad_seconds: float = 0.5  # Audio kept either side of vocal regions
+    transcription_vad_threshold: float = 0.25  # Inactive below this fraction of the track's median activity
+    transcription_pretranscode_enabled: bool = True  # Re-encode to 16 kHz mono before upload (needs ffmpeg)
+    transcription_pretranscode_codec: str = "mp3"  # "mp3" or "opus"
+    transcription_pretranscode_bitrate: str = "32k"
+    transcription_pretranscode_concurrency: int = 4  # ffmpeg processes running at once
+    transcription_upload_bytes_per_second: int = 2 * 1024 * 1024  # Assumed upload throughput for time-saved estimates
+    transcription_cache_enabled: bool = True  # Reuse results for audio with the same content hash
+    audio_analysis_enabled: bool = True  # Tempo, beats, sections and energy for scene selection
+    audio_analysis_workers: int = 1  # Worker processes for audio analysis
+
+    # Scene pipeline
+    compact_transcript_encoding: bool = True  # Dictionary + delta-timestamp transcript in the scene-selection prompt
+    transcript_merge_min_seconds: float = 2.0  # Segments shorter than this are merged with a neighbour
+    transcript_merge_max_seconds: float = 8.0
+    scene_selection_streaming: bool = True  # Persist each scene and start its prompt as soon as it streams in
+    visual_prompt_generation_mode: str = "auto"  # "individual" | "chunked" | "auto"
+    visual_prompt_chunk_size: int = 4  # Scenes per request in "chunked" mode
+    visual_prompt_max_chunk_size: int = 8
+    llm_max_output_tokens: int = 8000
+
+    # Replicate predictions
+    replicate_pool_limit: int = 64  # Connections shared by all in-flight predictions
+    replicate_poll_initial_seconds: float = 1.0
+    replicate_poll_max_seconds: float = 10.0
+    replicate_prediction_timeout: float = 900.0  # Predictions still running after this are canceled
+    replicate_webhook_url: Optional[str] = None  # Public URL of /api/webhooks/replicate; polling only if unset
+    replicate_webhook_secret: Optional[str] = None  # "whsec_..." signing secret for webhook deliveries
+
+    # Batch image generation
+    image_generation_concurrency: int = 4  # Scenes generating at once per job
+
+    # Image generation result cache
+    image_cache_enabled: bool = True
+    image_cache_lru_size: int = 1024
+    image_cache_ttl_seconds: int = 50 * 60  # Replicate delivery URLs expire after an hour
+    image_cache_rehosted_ttl_seconds: int = 30 * 24 * 3600  # Entries pointing at our own storage
+    image_cache_redis_enabled: bool = True
+    image_cache_redis_max_entries: int = 10000
+
+    # Rehosting generated media into Supabase Storage
+    rehost_enabled: bool = True
+    rehost_concurrency: int = 4  # Downloads/uploads in flight at once
+    rehost_bucket: str = "project-files"
+    image_derivatives_enabled: bool = True  # 256/768 px WebP + AVIF variants and a blurhash per stored image
+    image_derivatives_workers: int = 1  # Worker processes for resizing/encoding
+
     # App
     environment: str = "development"
     debug: bool = True
@@ -1,8 +1,33 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.routers import health, projects, uploads, artists, image_generation, video_generation, transcription, scenes, auth
+from app.routers import health, projects, uploads, artists, image_generation, video_generation, transcription, scenes, auth, timeline, webhooks, images
 from app.auth.jwks_verifier import initialize_jwks_verifier
+from app.services.openrouter import get_openrouter_service
+from app.services import audio_analysis, image_cache, image_derivatives, media_rehost, replicate_client, transcription_backends
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared outbound HTTP pools on startup and close them (and worker pools) on shutdown."""
+    openrouter_service = get_openrouter_service()
+    await openrouter_service.start()
+    yield
+    await openrouter_service.close()
+    if transcription_backends.local_whisper_backend is not None:
+        await transcription_backends.local_whisper_backend.close()
+    if audio_analysis.audio_analysis_service is not None:
+        await audio_analysis.audio_analysis_service.close()
+    if replicate_client.replicate_client is not None:
+        await replicate_client.replicate_client.close()
+    if media_rehost.media_rehost_service is not None:
+        await media_rehost.media_rehost_service.close()
+    if image_derivatives.image_derivatives_service is not None:
+        await image_derivatives.image_derivatives_service.close()
+    if image_cache.image_result_cache is not None:
+        await image_cache.image_result_cache.close()
+
 
 app = FastAPI(
     title="OMVEE API",
@@ -10,6 +35,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # Initialize JWKS verifier for JWT authentication
@@ -34,6 +60,9 @@ app.include_router(image_generation.router, prefix="/api", tags=["image-generati
 app.include_router(video_generation.router, prefix="/api", tags=["video-generation"])
 app.include_router(transcription.router, prefix="/api", tags=["transcription"])
 app.include_router(scenes.router, prefix="/api", tags=["scenes"])
+app.include_router(images.router, prefix="/api", tags=["images"])
+app.include_router(timeline.router, prefix="/api", tags=["timeline"])
+app.include_router(webhooks.router, prefix="/api", tags=["webhooks"])
 
 
 @app.get("/")
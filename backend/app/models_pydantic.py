@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 from uuid import UUID, uuid4
 
@@ -174,7 +174,8 @@ class GeneratedImageBase(BaseModel):
 class GeneratedImageCreate(GeneratedImageBase):
     project_id: UUID
     scene_id: UUID
-    prompt_id: UUID
+    prompt_id: Optional[UUID] = None
+    generation_metadata: Optional[Dict[str, Any]] = None
 
 
 class GeneratedImage(GeneratedImageBase):
@@ -183,7 +184,11 @@ class GeneratedImage(GeneratedImageBase):
     id: UUID
     project_id: UUID
     scene_id: UUID
-    prompt_id: UUID
+    prompt_id: Optional[UUID] = None
+    generation_metadata: Optional[Dict[str, Any]] = None
+    source_url: Optional[str] = None
+    derivatives: Optional[Dict[str, Dict[str, str]]] = None  # {"256": {"webp": url, "avif": url}, "768": {...}}
+    blurhash: Optional[str] = None
     created_at: datetime
 
 
@@ -332,6 +337,14 @@ class ImageList(BaseModel):
     total: int
 
 
+class ImageGenerationJobResponse(BaseModel):
+    """Response when starting a batch image generation job."""
+    job_id: str = Field(..., description="Background job identifier")
+    status: str = Field(..., description="Job status")
+    total_scenes: int = Field(..., description="Scenes with a completed visual prompt")
+    pending_scenes: int = Field(..., description="Scenes that will be generated (the rest already have images)")
+
+
 class VideoClipList(BaseModel):
     clips: List[VideoClip]
     total: int
@@ -392,11 +405,13 @@ class TranscriptionStatusResponse(BaseModel):
     progress: Optional[float] = Field(None, ge=0.0, le=1.0, description="Progress percentage (0.0-1.0)")
     transcription_data: Optional[TranscriptionResult] = Field(None, description="Transcription result if completed")
     error_message: Optional[str] = Field(None, description="Error details if failed")
+    version: Optional[int] = Field(None, description="Transcription version, for segment patches")
 
 
 class TranscriptionEditRequest(BaseModel):
     transcription_data: TranscriptionResult = Field(..., description="Edited transcription data")
     segments_modified: List[int] = Field(default_factory=list, description="List of modified segment indices")
+    expected_version: Optional[int] = Field(None, ge=0, description="Transcription version the edits were made against; the save is rejected if it is stale")
 
 
 class SegmentUpdateRequest(BaseModel):
@@ -405,6 +420,65 @@ class SegmentUpdateRequest(BaseModel):
     end_time: Optional[float] = Field(None, ge=0, description="Updated end time")
 
 
+class SegmentOperation(BaseModel):
+    op: Literal["edit_text", "set_timing", "shift", "split", "merge"] = Field(..., description="Operation type")
+    segment_id: Optional[int] = Field(None, description="Target segment (edit_text, set_timing, split)")
+    segment_ids: List[int] = Field(default_factory=list, description="Target segments (shift, merge)")
+    text: Optional[str] = Field(None, description="New text (edit_text)")
+    start: Optional[float] = Field(None, ge=0, description="New start time (set_timing)")
+    end: Optional[float] = Field(None, ge=0, description="New end time (set_timing)")
+    offset: Optional[float] = Field(None, description="Seconds to move segments by (shift)")
+    text_index: Optional[int] = Field(None, ge=1, description="Character position to split at (split)")
+    at: Optional[float] = Field(None, ge=0, description="Split time; defaults to proportional to text_index (split)")
+
+
+class TranscriptionPatchRequest(BaseModel):
+    expected_version: int = Field(..., ge=0, description="Transcription version the edits were made against")
+    operations: List[SegmentOperation] = Field(..., min_length=1, description="Operations, applied in order")
+
+
+class StoredSegment(BaseModel):
+    segment_id: int = Field(..., description="Stable segment identifier")
+    start: float = Field(..., description="Segment start time in seconds")
+    end: float = Field(..., description="Segment end time in seconds")
+    text: str = Field(..., description="Segment text")
+
+
+class TranscriptionPatchResponse(BaseModel):
+    version: int = Field(..., description="New transcription version")
+    changed: List[StoredSegment] = Field(default_factory=list, description="Segments created or modified")
+    deleted: List[int] = Field(default_factory=list, description="Segment ids removed")
+
+
+# Timeline schemas
+class TimelineSegment(BaseModel):
+    index: int = Field(..., description="Position in transcription_data.segments")
+    start: float = Field(..., description="Segment start time in seconds")
+    end: float = Field(..., description="Segment end time in seconds")
+    text: str = Field(..., description="Segment text")
+
+
+class TimelineScene(BaseModel):
+    scene_id: int = Field(..., description="Scene identifier")
+    title: Optional[str] = Field(None, description="Scene title")
+    start_time: float = Field(..., description="Scene start time in seconds")
+    end_time: float = Field(..., description="Scene end time in seconds")
+
+
+class TimelinePositionResponse(BaseModel):
+    time: float = Field(..., description="Queried time in seconds")
+    segment: Optional[TimelineSegment] = Field(None, description="Segment playing at this time, if any")
+    scenes: List[TimelineScene] = Field(default_factory=list, description="Scenes covering this time")
+
+
+class TimelineRangeResponse(BaseModel):
+    start: float = Field(..., description="Range start in seconds")
+    end: float = Field(..., description="Range end in seconds")
+    duration: float = Field(..., description="Timeline duration in seconds")
+    segments: List[TimelineSegment] = Field(default_factory=list, description="Segments overlapping the range")
+    scenes: List[TimelineScene] = Field(default_factory=list, description="Scenes overlapping the range")
+
+
 # Health check schema
 class HealthCheck(BaseModel):
     status: str
@@ -2,6 +2,11 @@ from fastapi import APIRouter
 import redis
 from app.config import settings
 from app.services.supabase import supabase_service
+from app.services.openrouter import get_openrouter_service
+from app.services.audio_transcode import get_audio_transcoder
+from app.services.replicate_client import get_replicate_client
+from app.services.image_cache import get_image_result_cache
+from app.services.media_rehost import get_media_rehost_service
 from app import models_pydantic as schemas
 
 router = APIRouter()
@@ -34,4 +39,34 @@ async def health_check():
         supabase=supabase_status,
         redis=redis_status,
         environment=settings.environment
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/health/openrouter")
+async def openrouter_stats():
+    """OpenRouter client statistics (connection pool usage and reuse)."""
+    return get_openrouter_service().get_stats()
+
+
+@router.get("/health/transcode")
+async def transcode_stats():
+    """Audio pre-transcode totals (bytes saved before Whisper uploads)."""
+    return get_audio_transcoder().get_stats()
+
+
+@router.get("/health/replicate")
+async def replicate_stats():
+    """Replicate prediction counters, learned run times and connection pool usage."""
+    return get_replicate_client().get_stats()
+
+
+@router.get("/health/image-cache")
+async def image_cache_stats():
+    """Image generation result cache hit/miss counters."""
+    return get_image_result_cache().get_stats()
+
+
+@router.get("/health/rehost")
+async def rehost_stats():
+    """Generated media copied into storage (and copies still in progress)."""
+    return get_media_rehost_service().get_stats()
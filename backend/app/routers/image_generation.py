@@ -28,6 +28,7 @@ class ImageGenerationRequest(BaseModel):
     color_palette: Optional[str] = Field(None, description="Color scheme")
     reference_image_url: Optional[str] = Field(None, description="Optional reference image URL")
     custom_params: Optional[Dict[str, Any]] = Field(default_factory=dict, description="Custom generation parameters")
+    force_new_variation: bool = Field(False, description="Generate a new image even if an identical request is cached")
 
 
 
@@ -74,7 +75,8 @@ async def generate_image(
         result = await image_service.generate_image_from_prompt(
             visual_prompt=visual_prompt,
             reference_image_url=request.reference_image_url,
-            custom_params=request.custom_params
+            custom_params=request.custom_params,
+            force_new_variation=request.force_new_variation
         )
 
         return result
@@ -130,7 +132,8 @@ async def generate_image_with_artist(
         result = await image_service.generate_image_from_prompt(
             visual_prompt=visual_prompt,
             reference_image_url=reference_image_url,
-            custom_params=request.custom_params
+            custom_params=request.custom_params,
+            force_new_variation=request.force_new_variation
         )
 
         # Add artist information to result
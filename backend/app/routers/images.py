@@ -0,0 +1,97 @@
+"""
+Batch image generation router.
+Handles Phase 3 of the AI pipeline: Visual Prompts → Images, as a tracked job.
+"""
+
+from fastapi import APIRouter, HTTPException, status, BackgroundTasks, Depends
+from uuid import UUID
+
+from app.services.image_batch import get_image_batch_service
+from app.services.supabase import supabase_service
+from app import models_pydantic as schemas
+from app.dependencies.auth import get_current_user
+
+router = APIRouter()
+
+
+async def image_generation_task(project_id: str, job_id: str):
+    """Background task: generate every pending scene image for the project."""
+    try:
+        await get_image_batch_service().run(project_id, job_id)
+    except Exception as e:
+        print(f"❌ [images] job {job_id} failed: {str(e)}")
+
+
+@router.post("/projects/{project_id}/images/generate", response_model=schemas.ImageGenerationJobResponse)
+async def start_image_generation(
+    project_id: UUID,
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Start generating an image for every scene with a completed visual prompt.
+
+    Scenes that already have a completed image are skipped, so re-submitting
+    after a partially failed job only retries the scenes that failed.
+    """
+    try:
+        project = supabase_service.get_project(project_id)
+        if not project:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Project not found"
+            )
+        if project.get('user_id') != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Project does not belong to user"
+            )
+
+        # Claimed before anything is scheduled, so a double submit can't start two jobs
+        batch_service = get_image_batch_service()
+        if not batch_service.claim(str(project_id)):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Image generation is already running for this project"
+            )
+
+        try:
+            plan = batch_service.plan(str(project_id))
+            total_scenes = len(plan['pending']) + len(plan['done'])
+            if not total_scenes:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Project has no completed visual prompts. Generate scenes first."
+                )
+
+            job = supabase_service.create_job({
+                'project_id': str(project_id),
+                'type': 'generate_images',
+                'status': 'pending',
+                'progress': 0,
+                'payload_json': {
+                    'project_id': str(project_id),
+                    'stage': 'initializing'
+                }
+            })
+            job_id = job['id']
+        except Exception:
+            batch_service.release(str(project_id))
+            raise
+
+        background_tasks.add_task(image_generation_task, str(project_id), job_id)
+
+        return schemas.ImageGenerationJobResponse(
+            job_id=job_id,
+            status='started',
+            total_scenes=total_scenes,
+            pending_scenes=len(plan['pending'])
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to start image generation: {str(e)}"
+        )
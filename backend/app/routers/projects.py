@@ -1,12 +1,10 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from typing import List, Dict
 from uuid import UUID
-import httpx
-import io
 
 from app.services.supabase import supabase_service
 from app.services.supabase_storage import supabase_storage_service
-from app.services.whisper import WhisperService
+from app.services.audio_probe import probe_url
 from app.dependencies.auth import get_current_user
 from app import models_pydantic as schemas
 
@@ -212,11 +210,16 @@ async def process_project_audio(project_id: UUID, audio_info: schemas.AudioProce
                 detail="Project not found"
             )
 
-        # TODO: Add audio file validation and metadata extraction
-        # For now, we'll extract format from URL and estimate duration
-        audio_format = audio_info.audio_format
+        # Read format and duration from the file headers (a few KB via Range requests)
+        probe = None
+        try:
+            probe = await probe_url(audio_info.audio_url)
+        except Exception as e:
+            print(f"Warning: Could not probe audio: {e}")
+
+        audio_format = probe.format if probe and probe.format != 'unknown' else audio_info.audio_format
         if not audio_format:
-            # Try to extract from URL
+            # Fall back to the URL extension
             if '.mp3' in audio_info.audio_url:
                 audio_format = 'mp3'
             elif '.wav' in audio_info.audio_url:
@@ -233,26 +236,10 @@ async def process_project_audio(project_id: UUID, audio_info: schemas.AudioProce
             'transcription_status': 'ready'  # Ready for transcription
         }
 
-        # Get actual audio duration by downloading and analyzing the file
-        try:
-            whisper_service = WhisperService()
-
-            # Download audio file to analyze duration
-            async with httpx.AsyncClient() as client:
-                response = await client.get(audio_info.audio_url, timeout=30.0)
-                if response.status_code != 200:
-                    raise Exception(f"Failed to download audio: {response.status_code}")
-
-                # Create file-like object from downloaded content
-                audio_file = io.BytesIO(response.content)
-
-                # Get duration in minutes, convert to seconds
-                duration_minutes = await whisper_service.get_audio_duration(audio_file)
-                audio_duration = duration_minutes * 60.0  # Convert to seconds
-
-        except Exception as e:
+        if probe and probe.duration:
+            audio_duration = round(probe.duration, 3)
+        else:
             # If we can't get the actual duration, use a reasonable default
-            print(f"Warning: Could not get audio duration: {e}")
             audio_duration = 180.0  # Default 3 minutes
 
         update_data['audio_duration'] = audio_duration
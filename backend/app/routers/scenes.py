@@ -7,23 +7,76 @@ from fastapi import APIRouter, HTTPException, status, BackgroundTasks, Depends
 from uuid import UUID
 import asyncio
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
-from app.services.openrouter import OpenRouterService
+from app.services.openrouter import get_openrouter_service
+from app.services.audio_analysis import AudioFeatures, get_audio_analysis_service
+from app.services.llm_metering import llm_call_tags
+from app.services.prompt_batching import split_into_chunks
 from app.services.supabase import supabase_service
+from app.services.transcription_segments import get_transcription_segment_store
 from app import models_pydantic as schemas
 from app.config import settings
 from app.dependencies.auth import get_current_user
 
 router = APIRouter()
 
-# Initialize OpenRouter service
-openrouter_service = OpenRouterService(api_key=settings.openrouter_api_key)
+# Shared OpenRouter service (one pooled HTTP session per process)
+openrouter_service = get_openrouter_service()
 
 # Job tracking is now handled via database instead of in-memory
 # scene_generation_jobs = {}  # DEPRECATED - using jobs table
 
 
+def _scene_to_row(project_id: str, scene: schemas.SceneSelection, order_idx: int) -> Dict[str, Any]:
+    """Map a selected scene to a selected_scenes row."""
+    return {
+        'project_id': str(project_id),
+        'lyric_excerpt': scene.lyrics_excerpt,
+        'theme': scene.theme,
+        'order_idx': order_idx,
+        'scene_id': scene.scene_id,
+        'title': scene.title,
+        'start_time': float(scene.start_time),
+        'end_time': float(scene.end_time),
+        'duration': float(scene.duration),
+        'energy_level': int(scene.energy_level),
+        'visual_potential': int(scene.visual_potential),
+        'narrative_importance': int(scene.narrative_importance),
+        'reasoning': scene.reasoning
+    }
+
+
+def _update_scene_row(project_id: str, scene_id: int, updates: Dict[str, Any]):
+    """Update a saved selected_scenes row in place."""
+    supabase_service.client.table('selected_scenes')\
+        .update(updates)\
+        .eq('project_id', project_id)\
+        .eq('scene_id', scene_id)\
+        .execute()
+
+
+def _delete_scene_row(project_id: str, scene_id: int):
+    """Delete a saved selected_scenes row."""
+    supabase_service.client.table('selected_scenes')\
+        .delete()\
+        .eq('project_id', project_id)\
+        .eq('scene_id', scene_id)\
+        .execute()
+
+
+def _save_scene_prompt(project_id: str, scene_id: int, prompt: schemas.VisualPrompt):
+    """Store a generated visual prompt on its scene row."""
+    supabase_service.client.table('selected_scenes')\
+        .update({
+            'visual_prompt_data': prompt.model_dump(),
+            'prompt_status': 'completed'
+        })\
+        .eq('project_id', project_id)\
+        .eq('scene_id', scene_id)\
+        .execute()
+
+
 async def scene_selection_task(project_id: str, job_id: str):
     """Background task for scene selection only."""
     try:
@@ -42,13 +95,11 @@ async def scene_selection_task(project_id: str, job_id: str):
         if not project:
             raise Exception("Project not found")
 
-        transcription_data = project.get('transcription_data')
-        if not transcription_data:
+        # Edited transcriptions are assembled from their stored segments
+        transcription_result = get_transcription_segment_store().get_transcription(project)
+        if not transcription_result:
             raise Exception("Project has no transcription data")
 
-        # Convert to TranscriptionResult
-        transcription_result = schemas.TranscriptionResult(**transcription_data)
-
         # Update progress
         supabase_service.update_job(job_id, {
             'progress': 30,
@@ -68,12 +119,23 @@ async def scene_selection_task(project_id: str, job_id: str):
         # Get song duration from project or transcription
         song_duration = project.get('audio_duration')
 
-        scene_selection = await openrouter_service.select_scenes(
-            transcription=transcription_result,
-            target_scenes=15,
-            song_metadata=song_metadata,
-            song_duration=song_duration
-        )
+        # Tempo, sections and energy measured when the audio was transcribed
+        audio_features = None
+        if settings.audio_analysis_enabled:
+            audio_features = get_audio_analysis_service().get(project.get('audio_sha256'))
+
+        with llm_call_tags(project_id=project_id, job_id=job_id):
+            if settings.scene_selection_streaming:
+                await streamed_scene_selection_task(project_id, job_id, project, transcription_result, song_metadata, song_duration, audio_features)
+                return
+
+            scene_selection = await openrouter_service.select_scenes(
+                transcription=transcription_result,
+                target_scenes=15,
+                song_metadata=song_metadata,
+                song_duration=song_duration,
+                audio_features=audio_features
+            )
 
         # Update progress
         supabase_service.update_job(job_id, {
@@ -85,28 +147,8 @@ async def scene_selection_task(project_id: str, job_id: str):
         })
 
         # Save scenes to database
-        scenes_data = []
         for i, scene in enumerate(scene_selection.selected_scenes):
-            scene_data = {
-                'project_id': str(project_id),
-                'lyric_excerpt': scene.lyrics_excerpt,
-                'theme': scene.theme,
-                'order_idx': i,
-                'scene_id': scene.scene_id,
-                'title': scene.title,
-                'start_time': float(scene.start_time),
-                'end_time': float(scene.end_time),
-                'duration': float(scene.duration),
-                'energy_level': int(scene.energy_level),
-                'visual_potential': int(scene.visual_potential),
-                'narrative_importance': int(scene.narrative_importance),
-                'reasoning': scene.reasoning
-            }
-            scenes_data.append(scene_data)
-
-        # Save scenes in batch
-        for scene_data in scenes_data:
-            supabase_service.create_scene(scene_data)
+            supabase_service.create_scene(_scene_to_row(project_id, scene, i))
 
         # Update project with scene selection data
         update_data = {
@@ -150,8 +192,6 @@ async def scene_selection_task(project_id: str, job_id: str):
         prompt_job_id = prompt_job['id']
 
         # Start prompt generation task
-        from fastapi import BackgroundTasks
-        import asyncio
         asyncio.create_task(visual_prompt_generation_task(project_id, prompt_job_id))
 
     except Exception as e:
@@ -168,6 +208,220 @@ async def scene_selection_task(project_id: str, job_id: str):
         print(f"❌ Scene selection failed: {str(e)}")
 
 
+async def streamed_scene_selection_task(
+    project_id: str,
+    job_id: str,
+    project: Dict[str, Any],
+    transcription_result: schemas.TranscriptionResult,
+    song_metadata: Dict[str, Any],
+    song_duration: Optional[float],
+    audio_features: Optional[AudioFeatures] = None
+):
+    """
+    Stream scene selection and overlap it with visual prompt generation.
+
+    Each scene is saved as soon as it is complete in the stream and its
+    prompt generation starts immediately, instead of waiting for the whole
+    selection. Raises on selection failure (after cancelling started prompts
+    and removing partially saved scenes) so the caller marks the job failed.
+    """
+    artist_reference_images = project.get('selected_reference_images', {})
+
+    # The prompt job exists from the start so its progress is visible while scenes stream in
+    prompt_job = supabase_service.create_job({
+        'project_id': str(project_id),
+        'type': 'generate_visual_prompts',
+        'status': 'running',
+        'progress': 10,
+        'payload_json': {
+            'project_id': str(project_id),
+            'stage': 'generating_prompts',
+            'completed_prompts': 0,
+            'total_prompts': 0
+        }
+    })
+    prompt_job_id = prompt_job['id']
+
+    # Latest version of each scene; a prompt built from a superseded version is discarded
+    current_scenes: Dict[int, schemas.SceneSelection] = {}
+    saved_order: Dict[int, int] = {}
+    prompted_scene_ids = set()
+
+    async def generate_and_save_prompts(scenes: List[schemas.SceneSelection]) -> List[schemas.VisualPrompt]:
+        with llm_call_tags(job_id=prompt_job_id):
+            prompts = await openrouter_service.generate_visual_prompt_chunk_with_artist(
+                scenes, artist_reference_images, song_metadata
+            )
+        saved = []
+        for scene, prompt in zip(scenes, prompts):
+            if current_scenes.get(scene.scene_id) is scene:
+                _save_scene_prompt(project_id, scene.scene_id, prompt)
+                prompted_scene_ids.add(scene.scene_id)
+                saved.append(prompt)
+        return saved
+
+    # Scenes per prompt request; 1 starts each prompt the moment its scene arrives.
+    # Selection asks for 15-20 scenes, so plan for 18 before the real count is known.
+    chunk_size = openrouter_service.prompt_batcher.chunk_size(18)
+    pending_scenes = []
+    scenes_saved = 0
+
+    prompt_tasks = []
+    try:
+        stream = openrouter_service.select_scenes_stream(
+            transcription=transcription_result,
+            target_scenes=15,
+            song_metadata=song_metadata,
+            song_duration=song_duration,
+            audio_features=audio_features
+        )
+
+        async for scene in stream:
+            supabase_service.create_scene(_scene_to_row(project_id, scene, scenes_saved))
+            current_scenes[scene.scene_id] = scene
+            saved_order[scene.scene_id] = scenes_saved
+            scenes_saved += 1
+
+            pending_scenes.append(scene)
+            if len(pending_scenes) >= chunk_size:
+                prompt_tasks.append(asyncio.create_task(generate_and_save_prompts(pending_scenes)))
+                pending_scenes = []
+
+            supabase_service.update_job(job_id, {
+                'progress': 50,
+                'payload_json': {
+                    'project_id': project_id,
+                    'stage': 'streaming_scenes',
+                    'scenes_saved': scenes_saved
+                }
+            })
+
+        if pending_scenes:
+            prompt_tasks.append(asyncio.create_task(generate_and_save_prompts(pending_scenes)))
+
+        scene_selection = stream.result
+
+        # Streamed rows are provisional (e.g. the last scene's end is only fixed once the
+        # stream ends); bring them in line with the final selection and re-prompt changed scenes
+        changed_scenes = []
+        for order_idx, scene in enumerate(scene_selection.selected_scenes):
+            streamed = current_scenes.get(scene.scene_id)
+            final_row = _scene_to_row(project_id, scene, order_idx)
+            if streamed is None or _scene_to_row(project_id, streamed, order_idx) != final_row:
+                _update_scene_row(project_id, scene.scene_id, final_row)
+                current_scenes[scene.scene_id] = scene
+                changed_scenes.append(scene)
+            elif saved_order.get(scene.scene_id) != order_idx:
+                # A scene replayed after the stream was saved out of order; its prompt still stands
+                _update_scene_row(project_id, scene.scene_id, {'order_idx': order_idx})
+        # Streamed scenes the final selection dropped; their prompts are discarded too
+        final_ids = {scene.scene_id for scene in scene_selection.selected_scenes}
+        for scene_id in set(current_scenes) - final_ids:
+            _delete_scene_row(project_id, scene_id)
+            current_scenes.pop(scene_id)
+            prompted_scene_ids.discard(scene_id)
+            print(f"🎬 Removed streamed scene {scene_id} missing from the final selection")
+        if changed_scenes:
+            print(f"🎬 Reconciled {len(changed_scenes)} streamed scene(s) with the final selection")
+            prompt_tasks.append(asyncio.create_task(generate_and_save_prompts(changed_scenes)))
+
+    except Exception as e:
+        for task in prompt_tasks:
+            task.cancel()
+        await asyncio.gather(*prompt_tasks, return_exceptions=True)
+        supabase_service.delete_project_scenes(UUID(project_id))
+        supabase_service.update_job(prompt_job_id, {
+            'status': 'failed',
+            'progress': 0,
+            'error': f"Scene selection failed: {e}",
+            'payload_json': {
+                'project_id': project_id,
+                'completed_prompts': 0,
+                'stage': 'failed'
+            }
+        })
+        raise
+
+    total_scenes = len(scene_selection.selected_scenes)
+
+    # Update project with scene selection data
+    supabase_service.update_project(UUID(project_id), {
+        'status': 'scenes_processing',
+        'scene_selection_data': scene_selection.model_dump(),
+        'scenes_count': total_scenes
+    })
+
+    # Mark selection job as completed
+    supabase_service.update_job(job_id, {
+        'status': 'completed',
+        'progress': 100,
+        'result_json': {
+            'scenes_count': total_scenes,
+            'completion_time': str(datetime.now())
+        },
+        'payload_json': {
+            'project_id': project_id,
+            'stage': 'completed',
+            'scenes_count': total_scenes
+        }
+    })
+
+    print(f"✅ Scene selection completed: {total_scenes} scenes (prompts already in progress)")
+
+    try:
+        for finished in asyncio.as_completed(prompt_tasks):
+            await finished
+            # A reconciled scene may be prompted twice, so count scenes rather than prompts
+            completed_prompts = len(prompted_scene_ids)
+            supabase_service.update_job(prompt_job_id, {
+                'progress': 20 + (int(70 * completed_prompts / total_scenes) if total_scenes else 70),
+                'payload_json': {
+                    'project_id': project_id,
+                    'completed_prompts': completed_prompts,
+                    'total_prompts': total_scenes,
+                    'stage': 'generating_prompts'
+                }
+            })
+
+        # Update project status to fully completed
+        supabase_service.update_project(UUID(project_id), {
+            'status': 'scenes_completed'
+        })
+
+        supabase_service.update_job(prompt_job_id, {
+            'status': 'completed',
+            'progress': 100,
+            'result_json': {
+                'prompts_generated': total_scenes,
+                'completion_time': str(datetime.now())
+            },
+            'payload_json': {
+                'project_id': project_id,
+                'completed_prompts': total_scenes,
+                'total_prompts': total_scenes,
+                'stage': 'completed'
+            }
+        })
+
+        print(f"✅ Visual prompt generation completed: {total_scenes} prompts")
+
+    except Exception as e:
+        for task in prompt_tasks:
+            task.cancel()
+        await asyncio.gather(*prompt_tasks, return_exceptions=True)
+        supabase_service.update_job(prompt_job_id, {
+            'status': 'failed',
+            'progress': 0,
+            'error': str(e),
+            'payload_json': {
+                'project_id': project_id,
+                'completed_prompts': 0,
+                'stage': 'failed'
+            }
+        })
+        print(f"❌ Visual prompt generation failed: {str(e)}")
+
+
 async def visual_prompt_generation_task(project_id: str, job_id: str):
     """Background task for visual prompt generation only."""
     try:
@@ -231,28 +485,28 @@ async def visual_prompt_generation_task(project_id: str, job_id: str):
         }
         artist_reference_images = project.get('selected_reference_images', {})
 
-        # Fire all prompt generation tasks in parallel
+        # Group scenes into requests (K per request, chosen from latency and concurrency headroom)
+        chunk_size = openrouter_service.prompt_batcher.chunk_size(len(scene_selections))
+        scene_chunks = split_into_chunks(scene_selections, chunk_size)
+        print(f"🎨 Using {len(scene_chunks)} request(s) of up to {chunk_size} scene(s)")
+
+        # Fire all prompt generation requests in parallel (bounded by the shared LLM limiter)
         prompt_tasks = [
-            openrouter_service.generate_individual_visual_prompt_with_artist(
-                scene, artist_reference_images, song_metadata
+            openrouter_service.generate_visual_prompt_chunk_with_artist(
+                chunk, artist_reference_images, song_metadata
             )
-            for scene in scene_selections
+            for chunk in scene_chunks
         ]
 
         # Wait for all prompts to complete
-        visual_prompts = await asyncio.gather(*prompt_tasks)
+        with llm_call_tags(project_id=project_id, job_id=job_id):
+            chunk_results = await asyncio.gather(*prompt_tasks)
+        visual_prompts = [prompt for chunk_prompts in chunk_results for prompt in chunk_prompts]
 
         # Save prompts and update progress
         for i, (scene, prompt) in enumerate(zip(scene_selections, visual_prompts)):
             # Save to database
-            supabase_service.client.table('selected_scenes')\
-                .update({
-                    'visual_prompt_data': prompt.model_dump(),
-                    'prompt_status': 'completed'
-                })\
-                .eq('project_id', project_id)\
-                .eq('scene_id', scene.scene_id)\
-                .execute()
+            _save_scene_prompt(project_id, scene.scene_id, prompt)
 
             # Update progress
             completed_prompts = i + 1
@@ -643,11 +897,13 @@ async def regenerate_scene_prompt(
         artist_reference_images = project.get('selected_reference_images', {})
 
         # Generate new prompt with artist references
-        new_prompt = await openrouter_service.generate_individual_visual_prompt_with_artist(
-            scene=scene_selection,
-            artist_reference_images=artist_reference_images,
-            song_metadata=song_metadata
-        )
+        with llm_call_tags(project_id=project_id):
+            new_prompt = await openrouter_service.generate_individual_visual_prompt_with_artist(
+                scene=scene_selection,
+                artist_reference_images=artist_reference_images,
+                song_metadata=song_metadata,
+                bypass_cache=True  # Regenerate must produce a fresh prompt
+            )
 
         # Update in database
         supabase_service.client.table('selected_scenes')\
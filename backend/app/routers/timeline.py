@@ -0,0 +1,112 @@
+"""
+Timeline lookups for the editor: what is playing at a time, and what falls
+inside a range. Backed by a per-project TimelineIndex cache.
+"""
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from uuid import UUID
+from typing import Any, Dict, List, Tuple
+
+from app.services.supabase import supabase_service
+from app.services.timeline import get_timeline_index_cache
+from app.services.transcription_segments import get_transcription_segment_store
+from app.utils.timeline_index import TimelineIndex
+from app import models_pydantic as schemas
+from app.dependencies.auth import get_current_user
+
+router = APIRouter()
+
+
+def _load_timeline(project_id: UUID, user_id: str) -> Tuple[TimelineIndex, List[Dict[str, Any]]]:
+    """Fetch the project and scenes (checking ownership) and return the cached index."""
+    project = supabase_service.get_project(project_id)
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+
+    if project.get('user_id') != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied: Project does not belong to user"
+        )
+
+    scenes = supabase_service.get_project_scenes(project_id)
+
+    def load_segments():
+        transcription = get_transcription_segment_store().get_transcription(project)
+        return transcription.segments if transcription else []
+
+    return get_timeline_index_cache().get(str(project_id), project, scenes, load_segments), scenes
+
+
+def _segment(index: TimelineIndex, i: int) -> schemas.TimelineSegment:
+    segment = index.segments[i]
+    return schemas.TimelineSegment(index=i, start=segment['start'], end=segment['end'], text=segment.get('text', ''))
+
+
+def _scene(scene: Dict[str, Any]) -> schemas.TimelineScene:
+    return schemas.TimelineScene(
+        scene_id=scene['scene_id'],
+        title=scene.get('title'),
+        start_time=scene['start_time'],
+        end_time=scene['end_time']
+    )
+
+
+@router.get("/projects/{project_id}/timeline/at", response_model=schemas.TimelinePositionResponse)
+async def get_timeline_position(
+    project_id: UUID,
+    t: float = Query(..., ge=0, description="Playback position in seconds"),
+    user_id: str = Depends(get_current_user)
+):
+    """Segment and scenes under the playhead."""
+    try:
+        index, scenes = _load_timeline(project_id, user_id)
+        segment_index = index.segment_at(t)
+        return schemas.TimelinePositionResponse(
+            time=t,
+            segment=_segment(index, segment_index) if segment_index is not None else None,
+            scenes=[_scene(scenes[i]) for i in index.scenes_covering(t)]
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error reading timeline: {str(e)}"
+        )
+
+
+@router.get("/projects/{project_id}/timeline/range", response_model=schemas.TimelineRangeResponse)
+async def get_timeline_range(
+    project_id: UUID,
+    start: float = Query(..., ge=0, description="Range start in seconds"),
+    end: float = Query(..., ge=0, description="Range end in seconds"),
+    user_id: str = Depends(get_current_user)
+):
+    """Segments and scenes overlapping [start, end)."""
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must not be before start"
+        )
+
+    try:
+        index, scenes = _load_timeline(project_id, user_id)
+        return schemas.TimelineRangeResponse(
+            start=start,
+            end=end,
+            duration=index.duration,
+            segments=[_segment(index, i) for i in index.segments_overlapping(start, end)],
+            scenes=[_scene(scenes[i]) for i in index.scenes_overlapping(start, end)]
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error reading timeline: {str(e)}"
+        )
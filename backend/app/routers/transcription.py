@@ -6,10 +6,17 @@ Handles audio transcription, progress tracking, and editing.
 from fastapi import APIRouter, HTTPException, status, BackgroundTasks, Depends
 from uuid import UUID
 import asyncio
-import httpx
+from pathlib import Path
 from typing import Optional
 
+from app.config import settings
+from app.services.audio_analysis import get_audio_analysis_service
+from app.services.audio_chunking import decode_to_pcm
+from app.services.audio_download import AudioTooLargeError, DownloadedAudio, download_to_spooled_file
 from app.services.whisper import WhisperService
+from app.services.transcription_cache import get_transcription_cache
+from app.services.transcription_segments import TranscriptionVersionConflict, get_transcription_segment_store
+from app.utils.segment_patch import SegmentPatchError
 from app.services.supabase import supabase_service
 from app import models_pydantic as schemas
 from app.dependencies.auth import get_current_user
@@ -22,18 +29,20 @@ whisper_service = WhisperService()
 # Transcription now uses DB-backed jobs via the jobs table (see scenes.py pattern)
 
 
-async def download_audio_file(audio_url: str) -> bytes:
-    """Download audio file from URL for transcription."""
+async def download_audio_file(audio_url: str) -> DownloadedAudio:
+    """Stream audio from URL to a spooled temp file, hashing it as it downloads."""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(audio_url, timeout=60.0)
-            if response.status_code == 200:
-                return response.content
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Failed to download audio file: {response.status_code}"
-                )
+        return await download_to_spooled_file(
+            audio_url,
+            max_bytes=settings.audio_download_max_bytes,
+            spool_bytes=settings.audio_download_spool_bytes,
+            chunk_bytes=settings.audio_download_chunk_bytes
+        )
+    except AudioTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -41,8 +50,9 @@ async def download_audio_file(audio_url: str) -> bytes:
         )
 
 
-async def transcription_background_task(project_id: str, audio_url: str, job_id: str):
+async def transcription_background_task(project_id: str, audio_url: str, job_id: str, backend: Optional[str] = None):
     """Background task for audio transcription using DB-backed jobs."""
+    audio = None
     try:
         print(f"[transcription] job {job_id} starting for project {project_id}")
         # Mark job as running
@@ -57,36 +67,104 @@ async def transcription_background_task(project_id: str, audio_url: str, job_id:
 
         # Download audio file
         print(f"[transcription] job {job_id} downloading audio")
-        audio_content = await download_audio_file(audio_url)
+        audio = await download_audio_file(audio_url)
+        audio_sha256 = audio.sha256
         supabase_service.update_job(job_id, {
             'progress': 30,
             'payload_json': {
                 'project_id': project_id,
-                'stage': 'downloaded_audio'
+                'stage': 'downloaded_audio',
+                'audio_bytes': audio.size_bytes
             }
         })
 
+        # The same audio (re-upload or another project) reuses its earlier transcription
+        engine = whisper_service.get_backend(backend)
+        transcription_cache = get_transcription_cache() if settings.transcription_cache_enabled else None
+        transcription_result = None
+        if transcription_cache:
+            transcription_result = transcription_cache.get(audio_sha256, engine.model)
+            if transcription_result:
+                print(f"[transcription] job {job_id} cache hit for audio {audio_sha256[:12]}")
+
         # Extract filename from URL for format detection
         filename = audio_url.split('/')[-1]
         if '?' in filename:
             filename = filename.split('?')[0]
 
-        # Transcribe audio
-        from io import BytesIO
-        audio_file = BytesIO(audio_content)
-        audio_file.name = filename
+        # The spooled file goes straight to the transcription client
+        audio_file = audio.file
 
-        print(f"[transcription] job {job_id} transcribing audio filename={filename}")
-        transcription_result = await whisper_service.transcribe_audio(
-            audio_file=audio_file,
-            filename=filename
-        )
+        # Decoded once up front; the samples feed both the audio analysis (in a worker
+        # process, while transcription runs) and the transcriber's chunking
+        analysis_service = get_audio_analysis_service() if settings.audio_analysis_enabled else None
+        cached_features = analysis_service.get(audio_sha256) if analysis_service else None
+        samples = None
+        if (analysis_service and cached_features is None) or (transcription_result is None and whisper_service.decodes_audio):
+            try:
+                samples = await decode_to_pcm(audio_file, suffix=Path(filename).suffix)
+            except Exception as e:
+                print(f"[transcription] job {job_id} local decoding unavailable: {e}")
+
+        analysis = None
+        if cached_features is not None:
+            analysis = asyncio.get_running_loop().create_future()
+            analysis.set_result(cached_features)
+        elif analysis_service and samples is not None:
+            try:
+                analysis = analysis_service.analyze_samples(audio_sha256, samples)
+            except Exception as e:
+                print(f"[transcription] job {job_id} audio analysis skipped: {e}")
+
+        def report_chunk_progress(chunks_done: int, chunks_total: int):
+            # Transcription spans 30-80% of the job
+            supabase_service.update_job(job_id, {
+                'progress': 30 + int(50 * chunks_done / chunks_total),
+                'payload_json': {
+                    'project_id': project_id,
+                    'stage': 'transcribing',
+                    'chunks_done': chunks_done,
+                    'chunks_total': chunks_total
+                }
+            })
+
+        transcode_stats = None
+        activity_stats = None
+
+        def record_activity(report):
+            nonlocal activity_stats
+            activity_stats = report.to_dict()
+            if report.skipped_seconds:
+                print(f"[transcription] job {job_id} skipped {report.skipped_seconds:.1f}s of instrumental audio")
+
+        def record_transcode(report):
+            nonlocal transcode_stats
+            transcode_stats = report.to_dict()
+            if report.files:
+                print(f"[transcription] job {job_id} pre-transcoded uploads {report.reduction_ratio:.1f}x smaller, ~{report.time_saved_seconds:.1f}s saved")
+
+        cache_hit = transcription_result is not None
+        if not cache_hit:
+            print(f"[transcription] job {job_id} transcribing audio filename={filename} backend={engine.name}")
+            transcription_result = await whisper_service.transcribe(
+                audio_file=audio_file,
+                filename=filename,
+                progress_callback=report_chunk_progress,
+                transcode_callback=record_transcode,
+                backend=engine.name,
+                activity_callback=record_activity,
+                samples=samples
+            )
 
         supabase_service.update_job(job_id, {
             'progress': 80,
             'payload_json': {
                 'project_id': project_id,
-                'stage': 'transcribed'
+                'stage': 'transcribed',
+                'cache_hit': cache_hit,
+                'backend': engine.name,
+                'transcode': transcode_stats,
+                'vocal_activity': activity_stats
             }
         })
 
@@ -100,14 +178,32 @@ async def transcription_background_task(project_id: str, audio_url: str, job_id:
             else:
                 actual_audio_duration = getattr(last_segment, 'end', 0.0)
 
-        # Save transcription to project with correct audio duration
+        if transcription_cache and not cache_hit:
+            transcription_cache.set(audio_sha256, engine.model, transcription_result, audio_duration=actual_audio_duration)
+
+        analysis_summary = None
+        if analysis is not None:
+            try:
+                features = await analysis
+                analysis_summary = features.summary()
+                # The decoded length includes any outro after the last lyric
+                actual_audio_duration = round(features.duration, 3)
+                print(f"[transcription] job {job_id} audio analysis: {analysis_summary}")
+            except Exception as e:
+                print(f"[transcription] job {job_id} audio analysis failed: {e}")
+
+        # The new transcript supersedes any edited segment rows and bumps the version
+        print(f"[transcription] job {job_id} saving transcription to project {project_id}")
+        supabase_service.replace_transcription(
+            UUID(project_id), None, transcription_result.model_dump(), transcription_result.text, edited=False
+        )
+
+        # Save the remaining fields with the correct audio duration
         update_data = {
             'transcription_status': 'completed',
-            'transcription_data': transcription_result.model_dump(),
-            'transcript_text': transcription_result.text,
-            'audio_duration': actual_audio_duration  # Update with actual duration from transcription
+            'audio_duration': actual_audio_duration,  # Decoded length, or the last segment's end without analysis
+            'audio_sha256': audio_sha256
         }
-        print(f"[transcription] job {job_id} saving transcription to project {project_id}")
         result = supabase_service.update_project(UUID(project_id), update_data)
         if not result:
             raise Exception("Failed to save transcription to project")
@@ -120,7 +216,8 @@ async def transcription_background_task(project_id: str, audio_url: str, job_id:
             'result_json': transcription_result.model_dump(),
             'payload_json': {
                 'project_id': project_id,
-                'stage': 'completed'
+                'stage': 'completed',
+                'audio_analysis': analysis_summary
             }
         })
 
@@ -136,15 +233,24 @@ async def transcription_background_task(project_id: str, audio_url: str, job_id:
                 'stage': 'failed'
             }
         })
+    finally:
+        if audio is not None:
+            audio.close()
 
 
 @router.post("/projects/{project_id}/transcribe", response_model=schemas.TranscriptionJobResponse)
 async def start_transcription(
     project_id: UUID,
     background_tasks: BackgroundTasks,
+    backend: Optional[str] = None,
     user_id: str = Depends(get_current_user)
 ):
-    """Start transcription job for project audio."""
+    """
+    Start transcription job for project audio.
+
+    The optional backend query parameter ("api" or "local") overrides the
+    deployment's default transcription backend for this job.
+    """
     try:
         # Check if project exists and belongs to user
         project = supabase_service.get_project(project_id)
@@ -188,6 +294,15 @@ async def start_transcription(
                 detail="Transcription already in progress"
             )
 
+        # Fail fast on a backend this deployment can't run
+        try:
+            backend = whisper_service.get_backend(backend).name
+        except (ValueError, ImportError) as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+
         # Create DB job entry
         job_data = {
             'project_id': str(project_id),
@@ -196,7 +311,8 @@ async def start_transcription(
             'progress': 0,
             'payload_json': {
                 'project_id': str(project_id),
-                'stage': 'queued'
+                'stage': 'queued',
+                'backend': backend
             }
         }
         job = supabase_service.create_job(job_data)
@@ -210,7 +326,8 @@ async def start_transcription(
             transcription_background_task,
             str(project_id),
             project['audio_url'],
-            job_id
+            job_id,
+            backend
         )
 
         # Estimate duration based on audio length
@@ -253,17 +370,16 @@ async def get_transcription(
             )
 
         transcription_status = project.get('transcription_status', 'pending')
-        transcription_data = project.get('transcription_data')
 
-        # Convert transcription_data to TranscriptionResult if it exists
-        transcription_result = None
-        if transcription_data:
-            transcription_result = schemas.TranscriptionResult(**transcription_data)
+        # Edited transcriptions are assembled from their stored segments
+        segment_store = get_transcription_segment_store()
+        transcription_result = segment_store.get_transcription(project)
 
         return schemas.TranscriptionStatusResponse(
             status=transcription_status,
             progress=1.0 if transcription_status == 'completed' else None,
-            transcription_data=transcription_result
+            transcription_data=transcription_result,
+            version=segment_store.version(project)
         )
 
     except HTTPException:
@@ -335,7 +451,12 @@ async def update_transcription(
     transcription_edit: schemas.TranscriptionEditRequest,
     user_id: str = Depends(get_current_user)
 ):
-    """Save user-edited transcription."""
+    """
+    Save user-edited transcription.
+
+    When expected_version is sent it must match the version returned by GET;
+    a stale version gets 409 and the client should reload before saving.
+    """
     try:
         # Check if project exists and belongs to user
         project = supabase_service.get_project(project_id)
@@ -358,28 +479,25 @@ async def update_transcription(
                 detail="Project has no completed transcription to edit"
             )
 
-        # Update project with edited transcription
-        update_data = {
-            'transcription_data': transcription_edit.transcription_data.model_dump(),
-            'transcript_text': transcription_edit.transcription_data.text,
-            'transcription_edited': True
-        }
-
-        result = supabase_service.update_project(project_id, update_data)
-        if not result:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Failed to save edited transcription"
-            )
+        # Replace the transcription (if nobody saved since the client read it); the blob becomes authoritative again
+        version = get_transcription_segment_store().replace(
+            project, transcription_edit.expected_version, transcription_edit.transcription_data
+        )
 
         return schemas.TranscriptionStatusResponse(
             status='completed',
             progress=1.0,
-            transcription_data=transcription_edit.transcription_data
+            transcription_data=transcription_edit.transcription_data,
+            version=version
         )
 
     except HTTPException:
         raise
+    except TranscriptionVersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -387,6 +505,66 @@ async def update_transcription(
         )
 
 
+@router.patch("/projects/{project_id}/transcription/segments", response_model=schemas.TranscriptionPatchResponse)
+async def patch_transcription_segments(
+    project_id: UUID,
+    patch: schemas.TranscriptionPatchRequest,
+    user_id: str = Depends(get_current_user)
+):
+    """
+    Apply segment-level edits (edit text, split, merge, shift timing).
+
+    Only the segments an edit touches are written. expected_version must match
+    the version returned by GET; a stale version gets 409 and the client should
+    reload and reapply its edits.
+    """
+    try:
+        project = supabase_service.get_project(project_id)
+        if not project:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Project not found"
+            )
+
+        if project.get('user_id') != user_id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied: Project does not belong to user"
+            )
+
+        if project.get('transcription_status') != 'completed':
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Project has no completed transcription to edit"
+            )
+
+        version, result = get_transcription_segment_store().apply_patch(project, patch.expected_version, patch.operations)
+
+        return schemas.TranscriptionPatchResponse(
+            version=version,
+            changed=[schemas.StoredSegment(**segment) for segment in result.changed.values()],
+            deleted=sorted(result.deleted)
+        )
+
+    except HTTPException:
+        raise
+    except TranscriptionVersionConflict as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except SegmentPatchError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to patch transcription: {str(e)}"
+        )
+
+
 @router.post("/transcription/estimate-cost")
 async def estimate_transcription_cost(audio_duration_minutes: float):
     """Estimate cost for audio transcription."""
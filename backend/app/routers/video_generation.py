@@ -6,7 +6,8 @@ from typing import Optional, Dict, Any
 from pydantic import BaseModel, Field
 
 from app.services.video_generation import VideoGenerationService
-from app.services.openrouter import OpenRouterService
+from app.services.openrouter import OpenRouterService, get_openrouter_service
+from app.services.llm_metering import llm_call_tags
 from app.services.supabase import get_supabase_client
 from app.models_pydantic import VisualPrompt, SceneSelection
 from app.dependencies.auth import get_current_user
@@ -39,11 +40,6 @@ def get_video_generation_service() -> VideoGenerationService:
     return VideoGenerationService()
 
 
-def get_openrouter_service() -> OpenRouterService:
-    """Dependency to get OpenRouterService instance."""
-    return OpenRouterService()
-
-
 @router.post("/generate", response_model=Dict[str, Any])
 async def generate_video(
     request: VideoGenerationRequest,
@@ -152,14 +148,15 @@ async def generate_video_from_scene(
         )
 
         # Generate motion prompt using DeepSeek video director
-        motion_prompt = await openrouter_service.generate_video_motion_prompt(
-            scene=scene,
-            visual_prompt=visual_prompt,
-            image_url=request.image_url,
-            song_title=request.song_title,
-            genre=request.genre,
-            artist_present=request.artist_present
-        )
+        with llm_call_tags(project_id=scene_data.get("project_id"), scene_id=request.scene_id):
+            motion_prompt = await openrouter_service.generate_video_motion_prompt(
+                scene=scene,
+                visual_prompt=visual_prompt,
+                image_url=request.image_url,
+                song_title=request.song_title,
+                genre=request.genre,
+                artist_present=request.artist_present
+            )
 
         # Generate video
         result = await video_service.generate_video_from_image(
@@ -0,0 +1,43 @@
+"""
+Inbound webhooks from generation providers.
+"""
+import json
+
+from fastapi import APIRouter, HTTPException, Request, status
+
+from app.config import settings
+from app.services.replicate_client import get_replicate_client, verify_webhook_signature
+
+router = APIRouter()
+
+
+@router.post("/webhooks/replicate")
+async def replicate_webhook(request: Request):
+    """Completion callback for Replicate predictions (set REPLICATE_WEBHOOK_URL to this endpoint)."""
+    body = await request.body()
+
+    # Unsigned deliveries are never accepted; without a secret the endpoint is closed
+    if not settings.replicate_webhook_secret or not verify_webhook_signature(
+        settings.replicate_webhook_secret,
+        request.headers.get("webhook-id", ""),
+        request.headers.get("webhook-timestamp", ""),
+        body,
+        request.headers.get("webhook-signature", "")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook signature"
+        )
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict) or not payload.get("id"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Webhook body must be a prediction object"
+        )
+
+    delivered = get_replicate_client().resolve_webhook(payload)
+    return {"received": True, "delivered": delivered}
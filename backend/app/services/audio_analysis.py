@@ -0,0 +1,507 @@
+"""
+Audio analysis stage: energy envelope, beat grid and sections.
+
+Computed locally with vectorized NumPy (STFT, spectral-flux onsets,
+autocorrelation tempo, self-similarity novelty) in a worker process, once
+per audio content hash. Features are stored as a compact .npz in the
+audio_features table and reused by every project with the same audio, so
+scene selection gets measured energy and structure instead of asking the
+LLM to infer them from lyrics.
+"""
+import asyncio
+import base64
+import io
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.models_pydantic import SceneSelection, SceneSelectionResult
+from app.services.audio_chunking import SAMPLE_RATE, decode_to_pcm
+from app.services.response_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Bump when the analysis changes; stored features from older versions are recomputed
+FEATURES_VERSION = 1
+
+N_FFT = 1024
+HOP = 512  # 32 ms at 16 kHz
+HOP_SECONDS = HOP / SAMPLE_RATE
+TEMPO_RANGE_BPM = (60.0, 200.0)
+SECTION_BLOCK_SECONDS = 1.0
+SECTION_CHANGE_DB = 6.0
+MIN_NOVELTY = 0.1
+
+
+@dataclass
+class AudioFeatures:
+    """Precomputed features of one audio file."""
+    duration: float
+    tempo: float  # BPM; 0 when no steady beat was found
+    rms: np.ndarray  # RMS per HOP_SECONDS frame (float16)
+    beats: np.ndarray  # Beat times in seconds
+    sections: np.ndarray  # Section boundaries in seconds, from 0 to duration
+    hop_seconds: float = HOP_SECONDS
+
+    def to_bytes(self) -> bytes:
+        """Compressed .npz file."""
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            version=np.int32(FEATURES_VERSION),
+            duration=np.float64(self.duration),
+            tempo=np.float64(self.tempo),
+            hop_seconds=np.float64(self.hop_seconds),
+            rms=self.rms.astype(np.float16),
+            beats=self.beats.astype(np.float32),
+            sections=self.sections.astype(np.float32)
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "AudioFeatures":
+        """
+        Load features written by to_bytes().
+
+        Raises:
+            ValueError: If the file is from another FEATURES_VERSION
+        """
+        with np.load(io.BytesIO(data), allow_pickle=False) as npz:
+            version = int(npz["version"])
+            if version != FEATURES_VERSION:
+                raise ValueError(f"Audio features version {version} is stale (current {FEATURES_VERSION})")
+            return cls(
+                duration=float(npz["duration"]),
+                tempo=float(npz["tempo"]),
+                hop_seconds=float(npz["hop_seconds"]),
+                rms=npz["rms"],
+                beats=npz["beats"],
+                sections=npz["sections"]
+            )
+
+    @property
+    def beat_seconds(self) -> float:
+        return 60.0 / self.tempo if self.tempo else 0.0
+
+    def _levels_db(self) -> Tuple[np.ndarray, float, float]:
+        """Frame levels in dB plus the track's quiet and loud reference levels."""
+        levels = 20 * np.log10(self.rms.astype(np.float64) + 1e-5)
+        return levels, float(np.percentile(levels, 10)), float(np.percentile(levels, 95))
+
+    def energy_level(self, start: float, end: float) -> int:
+        """Energy of [start, end) on a 1-10 scale relative to the rest of the track."""
+        if len(self.rms) == 0:
+            return 5
+        levels, quiet, loud = self._levels_db()
+        first = min(int(start / self.hop_seconds), len(self.rms) - 1)
+        last = max(first + 1, int(np.ceil(end / self.hop_seconds)))
+        # Mean power, not mean dB: a loud hit in a quiet bar still counts
+        level = 10 * np.log10(np.mean(10 ** (levels[first:last] / 10)))
+        if loud - quiet < 1e-6:
+            return 5
+        return int(np.clip(round(1 + 9 * (level - quiet) / (loud - quiet)), 1, 10))
+
+    def nearest_beat(self, t: float) -> float:
+        """Closest beat within half a beat of t, otherwise t itself."""
+        if len(self.beats) == 0:
+            return t
+        beat = float(self.beats[np.argmin(np.abs(self.beats - t))])
+        return beat if abs(beat - t) <= self.beat_seconds / 2 else t
+
+    def section_list(self) -> List[Dict[str, Any]]:
+        """Sections with their energy levels."""
+        bounds = [float(b) for b in self.sections]
+        return [
+            {"start": round(start, 2), "end": round(end, 2), "energy_level": self.energy_level(start, end)}
+            for start, end in zip(bounds, bounds[1:])
+        ]
+
+    def prompt_block(self) -> str:
+        """Compact description for the scene selection prompt."""
+        sections = " | ".join(
+            f"{s['start']:.1f}-{s['end']:.1f}s: {s['energy_level']}" for s in self.section_list()
+        )
+        tempo = f"{self.tempo:.0f} BPM (one beat every {self.beat_seconds:.2f}s)" if self.tempo else "no steady beat"
+        return f"""AUDIO ANALYSIS (measured from the audio track):
+- Tempo: {tempo}
+- Sections (time: energy 1-10): {sections}
+Start scenes on section boundaries where the lyrics allow, and take energy levels from these sections instead of guessing from the lyrics."""
+
+    def align_scene(self, scene: SceneSelection) -> SceneSelection:
+        """
+        Snap a scene's cuts to the beat and set its measured energy level.
+
+        Cuts within half a beat of the start or end of the song are left alone
+        so coverage of the whole song is kept. Adjacent scenes share a cut
+        time, so they snap to the same beat and stay gapless.
+        """
+        margin = self.beat_seconds / 2
+
+        def snap(t: float) -> float:
+            return t if t <= margin or t >= self.duration - margin else self.nearest_beat(t)
+
+        start, end = snap(scene.start_time), snap(scene.end_time)
+        if end <= start:
+            start, end = scene.start_time, scene.end_time
+        return scene.model_copy(update={
+            "start_time": round(start, 2),
+            "end_time": round(end, 2),
+            "duration": round(end - start, 2),
+            "energy_level": self.energy_level(start, end)
+        })
+
+    def align_result(self, result: SceneSelectionResult) -> SceneSelectionResult:
+        """align_scene() applied to every scene of a selection."""
+        scenes = [self.align_scene(scene) for scene in result.selected_scenes]
+        average = sum(scene.duration for scene in scenes) / len(scenes) if scenes else result.average_scene_length
+        return result.model_copy(update={
+            "selected_scenes": scenes,
+            "average_scene_length": round(average, 2)
+        })
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "duration": round(self.duration, 2),
+            "tempo": round(self.tempo, 1),
+            "beats": len(self.beats),
+            "sections": len(self.sections) - 1
+        }
+
+
+def stft_magnitude(samples: np.ndarray) -> np.ndarray:
+    """Magnitude spectrogram (frames x N_FFT // 2 + 1), frame i centred on sample i * HOP."""
+    padded = np.pad(samples.astype(np.float32), N_FFT // 2)
+    if len(padded) < N_FFT:
+        return np.zeros((0, N_FFT // 2 + 1), dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(padded, N_FFT)[::HOP]
+    return np.abs(np.fft.rfft(frames * np.hanning(N_FFT).astype(np.float32), axis=1)).astype(np.float32)
+
+
+def rms_envelope(samples: np.ndarray, frames: int) -> np.ndarray:
+    """RMS of the HOP samples around each spectrogram frame."""
+    padded = np.pad(samples.astype(np.float32), (HOP // 2, frames * HOP))
+    blocks = padded[:frames * HOP].reshape(frames, HOP)
+    return np.sqrt(np.mean(blocks ** 2, axis=1))
+
+
+def onset_envelope(magnitude: np.ndarray) -> np.ndarray:
+    """Spectral flux: summed positive change in log magnitude, minus its local mean."""
+    if len(magnitude) < 2:
+        return np.zeros(len(magnitude), dtype=np.float32)
+    log_magnitude = np.log1p(100.0 * magnitude / (magnitude.max() + 1e-10))
+    flux = np.zeros(len(magnitude), dtype=np.float32)
+    flux[1:] = np.maximum(np.diff(log_magnitude, axis=0), 0.0).sum(axis=1)
+    window = max(1, int(0.5 / HOP_SECONDS))
+    local_mean = np.convolve(flux, np.ones(window) / window, mode="same")
+    return np.maximum(flux - local_mean, 0.0).astype(np.float32)
+
+
+def estimate_tempo(onsets: np.ndarray) -> float:
+    """
+    Tempo in BPM from the autocorrelation of the onset envelope.
+
+    Lags are weighted by a log-normal prior around 120 BPM so the half and
+    double tempo of a clear beat don't win. Returns 0 for arrhythmic audio.
+    """
+    n = len(onsets)
+    min_lag = int(np.floor(60.0 / (TEMPO_RANGE_BPM[1] * HOP_SECONDS)))
+    max_lag = int(np.ceil(60.0 / (TEMPO_RANGE_BPM[0] * HOP_SECONDS)))
+    if n <= max_lag + 1:
+        return 0.0
+
+    centred = onsets - onsets.mean()
+    spectrum = np.fft.rfft(centred, 2 * n)
+    autocorrelation = np.fft.irfft(np.abs(spectrum) ** 2)[:n]
+    if autocorrelation[0] <= 0:
+        return 0.0
+    autocorrelation = autocorrelation / autocorrelation[0]
+
+    lags = np.arange(min_lag, max_lag + 1)
+    bpm = 60.0 / (lags * HOP_SECONDS)
+    weighted = autocorrelation[lags] * np.exp(-0.5 * np.log2(bpm / 120.0) ** 2)
+    best = int(np.argmax(weighted))
+    if autocorrelation[lags[best]] <= 0.05:
+        return 0.0
+
+    # Refine the period from the peak near a later multiple of the lag, where
+    # a frame of error is a smaller fraction of the period
+    lag = float(lags[best])
+    multiple = 1
+    while (multiple * 2 + 1) * lag < n / 2 and multiple < 8:
+        multiple *= 2
+    centre = int(round(multiple * lag))
+    low, high = max(1, centre - multiple), min(n - 2, centre + multiple)
+    peak = low + int(np.argmax(autocorrelation[low:high + 1]))
+    left, middle, right = autocorrelation[peak - 1:peak + 2]
+    curvature = left - 2 * middle + right
+    offset = 0.5 * (left - right) / curvature if curvature < 0 else 0.0
+    return float(60.0 / ((peak + offset) / multiple * HOP_SECONDS))
+
+
+def beat_grid(onsets: np.ndarray, tempo: float, duration: float) -> np.ndarray:
+    """Evenly spaced beats at the phase that lines up with the most onset strength."""
+    if not tempo:
+        return np.zeros(0, dtype=np.float32)
+    period = 60.0 / (tempo * HOP_SECONDS)  # frames
+    count = int(np.ceil(len(onsets) / period))
+    phases = np.arange(int(np.ceil(period)))
+    positions = np.round(phases[:, None] + np.arange(count)[None, :] * period).astype(np.int64)
+    strength = np.concatenate((onsets, np.zeros(int(np.ceil(period)) + 1, dtype=onsets.dtype)))
+    phase = phases[int(np.argmax(strength[positions].sum(axis=1)))]
+
+    # Fit the grid to the strongest onset within a quarter beat of each beat,
+    # so a small tempo error doesn't drift the grid off the music over a song
+    grid = phase + np.arange(count) * period
+    reach = max(1, int(period / 4))
+    windows = np.round(grid[:, None] + np.arange(-reach, reach + 1)[None, :]).astype(np.int64)
+    windows = np.clip(windows, 0, len(strength) - 1)
+    peaks = windows[np.arange(count), np.argmax(strength[windows], axis=1)]
+    strong = strength[peaks] > np.median(strength[peaks])
+    if strong.sum() >= 4:
+        slope, intercept = np.polyfit(np.arange(count)[strong], peaks[strong], 1)
+        if abs(slope - period) < period * 0.02:
+            grid = intercept + np.arange(count) * slope
+
+    beats = grid * HOP_SECONDS
+    return beats[beats < duration].astype(np.float32)
+
+
+def section_boundaries(
+    magnitude: np.ndarray,
+    duration: float,
+    beats: np.ndarray,
+    min_section_seconds: float = 8.0,
+    kernel_seconds: float = 8.0
+) -> np.ndarray:
+    """
+    Section boundaries from a checkerboard-kernel novelty curve.
+
+    Log band energies are pooled into SECTION_BLOCK_SECONDS blocks; a boundary
+    is where the blocks before a point stop resembling the blocks after it.
+    Boundaries are snapped to the nearest beat.
+    """
+    block_frames = int(round(SECTION_BLOCK_SECONDS / HOP_SECONDS))
+    blocks = len(magnitude) // block_frames
+    kernel = int(round(kernel_seconds / SECTION_BLOCK_SECONDS))
+    if blocks < 2 * kernel:
+        return np.array([0.0, duration], dtype=np.float32)
+
+    # 16 log-spaced bands between 60 Hz and 8 kHz
+    frequencies = np.fft.rfftfreq(N_FFT, 1.0 / SAMPLE_RATE)
+    edges = np.geomspace(60.0, SAMPLE_RATE / 2, 17)
+    band_index = np.clip(np.searchsorted(edges, frequencies) - 1, 0, 15)
+    valid = frequencies >= edges[0]
+    bands = np.zeros((len(magnitude), 16), dtype=np.float64)
+    for band in range(16):
+        selected = valid & (band_index == band)
+        bands[:, band] = (magnitude[:, selected] ** 2).sum(axis=1)
+
+    pooled = 10 * np.log10(bands[:blocks * block_frames].reshape(blocks, block_frames, 16).mean(axis=1) + 1e-10)
+    # Floor quiet bands 60 dB under the loudest so their noise doesn't count as change
+    pooled = np.maximum(pooled, pooled.max() - 60.0)
+    # Blocks whose band levels differ by SECTION_CHANGE_DB (RMS over bands) count as dissimilar
+    squared = (pooled ** 2).sum(axis=1)
+    distance = np.sqrt(np.maximum(squared[:, None] + squared[None, :] - 2 * pooled @ pooled.T, 0.0) / 16)
+    similarity = np.exp(-(distance / SECTION_CHANGE_DB) ** 2)
+
+    # Gaussian-tapered checkerboard: +1 within past/future, -1 across them
+    offsets = np.arange(-kernel, kernel) + 0.5
+    taper = np.exp(-0.5 * (offsets / (kernel / 2)) ** 2)
+    checkerboard = np.outer(np.sign(offsets) * taper, np.sign(offsets) * taper)
+    checkerboard /= np.abs(checkerboard).sum()  # Novelty in [-1, 1]
+    padded = np.pad(similarity, kernel, mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, (2 * kernel, 2 * kernel))
+    novelty = np.array([np.sum(windows[i, i] * checkerboard) for i in range(blocks)])
+    novelty[:kernel // 2] = 0
+    novelty[blocks - kernel // 2:] = 0
+
+    threshold = max(novelty.mean() + novelty.std(), 0.25 * novelty.max(), MIN_NOVELTY)
+    min_blocks = int(round(min_section_seconds / SECTION_BLOCK_SECONDS))
+    chosen: List[int] = []
+    # Strongest peaks first, skipping any too close to one already chosen
+    for i in np.argsort(novelty)[::-1]:
+        if novelty[i] <= threshold:
+            break
+        if i < min_blocks or blocks - i < min_blocks:
+            continue
+        if all(abs(i - j) >= min_blocks for j in chosen):
+            chosen.append(int(i))
+
+    times = sorted(i * SECTION_BLOCK_SECONDS for i in chosen)
+    if len(beats):
+        times = [float(beats[np.argmin(np.abs(beats - t))]) for t in times]
+    return np.array([0.0, *times, duration], dtype=np.float32)
+
+
+def analyze_audio(samples: np.ndarray) -> AudioFeatures:
+    """Run the full analysis on 16 kHz mono float samples."""
+    duration = len(samples) / SAMPLE_RATE
+    magnitude = stft_magnitude(samples)
+    onsets = onset_envelope(magnitude)
+    tempo = estimate_tempo(onsets)
+    beats = beat_grid(onsets, tempo, duration)
+    if len(beats) > 1:
+        # The fitted grid pins the tempo down more precisely than the autocorrelation
+        tempo = float(60.0 / np.mean(np.diff(beats)))
+    return AudioFeatures(
+        duration=duration,
+        tempo=tempo,
+        rms=rms_envelope(samples, len(magnitude)).astype(np.float16),
+        beats=beats,
+        sections=section_boundaries(magnitude, duration, beats)
+    )
+
+
+def _analyze_in_worker(pcm: bytes) -> bytes:
+    """Runs in a worker process; 16-bit PCM in, .npz out, so both pickle cheaply."""
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+    return analyze_audio(samples).to_bytes()
+
+
+class AudioAnalysisService:
+    """
+    Analyzes each distinct audio file once and serves its features.
+
+    Two-tier cache like TranscriptionCache: an in-process LRU in front of the
+    audio_features table. Store errors are logged and treated as misses.
+    Concurrent requests for the same hash share one analysis.
+    """
+
+    def __init__(self, store=None, executor: Optional[Executor] = None, workers: int = 1, lru_size: int = 32):
+        """
+        Args:
+            store: Object with get_audio_features(sha256) and save_audio_features(row)
+                (defaults to supabase_service)
+            executor: Executor to run analyses in instead of a new process pool
+            workers: Worker processes in the default pool
+            lru_size: Feature sets kept in memory
+        """
+        self._store = store
+        self._executor = executor
+        self.workers = workers
+        self._lru = LRUCache(max_entries=lru_size)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._stats = {"hits_memory": 0, "hits_store": 0, "analyzed": 0, "errors": 0}
+
+    @property
+    def store(self):
+        if self._store is None:
+            from app.services.supabase import supabase_service
+            self._store = supabase_service
+        return self._store
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # spawn: forked children would inherit the event loop and open sockets
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def get(self, content_sha256: Optional[str]) -> Optional[AudioFeatures]:
+        """Stored features for an audio hash, or None if it hasn't been analyzed."""
+        if not content_sha256:
+            return None
+        found, features = self._lru.get(content_sha256)
+        if found:
+            self._stats["hits_memory"] += 1
+            return features
+
+        try:
+            row = self.store.get_audio_features(content_sha256)
+            features = AudioFeatures.from_bytes(base64.b64decode(row["features_npz"])) if row else None
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Audio features lookup failed: {e}")
+            features = None
+        if features is None:
+            return None
+
+        self._lru.set(content_sha256, features)
+        self._stats["hits_store"] += 1
+        return features
+
+    def _save(self, content_sha256: str, features: AudioFeatures):
+        self._lru.set(content_sha256, features)
+        try:
+            self.store.save_audio_features({
+                "content_sha256": content_sha256,
+                "version": FEATURES_VERSION,
+                "duration_seconds": round(features.duration, 3),
+                "tempo_bpm": round(features.tempo, 2),
+                "features_npz": base64.b64encode(features.to_bytes()).decode("ascii")
+            })
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Audio features store failed: {e}")
+
+    async def _analyze(self, content_sha256: str, pcm: bytes) -> AudioFeatures:
+        loop = asyncio.get_running_loop()
+        features = AudioFeatures.from_bytes(await loop.run_in_executor(self.executor, _analyze_in_worker, pcm))
+        self._stats["analyzed"] += 1
+        self._save(content_sha256, features)
+        logger.info(f"Analyzed audio {content_sha256[:12]}: {features.summary()}")
+        return features
+
+    def analyze_samples(self, content_sha256: str, samples: np.ndarray) -> "asyncio.Future[AudioFeatures]":
+        """
+        Start analyzing decoded samples (or join an analysis already running).
+
+        Returns:
+            Future resolving to the AudioFeatures
+        """
+        if content_sha256 in self._in_flight:
+            return self._in_flight[content_sha256]
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        task = asyncio.ensure_future(self._analyze(content_sha256, pcm))
+        self._in_flight[content_sha256] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(content_sha256, None))
+        return task
+
+    async def start(self, content_sha256: str, audio_file: BinaryIO, suffix: str = "") -> "asyncio.Future[AudioFeatures]":
+        """
+        Decode the audio and start its analysis in the background.
+
+        Decoding finishes before this returns, so the file can be handed to
+        the transcriber while the analysis runs.
+
+        Returns:
+            Future resolving to the AudioFeatures (already resolved on a cache hit)
+        """
+        features = self.get(content_sha256)
+        if features is not None:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(features)
+            return future
+        if content_sha256 in self._in_flight:
+            return self._in_flight[content_sha256]
+        samples = await decode_to_pcm(audio_file, suffix=suffix)
+        return self.analyze_samples(content_sha256, samples)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "in_flight": len(self._in_flight), "memory_entries": len(self._lru)}
+
+    async def close(self):
+        global audio_analysis_service
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if audio_analysis_service is self:
+            audio_analysis_service = None
+
+
+# Global service instance - will be initialized when needed
+audio_analysis_service = None
+
+def get_audio_analysis_service() -> AudioAnalysisService:
+    """Get or create the global AudioAnalysisService instance."""
+    global audio_analysis_service
+    if audio_analysis_service is None:
+        audio_analysis_service = AudioAnalysisService(workers=settings.audio_analysis_workers)
+    return audio_analysis_service
@@ -0,0 +1,227 @@
+"""
+Audio chunking for parallel transcription.
+
+Decodes audio to 16 kHz mono PCM, picks cut points in low-energy stretches
+near the target chunk length, and stitches per-chunk Whisper segments back
+onto the song timeline, de-duplicating the overlap between neighbours.
+"""
+import asyncio
+import io
+import logging
+import re
+import shutil
+import tempfile
+import wave
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+@dataclass
+class AudioChunk:
+    """One transcription window; segments are kept only inside [keep_start, keep_end)."""
+    index: int
+    start: float       # Window start on the song timeline (includes overlap)
+    end: float         # Window end (includes overlap)
+    keep_start: float  # Cut point shared with the previous chunk
+    keep_end: float    # Cut point shared with the next chunk
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+
+def _decode_wav(file: BinaryIO) -> Optional[np.ndarray]:
+    """Decode 16-bit PCM WAV without ffmpeg (None if the file isn't such a WAV)."""
+    try:
+        file.seek(0)
+        with wave.open(file) as wav:
+            if wav.getsampwidth() != 2:
+                return None
+            channels = wav.getnchannels()
+            rate = wav.getframerate()
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2").astype(np.float32) / 32768.0
+    except (wave.Error, EOFError):
+        return None
+    finally:
+        file.seek(0)
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != SAMPLE_RATE and len(samples):
+        # Linear resampling is plenty for energy analysis and speech recognition
+        target_length = int(len(samples) * SAMPLE_RATE / rate)
+        samples = np.interp(
+            np.linspace(0, len(samples) - 1, target_length), np.arange(len(samples)), samples
+        ).astype(np.float32)
+    return samples
+
+
+async def decode_to_pcm(audio: Union[bytes, BinaryIO], suffix: str = "") -> np.ndarray:
+    """
+    Decode audio to 16 kHz mono float32 samples.
+
+    Args:
+        audio: Encoded audio bytes or file object (any format ffmpeg reads;
+            PCM WAV works without ffmpeg)
+        suffix: Original file extension, used as a hint for ffmpeg
+
+    Returns:
+        Samples in [-1, 1]
+
+    Raises:
+        Exception: If the audio can't be decoded
+    """
+    file = io.BytesIO(audio) if isinstance(audio, (bytes, bytearray)) else audio
+
+    if not ffmpeg_available():
+        samples = _decode_wav(file)
+        if samples is None:
+            raise Exception("ffmpeg is not installed and the audio is not a PCM WAV file")
+        return samples
+
+    # A temp file rather than stdin: MP4/M4A files may keep their index at the end
+    with tempfile.NamedTemporaryFile(suffix=suffix) as source:
+        file.seek(0)
+        shutil.copyfileobj(file, source, 1024 * 1024)
+        file.seek(0)
+        source.flush()
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-nostdin", "-v", "error", "-i", source.name,
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+
+    if process.returncode != 0:
+        raise Exception(f"ffmpeg failed to decode audio: {stderr.decode(errors='replace')[:500]}")
+    return np.frombuffer(stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def frame_energy(samples: np.ndarray, frame_seconds: float = 0.05) -> np.ndarray:
+    """RMS energy of consecutive frames."""
+    frame = max(1, int(SAMPLE_RATE * frame_seconds))
+    usable = len(samples) - len(samples) % frame
+    if usable == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:usable].reshape(-1, frame)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def plan_chunks(
+    energy: np.ndarray,
+    frame_seconds: float = 0.05,
+    target_seconds: float = 60.0,
+    search_seconds: float = 8.0,
+    overlap_seconds: float = 2.0
+) -> List[AudioChunk]:
+    """
+    Choose cut points at low-energy frames near every target_seconds.
+
+    Args:
+        energy: Per-frame RMS energy (see frame_energy)
+        frame_seconds: Duration of one energy frame
+        target_seconds: Desired chunk length
+        search_seconds: How far either side of the target to look for a quiet frame
+        overlap_seconds: Audio shared by neighbouring windows on each side of a cut
+
+    Returns:
+        Chunks covering the whole audio; a single chunk if it is shorter than 1.5 targets
+    """
+    duration = len(energy) * frame_seconds
+    cuts = [0.0]
+    while duration - cuts[-1] > target_seconds * 1.5:
+        target = cuts[-1] + target_seconds
+        low = int(max(cuts[-1] + target_seconds / 2, target - search_seconds) / frame_seconds)
+        high = int(min(duration - target_seconds / 2, target + search_seconds) / frame_seconds)
+        if high <= low:
+            cut = target
+        else:
+            # Smooth over ~250 ms so a single quiet frame inside a word doesn't win
+            window = energy[low:high]
+            kernel = np.ones(5) / 5
+            smoothed = np.convolve(window, kernel, mode="same") if len(window) >= 5 else window
+            cut = (low + int(np.argmin(smoothed))) * frame_seconds
+        cuts.append(round(cut, 3))
+    cuts.append(round(duration, 3))
+
+    return [
+        AudioChunk(
+            index=i,
+            start=max(0.0, cuts[i] - overlap_seconds),
+            end=min(duration, cuts[i + 1] + overlap_seconds),
+            keep_start=cuts[i],
+            keep_end=cuts[i + 1]
+        )
+        for i in range(len(cuts) - 1)
+    ]
+
+
+def encode_wav(samples: np.ndarray) -> bytes:
+    """Encode float samples as 16 kHz mono 16-bit WAV (~32 KB per second)."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def slice_chunk(samples: np.ndarray, chunk: AudioChunk) -> np.ndarray:
+    return samples[int(chunk.start * SAMPLE_RATE):int(chunk.end * SAMPLE_RATE)]
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r"[^\w']+", " ", text.lower()).strip()
+
+
+def stitch_segments(chunk_segments: Sequence[Tuple[AudioChunk, List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+    """
+    Merge per-chunk segments onto the song timeline.
+
+    Segment times are shifted by the chunk start. In an overlap, each segment
+    belongs to the chunk whose keep range contains its midpoint, and a segment
+    repeating the text of the one before it across a cut is dropped.
+
+    Args:
+        chunk_segments: (chunk, segments relative to chunk.start) in chunk order
+
+    Returns:
+        Segments with absolute start/end times
+    """
+    stitched: List[Dict[str, Any]] = []
+    for position, (chunk, segments) in enumerate(chunk_segments):
+        is_last = position == len(chunk_segments) - 1
+        first_in_chunk = True
+        for segment in segments:
+            start = round(float(segment.get("start", 0)) + chunk.start, 3)
+            end = round(float(segment.get("end", 0)) + chunk.start, 3)
+            midpoint = (start + end) / 2
+            if midpoint < chunk.keep_start or (midpoint >= chunk.keep_end and not is_last):
+                continue
+
+            text = segment.get("text", "")
+            if (
+                first_in_chunk and stitched
+                and _normalize_text(text) == _normalize_text(stitched[-1]["text"])
+                and start - stitched[-1]["end"] < 2.0
+            ):
+                continue
+            first_in_chunk = False
+
+            if stitched and start < stitched[-1]["end"]:
+                start = stitched[-1]["end"]  # Keep segments ordered and non-overlapping
+            stitched.append({**segment, "start": start, "end": max(start, end), "text": text})
+    return stitched
@@ -0,0 +1,92 @@
+"""
+Streaming audio download to a spooled temporary file.
+
+Audio is read in fixed-size chunks into a SpooledTemporaryFile (memory up to
+a threshold, then disk) while its SHA-256 and size are computed, so a job
+never holds more than one bounded copy of a track in memory.
+"""
+import hashlib
+import logging
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class AudioTooLargeError(ValueError):
+    """The audio exceeds the configured download cap."""
+
+
+@dataclass
+class DownloadedAudio:
+    """A downloaded track positioned at offset 0. Call close() when done."""
+    file: BinaryIO
+    sha256: str
+    size_bytes: int
+    content_type: str = ""
+
+    @property
+    def on_disk(self) -> bool:
+        return bool(getattr(self.file, "_rolled", False))
+
+    def close(self):
+        self.file.close()
+
+
+async def download_to_spooled_file(
+    url: str,
+    max_bytes: int,
+    spool_bytes: int = 16 * 1024 * 1024,
+    chunk_bytes: int = 1024 * 1024,
+    timeout: float = 60.0
+) -> DownloadedAudio:
+    """
+    Stream a file into a SpooledTemporaryFile, hashing it on the way.
+
+    Args:
+        url: File URL
+        max_bytes: Hard cap; larger files fail without being fully downloaded
+        spool_bytes: Size above which the file moves from memory to disk
+        chunk_bytes: Read size
+        timeout: Per-read timeout in seconds
+
+    Returns:
+        DownloadedAudio with the file rewound to the start
+
+    Raises:
+        AudioTooLargeError: If the file is larger than max_bytes
+        Exception: If the download fails
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
+            async with client.stream("GET", url) as response:
+                if response.status_code != 200:
+                    raise Exception(f"Failed to download audio file: {response.status_code}")
+
+                declared = response.headers.get("Content-Length")
+                if declared and int(declared) > max_bytes:
+                    raise AudioTooLargeError(f"Audio file is {int(declared)} bytes; the limit is {max_bytes}")
+
+                async for chunk in response.aiter_bytes(chunk_bytes):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise AudioTooLargeError(f"Audio file exceeds the {max_bytes} byte limit")
+                    digest.update(chunk)
+                    spooled.write(chunk)
+
+                content_type = response.headers.get("Content-Type", "")
+    except BaseException:
+        spooled.close()
+        raise
+
+    spooled.seek(0)
+    downloaded = DownloadedAudio(file=spooled, sha256=digest.hexdigest(), size_bytes=size, content_type=content_type)
+    logger.info(f"Downloaded {size} bytes ({'disk' if downloaded.on_disk else 'memory'})")
+    return downloaded
@@ -0,0 +1,483 @@
+"""
+Audio format and duration probing from file headers.
+
+Reads only the first (and, where needed, last) few KB of a file - over HTTP
+with Range requests - and parses the container/frame headers of MP3, M4A/MP4,
+WAV, FLAC and Ogg to get the exact duration, bitrate and sample rate. The
+format is sniffed from magic bytes rather than the file extension.
+"""
+import logging
+import re
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HEAD_BYTES = 64 * 1024
+MAX_MOOV_BYTES = 8 * 1024 * 1024
+
+
+class AudioProbeError(Exception):
+    """The audio header could not be read or parsed."""
+
+
+@dataclass
+class AudioProbe:
+    """What the headers say about an audio file."""
+    format: str                        # mp3 | m4a | mp4 | wav | flac | ogg | webm | unknown
+    duration: Optional[float] = None   # Seconds
+    bitrate: Optional[int] = None      # Bits per second (average for VBR)
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    size_bytes: Optional[int] = None
+    exact: bool = False                # Duration read from headers rather than estimated
+
+
+# ---------------------------------------------------------------------------
+# Byte sources
+# ---------------------------------------------------------------------------
+
+class BytesSource:
+    """Probe source over in-memory bytes."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.size: Optional[int] = len(data)
+        self.head = data[:HEAD_BYTES]
+
+    async def read(self, start: int, length: int) -> bytes:
+        return self.data[start:start + length]
+
+
+class FileSource:
+    """Probe source over a seekable file object (reads only what the parsers ask for)."""
+
+    def __init__(self, file: BinaryIO):
+        self.file = file
+        position = file.tell()
+        file.seek(0, 2)
+        self.size: Optional[int] = file.tell()
+        file.seek(0)
+        self.head = file.read(HEAD_BYTES)
+        file.seek(position)
+
+    async def read(self, start: int, length: int) -> bytes:
+        position = self.file.tell()
+        self.file.seek(start)
+        data = self.file.read(length)
+        self.file.seek(position)
+        return data
+
+
+class HTTPRangeSource:
+    """
+    Probe source over HTTP Range requests.
+
+    The first HEAD_BYTES are fetched once; other reads are separate ranged
+    GETs. Servers that ignore Range only serve the head.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, url: str):
+        self.client = client
+        self.url = url
+        self.size: Optional[int] = None
+        self.head = b""
+        self.supports_range = False
+        self.requests = 0
+
+    async def open(self):
+        self.requests += 1
+        async with self.client.stream("GET", self.url, headers={"Range": f"bytes=0-{HEAD_BYTES - 1}"}) as response:
+            if response.status_code not in (200, 206):
+                raise AudioProbeError(f"Failed to read audio header: HTTP {response.status_code}")
+
+            if response.status_code == 206:
+                self.supports_range = True
+                match = re.search(r"/(\d+)$", response.headers.get("Content-Range", ""))
+                self.size = int(match.group(1)) if match else None
+            elif response.headers.get("Content-Length"):
+                self.size = int(response.headers["Content-Length"])
+
+            # A server ignoring Range sends the whole file; stop after the head
+            chunks = []
+            received = 0
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                received += len(chunk)
+                if received >= HEAD_BYTES:
+                    break
+            self.head = b"".join(chunks)[:HEAD_BYTES]
+
+    async def read(self, start: int, length: int) -> bytes:
+        if start + length <= len(self.head):
+            return self.head[start:start + length]
+        if not self.supports_range:
+            raise AudioProbeError("Server does not support Range requests")
+        if self.size is not None:
+            length = min(length, self.size - start)
+        if length <= 0:
+            return b""
+
+        self.requests += 1
+        response = await self.client.get(self.url, headers={"Range": f"bytes={start}-{start + length - 1}"})
+        if response.status_code != 206:
+            raise AudioProbeError(f"Range request failed: HTTP {response.status_code}")
+        return response.content
+
+
+# ---------------------------------------------------------------------------
+# Format sniffing
+# ---------------------------------------------------------------------------
+
+def sniff_format(head: bytes) -> str:
+    """Identify the container from magic bytes."""
+    if head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "mp3"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"\x1aE\xdf\xa3":
+        return "webm"
+    if head[4:8] == b"ftyp":
+        brand = head[8:12]
+        return "m4a" if brand in (b"M4A ", b"M4B ") else "mp4"
+    return "unknown"
+
+
+# ---------------------------------------------------------------------------
+# MP3
+# ---------------------------------------------------------------------------
+
+_MP3_BITRATES = {
+    (1, 1): [32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+
+
+def _parse_mp3_header(data: bytes, offset: int) -> Optional[Dict[str, int]]:
+    """Decode the 4-byte MPEG audio frame header at offset (None if invalid)."""
+    if offset + 4 > len(data):
+        return None
+    header = struct.unpack(">I", data[offset:offset + 4])[0]
+    if header >> 21 != 0x7FF:
+        return None
+
+    version_bits = (header >> 19) & 3
+    layer_bits = (header >> 17) & 3
+    bitrate_index = (header >> 12) & 0xF
+    rate_index = (header >> 10) & 3
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    version = {3: 1, 2: 2, 0: 2.5}[version_bits]
+    layer = 4 - layer_bits
+    bitrate = _MP3_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index - 1] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header >> 9) & 1
+    mono = ((header >> 6) & 3) == 3
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 576 if (layer == 3 and version != 1) else 1152
+        length = samples // 8 * bitrate // sample_rate + padding
+
+    return {
+        "version": version, "layer": layer, "bitrate": bitrate, "sample_rate": sample_rate,
+        "channels": 1 if mono else 2, "samples": samples, "length": length
+    }
+
+
+def _find_first_frame(data: bytes, start: int) -> Tuple[int, Dict[str, int]]:
+    """Find a frame header confirmed by a second header right after it."""
+    for offset in range(start, len(data) - 4):
+        if data[offset] != 0xFF:
+            continue
+        frame = _parse_mp3_header(data, offset)
+        if frame is None:
+            continue
+        following = offset + frame["length"]
+        if following + 4 > len(data) or _parse_mp3_header(data, following):
+            return offset, frame
+    raise AudioProbeError("No MPEG audio frame found")
+
+
+async def _probe_mp3(source, head: bytes) -> AudioProbe:
+    audio_start = 0
+    if head[:3] == b"ID3":
+        tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        audio_start = 10 + tag_size + (10 if head[5] & 0x10 else 0)
+
+    # Album art can push the first frame past the head
+    data, base = head, 0
+    if audio_start + 4096 > len(head):
+        data, base = await source.read(audio_start, HEAD_BYTES), audio_start
+
+    offset, frame = _find_first_frame(data, audio_start - base)
+    frame_start = base + offset
+    probe = AudioProbe(format="mp3", sample_rate=frame["sample_rate"], channels=frame["channels"], size_bytes=source.size)
+
+    # Xing/Info (LAME) or VBRI headers carry the exact frame count
+    side_info = (32 if frame["channels"] == 2 else 17) if frame["version"] == 1 else (17 if frame["channels"] == 2 else 9)
+    xing = offset + 4 + side_info
+    frames = audio_bytes = None
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        position = xing + 8
+        if flags & 1:
+            frames = struct.unpack(">I", data[position:position + 4])[0]
+            position += 4
+        if flags & 2:
+            audio_bytes = struct.unpack(">I", data[position:position + 4])[0]
+    elif data[offset + 36:offset + 40] == b"VBRI":
+        audio_bytes, frames = struct.unpack(">II", data[offset + 46:offset + 54])
+
+    if frames:
+        probe.duration = frames * frame["samples"] / frame["sample_rate"]
+        if audio_bytes:
+            probe.bitrate = int(audio_bytes * 8 / probe.duration)
+        elif source.size:
+            probe.bitrate = int((source.size - frame_start) * 8 / probe.duration)
+        probe.exact = True
+        return probe
+
+    # No VBR header: scan the frames we have; identical bitrates mean CBR
+    bitrates = []
+    position = offset
+    while len(bitrates) < 200:
+        scanned = _parse_mp3_header(data, position)
+        if scanned is None:
+            break
+        bitrates.append(scanned["bitrate"])
+        position += scanned["length"]
+    average_bitrate = sum(bitrates) / len(bitrates)
+    probe.bitrate = int(average_bitrate)
+
+    if source.size:
+        audio_end = source.size
+        if source.size >= 128 and await source.read(source.size - 128, 3) == b"TAG":
+            audio_end -= 128  # ID3v1 tag
+        probe.duration = (audio_end - frame_start) * 8 / average_bitrate
+        probe.exact = len(set(bitrates)) == 1
+    return probe
+
+
+# ---------------------------------------------------------------------------
+# M4A / MP4
+# ---------------------------------------------------------------------------
+
+async def _probe_mp4(source, head: bytes, container: str) -> AudioProbe:
+    probe = AudioProbe(format=container, size_bytes=source.size)
+
+    # Walk top-level boxes to moov (often after a large mdat)
+    offset = 0
+    moov = None
+    while source.size is None or offset + 8 <= source.size:
+        header = await source.read(offset, 16)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            if source.size is None:
+                break
+            size = source.size - offset
+        if size < header_size:
+            raise AudioProbeError(f"Corrupt MP4 box at offset {offset}")
+
+        if box_type == b"moov":
+            if size > MAX_MOOV_BYTES:
+                raise AudioProbeError("MP4 moov box too large to probe")
+            moov = await source.read(offset + header_size, size - header_size)
+            break
+        offset += size
+
+    if moov is None:
+        raise AudioProbeError("MP4 file has no moov box")
+
+    mvhd = moov.find(b"mvhd")
+    if mvhd < 4:
+        raise AudioProbeError("MP4 moov box has no mvhd")
+    body = mvhd + 4
+    if moov[body] == 1:
+        timescale, duration = struct.unpack(">IQ", moov[body + 20:body + 32])
+    else:
+        timescale, duration = struct.unpack(">II", moov[body + 12:body + 20])
+    if timescale:
+        probe.duration = duration / timescale
+        probe.exact = True
+
+    # Audio sample entry: channel count at +24, 16.16 fixed-point sample rate at +32 from the box start
+    for codec in (b"mp4a", b"alac", b"ac-3", b"Opus"):
+        entry = moov.find(codec)
+        if entry >= 4:
+            box_start = entry - 4
+            probe.channels = struct.unpack(">H", moov[box_start + 24:box_start + 26])[0]
+            probe.sample_rate = struct.unpack(">I", moov[box_start + 32:box_start + 36])[0] >> 16
+            break
+
+    if probe.duration and source.size:
+        probe.bitrate = int(source.size * 8 / probe.duration)
+    return probe
+
+
+# ---------------------------------------------------------------------------
+# WAV, FLAC, Ogg
+# ---------------------------------------------------------------------------
+
+async def _probe_wav(source, head: bytes) -> AudioProbe:
+    probe = AudioProbe(format="wav", size_bytes=source.size)
+    offset = 12
+    byte_rate = None
+    while True:
+        header = await source.read(offset, 8)
+        if len(header) < 8:
+            break
+        chunk_id, chunk_size = struct.unpack("<4sI", header)
+        if chunk_id == b"fmt ":
+            fmt = await source.read(offset + 8, 16)
+            _, probe.channels, probe.sample_rate, byte_rate = struct.unpack("<HHII", fmt[:12])
+            probe.bitrate = byte_rate * 8
+        elif chunk_id == b"data":
+            if byte_rate:
+                data_size = chunk_size
+                if source.size and (chunk_size == 0xFFFFFFFF or offset + 8 + chunk_size > source.size):
+                    data_size = source.size - offset - 8  # Streamed WAVs leave the size unset
+                probe.duration = data_size / byte_rate
+                probe.exact = True
+            break
+        offset += 8 + chunk_size + (chunk_size & 1)
+
+    if probe.duration is None:
+        raise AudioProbeError("WAV file has no fmt/data chunk")
+    return probe
+
+
+async def _probe_flac(source, head: bytes) -> AudioProbe:
+    # STREAMINFO is always the first metadata block
+    if head[4] & 0x7F != 0:
+        raise AudioProbeError("FLAC file does not start with STREAMINFO")
+    packed = int.from_bytes(head[18:26], "big")
+    sample_rate = packed >> 44
+    total_samples = packed & 0xFFFFFFFFF
+    probe = AudioProbe(
+        format="flac", sample_rate=sample_rate, channels=((packed >> 41) & 7) + 1, size_bytes=source.size
+    )
+    if sample_rate and total_samples:
+        probe.duration = total_samples / sample_rate
+        probe.exact = True
+        if source.size:
+            probe.bitrate = int(source.size * 8 / probe.duration)
+    return probe
+
+
+async def _probe_ogg(source, head: bytes) -> AudioProbe:
+    probe = AudioProbe(format="ogg", size_bytes=source.size)
+    vorbis = head.find(b"\x01vorbis")
+    opus = head.find(b"OpusHead")
+    if vorbis >= 0:
+        probe.channels = head[vorbis + 11]
+        probe.sample_rate = struct.unpack("<I", head[vorbis + 12:vorbis + 16])[0]
+        granule_rate = probe.sample_rate
+    elif opus >= 0:
+        probe.channels = head[opus + 9]
+        probe.sample_rate = struct.unpack("<I", head[opus + 12:opus + 16])[0]
+        granule_rate = 48000  # Opus granule positions are always 48 kHz
+    else:
+        return probe
+
+    # The last page's granule position is the total sample count
+    if source.size and granule_rate:
+        tail_start = max(0, source.size - HEAD_BYTES)
+        tail = await source.read(tail_start, source.size - tail_start)
+        last_page = tail.rfind(b"OggS")
+        if last_page >= 0 and last_page + 14 <= len(tail):
+            granule = struct.unpack("<q", tail[last_page + 6:last_page + 14])[0]
+            if granule > 0:
+                probe.duration = granule / granule_rate
+                probe.bitrate = int(source.size * 8 / probe.duration)
+                probe.exact = True
+    return probe
+
+
+# ---------------------------------------------------------------------------
+# Entry points
+# ---------------------------------------------------------------------------
+
+async def probe_source(source) -> AudioProbe:
+    """
+    Probe an opened byte source.
+
+    Args:
+        source: BytesSource, FileSource or opened HTTPRangeSource
+
+    Returns:
+        AudioProbe (duration is None for containers without usable headers, e.g. WebM)
+
+    Raises:
+        AudioProbeError: If the headers are missing or corrupt
+    """
+    head = source.head
+    container = sniff_format(head)
+    try:
+        if container == "mp3":
+            return await _probe_mp3(source, head)
+        if container in ("m4a", "mp4"):
+            return await _probe_mp4(source, head, container)
+        if container == "wav":
+            return await _probe_wav(source, head)
+        if container == "flac":
+            return await _probe_flac(source, head)
+        if container == "ogg":
+            return await _probe_ogg(source, head)
+    except (struct.error, IndexError) as e:
+        raise AudioProbeError(f"Truncated or corrupt {container} header: {e}")
+    return AudioProbe(format=container, size_bytes=source.size)
+
+
+async def probe_bytes(data: bytes) -> AudioProbe:
+    """Probe audio held in memory."""
+    return await probe_source(BytesSource(data))
+
+
+async def probe_fileobj(file: BinaryIO) -> AudioProbe:
+    """Probe a seekable file object without reading it whole."""
+    return await probe_source(FileSource(file))
+
+
+async def probe_url(url: str, timeout: float = 10.0, client: Optional[httpx.AsyncClient] = None) -> AudioProbe:
+    """
+    Probe a remote audio file with Range requests (a few KB regardless of file size).
+
+    Args:
+        url: Audio file URL
+        timeout: Per-request timeout in seconds
+        client: Optional shared httpx client
+
+    Returns:
+        AudioProbe
+    """
+    if client is None:
+        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as own_client:
+            return await probe_url(url, timeout, own_client)
+
+    source = HTTPRangeSource(client, url)
+    await source.open()
+    probe = await probe_source(source)
+    logger.info(f"Probed {url}: {probe.format} {probe.duration}s in {source.requests} request(s)")
+    return probe
@@ -0,0 +1,289 @@
+"""
+Pre-transcode audio to a compact speech format before upload to Whisper.
+
+Whisper resamples everything to 16 kHz mono, so uploading full-bitrate stereo
+masters spends most of the transcription time on the network. ffmpeg runs as a
+subprocess fed and drained through streaming pipes, with the number of
+concurrent encoders bounded, and produces low-bitrate mono MP3 or Opus.
+"""
+import asyncio
+import logging
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from app.config import settings
+from app.services.audio_chunking import SAMPLE_RATE, ffmpeg_available
+
+logger = logging.getLogger(__name__)
+
+PIPE_CHUNK_BYTES = 64 * 1024
+
+# codec -> (encoder args, container, output extension, content type)
+CODECS = {
+    "mp3": (["-c:a", "libmp3lame"], "mp3", "mp3", "audio/mpeg"),
+    "opus": (["-c:a", "libopus", "-application", "voip"], "webm", "webm", "audio/webm"),
+}
+
+# Containers ffmpeg can't read from a non-seekable pipe when the index is at the end
+_SEEKABLE_INPUT_SUFFIXES = {".m4a", ".mp4"}
+
+
+@dataclass
+class TranscodedAudio:
+    """A transcoded file positioned at offset 0. Call close() when done."""
+    file: BinaryIO
+    filename: str
+    content_type: str
+    original_bytes: int
+    transcoded_bytes: int
+    seconds: float
+
+    def close(self):
+        self.file.close()
+
+
+@dataclass
+class TranscodeReport:
+    """Per-job totals of what pre-transcoding saved."""
+    files: int = 0
+    skipped: int = 0
+    original_bytes: int = 0
+    transcoded_bytes: int = 0
+    transcode_seconds: float = 0.0
+    upload_bytes_per_second: float = 2 * 1024 * 1024
+
+    def add(self, transcoded: TranscodedAudio):
+        self.files += 1
+        self.original_bytes += transcoded.original_bytes
+        self.transcoded_bytes += transcoded.transcoded_bytes
+        self.transcode_seconds += transcoded.seconds
+
+    @property
+    def reduction_ratio(self) -> float:
+        """original / transcoded size (e.g. 8.0 for an 8x smaller upload)."""
+        return self.original_bytes / self.transcoded_bytes if self.transcoded_bytes else 0.0
+
+    @property
+    def time_saved_seconds(self) -> float:
+        """Estimated upload time saved at upload_bytes_per_second, net of encoding time."""
+        bytes_saved = self.original_bytes - self.transcoded_bytes
+        return bytes_saved / self.upload_bytes_per_second - self.transcode_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "files": self.files,
+            "skipped": self.skipped,
+            "original_bytes": self.original_bytes,
+            "transcoded_bytes": self.transcoded_bytes,
+            "reduction_ratio": round(self.reduction_ratio, 2),
+            "transcode_seconds": round(self.transcode_seconds, 3),
+            "time_saved_seconds": round(self.time_saved_seconds, 3),
+        }
+
+
+class AudioTranscoder:
+    """
+    Downmix, resample and re-encode audio with a bounded pool of ffmpeg processes.
+
+    transcode() returns None whenever the original should be uploaded as-is:
+    ffmpeg missing or failing, or the output not being smaller.
+    """
+
+    def __init__(
+        self,
+        codec: str = "mp3",
+        bitrate: str = "32k",
+        max_concurrency: int = 4,
+        spool_bytes: int = 16 * 1024 * 1024,
+        upload_bytes_per_second: float = 2 * 1024 * 1024,
+        command: Optional[List[str]] = None
+    ):
+        """
+        Args:
+            codec: "mp3" or "opus"
+            bitrate: Target bitrate passed to ffmpeg (e.g. "32k")
+            max_concurrency: ffmpeg processes allowed to run at once
+            spool_bytes: Output size above which the result spills to disk
+            upload_bytes_per_second: Assumed upload throughput for time-saved estimates
+            command: Full encoder command reading stdin and writing stdout
+                (overrides the ffmpeg command built from codec and bitrate)
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unsupported transcode codec: {codec}. Supported: {list(CODECS)}")
+        self.codec = codec
+        self.bitrate = bitrate
+        self.spool_bytes = spool_bytes
+        self.upload_bytes_per_second = upload_bytes_per_second
+        self.command = command
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._totals = TranscodeReport(upload_bytes_per_second=upload_bytes_per_second)
+        self._failures = 0
+
+    @property
+    def available(self) -> bool:
+        return self.command is not None or ffmpeg_available()
+
+    def new_report(self) -> TranscodeReport:
+        return TranscodeReport(upload_bytes_per_second=self.upload_bytes_per_second)
+
+    def _ffmpeg_command(self, input_path: str = "pipe:0") -> List[str]:
+        encoder_args, container, _, _ = CODECS[self.codec]
+        return [
+            "ffmpeg", "-v", "error", "-i", input_path, "-vn",
+            "-ac", "1", "-ar", str(SAMPLE_RATE),
+            *encoder_args, "-b:a", self.bitrate,
+            "-f", container, "pipe:1"
+        ]
+
+    async def transcode(
+        self,
+        audio_file: BinaryIO,
+        filename: str,
+        report: Optional[TranscodeReport] = None
+    ) -> Optional[TranscodedAudio]:
+        """
+        Encode audio to compact mono speech audio.
+
+        Args:
+            audio_file: Source audio (read from the start; position is restored to 0)
+            filename: Original filename (its extension picks pipe or temp-file input)
+            report: Per-job report updated with the outcome
+
+        Returns:
+            TranscodedAudio, or None to upload the original
+        """
+        if not self.available:
+            if report:
+                report.skipped += 1
+            return None
+
+        audio_file.seek(0, 2)
+        original_bytes = audio_file.tell()
+        audio_file.seek(0)
+
+        started = time.perf_counter()
+        try:
+            async with self._semaphore:
+                output = await self._encode(audio_file, Path(filename).suffix.lower())
+        except Exception as e:
+            self._failures += 1
+            if report:
+                report.skipped += 1
+            logger.warning(f"Pre-transcode of {filename} failed, uploading original: {e}")
+            return None
+        finally:
+            audio_file.seek(0)
+        seconds = time.perf_counter() - started
+
+        output.seek(0, 2)
+        transcoded_bytes = output.tell()
+        output.seek(0)
+        if transcoded_bytes == 0 or transcoded_bytes >= original_bytes:
+            output.close()
+            if report:
+                report.skipped += 1
+            return None
+
+        _, _, extension, content_type = CODECS[self.codec]
+        transcoded = TranscodedAudio(
+            file=output,
+            filename=f"{Path(filename).stem}.{extension}",
+            content_type=content_type,
+            original_bytes=original_bytes,
+            transcoded_bytes=transcoded_bytes,
+            seconds=seconds
+        )
+        self._totals.add(transcoded)
+        if report:
+            report.add(transcoded)
+        logger.info(
+            f"Pre-transcoded {filename}: {original_bytes} -> {transcoded_bytes} bytes "
+            f"({original_bytes / transcoded_bytes:.1f}x) in {seconds:.2f}s"
+        )
+        return transcoded
+
+    async def _encode(self, audio_file: BinaryIO, suffix: str) -> BinaryIO:
+        """Run the encoder, streaming the source in and the result out."""
+        if self.command is not None:
+            return await self._run(self.command, audio_file)
+        if suffix not in _SEEKABLE_INPUT_SUFFIXES:
+            return await self._run(self._ffmpeg_command(), audio_file)
+
+        # MP4/M4A may keep the moov index after the media data; give ffmpeg a seekable file
+        with tempfile.NamedTemporaryFile(suffix=suffix) as source:
+            shutil.copyfileobj(audio_file, source, 1024 * 1024)
+            source.flush()
+            return await self._run(self._ffmpeg_command(source.name), None)
+
+    async def _run(self, command: List[str], source: Optional[BinaryIO]) -> BinaryIO:
+        output = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE if source is not None else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+
+        async def feed():
+            try:
+                for chunk in iter(lambda: source.read(PIPE_CHUNK_BYTES), b""):
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                # The encoder exited early; its return code and stderr explain why
+                pass
+            finally:
+                process.stdin.close()
+
+        async def drain():
+            while True:
+                chunk = await process.stdout.read(PIPE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                output.write(chunk)
+
+        try:
+            tasks = [drain(), process.stderr.read()]
+            if source is not None:
+                tasks.append(feed())
+            results = await asyncio.gather(*tasks)
+            await process.wait()
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+            output.close()
+            raise
+
+        if process.returncode != 0:
+            output.close()
+            raise Exception(f"encoder exited with {process.returncode}: {results[1].decode(errors='replace')[:500]}")
+        return output
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "codec": self.codec,
+            "bitrate": self.bitrate,
+            "available": self.available,
+            "failures": self._failures,
+            **self._totals.to_dict()
+        }
+
+
+# Global transcoder instance - will be initialized when needed
+audio_transcoder = None
+
+def get_audio_transcoder() -> AudioTranscoder:
+    """Get or create the global AudioTranscoder instance."""
+    global audio_transcoder
+    if audio_transcoder is None:
+        audio_transcoder = AudioTranscoder(
+            codec=settings.transcription_pretranscode_codec,
+            bitrate=settings.transcription_pretranscode_bitrate,
+            max_concurrency=settings.transcription_pretranscode_concurrency,
+            upload_bytes_per_second=settings.transcription_upload_bytes_per_second
+        )
+    return audio_transcoder
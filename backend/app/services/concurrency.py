@@ -0,0 +1,441 @@
+"""
+Adaptive (AIMD) concurrency limiting for outbound LLM calls.
+One limiter is shared per process; with Redis it also coordinates across workers.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Take a lease if the cluster is below the shared limit and not cooling down.
+# KEYS: leases zset, limit key, cooldown key
+# ARGV: now, token, lease expiry, default limit
+_ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local cooldown = tonumber(redis.call('GET', KEYS[3]) or '0')
+local limit = tonumber(redis.call('GET', KEYS[2]) or ARGV[4])
+if cooldown > tonumber(ARGV[1]) then
+  return {0, tostring(limit), tostring(cooldown)}
+end
+if redis.call('ZCARD', KEYS[1]) < math.floor(limit) then
+  redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2])
+  return {1, tostring(limit), '0'}
+end
+return {0, tostring(limit), '0'}
+"""
+
+# Apply an AIMD step to the shared limit. Decreases are rate-limited so a burst
+# of 429s seen by many workers only halves the limit once.
+# KEYS: limit key, last-decrease key
+# ARGV: op ('inc' | 'dec'), amount, min, max, default limit, now, decrease interval
+_ADJUST_SCRIPT = """
+local limit = tonumber(redis.call('GET', KEYS[1]) or ARGV[5])
+if ARGV[1] == 'inc' then
+  limit = math.min(tonumber(ARGV[4]), limit + tonumber(ARGV[2]))
+else
+  local last = tonumber(redis.call('GET', KEYS[2]) or '0')
+  if tonumber(ARGV[6]) - last < tonumber(ARGV[7]) then
+    return tostring(limit)
+  end
+  limit = math.max(tonumber(ARGV[3]), limit * tonumber(ARGV[2]))
+  redis.call('SET', KEYS[2], ARGV[6])
+end
+redis.call('SET', KEYS[1], tostring(limit))
+return tostring(limit)
+"""
+
+# Extend the shared cooldown (never shorten it).
+# KEYS: cooldown key; ARGV: cooldown-until timestamp, cooldown seconds
+_COOLDOWN_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tonumber(ARGV[1]) > current then
+  redis.call('SET', KEYS[1], ARGV[1], 'PX', math.ceil(tonumber(ARGV[2]) * 1000))
+end
+return 1
+"""
+
+
+def parse_retry_after(value: Optional[str], max_seconds: float = 300.0) -> Optional[float]:
+    """
+    Parse a Retry-After header (delta-seconds or HTTP-date).
+
+    Args:
+        value: Raw header value
+        max_seconds: Upper bound applied to the parsed delay
+
+    Returns:
+        Delay in seconds, or None if the header is missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return max(0.0, min(seconds, max_seconds))
+
+
+def is_throttle_error(error: Optional[BaseException]) -> bool:
+    """True for upstream 429 / 5xx errors (exceptions carrying a `status` attribute)."""
+    status = getattr(error, "status", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limiter with an optional Redis-coordinated global limit.
+
+    Features:
+    - Additive increase: the limit grows by ~1 for every `limit` successful calls
+    - Multiplicative decrease on 429/5xx (at most once per decrease_interval)
+    - Retry-After honoured as a cooldown during which no new calls start
+    - FIFO queueing of callers waiting for a slot
+    - Optional Redis tier: a lease ZSET enforces the limit across processes and
+      the limit/cooldown are shared, so every worker backs off together
+    - Stats: current limit, in-flight calls, queue depth and wait times
+
+    Usage:
+        async with limiter.slot():
+            await call_upstream()
+    """
+
+    # How long to stop talking to Redis after a connection error
+    REDIS_RETRY_AFTER_SECONDS = 30.0
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        decrease_factor: float = 0.5,
+        decrease_interval: float = 2.0,
+        redis_url: Optional[str] = None,
+        lease_seconds: float = 180.0,
+        redis_poll_interval: float = 0.05
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.initial_limit = max(min_limit, min(initial_limit, max_limit))
+        self.decrease_factor = decrease_factor
+        self.decrease_interval = decrease_interval
+        self.redis_url = redis_url
+        self.lease_seconds = lease_seconds
+        self.redis_poll_interval = redis_poll_interval
+
+        self._limit = float(self.initial_limit)
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._blocked_until = 0.0       # time.monotonic() deadline of the Retry-After cooldown
+        self._wake_handle: Optional[asyncio.TimerHandle] = None
+        self._last_decrease = 0.0
+
+        self._redis = None
+        self._redis_loop = None
+        self._redis_disabled_until = 0.0
+        self._redis_waiting = 0
+
+        self._wait_times: Deque[float] = deque(maxlen=500)
+        self._stats = {
+            "acquired": 0,
+            "successes": 0,
+            "throttled": 0,
+            "decreases": 0,
+            "cooldowns": 0,
+            "redis_errors": 0
+        }
+
+    # ---- local gate ----
+
+    @property
+    def limit(self) -> int:
+        """Current effective concurrency limit."""
+        return max(self.min_limit, int(self._limit))
+
+    def has_headroom(self) -> bool:
+        """True if a call could start right now without queueing."""
+        return (
+            not self._waiters
+            and self._in_flight < self.limit
+            and self._blocked_until <= time.monotonic()
+        )
+
+    def _check_loop(self):
+        """Drop waiters bound to a previous event loop (e.g. between Celery tasks)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._waiters.clear()
+            self._wake_handle = None
+            self._in_flight = 0
+
+    def _wake(self):
+        """Grant free slots to queued callers, unless a cooldown is active."""
+        if self._wake_handle is not None:
+            self._wake_handle.cancel()
+            self._wake_handle = None
+        cooldown = self._blocked_until - time.monotonic()
+        if cooldown > 0:
+            if self._waiters and self._loop is not None:
+                self._wake_handle = self._loop.call_later(cooldown, self._wake)
+            return
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(True)
+
+    async def _acquire_local(self):
+        self._check_loop()
+        in_cooldown = self._blocked_until > time.monotonic()
+        if not in_cooldown and not self._waiters and self._in_flight < self.limit:
+            self._in_flight += 1
+            return
+
+        waiter = self._loop.create_future()
+        self._waiters.append(waiter)
+        if in_cooldown and self._wake_handle is None:
+            self._wake()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Slot was granted just as we were cancelled - hand it on
+                self._release_local()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def _release_local(self):
+        self._in_flight = max(0, self._in_flight - 1)
+        self._wake()
+
+    # ---- Redis tier ----
+
+    def _key(self, suffix: str) -> str:
+        return f"omvee:limiter:{self.name}:{suffix}"
+
+    def _get_redis(self):
+        """Return a Redis client for the running loop, or None if the tier is unavailable."""
+        if not self.redis_url or time.monotonic() < self._redis_disabled_until:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._redis_loop is not loop:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(self.redis_url, socket_connect_timeout=1.0, socket_timeout=2.0)
+            self._redis_loop = loop
+        return self._redis
+
+    def _on_redis_error(self, error: Exception):
+        self._stats["redis_errors"] += 1
+        self._redis_disabled_until = time.monotonic() + self.REDIS_RETRY_AFTER_SECONDS
+        logger.warning(f"[limiter:{self.name}] Redis coordination unavailable, limiting per process: {error}")
+
+    async def _acquire_distributed(self) -> Optional[str]:
+        """Wait for a cluster-wide lease. Returns its token, or None without Redis."""
+        token = uuid.uuid4().hex
+        self._redis_waiting += 1
+        try:
+            while True:
+                client = self._get_redis()
+                if client is None:
+                    return None
+                now = time.time()
+                try:
+                    acquired, shared_limit, cooldown_until = await client.eval(
+                        _ACQUIRE_SCRIPT, 3,
+                        self._key("leases"), self._key("limit"), self._key("cooldown"),
+                        now, token, now + self.lease_seconds, self.initial_limit
+                    )
+                except Exception as e:
+                    self._on_redis_error(e)
+                    return None
+
+                self._limit = float(shared_limit)
+                if int(acquired) == 1:
+                    return token
+
+                delay = max(float(cooldown_until) - now, self.redis_poll_interval)
+                await asyncio.sleep(min(delay, 1.0))
+        finally:
+            self._redis_waiting -= 1
+
+    async def _release_distributed(self, token: Optional[str]):
+        if token is None:
+            return
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.zrem(self._key("leases"), token)
+        except Exception as e:
+            self._on_redis_error(e)
+
+    async def _adjust_distributed(self, op: str, amount: float) -> bool:
+        """Apply an AIMD step to the shared limit. Returns False if Redis is unavailable."""
+        client = self._get_redis()
+        if client is None:
+            return False
+        try:
+            shared_limit = await client.eval(
+                _ADJUST_SCRIPT, 2,
+                self._key("limit"), self._key("last_decrease"),
+                op, amount, self.min_limit, self.max_limit, self.initial_limit,
+                time.time(), self.decrease_interval
+            )
+            self._limit = float(shared_limit)
+            return True
+        except Exception as e:
+            self._on_redis_error(e)
+            return False
+
+    async def _set_distributed_cooldown(self, seconds: float):
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.eval(_COOLDOWN_SCRIPT, 1, self._key("cooldown"), time.time() + seconds, seconds)
+        except Exception as e:
+            self._on_redis_error(e)
+
+    # ---- public API ----
+
+    async def acquire(self) -> Optional[str]:
+        """
+        Wait for a free slot.
+
+        Returns:
+            Lease token to pass to release() (None when only the local gate applies)
+        """
+        started = time.monotonic()
+        await self._acquire_local()
+        try:
+            token = await self._acquire_distributed()
+        except BaseException:
+            self._release_local()
+            raise
+        self._wait_times.append(time.monotonic() - started)
+        self._stats["acquired"] += 1
+        return token
+
+    async def release(self, token: Optional[str], error: Optional[BaseException] = None):
+        """
+        Release a slot and feed the call outcome into the AIMD controller.
+
+        Args:
+            token: Value returned by acquire()
+            error: Exception raised by the call, if any. Errors with `status`
+                429/5xx shrink the limit; a `retry_after` attribute starts a cooldown.
+        """
+        self._release_local()
+        await self._release_distributed(token)
+
+        if error is None:
+            self._stats["successes"] += 1
+            await self._increase()
+        elif is_throttle_error(error):
+            self._stats["throttled"] += 1
+            await self._decrease()
+            retry_after = getattr(error, "retry_after", None)
+            if retry_after:
+                await self.cooldown(retry_after)
+
+    async def _increase(self):
+        step = 1.0 / max(self._limit, 1.0)
+        if not await self._adjust_distributed("inc", step):
+            self._limit = min(float(self.max_limit), self._limit + step)
+        self._wake()
+
+    async def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < self.decrease_interval:
+            return
+        self._last_decrease = now
+        self._stats["decreases"] += 1
+        previous = self.limit
+        if not await self._adjust_distributed("dec", self.decrease_factor):
+            self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+        logger.warning(f"[limiter:{self.name}] Upstream throttling, limit {previous} -> {self.limit}")
+
+    async def cooldown(self, seconds: float):
+        """Stop starting new calls for `seconds` (e.g. from a Retry-After header)."""
+        self._stats["cooldowns"] += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        await self._set_distributed_cooldown(seconds)
+        print(f"⏸️ [{self.name}] Upstream asked to retry after {seconds:.1f}s, pausing new calls")
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold a slot for the duration of the block, reporting its outcome on exit."""
+        token = await self.acquire()
+        try:
+            yield
+        except Exception as e:
+            await self.release(token, e)
+            raise
+        except BaseException:
+            # Cancellation / generator close says nothing about upstream health
+            self._release_local()
+            await asyncio.shield(self._release_distributed(token))
+            raise
+        else:
+            await self.release(token)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the current limit, load and wait-time statistics."""
+        waits = sorted(self._wait_times)
+        return {
+            "name": self.name,
+            "limit": self.limit,
+            "limit_raw": round(self._limit, 3),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self._in_flight,
+            "queue_depth": len(self._waiters) + self._redis_waiting,
+            "cooldown_remaining": round(max(0.0, self._blocked_until - time.monotonic()), 3),
+            "wait_ms_avg": round(1000 * sum(waits) / len(waits), 2) if waits else 0.0,
+            "wait_ms_p95": round(1000 * waits[int(0.95 * (len(waits) - 1))], 2) if waits else 0.0,
+            "wait_ms_max": round(1000 * waits[-1], 2) if waits else 0.0,
+            **self._stats,
+            "redis_enabled": bool(self.redis_url) and time.monotonic() >= self._redis_disabled_until
+        }
+
+
+# Global limiter for LLM calls - shared by every OpenRouterService in the process
+llm_limiter = None
+
+def get_llm_limiter() -> AdaptiveConcurrencyLimiter:
+    """Get or create the process-wide LLM concurrency limiter."""
+    global llm_limiter
+    if llm_limiter is None:
+        llm_limiter = AdaptiveConcurrencyLimiter(
+            name="llm",
+            initial_limit=settings.llm_concurrency_initial,
+            min_limit=settings.llm_concurrency_min,
+            max_limit=settings.llm_concurrency_max,
+            redis_url=settings.redis_url if settings.llm_concurrency_redis_enabled else None,
+            lease_seconds=settings.llm_concurrency_lease_seconds
+        )
+    return llm_limiter
@@ -0,0 +1,170 @@
+"""
+Pooled HTTP session shared by outbound API clients.
+Keeps TCP/TLS connections alive between calls and exposes pool statistics.
+"""
+import asyncio
+import logging
+from typing import Optional, Dict, Any
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class PooledHTTPSession:
+    """
+    Long-lived aiohttp session with a bounded, keep-alive connection pool.
+
+    Features:
+    - One session per process instead of one per request
+    - Per-host connection limits and configurable timeouts
+    - Connection reuse tracking via aiohttp trace hooks
+
+    The session is bound to the event loop that created it. If it is used from
+    a different loop (for example a Celery task driven by asyncio.run), a fresh
+    session is opened on that loop.
+    """
+
+    def __init__(
+        self,
+        name: str = "http",
+        limit: int = 100,
+        limit_per_host: int = 32,
+        keepalive_timeout: float = 30.0,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 120.0,
+        total_timeout: Optional[float] = None,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        self.name = name
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.headers = headers or {}
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Pool statistics
+        self._requests = 0
+        self._connections_created = 0
+        self._connections_reused = 0
+
+    async def _on_request_start(self, session, context, params):
+        self._requests += 1
+
+    async def _on_connection_create_end(self, session, context, params):
+        self._connections_created += 1
+
+    async def _on_connection_reuseconn(self, session, context, params):
+        self._connections_reused += 1
+
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        return trace_config
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the pooled session, creating it on first use.
+
+        Returns:
+            Open aiohttp.ClientSession bound to the running event loop
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed:
+            if self._loop is loop:
+                return self._session
+            # The owning loop is gone or different - its transports cannot be reused here
+            logger.warning(f"[{self.name}] session used from a new event loop, opening a new pool")
+            self._discard_session()
+
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.total_timeout,
+            connect=self.connect_timeout,
+            sock_read=self.read_timeout
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers=self.headers,
+            trace_configs=[self._build_trace_config()]
+        )
+        self._loop = loop
+        logger.info(f"[{self.name}] opened pooled session (limit={self.limit}, per_host={self.limit_per_host})")
+        return self._session
+
+    def _discard_session(self):
+        """Drop a session owned by another event loop and close its connections."""
+        session, old_loop = self._session, self._loop
+        connector = session.connector
+        # Marks the session closed without touching the connector from this loop
+        session.detach()
+        self._session = None
+        self._loop = None
+        if connector is None:
+            return
+
+        if old_loop is not None and old_loop.is_running():
+            # Its transports belong to that loop, so close them there
+            old_loop.call_soon_threadsafe(connector.close)
+            return
+        try:
+            connector.close()
+        except RuntimeError as e:
+            # The loop is already closed and took its sockets with it
+            logger.debug(f"[{self.name}] connections of the old pool already closed: {e}")
+
+    async def start(self):
+        """Open the pool eagerly (e.g. from the app lifespan)."""
+        await self.get_session()
+
+    async def close(self):
+        """Close the pool and release all connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info(f"[{self.name}] closed pooled session")
+        self._session = None
+        self._loop = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Report connection pool statistics.
+
+        Returns:
+            Dictionary with active/idle connections and reuse ratio
+        """
+        active_connections = 0
+        idle_connections = 0
+        is_open = self._session is not None and not self._session.closed
+        if is_open:
+            connector = self._session.connector
+            active_connections = len(getattr(connector, "_acquired", ()))
+            idle_connections = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+
+        total_connections = self._connections_created + self._connections_reused
+        reuse_ratio = self._connections_reused / total_connections if total_connections else 0.0
+
+        return {
+            "name": self.name,
+            "open": is_open,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "active_connections": active_connections,
+            "idle_connections": idle_connections,
+            "requests": self._requests,
+            "connections_created": self._connections_created,
+            "connections_reused": self._connections_reused,
+            "reuse_ratio": round(reuse_ratio, 4)
+        }
@@ -0,0 +1,263 @@
+"""
+Batch image generation for a project's scenes.
+
+A job generates one image per scene whose visual prompt is complete, with at
+most `concurrency` predictions running at once. Each image is written to
+generated_images the moment it lands and the job's payload carries every
+scene's status, so a client can render progress per scene and a re-run
+only picks up the scenes that still have no completed image. Saved images
+are copied into storage in the background (see media_rehost), off the
+job's critical path.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+from uuid import UUID
+
+from app.config import settings
+from app.models_pydantic import VisualPrompt
+
+logger = logging.getLogger(__name__)
+
+
+def pending_scenes(scenes: List[Dict[str, Any]], images: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Scenes with a completed visual prompt and no completed image yet, in scene order."""
+    done = {image.get('scene_id') for image in images if image.get('status') == 'completed'}
+    return [
+        scene for scene in scenes
+        if scene.get('prompt_status') == 'completed'
+        and scene.get('visual_prompt_data')
+        and scene.get('id') not in done
+    ]
+
+
+class ImageBatchService:
+    """
+    Runs image generation jobs stored in the jobs table.
+
+    Progress is published as payload_json:
+        {'stage', 'total', 'completed', 'failed', 'skipped',
+         'scenes': {<selected_scenes.id>: {'scene_id', 'status', 'prediction_id', 'image_id', 'error'}}}
+    where a scene's status moves pending -> generating -> completed | failed
+    (scenes that already had an image are 'skipped').
+    """
+
+    def __init__(self, db=None, image_service=None, concurrency: Optional[int] = None, rehost=None):
+        """
+        Args:
+            db: Object with get_project, get_project_scenes, get_project_images,
+                get_project_jobs, create_image and update_job (defaults to supabase_service)
+            image_service: ImageGenerationService (created on first use)
+            concurrency: Scenes generating at once per job
+            rehost: MediaRehostService that copies each saved image into storage
+                in the background (the shared one if rehosting is enabled)
+        """
+        self._db = db
+        self._image_service = image_service
+        self._rehost = rehost
+        self.concurrency = concurrency or settings.image_generation_concurrency
+        # Projects with a job claimed or running in this process
+        self._running: Set[str] = set()
+
+    @property
+    def db(self):
+        if self._db is None:
+            from app.services.supabase import supabase_service
+            self._db = supabase_service
+        return self._db
+
+    @property
+    def image_service(self):
+        if self._image_service is None:
+            from app.services.image_generation import ImageGenerationService
+            self._image_service = ImageGenerationService()
+        return self._image_service
+
+    @property
+    def rehost(self):
+        if self._rehost is None and settings.rehost_enabled:
+            from app.services.media_rehost import get_media_rehost_service
+            self._rehost = get_media_rehost_service()
+        return self._rehost
+
+    def is_running(self, project_id: str) -> bool:
+        return str(project_id) in self._running
+
+    def active_jobs(self, project_id: str) -> List[Dict[str, Any]]:
+        """The project's pending or running image generation jobs (from any process)."""
+        return [
+            job for job in self.db.get_project_jobs(UUID(str(project_id)))
+            if job.get('type') == 'generate_images' and job.get('status') in ('pending', 'running')
+        ]
+
+    def claim(self, project_id: str) -> bool:
+        """
+        Reserve the project for a new job before it is scheduled.
+
+        There is no await between the checks and the reservation, so two
+        requests in this process can't both claim it; the jobs table catches
+        a job started by another worker. A claim is released when run()
+        finishes, or by release() if the job never gets scheduled.
+
+        Returns:
+            False if a job is already running or queued for the project
+        """
+        project_id = str(project_id)
+        if project_id in self._running or self.active_jobs(project_id):
+            return False
+        self._running.add(project_id)
+        return True
+
+    def release(self, project_id: str):
+        self._running.discard(str(project_id))
+
+    def plan(self, project_id: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Split the project's prompted scenes into those to generate and those already done."""
+        scenes = [
+            scene for scene in self.db.get_project_scenes(UUID(str(project_id)))
+            if scene.get('prompt_status') == 'completed' and scene.get('visual_prompt_data')
+        ]
+        pending = pending_scenes(scenes, self.db.get_project_images(UUID(str(project_id))))
+        pending_ids = {scene['id'] for scene in pending}
+        return {
+            'pending': pending,
+            'done': [scene for scene in scenes if scene['id'] not in pending_ids]
+        }
+
+    async def run(self, project_id: str, job_id: str) -> Dict[str, Any]:
+        """
+        Generate images for every pending scene of a project and record progress on the job.
+
+        Returns:
+            The final progress payload
+        """
+        project_id = str(project_id)
+        # Already claimed when started through the endpoint
+        self._running.add(project_id)
+        try:
+            return await self._run(project_id, job_id)
+        finally:
+            self.release(project_id)
+
+    async def _run(self, project_id: str, job_id: str) -> Dict[str, Any]:
+        progress: Dict[str, Any] = {
+            'project_id': project_id,
+            'stage': 'initializing',
+            'total': 0,
+            'completed': 0,
+            'failed': 0,
+            'skipped': 0,
+            'scenes': {}
+        }
+
+        try:
+            project = self.db.get_project(UUID(project_id)) or {}
+            plan = self.plan(project_id)
+        except Exception as e:
+            self.db.update_job(job_id, {
+                'status': 'failed',
+                'error': f"Image generation failed: {e}",
+                'payload_json': {**progress, 'stage': 'failed'}
+            })
+            raise
+
+        # Same reference for every scene keeps the artist consistent across the video
+        reference_urls = list((project.get('selected_reference_images') or {}).values())
+        reference_image_url = reference_urls[0] if reference_urls else None
+
+        for scene in plan['done']:
+            progress['scenes'][scene['id']] = {'scene_id': scene.get('scene_id'), 'status': 'skipped'}
+        for scene in plan['pending']:
+            progress['scenes'][scene['id']] = {'scene_id': scene.get('scene_id'), 'status': 'pending'}
+        progress['skipped'] = len(plan['done'])
+        progress['total'] = len(plan['pending'])
+        progress['stage'] = 'generating_images'
+
+        def publish(**extra):
+            finished = progress['completed'] + progress['failed']
+            updates = {
+                'progress': int(100 * finished / progress['total']) if progress['total'] else 100,
+                'payload_json': progress,
+                **extra
+            }
+            try:
+                self.db.update_job(job_id, updates)
+            except Exception as e:
+                # A missed progress write isn't worth failing the batch over
+                logger.warning(f"Failed to update image job {job_id}: {e}")
+
+        self.db.update_job(job_id, {'status': 'running', 'progress': 0, 'payload_json': progress})
+        print(f"🖼️ [images] job {job_id}: {progress['total']} scene(s) to generate, {progress['skipped']} already done")
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def generate(scene: Dict[str, Any]):
+            entry = progress['scenes'][scene['id']]
+            async with semaphore:
+                entry['status'] = 'generating'
+                publish()
+
+                def on_prediction(prediction):
+                    entry['prediction_id'] = prediction.id
+                    publish()
+
+                try:
+                    prompt_data = dict(scene['visual_prompt_data'])
+                    prompt_data.setdefault('scene_id', scene.get('scene_id'))
+                    result = await self.image_service.generate_image_from_prompt(
+                        visual_prompt=VisualPrompt(**prompt_data),
+                        reference_image_url=reference_image_url,
+                        tracking={'project_id': project_id, 'job_id': job_id},
+                        on_prediction=on_prediction
+                    )
+                    metadata = result.get('generation_metadata', {})
+                    image = self.db.create_image({
+                        'project_id': project_id,
+                        'scene_id': scene['id'],
+                        'image_url': result['image_urls'][0],
+                        'replicate_prediction_id': metadata.get('prediction_id'),
+                        'status': 'completed',
+                        'generation_metadata': metadata
+                    })
+                except Exception as e:
+                    entry['status'] = 'failed'
+                    entry['error'] = str(e)
+                    progress['failed'] += 1
+                    logger.error(f"Image generation failed for scene {scene['id']}: {e}")
+                else:
+                    entry['status'] = 'completed'
+                    entry['image_id'] = (image or {}).get('id')
+                    progress['completed'] += 1
+                    # The row already works with the Replicate URL; the stored copy replaces it later
+                    if image and self.rehost is not None:
+                        self.rehost.rehost_image_in_background(image)
+                publish()
+
+        await asyncio.gather(*[generate(scene) for scene in plan['pending']])
+
+        failed = progress['failed']
+        progress['stage'] = 'completed' if not failed else 'completed_with_errors'
+        publish(
+            status='completed' if not failed else 'failed',
+            error=f"{failed} of {progress['total']} scene(s) failed; re-run to retry them" if failed else None,
+            result_json={
+                'images_generated': progress['completed'],
+                'images_failed': failed,
+                'scenes_skipped': progress['skipped'],
+                'completion_time': str(datetime.now())
+            }
+        )
+        print(f"✅ [images] job {job_id}: {progress['completed']} generated, {failed} failed, {progress['skipped']} skipped")
+        return progress
+
+
+# Global image batch service instance - will be initialized when needed
+image_batch_service = None
+
+def get_image_batch_service() -> ImageBatchService:
+    """Get or create the global ImageBatchService instance."""
+    global image_batch_service
+    if image_batch_service is None:
+        image_batch_service = ImageBatchService()
+    return image_batch_service
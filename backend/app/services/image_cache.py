@@ -0,0 +1,172 @@
+"""
+Content-addressed cache of image generation results.
+
+Re-running a project (or retrying a request) asks for the same prompt,
+reference and parameters again; a hit returns the earlier image and its
+metadata instead of paying for another multi-second Replicate prediction.
+Results are kept in a ResponseCache namespace (in-process LRU plus the
+shared Redis tier), so they expire by TTL and the oldest are evicted first;
+once the rehost stage has copied an image into storage, its entry switches
+to the stored URL and a longer TTL.
+"""
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.models_pydantic import VisualPrompt
+from app.services.http_pool import PooledHTTPSession
+from app.services.response_cache import LRUCache, ResponseCache
+
+logger = logging.getLogger(__name__)
+
+
+class ImageResultCache:
+    """
+    Image generation results keyed by everything that determines the image.
+
+    The key covers the model version, prompt, negative prompt, the reference
+    image's content hash, seed, aspect ratio and any other model parameters.
+    Reference images are hashed by content (streamed, once per URL per
+    hour), so re-uploading a different photo under the same URL is a miss.
+    """
+
+    # How long a reference URL's content hash is trusted
+    REFERENCE_HASH_TTL_SECONDS = 3600.0
+
+    def __init__(self, response_cache: ResponseCache = None, http_pool: PooledHTTPSession = None):
+        """
+        Args:
+            response_cache: Backing cache (defaults to the "images" namespace
+                configured by the image_cache_* settings)
+            http_pool: Session for fetching reference images (a private one is
+                created if omitted)
+        """
+        self.response_cache = response_cache or ResponseCache(
+            namespace="images",
+            lru_size=settings.image_cache_lru_size,
+            ttl_seconds=settings.image_cache_ttl_seconds,
+            redis_url=settings.redis_url if settings.image_cache_redis_enabled else None,
+            redis_max_entries=settings.image_cache_redis_max_entries
+        )
+        self.http_pool = http_pool or PooledHTTPSession(name="reference-images", limit=16, limit_per_host=8, read_timeout=30.0)
+        self._reference_hashes = LRUCache(max_entries=256, ttl_seconds=self.REFERENCE_HASH_TTL_SECONDS)
+
+    async def reference_hash(self, url: str) -> str:
+        """SHA-256 of the reference image's bytes (of its URL if it can't be fetched)."""
+        found, digest = self._reference_hashes.get(url)
+        if found:
+            return digest
+
+        try:
+            session = await self.http_pool.get_session()
+            sha = hashlib.sha256()
+            async with session.get(url) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+        except Exception as e:
+            # Still cacheable, just not protected against the URL's content changing
+            logger.warning(f"Could not hash reference image {url}, keying by URL: {e}")
+            return "url:" + hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+        self._reference_hashes.set(url, digest)
+        return digest
+
+    async def make_key(
+        self,
+        model: str,
+        visual_prompt: VisualPrompt,
+        params: Dict[str, Any],
+        reference_image_url: Optional[str] = None
+    ) -> str:
+        """
+        Build the cache key for one generation.
+
+        Args:
+            model: Replicate model including its version
+            visual_prompt: Prompt being rendered
+            params: Model input as sent to Replicate
+            reference_image_url: Subject reference, if any
+        """
+        other_params = {
+            k: v for k, v in params.items()
+            if k not in ("prompt", "negative_prompt", "subject_reference", "seed", "aspect_ratio")
+        }
+        return ResponseCache.make_key(
+            model,
+            params.get("prompt", visual_prompt.image_prompt),
+            params.get("negative_prompt", visual_prompt.negative_prompt),
+            await self.reference_hash(reference_image_url) if reference_image_url else None,
+            params.get("seed"),
+            params.get("aspect_ratio"),
+            other_params
+        )
+
+    async def get_or_generate(
+        self,
+        key: str,
+        generate: Callable[[], Awaitable[Dict[str, Any]]],
+        force_new: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Return the cached result for key, or generate (and store) it.
+
+        Concurrent misses for one key share a single generation.
+
+        Args:
+            key: From make_key()
+            generate: Coroutine factory running the prediction
+            force_new: Always generate a new variation; it replaces the cached result
+
+        Returns:
+            Generation result; generation_metadata.cache_hit says whether it was reused
+        """
+        generated = False
+
+        async def _generate():
+            nonlocal generated
+            generated = True
+            return await generate()
+
+        result = await self.response_cache.get_or_compute(key, _generate, bypass=force_new)
+        metadata = {**result.get("generation_metadata", {}), "cache_hit": not generated, "cache_key": key}
+        return {**result, "generation_metadata": metadata}
+
+    async def store_rehosted(self, key: str, image_urls: List[str]) -> bool:
+        """
+        Point a cached result at our stored copies of its images.
+
+        Delivery URLs expire within the hour; rehosted ones don't, so the
+        entry is kept for image_cache_rehosted_ttl_seconds from here on.
+
+        Returns:
+            True if the entry was still cached and has been updated
+        """
+        found, stored = await self.response_cache.get(key)
+        if not found:
+            return False
+        stored = {**stored, "image_urls": image_urls}
+        await self.response_cache.set(key, stored, ttl_seconds=settings.image_cache_rehosted_ttl_seconds)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.response_cache.get_stats(),
+            "reference_hashes": len(self._reference_hashes)
+        }
+
+    async def close(self):
+        await self.http_pool.close()
+
+
+# Global image result cache instance - shared by every ImageGenerationService, created on first use
+image_result_cache = None
+
+def get_image_result_cache() -> ImageResultCache:
+    """Get or create the global ImageResultCache instance."""
+    global image_result_cache
+    if image_result_cache is None:
+        image_result_cache = ImageResultCache()
+    return image_result_cache
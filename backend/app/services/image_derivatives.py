@@ -0,0 +1,223 @@
+"""
+Derivative images for fast scene grids.
+
+Once a generated image is in storage, it is resized to 256 px and 768 px
+(long edge) WebP and AVIF variants and summarised as a blurhash placeholder.
+Decoding and encoding are CPU-bound, so they run in a process pool; the
+variants are stored next to the original (<sha>_256.webp, ...) and their
+URLs recorded on the generated_images row.
+"""
+import asyncio
+import logging
+import math
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+from app.config import settings
+from app.services.storage import encode_image, open_rgb_image
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_SIZES = (256, 768)
+# Extension -> (Pillow format, content type, quality)
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", "image/webp", 80),
+    "avif": ("AVIF", "image/avif", 60)
+}
+# Horizontal x vertical components; 4x3 suits 16:9 frames
+BLURHASH_COMPONENTS = (4, 3)
+
+BASE83_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+
+def _base83(value: int, length: int) -> str:
+    return "".join(BASE83_CHARS[(value // 83 ** (length - i)) % 83] for i in range(1, length + 1))
+
+
+def _srgb_to_linear(channel: np.ndarray) -> np.ndarray:
+    v = channel / 255.0
+    return np.where(v <= 0.04045, v / 12.92, ((v + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value: float) -> int:
+    v = min(max(value, 0.0), 1.0)
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def blurhash_encode(rgb: np.ndarray, x_components: int = 4, y_components: int = 3) -> str:
+    """
+    Encode an RGB image (H x W x 3, uint8) as a blurhash string.
+
+    Follows the reference encoder: a DCT-like basis over linear RGB, the DC
+    term as sRGB and AC terms quantised against their maximum.
+    """
+    height, width = rgb.shape[:2]
+    linear = _srgb_to_linear(rgb.astype(np.float64))
+    xs = np.arange(width)
+    ys = np.arange(height)
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            basis = np.outer(np.cos(math.pi * j * ys / height), np.cos(math.pi * i * xs / width))
+            normalisation = 1.0 if i == 0 and j == 0 else 2.0
+            factors.append(normalisation * np.einsum("hw,hwc->c", basis, linear) / (width * height))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(float(np.max(np.abs(f))) for f in ac)
+        quantised_max = int(max(0, min(82, math.floor(actual_max * 166 - 0.5))))
+        maximum = (quantised_max + 1) / 166
+    else:
+        quantised_max, maximum = 0, 1.0
+    result += _base83(quantised_max, 1)
+
+    r, g, b = (_linear_to_srgb(float(c)) for c in dc)
+    result += _base83((r << 16) + (g << 8) + b, 4)
+
+    for factor in ac:
+        r, g, b = (
+            int(max(0, min(18, math.floor(math.copysign(abs(c / maximum) ** 0.5, c) * 9 + 9.5))))
+            for c in factor
+        )
+        result += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return result
+
+
+def render_derivatives(image_content: bytes) -> Dict[str, Any]:
+    """
+    Build every variant and the blurhash for one image (runs in a worker process).
+
+    Returns:
+        {"variants": {"256.webp": bytes, ...}, "blurhash": str, "width": int, "height": int}
+    """
+    image = open_rgb_image(image_content)
+    variants = {}
+    for size in DERIVATIVE_SIZES:
+        for ext, (pil_format, _, quality) in DERIVATIVE_FORMATS.items():
+            variants[f"{size}.{ext}"] = encode_image(image, max_size=(size, size), format=pil_format, quality=quality)
+
+    # The hash only carries a few components, so a tiny thumbnail is plenty
+    small = image.copy()
+    small.thumbnail((32, 32), Image.Resampling.BILINEAR)
+    return {
+        "variants": variants,
+        "blurhash": blurhash_encode(np.asarray(small), *BLURHASH_COMPONENTS),
+        "width": image.size[0],
+        "height": image.size[1]
+    }
+
+
+class ImageDerivativesService:
+    """
+    Creates and stores derivatives for rehosted images.
+
+    Called by the rehost stage after an image lands in storage; failures are
+    logged and leave the row with its full-size image only.
+    """
+
+    def __init__(self, db=None, storage=None, executor: Optional[Executor] = None, workers: int = 1):
+        """
+        Args:
+            db: Object with update_image (defaults to supabase_service)
+            storage: MediaRehostService used to download the original and
+                upload the variants (defaults to the shared one)
+            executor: Executor to render in instead of a new process pool
+            workers: Worker processes in the default pool
+        """
+        self._db = db
+        self._storage = storage
+        self._executor = executor
+        self.workers = workers
+        self._stats = {"images": 0, "failed": 0, "bytes_original": 0, "bytes_derivatives": 0}
+
+    @property
+    def db(self):
+        if self._db is None:
+            from app.services.supabase import supabase_service
+            self._db = supabase_service
+        return self._db
+
+    @property
+    def storage(self):
+        if self._storage is None:
+            from app.services.media_rehost import get_media_rehost_service
+            self._storage = get_media_rehost_service()
+        return self._storage
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # spawn: forked children would inherit the event loop and open sockets
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def create_for_image(self, image_id: str, url: str, storage_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Render, store and record the derivatives of one stored image.
+
+        Args:
+            image_id: generated_images row to update
+            url: Public URL of the stored original
+            storage_path: Its path in the bucket; variants go next to it
+
+        Returns:
+            The row update ({"derivatives", "blurhash"}), or None if it failed
+        """
+        try:
+            content = await self.storage.download(url)
+            loop = asyncio.get_running_loop()
+            rendered = await loop.run_in_executor(self.executor, render_derivatives, content)
+
+            base = storage_path.rsplit(".", 1)[0]
+            uploads = {}
+            for name, data in rendered["variants"].items():
+                size, ext = name.split(".")
+                uploads[(size, ext)] = self.storage.upload(f"{base}_{size}.{ext}", data, DERIVATIVE_FORMATS[ext][1])
+            urls = dict(zip(uploads, await asyncio.gather(*uploads.values())))
+
+            derivatives: Dict[str, Dict[str, str]] = {}
+            for (size, ext), variant_url in urls.items():
+                derivatives.setdefault(size, {})[ext] = variant_url
+
+            update = {"derivatives": derivatives, "blurhash": rendered["blurhash"]}
+            self.db.update_image(image_id, update)
+        except Exception as e:
+            self._stats["failed"] += 1
+            logger.warning(f"Creating derivatives for image {image_id} failed: {e}")
+            return None
+
+        self._stats["images"] += 1
+        self._stats["bytes_original"] += len(content)
+        self._stats["bytes_derivatives"] += sum(len(data) for data in rendered["variants"].values())
+        return update
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self._stats)
+
+    async def close(self):
+        """Shut down the worker pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global image derivatives service instance - will be initialized when needed
+image_derivatives_service = None
+
+def get_image_derivatives_service() -> ImageDerivativesService:
+    """Get or create the global ImageDerivativesService instance."""
+    global image_derivatives_service
+    if image_derivatives_service is None:
+        image_derivatives_service = ImageDerivativesService(workers=settings.image_derivatives_workers)
+    return image_derivatives_service
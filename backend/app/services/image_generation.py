@@ -3,14 +3,14 @@ Image generation service using Replicate API.
 Supports multiple models and reference photo integration.
 """
 import os
-import asyncio
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable
 from datetime import datetime
 import logging
 
-import replicate
 from app.models_pydantic import VisualPrompt
 from app.config import settings, ModelConfig
+from app.services.image_cache import ImageResultCache, get_image_result_cache
+from app.services.replicate_client import AsyncReplicateClient, Prediction, get_replicate_client
 
 logger = logging.getLogger(__name__)
 
@@ -24,15 +24,24 @@ class ImageGenerationService:
     - Reference photo support for artist consistency
     - Cost tracking and logging
     - Async processing for better performance
+    - Cached results for repeated prompt/reference/parameter combinations
     """
 
-    def __init__(self, api_token: str = None):
+    def __init__(self, api_token: str = None, result_cache: ImageResultCache = None):
         self.api_token = api_token or settings.replicate_api_token
         if not self.api_token:
             raise ValueError("Replicate API token is required")
 
-        # Initialize Replicate client
-        self.client = replicate.Client(api_token=self.api_token)
+        # Shared async Replicate client (predictions are polled, not run on a thread)
+        if self.api_token == settings.replicate_api_token:
+            self.client = get_replicate_client()
+        else:
+            self.client = AsyncReplicateClient(api_token=self.api_token)
+
+        # Shared result cache (None when disabled)
+        self.result_cache = result_cache
+        if self.result_cache is None and settings.image_cache_enabled:
+            self.result_cache = get_image_result_cache()
 
         # Current model configuration
         self.current_model = ModelConfig.image_model
@@ -71,15 +80,26 @@ class ImageGenerationService:
         self,
         visual_prompt: VisualPrompt,
         reference_image_url: Optional[str] = None,
-        custom_params: Optional[Dict[str, Any]] = None
+        custom_params: Optional[Dict[str, Any]] = None,
+        tracking: Optional[Dict[str, Any]] = None,
+        on_prediction: Optional[Callable[[Prediction], Any]] = None,
+        force_new_variation: bool = False
     ) -> Dict[str, Any]:
         """
         Generate image from visual prompt with optional reference photo.
 
+        Identical requests (model, prompt, reference image and parameters)
+        reuse the cached result unless force_new_variation is set.
+
         Args:
             visual_prompt: VisualPrompt object with detailed generation instructions
             reference_image_url: Optional URL of reference image for subject consistency
             custom_params: Optional parameters to override defaults
+            tracking: Extra fields stored with the prediction record (e.g. project_id)
+            on_prediction: Called with the prediction as soon as it is created
+                (not called when the result comes from the cache)
+            force_new_variation: Skip the cache and generate a new image; it
+                replaces the cached one
 
         Returns:
             Dictionary with generation results and metadata
@@ -111,59 +131,75 @@ class ImageGenerationService:
                 else:
                     print(f"  {key}: {value}")
 
-            # Generate image using Replicate
-            start_time = datetime.now()
-
-            # Run the prediction using replicate.run
-            output = await asyncio.to_thread(
-                self.client.run,
-                self.current_model,
-                input=params
-            )
-
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
-
-            # Process the output
-            image_urls = output if isinstance(output, list) else [output]
-
-            result = {
-                "success": True,
-                "image_urls": image_urls,
-                "generation_metadata": {
-                    "model": self.current_model,
-                    "scene_id": visual_prompt.scene_id,
-                    "reference_used": bool(reference_image_url),
-                    "reference_url": reference_image_url,
-                    "generation_time": duration,
-                    "timestamp": end_time.isoformat()
-                },
-                "visual_prompt": {
-                    "scene_id": visual_prompt.scene_id,
-                    "image_prompt": visual_prompt.image_prompt,
-                    "setting": visual_prompt.setting,
-                    "mood": visual_prompt.mood,
-                    "shot_type": visual_prompt.shot_type,
-                    "color_palette": visual_prompt.color_palette
-                },
-                "model_parameters": params
-            }
-
-            # Log the generation
-            await self._log_to_file_if_test(
-                generation_type=generation_type,
-                prompt=visual_prompt.image_prompt,
-                response=result,
-                metadata={
-                    "scene_id": visual_prompt.scene_id,
-                    "reference_image_url": reference_image_url,
-                    "generation_time": duration
+            async def _generate() -> Dict[str, Any]:
+                # Generate image using Replicate
+                start_time = datetime.now()
+
+                # Create the prediction and wait for it without holding a thread
+                prediction = await self.client.run(
+                    self.current_model,
+                    params,
+                    tracking={"kind": "image", "scene_id": visual_prompt.scene_id, **(tracking or {})},
+                    on_created=on_prediction
+                )
+                output = prediction.output
+
+                end_time = datetime.now()
+                duration = (end_time - start_time).total_seconds()
+
+                # Process the output
+                image_urls = output if isinstance(output, list) else [output]
+
+                result = {
+                    "success": True,
+                    "image_urls": image_urls,
+                    "generation_metadata": {
+                        "model": self.current_model,
+                        "prediction_id": prediction.id,
+                        "scene_id": visual_prompt.scene_id,
+                        "reference_used": bool(reference_image_url),
+                        "reference_url": reference_image_url,
+                        "generation_time": duration,
+                        "timestamp": end_time.isoformat()
+                    },
+                    "visual_prompt": {
+                        "scene_id": visual_prompt.scene_id,
+                        "image_prompt": visual_prompt.image_prompt,
+                        "setting": visual_prompt.setting,
+                        "mood": visual_prompt.mood,
+                        "shot_type": visual_prompt.shot_type,
+                        "color_palette": visual_prompt.color_palette
+                    },
+                    "model_parameters": params
                 }
-            )
-
-            print(f"✅ Image generated successfully in {duration:.2f}s")
-            print(f"🖼️ Generated {len(image_urls)} image(s)")
 
+                # Log the generation
+                await self._log_to_file_if_test(
+                    generation_type=generation_type,
+                    prompt=visual_prompt.image_prompt,
+                    response=result,
+                    metadata={
+                        "scene_id": visual_prompt.scene_id,
+                        "reference_image_url": reference_image_url,
+                        "generation_time": duration
+                    }
+                )
+
+                print(f"✅ Image generated successfully in {duration:.2f}s")
+                print(f"🖼️ Generated {len(image_urls)} image(s)")
+
+                return result
+
+            if self.result_cache is None:
+                return await _generate()
+
+            key = await self.result_cache.make_key(self.current_model, visual_prompt, params, reference_image_url)
+            result = await self.result_cache.get_or_generate(key, _generate, force_new=force_new_variation)
+            if result["generation_metadata"]["cache_hit"]:
+                print(f"♻️ Reused cached image for scene {visual_prompt.scene_id}")
+                # The same prompt may have been cached from another scene
+                result["generation_metadata"] = {**result["generation_metadata"], "scene_id": visual_prompt.scene_id}
+                result["visual_prompt"] = {**result["visual_prompt"], "scene_id": visual_prompt.scene_id}
             return result
 
         except Exception as e:
@@ -0,0 +1,355 @@
+"""
+Per-call metering for LLM requests.
+
+Every OpenRouter attempt is recorded with its model, stage, token usage,
+time-to-first-byte, total latency and cost, tagged with the project and job
+it ran for. Records are aggregated in memory (served by /health/openrouter)
+and flushed in batches to the llm_call_metrics table and/or a Redis stream.
+"""
+import asyncio
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, List, Optional
+
+from app.config import ModelConfig, settings
+from app.services.retry_policy import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+# Tags (project_id, job_id, ...) applied to every call made in the current context.
+# asyncio tasks copy the context when created, so tasks spawned inside a tagged
+# block inherit its tags.
+_llm_call_tags: ContextVar[Dict[str, Any]] = ContextVar("llm_call_tags", default={})
+
+SINKS = ("table", "redis", "both", "none")
+
+
+@contextmanager
+def llm_call_tags(**tags: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Tag LLM calls made inside the block (nested blocks add to the outer tags).
+
+    Usage:
+        with llm_call_tags(project_id=project_id, job_id=job_id):
+            await openrouter_service.select_scenes(...)
+    """
+    merged = {**_llm_call_tags.get(), **{key: str(value) for key, value in tags.items() if value is not None}}
+    token = _llm_call_tags.set(merged)
+    try:
+        yield merged
+    finally:
+        _llm_call_tags.reset(token)
+
+
+def current_llm_call_tags() -> Dict[str, Any]:
+    return dict(_llm_call_tags.get())
+
+
+def compute_cost(model: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> Optional[float]:
+    """
+    Cost in USD from the ModelConfig price table (None for unknown models).
+
+    Args:
+        model: OpenRouter model ID
+        prompt_tokens: Input tokens
+        completion_tokens: Output tokens
+    """
+    prices = ModelConfig.model_pricing.get(model)
+    if prices is None or (prompt_tokens is None and completion_tokens is None):
+        return None
+    prompt_price, completion_price = prices
+    return ((prompt_tokens or 0) * prompt_price + (completion_tokens or 0) * completion_price) / 1_000_000
+
+
+@dataclass
+class LLMCallRecord:
+    """One metered LLM request attempt."""
+    model: str
+    stage: Optional[str]
+    status: str                              # "ok" | "error" | "cancelled"
+    latency_ms: float
+    ttfb_ms: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    cost_usd: Optional[float] = None
+    streamed: bool = False
+    error: Optional[str] = None
+    project_id: Optional[str] = None
+    job_id: Optional[str] = None
+    tags: Dict[str, Any] = field(default_factory=dict)
+    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+    def to_row(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class _CallAggregate:
+    """Running totals for one stage/model pair."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.latency = LatencyWindow(max_samples=200)
+        self.ttfb = LatencyWindow(max_samples=200)
+
+    def add(self, record: LLMCallRecord):
+        self.calls += 1
+        if record.status != "ok":
+            self.errors += 1
+            return
+        self.prompt_tokens += record.prompt_tokens or 0
+        self.completion_tokens += record.completion_tokens or 0
+        self.cost_usd += record.cost_usd or 0.0
+        self.latency.add(record.latency_ms)
+        if record.ttfb_ms is not None:
+            self.ttfb.add(record.ttfb_ms)
+
+    def summary(self) -> Dict[str, Any]:
+        def ms(value):
+            return round(value, 1) if value is not None else None
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "latency_p50_ms": ms(self.latency.percentile(0.5)),
+            "latency_p95_ms": ms(self.latency.percentile(0.95)),
+            "ttfb_p50_ms": ms(self.ttfb.percentile(0.5)),
+            "ttfb_p95_ms": ms(self.ttfb.percentile(0.95))
+        }
+
+
+class LLMMeter:
+    """
+    Records LLM calls, aggregates them per stage/model and flushes them in batches.
+
+    Flushing happens every flush_interval seconds (once start() has been
+    called) and whenever batch_size records are buffered. A failed flush drops
+    its batch rather than growing the buffer; at most max_buffer records are
+    held between flushes.
+
+    Usage:
+        meter.record(model, stage="visual_prompt", status="ok", latency_ms=812.0, usage=data["usage"])
+    """
+
+    REDIS_RETRY_AFTER_SECONDS = 30.0
+
+    def __init__(
+        self,
+        sink: str = "table",
+        table: str = "llm_call_metrics",
+        redis_url: Optional[str] = None,
+        stream_key: str = "omvee:llm_calls",
+        stream_maxlen: int = 100000,
+        flush_interval: float = 10.0,
+        batch_size: int = 50,
+        max_buffer: int = 5000,
+        writer: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None
+    ):
+        if sink not in SINKS:
+            raise ValueError(f"Unknown metering sink '{sink}' (expected one of {SINKS})")
+        self.sink = sink
+        self.table = table
+        self.redis_url = redis_url
+        self.stream_key = stream_key
+        self.stream_maxlen = stream_maxlen
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self._writer = writer
+
+        self._buffer: Deque[LLMCallRecord] = deque()
+        self._aggregates: Dict[str, _CallAggregate] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._pending_flush: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._redis = None
+        self._redis_loop = None
+        self._stats = {"recorded": 0, "flushed": 0, "dropped": 0, "flush_failures": 0}
+
+    def record(
+        self,
+        model: str,
+        stage: Optional[str],
+        status: str,
+        latency_ms: float,
+        ttfb_ms: Optional[float] = None,
+        usage: Optional[Dict[str, Any]] = None,
+        streamed: bool = False,
+        error: Optional[str] = None
+    ) -> LLMCallRecord:
+        """
+        Record one call attempt, tagged with the current llm_call_tags().
+
+        Args:
+            model: Model that served the attempt
+            stage: Pipeline stage (scene_selection, visual_prompt, ...)
+            status: "ok", "error" or "cancelled"
+            latency_ms: Time from request start to the full response
+            ttfb_ms: Time to response headers (or first streamed delta)
+            usage: OpenRouter usage block (prompt_tokens, completion_tokens, optional cost)
+            streamed: Whether the response was streamed
+            error: Error message for failed attempts
+
+        Returns:
+            The stored record
+        """
+        usage = usage or {}
+        tags = current_llm_call_tags()
+        prompt_tokens = usage.get("prompt_tokens")
+        completion_tokens = usage.get("completion_tokens")
+
+        # OpenRouter's reported cost covers provider-specific pricing; the table is the fallback
+        cost = usage.get("cost")
+        if cost is None:
+            cost = compute_cost(model, prompt_tokens, completion_tokens)
+
+        record = LLMCallRecord(
+            model=model,
+            stage=stage,
+            status=status,
+            latency_ms=round(latency_ms, 1),
+            ttfb_ms=round(ttfb_ms, 1) if ttfb_ms is not None else None,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cost_usd=float(cost) if cost is not None else None,
+            streamed=streamed,
+            error=error[:500] if error else None,
+            project_id=tags.pop("project_id", None),
+            job_id=tags.pop("job_id", None),
+            tags=tags
+        )
+
+        self._stats["recorded"] += 1
+        self._aggregates.setdefault(f"{stage or 'unstaged'}/{model}", _CallAggregate()).add(record)
+
+        if self.sink == "none" and self._writer is None:
+            return record
+        if len(self._buffer) >= self.max_buffer:
+            self._buffer.popleft()
+            self._stats["dropped"] += 1
+        self._buffer.append(record)
+
+        if len(self._buffer) >= self.batch_size and (self._pending_flush is None or self._pending_flush.done()):
+            try:
+                self._pending_flush = asyncio.get_running_loop().create_task(self.flush())
+            except RuntimeError:
+                pass  # No running loop; the periodic flush or close() picks it up
+        return record
+
+    async def flush(self) -> int:
+        """
+        Write buffered records to the configured sink.
+
+        Returns:
+            Number of records written (0 if the write failed)
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            if not self._buffer:
+                return 0
+            batch = [self._buffer.popleft() for _ in range(len(self._buffer))]
+            rows = [record.to_row() for record in batch]
+
+            try:
+                if self._writer is not None:
+                    await self._writer(rows)
+                else:
+                    if self.sink in ("table", "both"):
+                        await self._write_table(rows)
+                    if self.sink in ("redis", "both"):
+                        await self._write_redis(rows)
+            except Exception as e:
+                self._stats["flush_failures"] += 1
+                self._stats["dropped"] += len(rows)
+                logger.warning(f"LLM metrics flush of {len(rows)} records failed: {e}")
+                return 0
+
+            self._stats["flushed"] += len(rows)
+            return len(rows)
+
+    async def _write_table(self, rows: List[Dict[str, Any]]):
+        from app.services.supabase import supabase_service
+
+        client = supabase_service.admin_client or supabase_service.client
+        # supabase-py is synchronous; keep the insert off the event loop
+        await asyncio.to_thread(lambda: client.table(self.table).insert(rows).execute())
+
+    async def _write_redis(self, rows: List[Dict[str, Any]]):
+        if not self.redis_url:
+            raise Exception("Redis metering sink configured without a redis_url")
+
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._redis_loop is not loop:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(self.redis_url, socket_connect_timeout=1.0, socket_timeout=2.0)
+            self._redis_loop = loop
+
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for row in rows:
+                fields = {key: ("" if value is None else str(value)) for key, value in row.items() if key != "tags"}
+                for key, value in row["tags"].items():
+                    fields[f"tag_{key}"] = str(value)
+                pipe.xadd(self.stream_key, fields, maxlen=self.stream_maxlen, approximate=True)
+            await pipe.execute()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        """Start the periodic flush loop on the running event loop."""
+        if self.sink == "none" and self._writer is None:
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def close(self):
+        """Stop the flush loop and write out whatever is buffered."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return per stage/model aggregates and flush counters."""
+        total_cost = sum(aggregate.cost_usd for aggregate in self._aggregates.values())
+        return {
+            **self._stats,
+            "sink": self.sink,
+            "buffered": len(self._buffer),
+            "total_cost_usd": round(total_cost, 6),
+            "by_stage_model": {key: aggregate.summary() for key, aggregate in sorted(self._aggregates.items())}
+        }
+
+
+# Global meter for LLM calls - shared by every OpenRouterService in the process
+llm_meter = None
+
+def get_llm_meter() -> LLMMeter:
+    """Get or create the process-wide LLM call meter."""
+    global llm_meter
+    if llm_meter is None:
+        llm_meter = LLMMeter(
+            sink=settings.llm_metering_sink if settings.llm_metering_enabled else "none",
+            redis_url=settings.redis_url,
+            flush_interval=settings.llm_metering_flush_interval,
+            batch_size=settings.llm_metering_batch_size
+        )
+    return llm_meter
@@ -0,0 +1,323 @@
+"""
+Rehosting of generated media into Supabase Storage.
+
+Replicate output URLs expire, so every generated image and clip is copied
+into the storage bucket under a path derived from its content hash. The copy
+streams: each chunk read from Replicate is hashed and forwarded to the
+upload as it arrives, so no file is ever held in memory whole. The hash is
+only known at the end, so the upload goes to a temporary key and is then
+moved to generated/<sha[:2]>/<sha>.<ext> (or dropped if identical content is
+already stored there).
+
+Rehosting runs in the background after a row is saved; the row keeps its
+Replicate URL (which later stages can use straight away) until the copy
+lands, and then points at the stored file.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional, Set
+from urllib.parse import urlparse
+
+from app.config import settings
+from app.services.http_pool import PooledHTTPSession
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+
+class RehostError(Exception):
+    """A download or storage request failed."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Rehost failed ({status}): {message}")
+        self.status = status
+
+
+class MediaRehostService:
+    """
+    Copies generated media into Supabase Storage with bounded concurrency.
+
+    Use rehost() to copy one URL and get its stored location, or
+    rehost_image_in_background() / rehost_clip_in_background() to copy a
+    saved row's media and update the row (and the image result cache) when
+    it lands.
+    """
+
+    def __init__(
+        self,
+        db=None,
+        http_pool: PooledHTTPSession = None,
+        storage_url: Optional[str] = None,
+        storage_key: Optional[str] = None,
+        bucket: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        derivatives=None
+    ):
+        """
+        Args:
+            db: Object with update_image and update_video_clip (defaults to supabase_service)
+            http_pool: Session for downloads and uploads (a private one is created if omitted)
+            storage_url: Supabase project URL (defaults to settings.supabase_url)
+            storage_key: Key for the Storage API (service key if configured, else anon key)
+            bucket: Destination bucket
+            concurrency: Files copied at once
+            derivatives: ImageDerivativesService run on each stored image (the
+                shared one if derivatives are enabled)
+        """
+        self._db = db
+        self._derivatives = derivatives
+        self.http_pool = http_pool or PooledHTTPSession(name="rehost", limit=32, limit_per_host=16, read_timeout=300.0)
+        self.storage_url = (storage_url or settings.supabase_url).rstrip("/")
+        self.storage_key = storage_key or settings.supabase_service_key or settings.supabase_anon_key
+        self.bucket = bucket or settings.rehost_bucket
+        self._semaphore = asyncio.Semaphore(concurrency or settings.rehost_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats = {"rehosted": 0, "deduplicated": 0, "failed": 0, "bytes": 0}
+
+    @property
+    def db(self):
+        if self._db is None:
+            from app.services.supabase import supabase_service
+            self._db = supabase_service
+        return self._db
+
+    @property
+    def derivatives(self):
+        if self._derivatives is None and settings.image_derivatives_enabled:
+            from app.services.image_derivatives import get_image_derivatives_service
+            self._derivatives = get_image_derivatives_service()
+        return self._derivatives
+
+    def public_url(self, path: str) -> str:
+        return f"{self.storage_url}/storage/v1/object/public/{self.bucket}/{path}"
+
+    def is_rehosted(self, url: Optional[str]) -> bool:
+        return bool(url) and url.startswith(f"{self.storage_url}/storage/v1/object/public/{self.bucket}/")
+
+    def _headers(self, **extra: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.storage_key}", "apikey": self.storage_key, **extra}
+
+    @staticmethod
+    def _extension(url: str, content_type: str) -> str:
+        ext = os.path.splitext(urlparse(url).path)[1].lower()
+        if ext:
+            return ext
+        return mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
+
+    @staticmethod
+    def _is_duplicate(status: int, body: str) -> bool:
+        """Whether a failed request means the destination already exists."""
+        if status == 409:
+            return True
+        if status != 400:
+            return False
+        # Older Storage versions answer 400 with the conflict in the body
+        try:
+            error = json.loads(body)
+        except ValueError:
+            return False
+        return isinstance(error, dict) and (
+            str(error.get("statusCode")) == "409"
+            or error.get("error") == "Duplicate"
+            or error.get("message") == "The resource already exists"
+        )
+
+    async def _storage_request(self, method: str, path: str, allow_duplicate: bool = False, **kwargs) -> int:
+        """
+        Call the Storage API.
+
+        Returns:
+            The response status (>= 300 only for an allowed duplicate)
+
+        Raises:
+            RehostError: On any other failure
+        """
+        session = await self.http_pool.get_session()
+        async with session.request(method, f"{self.storage_url}/storage/v1{path}", **kwargs) as response:
+            if response.status >= 300:
+                body = await response.text()
+                if allow_duplicate and self._is_duplicate(response.status, body):
+                    return response.status
+                raise RehostError(response.status, body[:500])
+            return response.status
+
+    async def rehost(self, url: str) -> Dict[str, Any]:
+        """
+        Copy one file into storage.
+
+        Returns:
+            {"url", "path", "sha256", "bytes", "content_type", "deduplicated"}
+
+        Raises:
+            RehostError: If the download or upload fails
+        """
+        async with self._semaphore:
+            session = await self.http_pool.get_session()
+            sha = hashlib.sha256()
+            size = 0
+
+            async with session.get(url) as source:
+                if source.status >= 300:
+                    raise RehostError(source.status, f"download of {url} failed")
+                content_type = source.headers.get("Content-Type", "application/octet-stream")
+                ext = self._extension(url, content_type)
+
+                async def body() -> AsyncIterator[bytes]:
+                    nonlocal size
+                    async for chunk in source.content.iter_chunked(CHUNK_SIZE):
+                        sha.update(chunk)
+                        size += len(chunk)
+                        yield chunk
+
+                temp_path = f"generated/tmp/{uuid.uuid4().hex}{ext}"
+                await self._storage_request(
+                    "POST", f"/object/{self.bucket}/{temp_path}",
+                    data=body(),
+                    headers=self._headers(**{"Content-Type": content_type, "Cache-Control": "max-age=31536000"})
+                )
+
+            digest = sha.hexdigest()
+            path = f"generated/{digest[:2]}/{digest}{ext}"
+            status = await self._storage_request(
+                "POST", "/object/move",
+                allow_duplicate=True,
+                json={"bucketId": self.bucket, "sourceKey": temp_path, "destinationKey": path},
+                headers=self._headers()
+            )
+            deduplicated = status >= 300
+            if deduplicated:
+                # Same content is already stored; drop the temporary copy
+                await self._storage_request(
+                    "DELETE", f"/object/{self.bucket}",
+                    json={"prefixes": [temp_path]},
+                    headers=self._headers()
+                )
+
+        self._stats["deduplicated" if deduplicated else "rehosted"] += 1
+        self._stats["bytes"] += size
+        return {
+            "url": self.public_url(path),
+            "path": path,
+            "sha256": digest,
+            "bytes": size,
+            "content_type": content_type,
+            "deduplicated": deduplicated
+        }
+
+    async def download(self, url: str) -> bytes:
+        """Fetch a (small) file whole, e.g. a stored image for the derivatives stage."""
+        async with self._semaphore:
+            session = await self.http_pool.get_session()
+            async with session.get(url) as response:
+                if response.status >= 300:
+                    raise RehostError(response.status, f"download of {url} failed")
+                return await response.read()
+
+    async def upload(self, path: str, data: bytes, content_type: str) -> str:
+        """Store bytes at path (replacing any existing object) and return the public URL."""
+        async with self._semaphore:
+            await self._storage_request(
+                "POST", f"/object/{self.bucket}/{path}",
+                data=data,
+                headers=self._headers(**{"Content-Type": content_type, "Cache-Control": "max-age=31536000", "x-upsert": "true"})
+            )
+        return self.public_url(path)
+
+    async def rehost_image(self, image: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Copy a generated_images row's image into storage, point the row (and
+        cache entry) at it, then create its derivatives.
+
+        Returns:
+            The stored location, or None if the row had nothing to copy
+        """
+        source_url = image.get("image_url")
+        if not source_url:
+            return None
+
+        stored = None
+        if self.is_rehosted(source_url):
+            # A cache hit hands a new row an image that is already stored; it still needs derivatives
+            url, path = source_url, source_url[len(self.public_url("")):]
+        else:
+            stored = await self.rehost(source_url)
+            self.db.update_image(image["id"], {
+                "image_url": stored["url"],
+                "source_url": source_url,
+                "storage_path": stored["path"]
+            })
+
+            cache_key = (image.get("generation_metadata") or {}).get("cache_key")
+            if cache_key and settings.image_cache_enabled:
+                from app.services.image_cache import get_image_result_cache
+                await get_image_result_cache().store_rehosted(cache_key, [stored["url"]])
+            url, path = stored["url"], stored["path"]
+
+        if self.derivatives is not None and not image.get("derivatives"):
+            await self.derivatives.create_for_image(image["id"], url, path)
+        return stored
+
+    async def rehost_clip(self, clip: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Copy a video_clips row's video into storage and point the row at it."""
+        source_url = clip.get("video_url")
+        if not source_url or self.is_rehosted(source_url):
+            return None
+        stored = await self.rehost(source_url)
+        self.db.update_video_clip(clip["id"], {
+            "video_url": stored["url"],
+            "source_url": source_url,
+            "storage_path": stored["path"]
+        })
+        return stored
+
+    def _in_background(self, coro, label: str) -> asyncio.Task:
+        async def guarded():
+            try:
+                return await coro
+            except Exception as e:
+                # The row keeps its Replicate URL; nothing downstream waits on this
+                self._stats["failed"] += 1
+                logger.warning(f"Rehosting {label} failed: {e}")
+
+        task = asyncio.create_task(guarded())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def rehost_image_in_background(self, image: Dict[str, Any]) -> asyncio.Task:
+        return self._in_background(self.rehost_image(image), f"image {image.get('id')}")
+
+    def rehost_clip_in_background(self, clip: Dict[str, Any]) -> asyncio.Task:
+        return self._in_background(self.rehost_clip(clip), f"clip {clip.get('id')}")
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Wait for background copies started so far."""
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "pending": len(self._tasks), "pool": self.http_pool.get_stats()}
+
+    async def close(self, timeout: float = 30.0):
+        """Give in-flight copies a chance to finish, then close the session."""
+        await self.drain(timeout)
+        for task in self._tasks:
+            task.cancel()
+        await self.http_pool.close()
+
+
+# Global media rehost service instance - will be initialized when needed
+media_rehost_service = None
+
+def get_media_rehost_service() -> MediaRehostService:
+    """Get or create the global MediaRehostService instance."""
+    global media_rehost_service
+    if media_rehost_service is None:
+        media_rehost_service = MediaRehostService()
+    return media_rehost_service
@@ -0,0 +1,242 @@
+"""
+Latency-aware model routing for LLM pipeline stages.
+Orders each stage's candidate models by live health and falls back on failure.
+"""
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from app.services.retry_policy import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ModelHealth:
+    """Rolling latency and error statistics for one model on one stage."""
+
+    def __init__(self, max_samples: int = 50):
+        self.latency = LatencyWindow(max_samples=max_samples)
+        self.outcomes: Deque[bool] = deque(maxlen=max_samples)
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.calls = 0
+        self.failures = 0
+
+    def record(self, success: bool, seconds: Optional[float] = None):
+        self.calls += 1
+        self.outcomes.append(success)
+        if success:
+            self.consecutive_failures = 0
+            if seconds is not None:
+                self.latency.add(seconds)
+        else:
+            self.failures += 1
+            self.consecutive_failures += 1
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def circuit_open(self) -> bool:
+        return time.monotonic() < self.open_until
+
+
+class ModelRouter:
+    """
+    Routes each LLM stage to the best of its candidate models.
+
+    Candidates keep their configured order unless live data says otherwise:
+    - A model whose circuit is open (too many consecutive failures) goes last
+    - A model whose recent error rate exceeds max_error_rate goes after healthy ones
+    - A model whose p95 is more than slow_factor x the fastest candidate's p95,
+      or over the stage's latency budget, goes after the fast ones (ordered by p95)
+    Models with too few samples are treated as fast, so they get explored.
+
+    Fallbacks only get traffic when the primary misbehaves, so their numbers
+    go stale. With explore_ratio set, that share of selections puts the least
+    used healthy fallback first, which keeps a slow primary comparable to
+    the alternatives even when it never fails.
+
+    run() tries candidates in that order and returns the first success.
+
+    Usage:
+        content = await router.run("visual_prompt", lambda model: post({**payload, "model": model}))
+    """
+
+    def __init__(
+        self,
+        stage_models: Dict[str, List[str]],
+        slow_factor: float = 1.5,
+        max_error_rate: float = 0.5,
+        min_samples: int = 5,
+        circuit_failures: int = 3,
+        circuit_seconds: float = 60.0,
+        latency_budgets: Optional[Dict[str, float]] = None,
+        explore_ratio: float = 0.0
+    ):
+        """
+        Args:
+            stage_models: Candidate models per stage, preferred first
+            slow_factor: p95 multiple of the fastest candidate that counts as slow
+            max_error_rate: Recent error rate above which a model is demoted
+            min_samples: Samples needed before a model's numbers are trusted
+            circuit_failures: Consecutive failures that open a model's circuit
+            circuit_seconds: How long an open circuit skips the model
+            latency_budgets: Per-stage p95 limit in seconds; a model over it counts as slow
+            explore_ratio: Share of selections that try a fallback first (0 disables)
+        """
+        self.stage_models = {stage: list(models) for stage, models in stage_models.items()}
+        self.latency_budgets = dict(latency_budgets or {})
+        self.explore_ratio = explore_ratio
+        self.slow_factor = slow_factor
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.circuit_failures = circuit_failures
+        self.circuit_seconds = circuit_seconds
+
+        self._health: Dict[str, Dict[str, ModelHealth]] = {}
+        self._fallbacks: Dict[str, int] = {}
+        self._selections: Dict[str, int] = {}
+        self._explorations: Dict[str, int] = {}
+
+    def _get_health(self, stage: str, model: str) -> ModelHealth:
+        stage_health = self._health.setdefault(stage, {})
+        if model not in stage_health:
+            stage_health[model] = ModelHealth()
+        return stage_health[model]
+
+    def candidates(self, stage: str, explore: bool = False) -> List[str]:
+        """
+        Return the stage's models in the order they should be tried.
+
+        Args:
+            stage: Pipeline stage name (e.g. "scene_selection")
+            explore: Count this as a selection for a call about to be made, so
+                every 1/explore_ratio-th one leads with a fallback
+
+        Returns:
+            Ordered list of model IDs
+        """
+        models = self.stage_models.get(stage)
+        if not models:
+            raise ValueError(f"No models configured for stage '{stage}'")
+
+        p95s = {}
+        for model in models:
+            health = self._get_health(stage, model)
+            if len(health.latency) >= self.min_samples:
+                p95s[model] = health.latency.percentile(0.95)
+        fastest = min(p95s.values()) if p95s else None
+        budget = self.latency_budgets.get(stage)
+
+        def tier(model: str) -> int:
+            health = self._get_health(stage, model)
+            if health.circuit_open():
+                return 2
+            if len(health.outcomes) >= self.min_samples and health.error_rate > self.max_error_rate:
+                return 1
+            return 0
+
+        def sort_key(indexed_model):
+            rank, model = indexed_model
+            p95 = p95s.get(model)
+            slow = p95 is not None and (
+                (fastest is not None and p95 > self.slow_factor * fastest)
+                or (budget is not None and p95 > budget)
+            )
+            return (tier(model), slow, p95 if slow else 0.0, rank)
+
+        ordered = [model for _, model in sorted(enumerate(models), key=sort_key)]
+
+        if explore and self.explore_ratio > 0 and len(ordered) > 1:
+            self._selections[stage] = self._selections.get(stage, 0) + 1
+            interval = max(1, round(1 / self.explore_ratio))
+            healthy = [model for model in ordered[1:] if tier(model) == 0]
+            if healthy and self._selections[stage] % interval == 0:
+                model = min(healthy, key=lambda m: self._get_health(stage, m).calls)
+                ordered.remove(model)
+                ordered.insert(0, model)
+                self._explorations[stage] = self._explorations.get(stage, 0) + 1
+
+        return ordered
+
+    def record(self, stage: str, model: str, success: bool, seconds: Optional[float] = None):
+        """Record the outcome of a call made outside run() (e.g. a streamed completion)."""
+        health = self._get_health(stage, model)
+        health.record(success, seconds)
+        if not success and health.consecutive_failures >= self.circuit_failures:
+            health.open_until = time.monotonic() + self.circuit_seconds
+            logger.warning(f"[router:{stage}] {model} failed {health.consecutive_failures}x in a row, skipping for {self.circuit_seconds:.0f}s")
+
+    def record_latency(self, stage: str, model: str, seconds: float):
+        """Record the latency of one successful attempt, measured by the caller."""
+        self._get_health(stage, model).latency.add(seconds)
+
+    def record_fallback(self, stage: str):
+        self._fallbacks[stage] = self._fallbacks.get(stage, 0) + 1
+
+    async def run(self, stage: str, call: Callable[[str], Awaitable[T]], timed: bool = True) -> T:
+        """
+        Call the best model for a stage, falling back down the candidate list on failure.
+
+        Args:
+            stage: Pipeline stage name
+            call: Coroutine factory taking the model ID
+            timed: Record each call's duration as the model's latency. Pass False
+                when the call includes queueing or retries and the caller reports
+                per-attempt latency through record_latency() instead
+
+        Returns:
+            Result of the first successful call
+        """
+        last_error: Optional[Exception] = None
+        for attempt, model in enumerate(self.candidates(stage, explore=True)):
+            if attempt > 0:
+                self.record_fallback(stage)
+                print(f"↪️ [{stage}] Falling back to {model} after: {last_error}")
+
+            started = time.monotonic()
+            try:
+                result = await call(model)
+            except Exception as e:
+                self.record(stage, model, False)
+                last_error = e
+                continue
+
+            self.record(stage, model, True, time.monotonic() - started if timed else None)
+            return result
+
+        if last_error is None:
+            raise ValueError(f"No candidate models for stage '{stage}'")
+        raise last_error
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return per-stage candidate order and per-model latency/error statistics."""
+        stats = {}
+        for stage in self.stage_models:
+            models = {}
+            for model in self.stage_models[stage]:
+                health = self._get_health(stage, model)
+                p50 = health.latency.percentile(0.5)
+                p95 = health.latency.percentile(0.95)
+                models[model] = {
+                    "calls": health.calls,
+                    "failures": health.failures,
+                    "error_rate": round(health.error_rate, 3),
+                    "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                    "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                    "circuit_open": health.circuit_open()
+                }
+            stats[stage] = {
+                "order": self.candidates(stage),
+                "fallbacks": self._fallbacks.get(stage, 0),
+                "explorations": self._explorations.get(stage, 0),
+                "latency_budget_s": self.latency_budgets.get(stage),
+                "models": models
+            }
+        return stats
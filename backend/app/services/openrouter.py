@@ -1,20 +1,54 @@
+import asyncio
 import json
 import os
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 from datetime import datetime
 import aiohttp
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
 
 from app.models_pydantic import (
     TranscriptionResult,
+    SceneSelection,
     SceneSelectionResult,
     PromptGenerationResult
 )
-from app.config import ModelConfig
+from app.config import ModelConfig, settings
+from app.services.audio_analysis import AudioFeatures
+from app.services.http_pool import PooledHTTPSession
+from app.services.response_cache import ResponseCache
+from app.services.concurrency import AdaptiveConcurrencyLimiter, get_llm_limiter, parse_retry_after
+from app.services.retry_policy import RetryPolicy
+from app.services.prompt_batching import PromptBatchPlanner
+from app.services.model_router import ModelRouter
+from app.services.llm_metering import LLMMeter, get_llm_meter
+from app.utils.json_extract import extraction_stats, parse_llm_json
+from app.utils.json_stream import IncrementalArrayParser
+from app.utils.transcript_encoding import EncodedTranscript, encode_transcript, render_segments_verbose
+
+
+class OpenRouterAPIError(Exception):
+    """Non-200 response from OpenRouter, with the status and Retry-After delay (if any)."""
+
+    def __init__(self, status: int, body: str, retry_after: Optional[float] = None):
+        super().__init__(f"OpenRouter API error {status}: {body}")
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status in (408, 429) or self.status >= 500
+
+
+class OpenRouterNetworkError(Exception):
+    """Connection-level failure talking to OpenRouter."""
+
+    retryable = True
 
 
 class OpenRouterService:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, http_pool: PooledHTTPSession = None, response_cache: ResponseCache = None, limiter: AdaptiveConcurrencyLimiter = None, retry_policy: RetryPolicy = None, meter: LLMMeter = None):
         self.api_key = api_key or os.getenv("OPENROUTER_API_KEY")
         if not self.api_key:
             raise ValueError("OpenRouter API key is required")
@@ -29,6 +63,338 @@ class OpenRouterService:
             "X-Title": "OMVEE Music Video Generator"
         }
 
+        # One keep-alive connection pool shared by every call this service makes
+        self.http_pool = http_pool or PooledHTTPSession(
+            name="openrouter",
+            limit=settings.openrouter_pool_limit,
+            limit_per_host=settings.openrouter_pool_limit_per_host,
+            keepalive_timeout=settings.openrouter_keepalive_timeout,
+            connect_timeout=settings.openrouter_connect_timeout,
+            read_timeout=settings.openrouter_read_timeout
+        )
+
+        # Process-wide AIMD limiter so concurrent jobs share one upstream budget
+        self.limiter = limiter or get_llm_limiter()
+
+        # Per-call tokens, latency and cost, flushed in batches
+        self.meter = meter or get_llm_meter()
+
+        # Per-stage model choice with fallback; skipped when self.model is overridden
+        self.model_router = None
+        if settings.model_routing_enabled:
+            self.model_router = ModelRouter(
+                stage_models=ModelConfig.stage_models,
+                slow_factor=settings.model_routing_slow_factor,
+                max_error_rate=settings.model_routing_max_error_rate,
+                circuit_failures=settings.model_routing_circuit_failures,
+                circuit_seconds=settings.model_routing_circuit_seconds,
+                latency_budgets=ModelConfig.stage_latency_budgets,
+                explore_ratio=settings.model_routing_explore_ratio
+            )
+
+        # Retries with backoff, per-attempt deadlines and p95 hedging
+        self.retry_policy = retry_policy or RetryPolicy(
+            name="openrouter",
+            max_attempts=settings.openrouter_max_attempts,
+            base_delay=settings.openrouter_retry_base_delay,
+            max_delay=settings.openrouter_retry_max_delay,
+            attempt_timeout=settings.openrouter_attempt_timeout,
+            hedging_enabled=settings.openrouter_hedging_enabled,
+            hedge_percentile=settings.openrouter_hedge_percentile,
+            hedge_max_ratio=settings.openrouter_hedge_max_ratio,
+            hedge_guard=lambda: self.limiter.has_headroom()
+        )
+
+        # Picks how many scenes go into each visual-prompt request
+        self.prompt_batcher = PromptBatchPlanner(
+            limiter=self.limiter,
+            mode=settings.visual_prompt_generation_mode,
+            fixed_chunk_size=settings.visual_prompt_chunk_size,
+            max_chunk_size=settings.visual_prompt_max_chunk_size,
+            max_output_tokens=settings.llm_max_output_tokens
+        )
+
+        # Content-addressed cache of parsed results, keyed by the request that produced them
+        self.response_cache = response_cache
+        if self.response_cache is None and settings.llm_cache_enabled:
+            self.response_cache = ResponseCache(
+                namespace="openrouter",
+                lru_size=settings.llm_cache_lru_size,
+                ttl_seconds=settings.llm_cache_ttl_seconds,
+                redis_url=settings.redis_url if settings.llm_cache_redis_enabled else None,
+                redis_max_entries=settings.llm_cache_redis_max_entries,
+                max_value_bytes=settings.llm_cache_max_value_bytes
+            )
+
+    async def start(self):
+        """Open the pooled HTTP session and start metrics flushing (called from the app lifespan)."""
+        await self.http_pool.start()
+        await self.meter.start()
+
+    async def close(self):
+        """Flush call metrics and close the pooled HTTP session."""
+        await self.meter.close()
+        await self.http_pool.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return runtime statistics for this service."""
+        return {
+            "model": self.model,
+            "http_pool": self.http_pool.get_stats(),
+            "concurrency": self.limiter.get_stats(),
+            "retry": self.retry_policy.get_stats(),
+            "prompt_batching": self.prompt_batcher.get_stats(),
+            "model_routing": self.model_router.get_stats() if self.model_router else None,
+            "metering": self.meter.get_stats(),
+            "cache": self.response_cache.get_stats() if self.response_cache else None,
+            "json_extraction": extraction_stats.get_stats()
+        }
+
+    @staticmethod
+    def _cache_key(payload: Dict[str, Any]) -> str:
+        """Content hash of the parts of a request that determine its result."""
+        return ResponseCache.make_key(
+            payload["model"],
+            payload["messages"],
+            payload.get("temperature"),
+            payload.get("max_tokens")
+        )
+
+    async def _cached_completion(self, payload: Dict[str, Any], generate, result_type: type, bypass_cache: bool = False):
+        """
+        Run generate() through the response cache keyed by the request payload.
+
+        Args:
+            payload: Chat completion request body (model, messages, temperature, max_tokens)
+            generate: Coroutine factory that performs the request and parses the result
+            result_type: Pydantic model class of the parsed result, or str
+            bypass_cache: Force a fresh completion (the new result replaces the cached one)
+
+        Returns:
+            Parsed result of type result_type
+        """
+        if self.response_cache is None:
+            return await generate()
+
+        key = self._cache_key(payload)
+
+        def encode(result):
+            return result.model_dump(mode="json") if isinstance(result, BaseModel) else result
+
+        def decode(stored):
+            return result_type(**stored) if isinstance(stored, dict) else stored
+
+        return await self.response_cache.get_or_compute(key, generate, encode=encode, decode=decode, bypass=bypass_cache)
+
+    def _routing_active(self) -> bool:
+        """Routing applies unless disabled or self.model was overridden (e.g. by model comparison runs)."""
+        return self.model_router is not None and self.model == ModelConfig.scene_selection_model
+
+    async def _post_chat_completion(self, payload: Dict[str, Any], stage: str = None, scene_count: Optional[int] = None) -> Dict[str, Any]:
+        """
+        POST a chat completion request, routed to the best model for its stage.
+
+        Args:
+            payload: OpenRouter chat completion request body
+            stage: Pipeline stage for model routing; None sends payload["model"] as-is
+            scene_count: Scenes covered by a visual-prompt request, fed to the prompt batcher
+
+        Returns:
+            Parsed JSON response containing at least one choice
+        """
+        if stage is None or not self._routing_active():
+            return await self._post_with_retry_policy(payload, stage, scene_count)
+
+        # The cache key keeps the stage's default model, so any model's answer serves later hits.
+        # Latency is recorded per attempt inside the limiter gate, not across queueing and retries.
+        return await self.model_router.run(
+            stage,
+            lambda model: self._post_with_retry_policy({**payload, "model": model}, stage, scene_count),
+            timed=False
+        )
+
+    def _record_model_latency(self, stage: Optional[str], model: str, seconds: float, scene_count: Optional[int] = None):
+        """Feed one attempt's own latency (excluding limiter wait and backoff) to the model router."""
+        if stage is not None and self._routing_active():
+            # Visual-prompt chunks cover a planner-chosen number of scenes; compare models per scene
+            if scene_count:
+                seconds /= scene_count
+            self.model_router.record_latency(stage, model, seconds)
+
+    async def _post_with_retry_policy(self, payload: Dict[str, Any], stage: str = None, scene_count: Optional[int] = None) -> Dict[str, Any]:
+        """POST a chat completion request, retrying and hedging per the retry policy."""
+        # Requests with the same output budget have comparable latency, so they share a p95
+        latency_key = f"max_tokens={payload.get('max_tokens')}"
+        return await self.retry_policy.run(
+            lambda: self._post_chat_completion_once(payload, stage, scene_count),
+            latency_key=latency_key,
+            gate=self.limiter.slot
+        )
+
+    async def _post_chat_completion_once(self, payload: Dict[str, Any], stage: str = None, scene_count: Optional[int] = None) -> Dict[str, Any]:
+        """Single metered chat completion attempt over the pooled session (caller holds a limiter slot)."""
+        started = time.monotonic()
+        ttfb = None
+        try:
+            session = await self.http_pool.get_session()
+            async with session.post(
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                # OpenRouter only reports the call's cost when usage accounting is requested
+                json={**payload, "usage": {"include": True}}
+            ) as response:
+                ttfb = time.monotonic() - started
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise OpenRouterAPIError(response.status, error_text, parse_retry_after(response.headers.get("Retry-After")))
+
+                data = await response.json()
+
+            if 'choices' not in data or not data['choices']:
+                raise Exception("No response choices from OpenRouter API")
+
+        except asyncio.CancelledError:
+            # Losing hedges and deadline-cancelled attempts may still be billed
+            self._meter_call(payload, stage, "cancelled", started, ttfb)
+            raise
+        except aiohttp.ClientError as e:
+            self._meter_call(payload, stage, "error", started, ttfb, error=str(e))
+            raise OpenRouterNetworkError(f"Network error calling OpenRouter: {e}")
+        except Exception as e:
+            self._meter_call(payload, stage, "error", started, ttfb, error=str(e))
+            raise
+
+        self._meter_call(payload, stage, "ok", started, ttfb, usage=data.get('usage'))
+        elapsed = time.monotonic() - started
+        self._record_model_latency(stage, payload["model"], elapsed, scene_count)
+        if scene_count is not None:
+            # The K-scene latency model must not absorb limiter wait, backoff or fallbacks
+            self.prompt_batcher.record(scene_count, elapsed, (data.get('usage') or {}).get('completion_tokens'))
+        return data
+
+    def _meter_call(self, payload: Dict[str, Any], stage: Optional[str], status: str, started: float, ttfb: Optional[float], usage: Dict[str, Any] = None, error: str = None, streamed: bool = False):
+        """Record one request attempt with the LLM meter."""
+        self.meter.record(
+            model=payload["model"],
+            stage=stage,
+            status=status,
+            latency_ms=(time.monotonic() - started) * 1000,
+            ttfb_ms=ttfb * 1000 if ttfb is not None else None,
+            usage=usage,
+            streamed=streamed,
+            error=error
+        )
+
+    async def _stream_chat_completion(self, payload: Dict[str, Any], stage: str = None) -> AsyncIterator[str]:
+        """
+        Stream a chat completion, routed to the best model for its stage.
+
+        Falls back to the next candidate model only if the stream fails before
+        any content arrived; once deltas have been yielded, errors propagate.
+
+        Args:
+            payload: OpenRouter chat completion request body (without "stream")
+            stage: Pipeline stage for model routing; None sends payload["model"] as-is
+
+        Yields:
+            Text deltas of the first choice as they arrive
+        """
+        if stage is None or not self._routing_active():
+            async for delta in self._stream_chat_completion_once(payload, stage):
+                yield delta
+            return
+
+        last_error = None
+        for attempt, model in enumerate(self.model_router.candidates(stage, explore=True)):
+            if attempt > 0:
+                self.model_router.record_fallback(stage)
+                print(f"↪️ [{stage}] Falling back to {model} after: {last_error}")
+
+            streamed = False
+            try:
+                async for delta in self._stream_chat_completion_once({**payload, "model": model}, stage):
+                    streamed = True
+                    yield delta
+            except Exception as e:
+                self.model_router.record(stage, model, False)
+                if streamed:
+                    raise
+                last_error = e
+                continue
+
+            # Latency was recorded by the attempt itself, excluding limiter wait and consumer time
+            self.model_router.record(stage, model, True)
+            return
+
+        if last_error is None:
+            raise Exception(f"No candidate models to stream stage '{stage}'")
+        raise last_error
+
+    async def _stream_chat_completion_once(self, payload: Dict[str, Any], stage: str = None) -> AsyncIterator[str]:
+        """POST a streaming chat completion request and yield content deltas (metered; TTFB is the first delta)."""
+        started = time.monotonic()
+        ttfb = None
+        usage = None
+        status, error = "cancelled", None  # Stays "cancelled" if the consumer stops early
+        consumer_seconds = 0.0  # Time suspended in yield, which isn't the model's latency
+        try:
+            async with self.limiter.slot():
+                started = time.monotonic()
+                session = await self.http_pool.get_session()
+                async with session.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=self.headers,
+                    json={**payload, "stream": True, "usage": {"include": True}}
+                ) as response:
+                    if response.status != 200:
+                        error_text = await response.text()
+                        raise OpenRouterAPIError(response.status, error_text, parse_retry_after(response.headers.get("Retry-After")))
+
+                    # Server-sent events: "data: {...}" lines, ":" comment keep-alives, "data: [DONE]" terminator
+                    async for raw_line in response.content:
+                        line = raw_line.decode("utf-8").strip()
+                        if not line or line.startswith(":") or not line.startswith("data:"):
+                            continue
+
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+
+                        try:
+                            event = json.loads(data)
+                        except json.JSONDecodeError:
+                            continue
+
+                        if "error" in event:
+                            raise Exception(f"OpenRouter stream error: {event['error']}")
+
+                        # Usage arrives in the last event, which has no choices
+                        if event.get("usage"):
+                            usage = event["usage"]
+
+                        choices = event.get("choices") or []
+                        if not choices:
+                            continue
+                        delta = (choices[0].get("delta") or {}).get("content")
+                        if delta:
+                            if ttfb is None:
+                                ttfb = time.monotonic() - started
+                            paused = time.monotonic()
+                            yield delta
+                            consumer_seconds += time.monotonic() - paused
+
+            status = "ok"
+            self._record_model_latency(stage, payload["model"], time.monotonic() - started - consumer_seconds)
+
+        except aiohttp.ClientError as e:
+            status, error = "error", str(e)
+            raise OpenRouterNetworkError(f"Network error calling OpenRouter: {e}")
+        except Exception as e:
+            status, error = "error", str(e)
+            raise
+        finally:
+            self._meter_call(payload, stage, status, started, ttfb, usage=usage, error=error, streamed=True)
+
     async def _log_to_file_if_test(self, prompt_type: str, prompt: str, response: str, metadata: Dict[str, Any] = None):
         """Log prompt and response to file during test runs for visibility."""
         if os.getenv("ENVIRONMENT") == "test":
@@ -53,21 +419,27 @@ class OpenRouterService:
             print(f"📋 Prompt type: {prompt_type}")
             print(f"📋 Response length: {len(response)} chars")
 
-    async def select_scenes(self, transcription: TranscriptionResult, target_scenes: int = 15, song_metadata: Dict[str, Any] = None, song_duration: float = None) -> SceneSelectionResult:
+    def _build_scene_selection_payload(self, transcription: TranscriptionResult, target_scenes: int, song_metadata: Dict[str, Any] = None, song_duration: float = None, audio_features: Optional[AudioFeatures] = None) -> Tuple[Dict[str, Any], Optional[EncodedTranscript]]:
         """
-        Select scenes from transcription using AI analysis.
+        Build the chat completion request used for scene selection.
 
         Args:
             transcription: The audio transcription with segments
             target_scenes: Number of scenes to select (10-20 range)
             song_metadata: Optional metadata about the song (title, artist, genre)
+            song_duration: Song length in seconds (derived from the audio features
+                or the last segment if omitted)
+            audio_features: Precomputed tempo, sections and energy for the song
 
         Returns:
-            SceneSelectionResult with selected scenes
+            (chat completion request body, compact transcript encoding or None)
         """
         if not transcription.segments:
             raise ValueError("Transcription must contain segments for scene selection")
 
+        if song_duration is None and audio_features is not None:
+            song_duration = audio_features.duration
+
         # Calculate song duration from transcription if not provided
         if song_duration is None:
             # Find the last segment's end time
@@ -82,13 +454,24 @@ class OpenRouterService:
             target_scenes = 18  # Use 18 as default when AI chooses
 
         # Build segments text for AI analysis
-        segments_text = []
-        for i, segment in enumerate(transcription.segments):
-            if isinstance(segment, dict) and 'text' in segment and 'start' in segment and 'end' in segment:
-                segments_text.append(f"Segment {i}: {segment['start']:.1f}s-{segment['end']:.1f}s: {segment['text']}")
-            else:
-                # Fallback for different segment formats
-                segments_text.append(f"Segment {i}: {segment}")
+        encoded = None
+        if settings.compact_transcript_encoding:
+            encoded = encode_transcript(
+                transcription.segments,
+                song_duration=song_duration,
+                merge_min_seconds=settings.transcript_merge_min_seconds,
+                merge_max_seconds=settings.transcript_merge_max_seconds
+            )
+            print(f"📉 Compact transcript: {encoded.stats}")
+            transcript_block = f"""TRANSCRIPT (compact encoding):
+Units run back to back from 0.0s: each "u<number> <duration>" line starts where the previous unit ended, and "@<time>s" lines give the absolute start of the next unit. "=L<k>" means the lyrics of line L<k> from REPEATED LINES.
+In "source_segments", list the u-numbers each scene covers (e.g. [3, 4]).
+
+{encoded.text}"""
+        else:
+            segments_text = render_segments_verbose(transcription.segments)
+            transcript_block = f"""TRANSCRIPT SEGMENTS:
+{chr(10).join(segments_text)}"""
 
         song_info = ""
         if song_metadata:
@@ -99,13 +482,14 @@ SONG INFORMATION:
 - Genre: {song_metadata.get('genre', 'Unknown')}
 """
 
+        audio_info = f"\n{audio_features.prompt_block()}\n" if audio_features is not None else ""
+
         prompt = f"""You are an expert music video director analyzing song lyrics to select the most cinematic scenes.
 {song_info}
-TRANSCRIPT SEGMENTS:
-{chr(10).join(segments_text)}
+{transcript_block}
 
 SONG DURATION: {song_duration:.1f} seconds
-
+{audio_info}
 TASK: Select between 15-20 scenes from these lyrics that would make the most compelling music video. Use your discretion to choose the optimal number of scenes based on the song content. Each scene should be 5-10 seconds long.
 
 CRITICAL COVERAGE REQUIREMENT: The song is {song_duration:.1f} seconds long. Your scenes MUST cover from 0 seconds to {song_duration:.1f} seconds with NO GAPS. When one scene's end_time finishes, the next scene's start_time should begin immediately. The scenes must cover the entire song from start to finish without skipping any content. DO NOT stop at 60 seconds - you must cover the FULL {song_duration:.1f} second duration.
@@ -145,80 +529,109 @@ OUTPUT FORMAT (valid JSON only):
 
 Respond with only valid JSON."""
 
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.7,
+            "max_tokens": 4000
+        }
+        return payload, encoded
+
+    @staticmethod
+    def _fill_truncated_scene_selection(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Complete the summary fields of a scene selection cut off after its scenes."""
+        scenes = [scene for scene in data.get('selected_scenes', []) if isinstance(scene, dict)]
+        durations = [scene['duration'] for scene in scenes if isinstance(scene.get('duration'), (int, float))]
+        data.setdefault('song_themes', [])
+        data.setdefault('energy_arc', "")
+        data['total_scenes_selected'] = len(scenes)
+        data.setdefault('average_scene_length', round(sum(durations) / len(durations), 2) if durations else 0.0)
+        data.setdefault('reasoning_summary', "(response truncated; summary unavailable)")
+        data['selected_scenes'] = scenes
+        return data
+
+    def _parse_scene_selection(self, content: str) -> SceneSelectionResult:
+        """Parse a scene selection completion into a SceneSelectionResult."""
         try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "model": self.model,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 4000
+            return parse_llm_json(content, SceneSelectionResult, fill_defaults=self._fill_truncated_scene_selection)
+        except ValidationError as e:
+            raise Exception(f"Invalid scene selection format: {e}")
+
+    async def select_scenes(self, transcription: TranscriptionResult, target_scenes: int = 15, song_metadata: Dict[str, Any] = None, song_duration: float = None, bypass_cache: bool = False, audio_features: Optional[AudioFeatures] = None) -> SceneSelectionResult:
+        """
+        Select scenes from transcription using AI analysis.
+
+        Args:
+            transcription: The audio transcription with segments
+            target_scenes: Number of scenes to select (10-20 range)
+            song_metadata: Optional metadata about the song (title, artist, genre)
+            bypass_cache: Skip the response cache and force a fresh completion
+            audio_features: Precomputed audio analysis; scene cuts are snapped to
+                its beats and energy levels are measured rather than guessed
+
+        Returns:
+            SceneSelectionResult with selected scenes
+        """
+        payload, encoded = self._build_scene_selection_payload(transcription, target_scenes, song_metadata, song_duration, audio_features)
+
+        async def _generate() -> SceneSelectionResult:
+            data = await self._post_chat_completion(payload, stage="scene_selection")
+
+            content = data['choices'][0]['message']['content']
+            print(f"📋 AI Content Response: {content}")
+
+            # Log to file if in test environment
+            await self._log_to_file_if_test(
+                prompt_type="scene_selection",
+                prompt=payload["messages"][0]["content"],
+                response=content,
+                metadata={
+                    "target_scenes": target_scenes,
+                    "song_metadata": song_metadata,
+                    "segment_count": len(transcription.segments)
                 }
+            )
 
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"OpenRouter API error {response.status}: {error_text}")
-
-                    data = await response.json()
-
-                    # Debug logging
-                    print(f"📋 OpenRouter Response Status: {response.status}")
-                    print(f"📋 Raw Response: {data}")
-
-                    if 'choices' not in data or not data['choices']:
-                        raise Exception("No response choices from OpenRouter API")
-
-                    content = data['choices'][0]['message']['content']
-                    print(f"📋 AI Content Response: {content}")
-
-                    # Log to file if in test environment
-                    await self._log_to_file_if_test(
-                        prompt_type="scene_selection",
-                        prompt=prompt,
-                        response=content,
-                        metadata={
-                            "target_scenes": target_scenes,
-                            "song_metadata": song_metadata,
-                            "segment_count": len(transcription.segments)
-                        }
-                    )
-
-                    # Strip markdown code blocks if present
-                    if content.startswith('```json'):
-                        content = content[7:]  # Remove ```json
-                    if content.startswith('```'):
-                        content = content[3:]   # Remove ```
-                    if content.endswith('```'):
-                        content = content[:-3]  # Remove trailing ```
-                    content = content.strip()
-
-                    # Parse JSON response
-                    try:
-                        result_json = json.loads(content)
-                        return SceneSelectionResult(**result_json)
-                    except json.JSONDecodeError as e:
-                        raise Exception(f"Invalid JSON response from AI: {content} | Error: {e}")
-                    except ValidationError as e:
-                        raise Exception(f"Invalid scene selection format: {e}")
+            result = self._parse_scene_selection(content)
+            # Unit numbers back to original segment indices and timestamps
+            if encoded:
+                result = encoded.remap_result(result)
+            return audio_features.align_result(result) if audio_features else result
 
-        except aiohttp.ClientError as e:
-            raise Exception(f"Network error calling OpenRouter: {e}")
+        return await self._cached_completion(payload, _generate, SceneSelectionResult, bypass_cache)
 
-    async def generate_visual_prompts(self, scene_selection: SceneSelectionResult) -> PromptGenerationResult:
+    def select_scenes_stream(self, transcription: TranscriptionResult, target_scenes: int = 15, song_metadata: Dict[str, Any] = None, song_duration: float = None, bypass_cache: bool = False, audio_features: Optional[AudioFeatures] = None) -> "SceneSelectionStream":
+        """
+        Select scenes with a streamed completion, yielding each scene as soon as it is complete.
+
+        Uses the same prompt and cache entry as select_scenes(), so a cached
+        selection replays instantly and a streamed one is reused by later calls.
+
+        Args:
+            transcription: The audio transcription with segments
+            target_scenes: Number of scenes to select (10-20 range)
+            song_metadata: Optional metadata about the song (title, artist, genre)
+            bypass_cache: Skip the response cache and force a fresh completion
+            audio_features: Precomputed audio analysis (see select_scenes)
+
+        Returns:
+            SceneSelectionStream; iterate it with `async for`, then read `.result`
+        """
+        payload, encoded = self._build_scene_selection_payload(transcription, target_scenes, song_metadata, song_duration, audio_features)
+        return SceneSelectionStream(self, payload, bypass_cache, encoded, audio_features)
+
+    async def generate_visual_prompts(self, scene_selection: SceneSelectionResult, bypass_cache: bool = False) -> PromptGenerationResult:
         """
         Generate visual prompts for selected scenes.
 
         Args:
             scene_selection: The selected scenes from AI analysis
+            bypass_cache: Skip the response cache and force a fresh completion
 
         Returns:
             PromptGenerationResult with visual prompts
@@ -274,77 +687,51 @@ OUTPUT FORMAT (valid JSON only):
 
 Respond with only valid JSON."""
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "model": self.model,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    "temperature": 0.8,
-                    "max_tokens": 4000
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
                 }
+            ],
+            "temperature": 0.8,
+            "max_tokens": 4000
+        }
 
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"OpenRouter API error {response.status}: {error_text}")
-
-                    data = await response.json()
-
-                    if 'choices' not in data or not data['choices']:
-                        raise Exception("No response choices from OpenRouter API")
-
-                    content = data['choices'][0]['message']['content']
-                    print(f"📋 Visual Prompts AI Response: {content}")
-
-                    # Strip markdown code blocks if present
-                    if content.startswith('```json'):
-                        content = content[7:]  # Remove ```json
-                    if content.startswith('```'):
-                        content = content[3:]   # Remove ```
-                    if content.endswith('```'):
-                        content = content[:-3]  # Remove trailing ```
-                    content = content.strip()
-
-                    # Parse JSON response
-                    try:
-                        result_json = json.loads(content)
-                        result = PromptGenerationResult(**result_json)
-
-                        # Debug: Show all complete prompts
-                        print(f"\n🎬 ALL {len(result.visual_prompts)} VISUAL PROMPTS:")
-                        for i, prompt in enumerate(result.visual_prompts):
-                            print(f"\n--- SCENE {prompt.scene_id} ---")
-                            print(f"Image Prompt: {prompt.image_prompt}")
-                            print(f"Setting: {prompt.setting}")
-                            print(f"Shot Type: {prompt.shot_type}")
-                            print(f"Mood: {prompt.mood}")
-                            print(f"Color Palette: {prompt.color_palette}")
-
-                        return result
-                    except json.JSONDecodeError as e:
-                        raise Exception(f"Invalid JSON response from AI: {e}")
-                    except ValidationError as e:
-                        raise Exception(f"Invalid prompt generation format: {e}")
+        async def _generate() -> PromptGenerationResult:
+            data = await self._post_chat_completion(payload, stage="visual_prompt")
 
-        except aiohttp.ClientError as e:
-            raise Exception(f"Network error calling OpenRouter: {e}")
+            content = data['choices'][0]['message']['content']
+            print(f"📋 Visual Prompts AI Response: {content}")
+
+            try:
+                result = parse_llm_json(content, PromptGenerationResult)
+
+                # Debug: Show all complete prompts
+                print(f"\n🎬 ALL {len(result.visual_prompts)} VISUAL PROMPTS:")
+                for i, prompt in enumerate(result.visual_prompts):
+                    print(f"\n--- SCENE {prompt.scene_id} ---")
+                    print(f"Image Prompt: {prompt.image_prompt}")
+                    print(f"Setting: {prompt.setting}")
+                    print(f"Shot Type: {prompt.shot_type}")
+                    print(f"Mood: {prompt.mood}")
+                    print(f"Color Palette: {prompt.color_palette}")
+
+                return result
+            except ValidationError as e:
+                raise Exception(f"Invalid prompt generation format: {e}")
 
-    async def generate_individual_visual_prompt(self, scene: 'SceneSelection', song_metadata: Dict[str, Any] = None) -> 'VisualPrompt':
+        return await self._cached_completion(payload, _generate, PromptGenerationResult, bypass_cache)
+
+    async def generate_individual_visual_prompt(self, scene: 'SceneSelection', song_metadata: Dict[str, Any] = None, bypass_cache: bool = False) -> 'VisualPrompt':
         """
         Generate a visual prompt for a single scene with focused attention and scene-specific details.
 
         Args:
             scene: Individual scene to generate prompt for
             song_metadata: Optional metadata about the song
+            bypass_cache: Skip the response cache and force a fresh completion
 
         Returns:
             VisualPrompt with detailed scene-specific generation instructions
@@ -398,89 +785,45 @@ Focus on translating the raw emotion and specific imagery from the lyrics into a
 
 Respond with only valid JSON."""
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "model": self.model,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    "temperature": 0.8,
-                    "max_tokens": 1000
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
                 }
+            ],
+            "temperature": 0.8,
+            "max_tokens": 1000
+        }
 
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"OpenRouter API error {response.status}: {error_text}")
-
-                    data = await response.json()
-
-                    if 'choices' not in data or not data['choices']:
-                        raise Exception("No response choices from OpenRouter API")
-
-                    content = data['choices'][0]['message']['content']
-                    print(f"📋 Individual Scene {scene.scene_id} Response: {content}")
-
-                    # Log to file if in test environment
-                    await self._log_to_file_if_test(
-                        prompt_type="individual_visual_prompt",
-                        prompt=prompt,
-                        response=content,
-                        metadata={
-                            "scene_id": scene.scene_id,
-                            "scene_title": scene.title,
-                            "song_metadata": song_metadata
-                        }
-                    )
-
-                    # Strip markdown code blocks if present
-                    if content.startswith('```json'):
-                        content = content[7:]  # Remove ```json
-                    if content.startswith('```'):
-                        content = content[3:]   # Remove ```
-                    if content.endswith('```'):
-                        content = content[:-3]  # Remove trailing ```
-                    content = content.strip()
-
-                    # Parse JSON response
-                    try:
-                        result_json = json.loads(content)
-                        return VisualPrompt(**result_json)
-                    except json.JSONDecodeError as e:
-                        raise Exception(f"Invalid JSON response from AI: {content} | Error: {e}")
-                    except ValidationError as e:
-                        raise Exception(f"Invalid visual prompt format: {e}")
+        async def _generate() -> VisualPrompt:
+            data = await self._post_chat_completion(payload, stage="visual_prompt")
 
-        except aiohttp.ClientError as e:
-            raise Exception(f"Network error calling OpenRouter: {e}")
+            content = data['choices'][0]['message']['content']
+            print(f"📋 Individual Scene {scene.scene_id} Response: {content}")
 
-    async def generate_individual_visual_prompt_with_artist(
-        self,
-        scene: 'SceneSelection',
-        artist_reference_images: Dict[str, str],  # {artist_id: image_url}
-        song_metadata: Dict[str, Any] = None
-    ) -> 'VisualPrompt':
-        """
-        Generate a visual prompt for a single scene with artist reference images.
+            # Log to file if in test environment
+            await self._log_to_file_if_test(
+                prompt_type="individual_visual_prompt",
+                prompt=prompt,
+                response=content,
+                metadata={
+                    "scene_id": scene.scene_id,
+                    "scene_title": scene.title,
+                    "song_metadata": song_metadata
+                }
+            )
 
-        Args:
-            scene: Individual scene to generate prompt for
-            artist_reference_images: Dictionary mapping artist IDs to reference image URLs
-            song_metadata: Optional metadata about the song
+            try:
+                return parse_llm_json(content, VisualPrompt)
+            except ValidationError as e:
+                raise Exception(f"Invalid visual prompt format: {e}")
 
-        Returns:
-            VisualPrompt with detailed scene-specific generation instructions including artist references
-        """
-        from app.models_pydantic import VisualPrompt
+        return await self._cached_completion(payload, _generate, VisualPrompt, bypass_cache)
 
+    def _artist_prompt_context(self, artist_reference_images: Dict[str, str], song_metadata: Dict[str, Any] = None) -> str:
+        """Build the song and artist-reference sections shared by the artist-aware prompts."""
         song_info = ""
         if song_metadata:
             song_info = f"""
@@ -503,9 +846,34 @@ ARTIST REFERENCES:
 IMPORTANT: Use the reference image(s) to ensure the generated person matches the actual artist's appearance, clothing style, and distinctive features. Do not create a generic person - reference the specific artist shown in the image.
 """
 
+        return f"{song_info}{artist_context}"
+
+    async def generate_individual_visual_prompt_with_artist(
+        self,
+        scene: 'SceneSelection',
+        artist_reference_images: Dict[str, str],  # {artist_id: image_url}
+        song_metadata: Dict[str, Any] = None,
+        bypass_cache: bool = False
+    ) -> 'VisualPrompt':
+        """
+        Generate a visual prompt for a single scene with artist reference images.
+
+        Args:
+            scene: Individual scene to generate prompt for
+            artist_reference_images: Dictionary mapping artist IDs to reference image URLs
+            song_metadata: Optional metadata about the song
+            bypass_cache: Skip the response cache and force a fresh completion
+
+        Returns:
+            VisualPrompt with detailed scene-specific generation instructions including artist references
+        """
+        from app.models_pydantic import VisualPrompt
+
+        context = self._artist_prompt_context(artist_reference_images, song_metadata)
+
         prompt = f"""You are an expert cinematographer creating a specific visual prompt for a music video scene.
 
-{song_info}{artist_context}
+{context}
 SCENE TO VISUALIZE:
 - Scene ID: {scene.scene_id}
 - Title: "{scene.title}"
@@ -542,122 +910,221 @@ Focus on translating the raw emotion and specific imagery from the lyrics into a
 
 Respond with only valid JSON."""
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "model": self.model,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    "temperature": 0.8,
-                    "max_tokens": 1000
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
                 }
+            ],
+            "temperature": 0.8,
+            "max_tokens": 1000
+        }
 
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"OpenRouter API error {response.status}: {error_text}")
-
-                    data = await response.json()
-
-                    if 'choices' not in data or not data['choices']:
-                        raise Exception("No response choices from OpenRouter API")
-
-                    content = data['choices'][0]['message']['content']
-                    print(f"📋 Artist-Enhanced Scene {scene.scene_id} Response: {content}")
-
-                    # Log to file if in test environment
-                    await self._log_to_file_if_test(
-                        prompt_type="artist_enhanced_visual_prompt",
-                        prompt=prompt,
-                        response=content,
-                        metadata={
-                            "scene_id": scene.scene_id,
-                            "scene_title": scene.title,
-                            "artist_reference_images": artist_reference_images,
-                            "song_metadata": song_metadata
-                        }
-                    )
-
-                    # Strip markdown code blocks if present
-                    if content.startswith('```json'):
-                        content = content[7:]  # Remove ```json
-                    if content.startswith('```'):
-                        content = content[3:]   # Remove ```
-                    if content.endswith('```'):
-                        content = content[:-3]  # Remove trailing ```
-                    content = content.strip()
-
-                    # Parse JSON response
-                    try:
-                        result_json = json.loads(content)
-                        return VisualPrompt(**result_json)
-                    except json.JSONDecodeError as e:
-                        raise Exception(f"Invalid JSON response from AI: {content} | Error: {e}")
-                    except ValidationError as e:
-                        raise Exception(f"Invalid visual prompt format: {e}")
+        async def _generate() -> VisualPrompt:
+            data = await self._post_chat_completion(payload, stage="visual_prompt", scene_count=1)
 
-        except aiohttp.ClientError as e:
-            raise Exception(f"Network error calling OpenRouter: {e}")
+            content = data['choices'][0]['message']['content']
+            print(f"📋 Artist-Enhanced Scene {scene.scene_id} Response: {content}")
+
+            # Log to file if in test environment
+            await self._log_to_file_if_test(
+                prompt_type="artist_enhanced_visual_prompt",
+                prompt=prompt,
+                response=content,
+                metadata={
+                    "scene_id": scene.scene_id,
+                    "scene_title": scene.title,
+                    "artist_reference_images": artist_reference_images,
+                    "song_metadata": song_metadata
+                }
+            )
+
+            try:
+                return parse_llm_json(content, VisualPrompt)
+            except ValidationError as e:
+                raise Exception(f"Invalid visual prompt format: {e}")
+
+        return await self._cached_completion(payload, _generate, VisualPrompt, bypass_cache)
+
+    async def generate_visual_prompt_chunk_with_artist(
+        self,
+        scenes: List['SceneSelection'],
+        artist_reference_images: Dict[str, str],
+        song_metadata: Dict[str, Any] = None,
+        bypass_cache: bool = False
+    ) -> List['VisualPrompt']:
+        """
+        Generate visual prompts for several scenes in one request.
+
+        A single scene uses generate_individual_visual_prompt_with_artist. Scenes
+        the model leaves out of a chunked response are generated individually.
+
+        Args:
+            scenes: Scenes to generate prompts for (typically a chunk sized by prompt_batcher)
+            artist_reference_images: Dictionary mapping artist IDs to reference image URLs
+            song_metadata: Optional metadata about the song
+            bypass_cache: Skip the response cache and force a fresh completion
 
-    async def _make_openrouter_request(self, system_prompt: str, user_prompt: str, model: str = None) -> str:
+        Returns:
+            VisualPrompts in the same order as scenes
+        """
+        from app.models_pydantic import VisualPrompt
+
+        if not scenes:
+            return []
+        if len(scenes) == 1:
+            return [await self.generate_individual_visual_prompt_with_artist(scenes[0], artist_reference_images, song_metadata, bypass_cache=bypass_cache)]
+
+        context = self._artist_prompt_context(artist_reference_images, song_metadata)
+
+        scenes_text = []
+        for scene in scenes:
+            scenes_text.append(f"""- Scene ID: {scene.scene_id}
+  Title: "{scene.title}"
+  Lyrics: "{scene.lyrics_excerpt}"
+  Theme: {scene.theme}
+  Duration: {scene.duration} seconds
+  Energy Level: {scene.energy_level}/10
+  Visual Potential: {scene.visual_potential}/10""")
+
+        prompt = f"""You are an expert cinematographer creating specific visual prompts for consecutive music video scenes.
+
+{context}
+SCENES TO VISUALIZE ({len(scenes)}):
+{chr(10).join(scenes_text)}
+
+TASK: For EACH scene, create a highly specific, lyric-focused image generation prompt that captures the exact imagery and emotion from its lyrics, featuring the specific artist(s) shown in the reference image(s). Keep the look consistent across these scenes.
+
+REQUIREMENTS:
+- Interpret each scene's SPECIFIC lyrics literally and emotionally
+- Feature the actual artist as shown in reference image (not a generic person)
+- Create vivid, cinema-quality imagery that matches the words
+- Include professional photography/cinematography techniques
+- Specify exact lighting, composition, and mood
+- Make each one feel like a professional music video frame
+- Include image generation parameters (aspect ratio, style, quality)
+
+OUTPUT FORMAT (valid JSON only, one entry per scene, same order as above):
+{{
+  "visual_prompts": [
+    {{
+      "scene_id": {scenes[0].scene_id},
+      "image_prompt": "Ultra-detailed, lyric-specific prompt featuring the artist as shown in reference image, including specific lighting, composition, camera angle, mood, and visual elements that directly interpret the lyrics",
+      "style_notes": "Specific cinematographic style and aesthetic guidance with artist consistency",
+      "negative_prompt": "Specific things to avoid including generic rapper, different person, unrecognizable face",
+      "setting": "Exact location/environment described in lyrics",
+      "shot_type": "Professional camera shot type and angle",
+      "mood": "Specific emotional atmosphere from lyrics",
+      "color_palette": "Detailed color scheme that enhances the lyrical content"
+    }}
+  ]
+}}
+
+Respond with only valid JSON."""
+
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.8,
+            # Same per-scene budget as the individual prompt, capped by the model's output limit
+            "max_tokens": min(1000 * len(scenes), settings.llm_max_output_tokens)
+        }
+
+        async def _generate() -> PromptGenerationResult:
+            data = await self._post_chat_completion(payload, stage="visual_prompt", scene_count=len(scenes))
+
+            content = data['choices'][0]['message']['content']
+            print(f"📋 Artist-Enhanced Chunk {[scene.scene_id for scene in scenes]} Response: {content}")
+
+            await self._log_to_file_if_test(
+                prompt_type="artist_enhanced_visual_prompt_chunk",
+                prompt=prompt,
+                response=content,
+                metadata={
+                    "scene_ids": [scene.scene_id for scene in scenes],
+                    "artist_reference_images": artist_reference_images,
+                    "song_metadata": song_metadata
+                }
+            )
+
+            # A truncated response still yields the prompts that completed; the rest fall back below
+            result_json = parse_llm_json(content)
+            items = result_json.get('visual_prompts', []) if isinstance(result_json, dict) else result_json
+            visual_prompts = []
+            for item in items if isinstance(items, list) else []:
+                try:
+                    visual_prompts.append(VisualPrompt(**item))
+                except (TypeError, ValidationError) as e:
+                    print(f"⚠️ Dropping malformed prompt in chunk response: {e}")
+
+            return PromptGenerationResult(
+                total_prompts=len(visual_prompts),
+                visual_prompts=visual_prompts,
+                style_consistency="",
+                generation_notes=f"chunk of {len(scenes)} scenes"
+            )
+
+        result = await self._cached_completion(payload, _generate, PromptGenerationResult, bypass_cache)
+
+        prompts_by_scene = {prompt.scene_id: prompt for prompt in result.visual_prompts}
+        missing = [scene for scene in scenes if scene.scene_id not in prompts_by_scene]
+        if missing:
+            print(f"⚠️ Chunk response missing scenes {[scene.scene_id for scene in missing]}, generating individually")
+            fallbacks = await asyncio.gather(*[
+                self.generate_individual_visual_prompt_with_artist(scene, artist_reference_images, song_metadata, bypass_cache=bypass_cache)
+                for scene in missing
+            ])
+            for scene, prompt in zip(missing, fallbacks):
+                prompts_by_scene[scene.scene_id] = prompt
+
+        return [prompts_by_scene[scene.scene_id] for scene in scenes]
+
+    async def _make_openrouter_request(self, system_prompt: str, user_prompt: str, model: str = None, bypass_cache: bool = False, stage: str = None) -> str:
         """
         Make a basic OpenRouter API request for text completion.
 
         Args:
             system_prompt: System instructions for the AI
             user_prompt: User prompt/question
-            model: Model to use (defaults to self.model)
+            model: Model to use (defaults to self.model; an explicit model disables routing)
+            bypass_cache: Skip the response cache and force a fresh completion
+            stage: Pipeline stage used for model routing (e.g. "motion_prompt")
 
         Returns:
             AI response content as string
         """
         model_to_use = model or self.model
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                payload = {
-                    "model": model_to_use,
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": system_prompt
-                        },
-                        {
-                            "role": "user",
-                            "content": user_prompt
-                        }
-                    ],
-                    "temperature": 0.7,
-                    "max_tokens": 1000
+        payload = {
+            "model": model_to_use,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": user_prompt
                 }
+            ],
+            "temperature": 0.7,
+            "max_tokens": 1000
+        }
 
-                async with session.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json=payload
-                ) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        raise Exception(f"OpenRouter API error {response.status}: {error_text}")
-
-                    data = await response.json()
+        async def _generate() -> str:
+            data = await self._post_chat_completion(payload, stage=None if model else stage)
 
-                    if 'choices' not in data or not data['choices']:
-                        raise Exception("No response choices from OpenRouter API")
+            content = data['choices'][0]['message']['content']
+            return content
 
-                    content = data['choices'][0]['message']['content']
-                    return content
-
-        except aiohttp.ClientError as e:
-            raise Exception(f"Network error calling OpenRouter: {e}")
+        return await self._cached_completion(payload, _generate, str, bypass_cache)
 
     async def generate_video_motion_prompt(
         self,
@@ -666,7 +1133,8 @@ Respond with only valid JSON."""
         image_url: str,
         song_title: str,
         genre: str,
-        artist_present: bool = False
+        artist_present: bool = False,
+        bypass_cache: bool = False
     ) -> str:
         """
         Generate a video motion prompt for ByteDance SeeDance using DeepSeek as video director.
@@ -678,6 +1146,7 @@ Respond with only valid JSON."""
             song_title: Title of the song
             genre: Music genre
             artist_present: Whether artist appears in this scene
+            bypass_cache: Skip the response cache and force a fresh completion
 
         Returns:
             Motion prompt optimized for ByteDance SeeDance-1-Lite
@@ -725,7 +1194,8 @@ Image URL: {image_url}"""
             response = await self._make_openrouter_request(
                 system_prompt=system_prompt,
                 user_prompt=user_prompt,
-                model=self.model
+                bypass_cache=bypass_cache,
+                stage="motion_prompt"
             )
 
             motion_prompt = response.strip()
@@ -751,3 +1221,94 @@ Image URL: {image_url}"""
         except Exception as e:
             print(f"❌ Video motion prompt generation failed: {e}")
             raise Exception(f"Video motion prompt generation failed: {e}")
+
+
+class SceneSelectionStream:
+    """
+    Async iterator over the scenes of a streamed scene selection.
+
+    Each SceneSelection is yielded as soon as its JSON object is complete in
+    the stream. Once iteration finishes, `result` holds the full validated
+    SceneSelectionResult, which is also written to the response cache.
+    Streamed scenes are provisional: the last scene's end is only fixed once
+    the stream ends, so callers should reconcile what they saved against
+    `result` (matching by scene_id).
+    """
+
+    def __init__(self, service: OpenRouterService, payload: Dict[str, Any], bypass_cache: bool = False, encoded: Optional[EncodedTranscript] = None, audio_features: Optional[AudioFeatures] = None):
+        self._service = service
+        self._payload = payload
+        self._bypass_cache = bypass_cache
+        self._encoded = encoded
+        self._audio_features = audio_features
+        # One delta can complete several scenes, so the parser's count can't tell which came first
+        self._first_remapped = False
+        self.result: Optional[SceneSelectionResult] = None
+
+    def __aiter__(self) -> AsyncIterator[SceneSelection]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[SceneSelection]:
+        service = self._service
+        cache = service.response_cache
+        key = service._cache_key(self._payload)
+
+        # A cached selection is replayed without touching the API
+        if cache is not None and not self._bypass_cache:
+            found, stored = await cache.get(key)
+            if found:
+                self.result = SceneSelectionResult(**stored)
+                for scene in self.result.selected_scenes:
+                    yield scene
+                return
+
+        parser = IncrementalArrayParser("selected_scenes")
+        streamed_ids = set()
+        async for delta in service._stream_chat_completion(self._payload, stage="scene_selection"):
+            for scene_json in parser.feed(delta):
+                try:
+                    scene = SceneSelection(**scene_json)
+                except ValidationError as e:
+                    raise Exception(f"Invalid scene selection format: {e}")
+                if self._encoded:
+                    # The last scene isn't known until the stream ends; its end is fixed up in `result`
+                    scene = self._encoded.remap_scene(scene, is_first=not self._first_remapped)
+                    self._first_remapped = True
+                if self._audio_features:
+                    scene = self._audio_features.align_scene(scene)
+                print(f"🎬 Streamed scene {scene.scene_id}: {scene.title}")
+                streamed_ids.add(scene.scene_id)
+                yield scene
+
+        content = parser.text
+        await service._log_to_file_if_test(
+            prompt_type="scene_selection_stream",
+            prompt=self._payload["messages"][0]["content"],
+            response=content,
+            metadata={"scenes_streamed": parser.objects_emitted}
+        )
+
+        self.result = service._parse_scene_selection(content)
+        if self._encoded:
+            self.result = self._encoded.remap_result(self.result)
+        if self._audio_features:
+            self.result = self._audio_features.align_result(self.result)
+
+        # Anything the incremental parser skipped (anywhere in the array) is still in the full result
+        for scene in self.result.selected_scenes:
+            if scene.scene_id not in streamed_ids:
+                yield scene
+
+        if cache is not None:
+            await cache.set(key, self.result.model_dump(mode="json"))
+
+
+# Global service instance - shared by routers and workers, created on first use
+openrouter_service = None
+
+def get_openrouter_service() -> OpenRouterService:
+    """Get or create the global OpenRouterService instance."""
+    global openrouter_service
+    if openrouter_service is None:
+        openrouter_service = OpenRouterService(api_key=settings.openrouter_api_key)
+    return openrouter_service
@@ -0,0 +1,178 @@
+"""
+Chunk-size planning for visual prompt generation.
+Chooses how many scenes to put in each LLM request from measured latency,
+output-token limits and current concurrency headroom.
+"""
+import logging
+import math
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from app.services.concurrency import AdaptiveConcurrencyLimiter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PROMPT_GENERATION_MODES = ("individual", "chunked", "auto")
+
+
+def split_into_chunks(items: List[T], chunk_size: int) -> List[List[T]]:
+    """Split items into the fewest chunks of at most chunk_size, with near-equal sizes."""
+    if not items:
+        return []
+    chunk_count = math.ceil(len(items) / max(1, chunk_size))
+    base, extra = divmod(len(items), chunk_count)
+    chunks, start = [], 0
+    for i in range(chunk_count):
+        size = base + (1 if i < extra else 0)
+        chunks.append(items[start:start + size])
+        start += size
+    return chunks
+
+
+class PromptBatchPlanner:
+    """
+    Picks K, the number of scenes per prompt-generation request.
+
+    Request latency is modelled as `overhead + per_scene * K`, fitted by least
+    squares over recent requests (priors are used until there is data). For N
+    scenes and H free concurrency slots, the makespan of a plan is
+    `ceil(ceil(N / K) / H) * latency(K)`; the K with the lowest makespan wins,
+    preferring fewer requests on ties. K is also capped so the expected output
+    (tokens per scene x K) fits the model's output-token limit.
+
+    With plenty of headroom this picks K=1 (one request per scene, fully
+    parallel); under load it batches scenes to amortise per-request overhead.
+    """
+
+    # Fraction of the output-token limit a chunk is planned to use
+    OUTPUT_TOKEN_SAFETY = 0.8
+
+    def __init__(
+        self,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        mode: str = "auto",
+        fixed_chunk_size: int = 4,
+        max_chunk_size: int = 8,
+        max_output_tokens: int = 8000,
+        prior_overhead_seconds: float = 2.0,
+        prior_seconds_per_scene: float = 6.0,
+        prior_tokens_per_scene: float = 600.0,
+        max_samples: int = 100
+    ):
+        if mode not in PROMPT_GENERATION_MODES:
+            raise ValueError(f"Unknown prompt generation mode '{mode}', expected one of {PROMPT_GENERATION_MODES}")
+
+        self.limiter = limiter
+        self.mode = mode
+        self.fixed_chunk_size = max(1, fixed_chunk_size)
+        self.max_chunk_size = max(1, max_chunk_size)
+        self.max_output_tokens = max_output_tokens
+        self.prior_overhead_seconds = prior_overhead_seconds
+        self.prior_seconds_per_scene = prior_seconds_per_scene
+
+        self._samples: Deque[Tuple[int, float]] = deque(maxlen=max_samples)
+        self._tokens_per_scene = prior_tokens_per_scene
+        self._last_plan: Dict[str, Any] = {}
+
+    def record(self, scene_count: int, seconds: float, completion_tokens: Optional[int] = None):
+        """
+        Record a completed prompt-generation request.
+
+        Args:
+            scene_count: Scenes covered by the request (K)
+            seconds: Request latency
+            completion_tokens: Output tokens reported by the API, if available
+        """
+        if scene_count < 1 or seconds <= 0:
+            return
+        self._samples.append((scene_count, seconds))
+        if completion_tokens:
+            # EWMA of output size so the token cap follows what the model actually writes
+            self._tokens_per_scene = 0.8 * self._tokens_per_scene + 0.2 * (completion_tokens / scene_count)
+
+    def latency_model(self) -> Tuple[float, float]:
+        """Return (overhead_seconds, seconds_per_scene) fitted from recent requests."""
+        if not self._samples:
+            return self.prior_overhead_seconds, self.prior_seconds_per_scene
+
+        ks = [k for k, _ in self._samples]
+        ys = [y for _, y in self._samples]
+        mean_k = sum(ks) / len(ks)
+        mean_y = sum(ys) / len(ys)
+        var_k = sum((k - mean_k) ** 2 for k in ks)
+
+        if var_k > 0:
+            per_scene = sum((k - mean_k) * (y - mean_y) for k, y in self._samples) / var_k
+            overhead = mean_y - per_scene * mean_k
+            if per_scene > 0 and overhead >= 0:
+                return overhead, per_scene
+
+        # Only one K observed (or a degenerate fit): keep the prior's shape, rescale to the data
+        prior_at_mean = self.prior_overhead_seconds + self.prior_seconds_per_scene * mean_k
+        scale = mean_y / prior_at_mean
+        return self.prior_overhead_seconds * scale, self.prior_seconds_per_scene * scale
+
+    def max_chunk_for_output_limit(self) -> int:
+        """Largest K whose expected output fits in the output-token limit."""
+        budget = self.max_output_tokens * self.OUTPUT_TOKEN_SAFETY
+        return max(1, int(budget // max(self._tokens_per_scene, 1.0)))
+
+    def headroom(self) -> int:
+        """Free concurrency slots right now (at least 1)."""
+        if self.limiter is None:
+            return self.max_chunk_size
+        stats = self.limiter.get_stats()
+        return max(1, stats["limit"] - stats["in_flight"] - stats["queue_depth"])
+
+    def chunk_size(self, scene_count: int) -> int:
+        """
+        Choose K for generating prompts for scene_count scenes.
+
+        Args:
+            scene_count: Number of scenes waiting for prompts
+
+        Returns:
+            Scenes per request (1 means one request per scene)
+        """
+        if self.mode == "individual" or scene_count <= 1:
+            return 1
+
+        k_max = min(self.max_chunk_size, self.max_chunk_for_output_limit(), scene_count)
+        if self.mode == "chunked":
+            return max(1, min(self.fixed_chunk_size, k_max))
+
+        overhead, per_scene = self.latency_model()
+        headroom = self.headroom()
+
+        best_k, best_key = 1, None
+        for k in range(1, k_max + 1):
+            requests = math.ceil(scene_count / k)
+            largest_chunk = math.ceil(scene_count / requests)
+            waves = math.ceil(requests / headroom)
+            makespan = waves * (overhead + per_scene * largest_chunk)
+            key = (round(makespan, 3), requests)
+            if best_key is None or key < best_key:
+                best_k, best_key = k, key
+
+        self._last_plan = {
+            "scene_count": scene_count,
+            "chunk_size": best_k,
+            "headroom": headroom,
+            "expected_makespan_seconds": best_key[0]
+        }
+        return best_k
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the fitted model and the most recent plan."""
+        overhead, per_scene = self.latency_model()
+        return {
+            "mode": self.mode,
+            "samples": len(self._samples),
+            "overhead_seconds": round(overhead, 3),
+            "seconds_per_scene": round(per_scene, 3),
+            "tokens_per_scene": round(self._tokens_per_scene, 1),
+            "max_chunk_for_output_limit": self.max_chunk_for_output_limit(),
+            "last_plan": self._last_plan
+        }
@@ -0,0 +1,413 @@
+"""
+Async Replicate predictions over the pooled HTTP session.
+
+A prediction is created with one request and then either polled with
+adaptive backoff or completed by a webhook, so an in-flight generation costs
+a pending coroutine rather than a thread blocked inside replicate.Client.run.
+Prediction IDs are recorded in the replicate_predictions table as soon as
+they exist, so long-running work can be tracked (and found again) outside
+the process that started it.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Optional
+
+import aiohttp
+
+from app.config import settings
+from app.services.concurrency import parse_retry_after
+from app.services.http_pool import PooledHTTPSession
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed", "canceled")
+
+
+class ReplicateAPIError(Exception):
+    """Non-2xx response from the Replicate API, with the status and Retry-After delay (if any)."""
+
+    def __init__(self, status: int, body: str, retry_after: Optional[float] = None):
+        super().__init__(f"Replicate API error {status}: {body}")
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+
+class ReplicatePredictionError(Exception):
+    """A prediction failed, was canceled, or didn't finish in time."""
+
+    def __init__(self, prediction: "Prediction", message: str):
+        super().__init__(f"Prediction {prediction.id} {message}")
+        self.prediction = prediction
+
+
+@dataclass
+class Prediction:
+    """The parts of a Replicate prediction the app uses."""
+    id: str
+    status: str
+    model: str = ""
+    output: Any = None
+    error: Optional[str] = None
+    metrics: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_api(cls, data: Dict[str, Any], model: str = "") -> "Prediction":
+        return cls(
+            id=data["id"],
+            status=data.get("status", "starting"),
+            model=model or data.get("model", ""),
+            output=data.get("output"),
+            error=data.get("error"),
+            metrics=data.get("metrics") or {}
+        )
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+
+def verify_webhook_signature(secret: str, webhook_id: str, timestamp: str, body: bytes, signature_header: str, tolerance_seconds: float = 300.0) -> bool:
+    """
+    Check a Replicate webhook signature.
+
+    Replicate signs "<webhook-id>.<webhook-timestamp>.<body>" with HMAC-SHA256
+    using the base64 key after the "whsec_" prefix; the webhook-signature
+    header holds one or more space-separated "v1,<base64 digest>" entries.
+    """
+    try:
+        if abs(time.time() - int(timestamp)) > tolerance_seconds:
+            return False
+        key = base64.b64decode(secret.split("_", 1)[1] if secret.startswith("whsec_") else secret)
+    except (ValueError, TypeError):
+        return False
+    signed = f"{webhook_id}.{timestamp}.".encode() + body
+    expected = base64.b64encode(hmac.new(key, signed, hashlib.sha256).digest()).decode()
+    return any(
+        hmac.compare_digest(expected, entry.split(",", 1)[1])
+        for entry in signature_header.split()
+        if "," in entry
+    )
+
+
+class AsyncReplicateClient:
+    """
+    Create and await Replicate predictions without holding a thread each.
+
+    Polling starts at poll_initial_seconds and backs off to poll_max_seconds;
+    once a model has completed a few predictions, the first poll waits for
+    most of its typical run time instead. With a webhook URL configured, a
+    webhook delivery (resolve_webhook) triggers an immediate poll and
+    otherwise polling only runs as a slow safety net.
+    """
+
+    API_BASE = "https://api.replicate.com/v1"
+
+    def __init__(
+        self,
+        api_token: str,
+        http_pool: PooledHTTPSession = None,
+        store=None,
+        webhook_url: Optional[str] = None,
+        poll_initial_seconds: float = 1.0,
+        poll_max_seconds: float = 10.0,
+        poll_multiplier: float = 1.5,
+        webhook_fallback_poll_seconds: float = 30.0,
+        timeout_seconds: float = 900.0,
+        max_create_attempts: int = 4
+    ):
+        """
+        Args:
+            api_token: Replicate API token
+            http_pool: Pooled session (a private one is created if omitted)
+            store: Object with save_replicate_prediction(row) (defaults to
+                supabase_service); errors are logged, never raised
+            webhook_url: Public URL of the /webhooks/replicate endpoint
+            poll_initial_seconds: First poll delay for a model with no history
+            poll_max_seconds: Longest delay between polls
+            poll_multiplier: Backoff factor between polls
+            webhook_fallback_poll_seconds: Poll interval while waiting on a webhook
+            timeout_seconds: Default wait before a prediction is canceled
+            max_create_attempts: Attempts at creating a prediction when throttled
+        """
+        self.api_token = api_token
+        self.http_pool = http_pool or PooledHTTPSession(
+            name="replicate",
+            limit=settings.replicate_pool_limit,
+            limit_per_host=settings.replicate_pool_limit,
+            read_timeout=60.0
+        )
+        self._store = store
+        self.webhook_url = webhook_url
+        self.poll_initial_seconds = poll_initial_seconds
+        self.poll_max_seconds = poll_max_seconds
+        self.poll_multiplier = poll_multiplier
+        self.webhook_fallback_poll_seconds = webhook_fallback_poll_seconds
+        self.timeout_seconds = timeout_seconds
+        self.max_create_attempts = max_create_attempts
+
+        # Prediction ID -> future resolved by a webhook delivery
+        self._webhook_waiters: Dict[str, asyncio.Future] = {}
+        # Smoothed run time per model, for timing the first poll
+        self._expected_seconds: Dict[str, float] = {}
+        self._stats = {
+            "created": 0, "polls": 0, "webhooks": 0, "succeeded": 0,
+            "failed": 0, "timeouts": 0, "throttled": 0, "store_errors": 0
+        }
+        self._in_flight = 0
+
+    @property
+    def store(self):
+        if self._store is None:
+            from app.services.supabase import supabase_service
+            self._store = supabase_service
+        return self._store
+
+    def _record(self, prediction: Prediction, tracking: Optional[Dict[str, Any]] = None):
+        """Persist a prediction's ID and status (best effort)."""
+        row = {"id": prediction.id, "model": prediction.model, "status": prediction.status}
+        if tracking is not None:
+            row["kind"] = tracking.get("kind")
+            row["project_id"] = tracking.get("project_id")
+            row["metadata"] = {k: v for k, v in tracking.items() if k not in ("kind", "project_id")}
+        if prediction.done:
+            row["output"] = prediction.output
+            row["error"] = prediction.error
+            row["completed_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        try:
+            self.store.save_replicate_prediction(row)
+        except Exception as e:
+            self._stats["store_errors"] += 1
+            logger.warning(f"Failed to record Replicate prediction {prediction.id}: {e}")
+
+    async def _request(self, method: str, path: str, json: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        session = await self.http_pool.get_session()
+        headers = {"Authorization": f"Bearer {self.api_token}"}
+        async with session.request(method, f"{self.API_BASE}{path}", json=json, headers=headers) as response:
+            if response.status >= 300:
+                raise ReplicateAPIError(
+                    response.status,
+                    (await response.text())[:500],
+                    parse_retry_after(response.headers.get("Retry-After"))
+                )
+            return await response.json()
+
+    async def create_prediction(
+        self,
+        model: str,
+        input: Dict[str, Any],
+        tracking: Optional[Dict[str, Any]] = None
+    ) -> Prediction:
+        """
+        Start a prediction.
+
+        Args:
+            model: "owner/name:version" or "owner/name" (latest version of an official model)
+            input: Model input
+            tracking: Stored with the prediction (kind, project_id, anything else)
+
+        Returns:
+            The new prediction (usually still starting)
+
+        Raises:
+            ReplicateAPIError: On a non-throttling error or after max_create_attempts
+        """
+        body: Dict[str, Any] = {"input": input}
+        if ":" in model:
+            path = "/predictions"
+            body["version"] = model.split(":", 1)[1]
+        else:
+            path = f"/models/{model}/predictions"
+        if self.webhook_url:
+            body["webhook"] = self.webhook_url
+            body["webhook_events_filter"] = ["completed"]
+
+        for attempt in range(1, self.max_create_attempts + 1):
+            try:
+                data = await self._request("POST", path, json=body)
+                break
+            except ReplicateAPIError as e:
+                if e.status != 429 or attempt == self.max_create_attempts:
+                    raise
+                self._stats["throttled"] += 1
+                await asyncio.sleep(e.retry_after if e.retry_after is not None else 2.0 ** attempt)
+
+        prediction = Prediction.from_api(data, model=model)
+        self._stats["created"] += 1
+        self._record(prediction, tracking or {})
+        return prediction
+
+    async def get_prediction(self, prediction_id: str, model: str = "") -> Prediction:
+        self._stats["polls"] += 1
+        return Prediction.from_api(await self._request("GET", f"/predictions/{prediction_id}"), model=model)
+
+    async def cancel_prediction(self, prediction_id: str):
+        """Best-effort cancel (e.g. after a timeout)."""
+        try:
+            await self._request("POST", f"/predictions/{prediction_id}/cancel")
+        except Exception as e:
+            logger.warning(f"Failed to cancel Replicate prediction {prediction_id}: {e}")
+
+    def resolve_webhook(self, payload: Dict[str, Any]) -> bool:
+        """
+        Wake the coroutine waiting on the prediction named in a webhook payload.
+
+        The payload is only a hint: the waiter re-fetches the prediction from
+        the API before trusting its status or output. Deliveries for
+        predictions this process isn't waiting on are ignored; the worker that
+        started them picks the result up on its next fallback poll.
+
+        Returns:
+            True if a waiter in this process was woken
+        """
+        self._stats["webhooks"] += 1
+        waiter = self._webhook_waiters.get(str(payload.get("id")))
+        if waiter is None or waiter.done():
+            return False
+        waiter.set_result(True)
+        return True
+
+    def _first_delay(self, model: str) -> float:
+        expected = self._expected_seconds.get(model)
+        if expected is None:
+            return self.poll_initial_seconds
+        # Most of a typical run, so a quick model isn't polled needlessly and a slow one isn't overshot
+        return min(max(self.poll_initial_seconds, expected * 0.8), self.timeout_seconds)
+
+    def _observe_duration(self, model: str, seconds: float):
+        previous = self._expected_seconds.get(model)
+        self._expected_seconds[model] = seconds if previous is None else 0.7 * previous + 0.3 * seconds
+
+    async def wait(self, prediction: Prediction, timeout: Optional[float] = None) -> Prediction:
+        """
+        Wait for a prediction to finish.
+
+        Raises:
+            ReplicatePredictionError: If it doesn't finish within the timeout
+                (it is canceled first)
+        """
+        if prediction.done:
+            return prediction
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + (timeout or self.timeout_seconds)
+        waiter = None
+        if self.webhook_url:
+            waiter = self._webhook_waiters.setdefault(prediction.id, loop.create_future())
+
+        delay = self._first_delay(prediction.model)
+        try:
+            while not prediction.done:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    await self.cancel_prediction(prediction.id)
+                    raise ReplicatePredictionError(prediction, f"timed out after {loop.time() - started:.0f}s ({prediction.status})")
+
+                if waiter is not None:
+                    await asyncio.wait({waiter}, timeout=min(max(delay, self.webhook_fallback_poll_seconds), remaining))
+                    if waiter.done():
+                        # Woken by a webhook: poll now, and wait on a fresh future for any later delivery
+                        waiter = self._webhook_waiters[prediction.id] = loop.create_future()
+                else:
+                    await asyncio.sleep(min(delay, remaining))
+
+                try:
+                    prediction = await self.get_prediction(prediction.id, model=prediction.model)
+                except (ReplicateAPIError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # A failed poll isn't a failed prediction; try again after the next delay
+                    logger.warning(f"Polling Replicate prediction {prediction.id} failed: {e}")
+                delay = self.poll_initial_seconds if delay > self.poll_max_seconds else min(delay * self.poll_multiplier, self.poll_max_seconds)
+        finally:
+            self._webhook_waiters.pop(prediction.id, None)
+
+        if prediction.status == "succeeded":
+            self._observe_duration(prediction.model, loop.time() - started)
+        return prediction
+
+    async def run(
+        self,
+        model: str,
+        input: Dict[str, Any],
+        tracking: Optional[Dict[str, Any]] = None,
+        on_created: Optional[Callable[[Prediction], Any]] = None,
+        timeout: Optional[float] = None
+    ) -> Prediction:
+        """
+        Create a prediction and wait for it to succeed.
+
+        Args:
+            model: "owner/name:version" or "owner/name"
+            input: Model input
+            tracking: Stored with the prediction record
+            on_created: Called with the new prediction before waiting (e.g. to
+                store its ID on a job)
+            timeout: Seconds before the prediction is canceled
+
+        Returns:
+            The succeeded prediction
+
+        Raises:
+            ReplicatePredictionError: If the prediction fails, is canceled or times out
+            ReplicateAPIError: If it can't be created
+        """
+        self._in_flight += 1
+        try:
+            prediction = await self.create_prediction(model, input, tracking=tracking)
+            if on_created is not None:
+                on_created(prediction)
+            try:
+                prediction = await self.wait(prediction, timeout)
+            except ReplicatePredictionError as e:
+                self._stats["failed"] += 1
+                self._record(replace(e.prediction, status="canceled", error=str(e)))
+                raise
+        finally:
+            self._in_flight -= 1
+
+        self._record(prediction)
+        if prediction.status != "succeeded":
+            self._stats["failed"] += 1
+            raise ReplicatePredictionError(prediction, f"{prediction.status}: {prediction.error or 'no error message'}")
+        self._stats["succeeded"] += 1
+        return prediction
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "in_flight": self._in_flight,
+            "webhook_waiters": len(self._webhook_waiters),
+            "expected_seconds": {model: round(seconds, 1) for model, seconds in self._expected_seconds.items()},
+            "pool": self.http_pool.get_stats()
+        }
+
+    async def close(self):
+        await self.http_pool.close()
+
+
+# Global client instance - shared by image and video generation, created on first use
+replicate_client = None
+
+def get_replicate_client() -> AsyncReplicateClient:
+    """Get or create the global AsyncReplicateClient instance."""
+    global replicate_client
+    if replicate_client is None:
+        webhook_url = settings.replicate_webhook_url
+        if webhook_url and not settings.replicate_webhook_secret:
+            # Unsigned deliveries are rejected, so waiting on them would only slow polling down
+            logger.warning("REPLICATE_WEBHOOK_URL is set without REPLICATE_WEBHOOK_SECRET; using polling only")
+            webhook_url = None
+        replicate_client = AsyncReplicateClient(
+            api_token=settings.replicate_api_token,
+            webhook_url=webhook_url,
+            poll_initial_seconds=settings.replicate_poll_initial_seconds,
+            poll_max_seconds=settings.replicate_poll_max_seconds,
+            timeout_seconds=settings.replicate_prediction_timeout
+        )
+    return replicate_client
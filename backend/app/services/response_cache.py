@@ -0,0 +1,264 @@
+"""
+Content-addressed response cache with an in-process LRU tier and a Redis tier.
+Identical in-flight requests are coalesced so only one upstream call is made.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Published to coalesced waiters when the computing caller is cancelled
+_LEADER_CANCELLED = object()
+
+
+class LRUCache:
+    """Bounded in-memory LRU map with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value); expired entries count as misses."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at and expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        ttl_seconds = ttl_seconds or self.ttl_seconds
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds else 0.0
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class ResponseCache:
+    """
+    Two-tier cache for expensive upstream responses.
+
+    Features:
+    - In-process LRU tier for hot entries
+    - Optional Redis tier shared across API and worker processes, with TTL and
+      a bounded index so the oldest entries are evicted past max_entries
+    - Single-flight: concurrent misses for one key share a single computation
+    - Explicit bypass to force a fresh result (which then refreshes the cache)
+
+    Values must be JSON-serializable; callers supply encode/decode to store
+    richer objects such as Pydantic models.
+    """
+
+    # How long to stop talking to Redis after a connection error
+    REDIS_RETRY_AFTER_SECONDS = 30.0
+
+    def __init__(
+        self,
+        namespace: str,
+        lru_size: int = 512,
+        ttl_seconds: int = 7 * 24 * 3600,
+        redis_url: Optional[str] = None,
+        redis_max_entries: int = 10000,
+        max_value_bytes: int = 256 * 1024
+    ):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.redis_url = redis_url
+        self.redis_max_entries = redis_max_entries
+        self.max_value_bytes = max_value_bytes
+
+        self._lru = LRUCache(max_entries=lru_size, ttl_seconds=ttl_seconds)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._redis = None
+        self._redis_loop = None
+        self._redis_disabled_until = 0.0
+
+        self._stats = {
+            "hits_memory": 0,
+            "hits_redis": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "redis_evictions": 0,
+            "redis_errors": 0,
+            "skipped_oversize": 0
+        }
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Build a stable content hash from JSON-serializable parts."""
+        canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _redis_key(self, key: str) -> str:
+        return f"omvee:cache:{self.namespace}:{key}"
+
+    def _redis_index_key(self) -> str:
+        return f"omvee:cache:{self.namespace}:__index__"
+
+    def _get_redis(self):
+        """Return a Redis client for the running loop, or None if the tier is unavailable."""
+        if not self.redis_url or time.monotonic() < self._redis_disabled_until:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._redis_loop is not loop:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(self.redis_url, socket_connect_timeout=1.0, socket_timeout=2.0)
+            self._redis_loop = loop
+        return self._redis
+
+    def _on_redis_error(self, error: Exception):
+        self._stats["redis_errors"] += 1
+        self._redis_disabled_until = time.monotonic() + self.REDIS_RETRY_AFTER_SECONDS
+        logger.warning(f"[cache:{self.namespace}] Redis tier unavailable, using memory only: {error}")
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up a key in memory, then Redis.
+
+        Returns:
+            (found, value) tuple with the JSON-decoded value
+        """
+        found, value = self._lru.get(key)
+        if found:
+            self._stats["hits_memory"] += 1
+            return True, value
+
+        client = self._get_redis()
+        if client is not None:
+            try:
+                raw = await client.get(self._redis_key(key))
+                if raw is not None:
+                    value = json.loads(raw)
+                    self._lru.set(key, value)
+                    self._stats["hits_redis"] += 1
+                    return True, value
+            except Exception as e:
+                self._on_redis_error(e)
+
+        return False, None
+
+    async def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
+        """Store a JSON-serializable value in both tiers (ttl_seconds overrides the namespace TTL)."""
+        serialized = json.dumps(value, separators=(",", ":"))
+        if len(serialized) > self.max_value_bytes:
+            self._stats["skipped_oversize"] += 1
+            return
+
+        ttl_seconds = ttl_seconds or self.ttl_seconds
+        self._lru.set(key, value, ttl_seconds)
+        self._stats["stores"] += 1
+
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            index_key = self._redis_index_key()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.set(self._redis_key(key), serialized, ex=ttl_seconds)
+                pipe.zadd(index_key, {key: time.time()})
+                pipe.zcard(index_key)
+                results = await pipe.execute()
+
+            overflow = results[-1] - self.redis_max_entries
+            if overflow > 0:
+                evicted = await client.zpopmin(index_key, overflow)
+                if evicted:
+                    await client.delete(*[self._redis_key(member.decode() if isinstance(member, bytes) else member) for member, _ in evicted])
+                    self._stats["redis_evictions"] += len(evicted)
+        except Exception as e:
+            self._on_redis_error(e)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda value: value,
+        bypass: bool = False
+    ) -> Any:
+        """
+        Return the cached value for key, computing it at most once per miss.
+
+        Args:
+            key: Content hash from make_key()
+            compute: Coroutine factory producing the fresh value
+            encode: Converts the computed value to a JSON-serializable form
+            decode: Converts the stored form back to the caller's type
+            bypass: Skip lookup and coalescing, always compute (result is still stored)
+
+        Returns:
+            Cached or freshly computed value
+        """
+        if bypass:
+            self._stats["bypassed"] += 1
+            value = await compute()
+            await self.set(key, encode(value))
+            return value
+
+        while True:
+            found, stored = await self.get(key)
+            if found:
+                return decode(stored)
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            self._stats["coalesced"] += 1
+            result = await asyncio.shield(inflight)
+            if result is not _LEADER_CANCELLED:
+                return decode(result)
+            # The leader's caller went away (e.g. a client disconnect); retry, one waiter leads
+
+        self._stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+            encoded = encode(value)
+            future.set_result(encoded)
+            await self.set(key, encoded)
+            return value
+        except asyncio.CancelledError:
+            # Only the leader was cancelled; wake the waiters so they retry instead
+            if not future.done():
+                future.set_result(_LEADER_CANCELLED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so waiter-less failures don't log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and tier sizes."""
+        lookups = self._stats["hits_memory"] + self._stats["hits_redis"] + self._stats["misses"]
+        hits = self._stats["hits_memory"] + self._stats["hits_redis"]
+        return {
+            "namespace": self.namespace,
+            **self._stats,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._lru),
+            "inflight": len(self._inflight),
+            "redis_enabled": bool(self.redis_url) and time.monotonic() >= self._redis_disabled_until
+        }
@@ -0,0 +1,233 @@
+"""
+Retry, per-attempt deadline and hedging policy for outbound API calls.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import nullcontext
+from typing import Any, AsyncContextManager, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Timeouts and errors flagged `retryable` (429/5xx, network failures) are retried."""
+    return isinstance(error, asyncio.TimeoutError) or bool(getattr(error, "retryable", False))
+
+
+class LatencyWindow:
+    """Sliding window of recent successful call latencies."""
+
+    def __init__(self, max_samples: int = 200):
+        self._samples: Deque[float] = deque(maxlen=max_samples)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Return the given percentile (0-1), or None if the window is empty."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+class RetryPolicy:
+    """
+    Wraps a coroutine factory with retries, deadlines and hedged requests.
+
+    Features:
+    - Full-jitter exponential backoff on retryable errors, never shorter than
+      the upstream's Retry-After
+    - A deadline on every attempt, so one hung request cannot stall a batch
+    - Optional hedging: once an attempt runs past the p95 latency of its
+      class, a duplicate is launched and whichever succeeds first wins.
+      Hedges are capped at hedge_max_ratio of all calls.
+    - Counters for attempts, retries, timeouts and hedges
+
+    Usage:
+        result = await policy.run(lambda: post(payload), latency_key="prompt", gate=limiter.slot)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        attempt_timeout: float = 90.0,
+        hedging_enabled: bool = True,
+        hedge_percentile: float = 0.95,
+        hedge_min_samples: int = 20,
+        hedge_max_ratio: float = 0.1,
+        is_retryable: Callable[[BaseException], bool] = is_retryable_error,
+        hedge_guard: Optional[Callable[[], bool]] = None
+    ):
+        self.name = name
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.hedging_enabled = hedging_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_max_ratio = hedge_max_ratio
+        self.is_retryable = is_retryable
+        self.hedge_guard = hedge_guard  # Extra check before hedging, e.g. spare concurrency
+
+        self._windows: Dict[str, LatencyWindow] = {}
+        self._stats = {
+            "calls": 0,
+            "attempts": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "hedges_launched": 0,
+            "hedges_won": 0
+        }
+
+    def _window(self, key: str) -> LatencyWindow:
+        if key not in self._windows:
+            self._windows[key] = LatencyWindow()
+        return self._windows[key]
+
+    def _backoff_delay(self, attempt: int, error: BaseException) -> float:
+        """Full-jitter exponential delay before the next attempt."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after:
+            delay = max(delay, min(float(retry_after), self.max_delay))
+        return delay
+
+    def _hedge_delay(self, window: LatencyWindow) -> Optional[float]:
+        """Seconds after which to hedge, or None if hedging should not happen."""
+        if not self.hedging_enabled or len(window) < self.hedge_min_samples:
+            return None
+        if self._stats["hedges_launched"] >= self.hedge_max_ratio * self._stats["calls"]:
+            return None
+        threshold = window.percentile(self.hedge_percentile)
+        if threshold is None or threshold >= self.attempt_timeout:
+            return None
+        return threshold
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        latency_key: str = "default",
+        gate: Optional[Callable[[], AsyncContextManager]] = None
+    ) -> T:
+        """
+        Run call() under the policy.
+
+        Args:
+            call: Coroutine factory; invoked once per attempt (and per hedge)
+            latency_key: Requests with the same key share a latency window for hedging
+            gate: Optional context manager factory (e.g. a concurrency limiter slot)
+                entered before each attempt. Time spent waiting at the gate does
+                not count against the attempt deadline or the hedge timer.
+
+        Returns:
+            The first successful result
+        """
+        self._stats["calls"] += 1
+        window = self._window(latency_key)
+
+        for attempt in range(1, self.max_attempts + 1):
+            self._stats["attempts"] += 1
+            try:
+                return await self._run_attempt(call, window, gate)
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self._stats["timeouts"] += 1
+                if attempt == self.max_attempts or not self.is_retryable(e):
+                    self._stats["failures"] += 1
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise Exception(f"{self.name} request timed out after {self.attempt_timeout:.0f}s") from e
+                    raise
+
+                delay = self._backoff_delay(attempt, e)
+                self._stats["retries"] += 1
+                print(f"🔁 [{self.name}] Attempt {attempt} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _call_with_deadline(
+        self,
+        call: Callable[[], Awaitable[T]],
+        window: LatencyWindow,
+        gate: Optional[Callable[[], AsyncContextManager]],
+        started: Optional[asyncio.Event] = None
+    ) -> T:
+        """Pass the gate, then run call() within the attempt deadline and record its latency."""
+        async with (gate() if gate is not None else nullcontext()):
+            if started is not None:
+                started.set()
+            began = time.monotonic()
+            result = await asyncio.wait_for(call(), timeout=self.attempt_timeout)
+            window.add(time.monotonic() - began)
+            return result
+
+    async def _run_attempt(
+        self,
+        call: Callable[[], Awaitable[T]],
+        window: LatencyWindow,
+        gate: Optional[Callable[[], AsyncContextManager]]
+    ) -> T:
+        hedge_after = self._hedge_delay(window)
+        if hedge_after is None:
+            return await self._call_with_deadline(call, window, gate)
+
+        started = asyncio.Event()
+        primary = asyncio.ensure_future(self._call_with_deadline(call, window, gate, started))
+        pending = [primary]
+        last_error: Optional[BaseException] = None
+        try:
+            # The hedge timer runs from when the primary actually started, not from when it queued
+            started_waiter = asyncio.ensure_future(started.wait())
+            await asyncio.wait([primary, started_waiter], return_when=asyncio.FIRST_COMPLETED)
+            started_waiter.cancel()
+
+            done, _ = await asyncio.wait([primary], timeout=hedge_after)
+            if not done and (self.hedge_guard is None or self.hedge_guard()):
+                self._stats["hedges_launched"] += 1
+                pending.append(asyncio.ensure_future(self._call_with_deadline(call, window, gate)))
+
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.remove(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._stats["hedges_won"] += 1
+                        return task.result()
+                    last_error = task.exception()
+
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return retry/hedge counters and per-class latency percentiles."""
+        latency = {}
+        for key, window in self._windows.items():
+            p50 = window.percentile(0.5)
+            p95 = window.percentile(0.95)
+            latency[key] = {
+                "samples": len(window),
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None
+            }
+        return {
+            "name": self.name,
+            **self._stats,
+            "latency": latency
+        }
@@ -8,6 +8,36 @@ from supabase import Client
 from fastapi import UploadFile, HTTPException
 
 
+def open_rgb_image(image_content: bytes) -> Image.Image:
+    """Decode image bytes as RGB (handles RGBA, palette images, etc.)."""
+    image = Image.open(BytesIO(image_content))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+
+def encode_image(image: Image.Image, max_size: tuple = (1024, 1024), format: str = 'JPEG', quality: int = 85) -> bytes:
+    """
+    Encode an image no larger than max_size (aspect ratio kept, never upscaled).
+
+    Args:
+        image: RGB image (left unchanged)
+        max_size: Maximum dimensions (width, height)
+        format: Pillow format name (JPEG, WEBP, AVIF, ...)
+        quality: Encoder quality
+
+    Returns:
+        Encoded image bytes
+    """
+    if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
+        image = image.copy()
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+    output = BytesIO()
+    image.save(output, format=format, quality=quality, optimize=True)
+    return output.getvalue()
+
+
 class StorageService:
     """Service for handling file uploads to Supabase Storage."""
 
@@ -233,21 +263,7 @@ class StorageService:
             Processed image bytes
         """
         try:
-            # Open image
-            image = Image.open(BytesIO(image_content))
-
-            # Convert to RGB if necessary (handles RGBA, etc.)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-
-            # Resize if too large (maintain aspect ratio)
-            if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-                image.thumbnail(max_size, Image.Resampling.LANCZOS)
-
-            # Save to bytes
-            output = BytesIO()
-            image.save(output, format='JPEG', quality=85, optimize=True)
-            return output.getvalue()
+            return encode_image(open_rgb_image(image_content), max_size=max_size)
 
         except Exception:
             # If processing fails, return original content
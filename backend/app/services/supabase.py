@@ -171,6 +171,162 @@ class SupabaseService:
             logger.error(f"Error creating scene: {str(e)}")
             raise
 
+    def delete_project_scenes(self, project_id: UUID) -> int:
+        """Delete all scenes for a project. Returns the number of rows removed."""
+        try:
+            result = self.client.table('selected_scenes')\
+                .delete()\
+                .eq('project_id', str(project_id))\
+                .execute()
+            return len(result.data or [])
+        except Exception as e:
+            logger.error(f"Error deleting scenes for project {project_id}: {str(e)}")
+            raise
+
+    # Transcription cache operations
+    def get_cached_transcription(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Get a cached transcription by its content/model/language key (service key only)."""
+        try:
+            result = (self.admin_client or self.client).table('transcription_cache')\
+                .select('*')\
+                .eq('cache_key', cache_key)\
+                .execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error getting cached transcription {cache_key}: {str(e)}")
+            raise
+
+    def save_cached_transcription(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Insert or replace a cached transcription (service key only)."""
+        try:
+            result = (self.admin_client or self.client).table('transcription_cache')\
+                .upsert(row, on_conflict='cache_key')\
+                .execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error saving cached transcription {row.get('cache_key')}: {str(e)}")
+            raise
+
+    # Audio feature operations
+    def get_audio_features(self, content_sha256: str) -> Optional[Dict[str, Any]]:
+        """Get stored audio analysis features by audio content hash (service key only)."""
+        try:
+            result = (self.admin_client or self.client).table('audio_features')\
+                .select('*')\
+                .eq('content_sha256', content_sha256)\
+                .execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error getting audio features {content_sha256}: {str(e)}")
+            raise
+
+    def save_audio_features(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Insert or replace audio analysis features (service key only)."""
+        try:
+            result = (self.admin_client or self.client).table('audio_features')\
+                .upsert(row, on_conflict='content_sha256')\
+                .execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error saving audio features {row.get('content_sha256')}: {str(e)}")
+            raise
+
+    # Replicate prediction tracking
+    def save_replicate_prediction(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Insert or update a Replicate prediction record by its ID (service key only)."""
+        try:
+            result = (self.admin_client or self.client).table('replicate_predictions')\
+                .upsert(row, on_conflict='id')\
+                .execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error saving Replicate prediction {row.get('id')}: {str(e)}")
+            raise
+
+    def get_replicate_prediction(self, prediction_id: str) -> Optional[Dict[str, Any]]:
+        """Get a tracked Replicate prediction (service key only)."""
+        try:
+            result = (self.admin_client or self.client).table('replicate_predictions')\
+                .select('*')\
+                .eq('id', prediction_id)\
+                .execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error getting Replicate prediction {prediction_id}: {str(e)}")
+            raise
+
+    # Transcription segment operations
+    def get_transcription_segments(self, project_id: UUID) -> List[Dict[str, Any]]:
+        """Get a project's stored transcription segments in order."""
+        try:
+            result = self.client.table('transcription_segments')\
+                .select('segment_id, seq, start_s, end_s, text')\
+                .eq('project_id', str(project_id))\
+                .order('seq')\
+                .execute()
+            return result.data or []
+        except Exception as e:
+            logger.error(f"Error getting transcription segments for project {project_id}: {str(e)}")
+            raise
+
+    def patch_transcription_segments(
+        self,
+        project_id: UUID,
+        expected_version: int,
+        upserts: List[Dict[str, Any]],
+        deletes: List[int]
+    ) -> int:
+        """
+        Atomically bump the project's transcription_version (if it still equals
+        expected_version) and write only the changed segment rows.
+
+        Returns:
+            The new transcription_version
+        """
+        try:
+            result = self.client.rpc('patch_transcription_segments', {
+                'p_project_id': str(project_id),
+                'p_expected_version': expected_version,
+                'p_upserts': upserts,
+                'p_deletes': deletes
+            }).execute()
+            return result.data
+        except Exception as e:
+            logger.error(f"Error patching transcription segments for project {project_id}: {str(e)}")
+            raise
+
+    def replace_transcription(
+        self,
+        project_id: UUID,
+        expected_version: Optional[int],
+        transcription_data: Dict[str, Any],
+        transcript_text: str,
+        edited: bool = True
+    ) -> int:
+        """
+        Atomically bump the project's transcription_version (if it still equals
+        expected_version, when given), store a whole transcription and drop
+        any segment rows it supersedes.
+
+        Args:
+            edited: Whether this is a user edit (False for a fresh transcription)
+
+        Returns:
+            The new transcription_version
+        """
+        try:
+            result = self.client.rpc('replace_transcription', {
+                'p_project_id': str(project_id),
+                'p_expected_version': expected_version,
+                'p_transcription_data': transcription_data,
+                'p_transcript_text': transcript_text,
+                'p_edited': edited
+            }).execute()
+            return result.data
+        except Exception as e:
+            logger.error(f"Error replacing transcription for project {project_id}: {str(e)}")
+            raise
+
     # Image operations
     def get_project_images(self, project_id: UUID) -> List[Dict[str, Any]]:
         """Get all generated images for a project."""
@@ -194,6 +350,18 @@ class SupabaseService:
             logger.error(f"Error creating image: {str(e)}")
             raise
 
+    def update_image(self, image_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update a generated image record."""
+        try:
+            result = self.client.table('generated_images')\
+                .update(update_data)\
+                .eq('id', str(image_id))\
+                .execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error updating image {image_id}: {str(e)}")
+            raise
+
     # Video clip operations
     def get_project_clips(self, project_id: UUID) -> List[Dict[str, Any]]:
         """Get all video clips for a project."""
@@ -217,6 +385,18 @@ class SupabaseService:
             logger.error(f"Error creating video clip: {str(e)}")
             raise
 
+    def update_video_clip(self, clip_id: str, update_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update a video clip record."""
+        try:
+            result = self.client.table('video_clips')\
+                .update(update_data)\
+                .eq('id', str(clip_id))\
+                .execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            logger.error(f"Error updating video clip {clip_id}: {str(e)}")
+            raise
+
     # Job operations
     def get_project_jobs(self, project_id: UUID) -> List[Dict[str, Any]]:
         """Get all jobs for a project."""
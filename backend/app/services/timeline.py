@@ -0,0 +1,87 @@
+"""
+Per-project cache of TimelineIndex instances.
+
+An index is built once from the project's transcription and scenes and reused
+until either changes, so editor scrubbing and scene-boundary edits are binary
+searches instead of re-walks of the transcription JSON.
+"""
+import hashlib
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.response_cache import LRUCache
+from app.utils.timeline_index import TimelineIndex
+
+logger = logging.getLogger(__name__)
+
+
+class TimelineIndexCache:
+    """LRU of TimelineIndex by project, validated against a cheap fingerprint."""
+
+    def __init__(self, max_projects: int = 256):
+        self._lru = LRUCache(max_entries=max_projects)
+        self._stats = {"hits": 0, "builds": 0}
+
+    @staticmethod
+    def fingerprint(project: Dict[str, Any], scenes: List[Dict[str, Any]]) -> str:
+        """
+        Changes whenever the transcription or any scene boundary changes.
+
+        The transcription is represented by the project's updated_at (bumped by
+        a trigger on every write), transcription_version and segment count;
+        scenes are few, so their ids and times are hashed directly.
+        """
+        segments = (project.get('transcription_data') or {}).get('segments') or []
+        parts = [str(project.get('updated_at')), str(project.get('transcription_version')), str(len(segments))]
+        parts.extend(
+            f"{scene.get('id', scene.get('scene_id'))}:{scene.get('start_time')}:{scene.get('end_time')}"
+            for scene in scenes
+        )
+        return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+    def get(
+        self,
+        project_id: str,
+        project: Dict[str, Any],
+        scenes: List[Dict[str, Any]],
+        segments_loader: Optional[Callable[[], List[Dict[str, Any]]]] = None
+    ) -> TimelineIndex:
+        """
+        Cached index for the project, rebuilt if its transcription or scenes changed.
+
+        Args:
+            segments_loader: Returns the current segments on a rebuild
+                (defaults to the project's transcription_data)
+        """
+        key = str(project_id)
+        fingerprint = self.fingerprint(project, scenes)
+        found, entry = self._lru.get(key)
+        if found and entry[0] == fingerprint:
+            self._stats["hits"] += 1
+            return entry[1]
+
+        if segments_loader:
+            segments = segments_loader()
+        else:
+            segments = (project.get('transcription_data') or {}).get('segments')
+        index = TimelineIndex.build(segments, scenes)
+        self._lru.set(key, (fingerprint, index))
+        self._stats["builds"] += 1
+        return index
+
+    def invalidate(self, project_id: str):
+        self._lru.delete(str(project_id))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "projects": len(self._lru)}
+
+
+# Global cache instance - will be initialized when needed
+timeline_index_cache = None
+
+def get_timeline_index_cache() -> TimelineIndexCache:
+    """Get or create the global TimelineIndexCache instance."""
+    global timeline_index_cache
+    if timeline_index_cache is None:
+        timeline_index_cache = TimelineIndexCache()
+    return timeline_index_cache
@@ -0,0 +1,228 @@
+"""
+Transcription backends behind WhisperService.
+
+- "api": OpenAI Whisper API (network upload, billed per minute)
+- "local": faster-whisper (CTranslate2, int8 by default) on CPU in a pool of
+  worker processes, each holding its own copy of the model
+
+Both return the same TranscriptionResult segment shape, so chunking,
+stitching and caching work identically on top of either.
+"""
+import asyncio
+import importlib.util
+import io
+import logging
+import multiprocessing
+from abc import ABC, abstractmethod
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.models_pydantic import TranscriptionResult
+
+logger = logging.getLogger(__name__)
+
+# (filename, file, content type), as accepted by the OpenAI client
+AudioUpload = Tuple[str, BinaryIO, str]
+
+BACKENDS = ["api", "local"]
+
+
+def segments_from_response(response) -> List[Dict[str, Any]]:
+    """Convert API response segments (dicts or objects) to plain dicts."""
+    segments = []
+    if hasattr(response, 'segments') and response.segments:
+        for segment in response.segments:
+            # Handle both dict and object formats
+            if isinstance(segment, dict):
+                segments.append({
+                    "start": segment.get("start", 0),
+                    "end": segment.get("end", 0),
+                    "text": segment.get("text", "")
+                })
+            else:
+                segments.append({
+                    "start": getattr(segment, "start", 0),
+                    "end": getattr(segment, "end", 0),
+                    "text": getattr(segment, "text", "")
+                })
+    return segments
+
+
+class TranscriptionBackend(ABC):
+    """Speech-to-text engine producing TranscriptionResults."""
+
+    name: str = ""
+    # Whether audio is uploaded over the network (pre-transcoding and the
+    # upload size limit only apply to remote backends)
+    remote: bool = False
+
+    @property
+    @abstractmethod
+    def model(self) -> str:
+        """Model identifier (part of the transcription cache key)."""
+
+    @property
+    @abstractmethod
+    def max_concurrency(self) -> int:
+        """Chunks worth transcribing at once."""
+
+    @abstractmethod
+    async def transcribe(self, upload: AudioUpload, language: Optional[str] = None) -> TranscriptionResult:
+        """Transcribe one file or chunk."""
+
+    async def close(self):
+        """Release resources (worker processes, connections)."""
+
+
+class APITranscriptionBackend(TranscriptionBackend):
+    """OpenAI Whisper API."""
+
+    name = "api"
+    remote = True
+
+    def __init__(self, client, model: str = "whisper-1"):
+        """
+        Args:
+            client: openai.AsyncOpenAI instance
+            model: Whisper API model
+        """
+        self.client = client
+        self._model = model
+
+    @property
+    def model(self) -> str:
+        return self._model
+
+    @property
+    def max_concurrency(self) -> int:
+        return settings.transcription_chunk_concurrency
+
+    async def request(self, upload: AudioUpload, language: Optional[str] = None):
+        """Single Whisper API call returning the verbose_json response."""
+        if self.client is None:
+            raise Exception("OpenAI API key is not configured")
+        return await self.client.audio.transcriptions.create(
+            model=self._model,
+            file=upload,
+            response_format="verbose_json",
+            language=language
+        )
+
+    async def transcribe(self, upload: AudioUpload, language: Optional[str] = None) -> TranscriptionResult:
+        response = await self.request(upload, language)
+        return TranscriptionResult(text=response.text, segments=segments_from_response(response))
+
+
+def local_whisper_available() -> bool:
+    return importlib.util.find_spec("faster_whisper") is not None
+
+
+# Model loaded once per worker process by _init_worker
+_worker_model = None
+
+
+def _init_worker(model_size: str, compute_type: str, cpu_threads: int):
+    global _worker_model
+    from faster_whisper import WhisperModel
+    _worker_model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def _transcribe_in_worker(audio: bytes, language: Optional[str], beam_size: int) -> Dict[str, Any]:
+    """Runs in a worker process; returns plain data so it pickles cheaply."""
+    segments, _ = _worker_model.transcribe(io.BytesIO(audio), language=language, beam_size=beam_size)
+    segments = [
+        {"start": round(segment.start, 3), "end": round(segment.end, 3), "text": segment.text}
+        for segment in segments  # A generator: decoding happens while iterating
+    ]
+    return {
+        "text": " ".join(segment["text"].strip() for segment in segments if segment["text"].strip()),
+        "segments": segments
+    }
+
+
+class LocalWhisperBackend(TranscriptionBackend):
+    """
+    faster-whisper on CPU in a process pool.
+
+    Each worker loads the model once and transcribes one file or chunk at a
+    time, so chunked transcription parallelises across workers without the
+    GIL or a network round-trip.
+    """
+
+    name = "local"
+    remote = False
+
+    def __init__(
+        self,
+        model_size: str = "small",
+        compute_type: str = "int8",
+        workers: int = 2,
+        cpu_threads: int = 4,
+        beam_size: int = 5,
+        executor: Optional[Executor] = None
+    ):
+        """
+        Args:
+            model_size: faster-whisper model name or path (e.g. "small", "medium", "large-v3")
+            compute_type: CTranslate2 quantization ("int8", "int8_float32", "float32")
+            workers: Worker processes (each holds a copy of the model)
+            cpu_threads: Threads per worker
+            beam_size: Decoding beam size
+            executor: Executor to run in instead of a new process pool
+
+        Raises:
+            ImportError: If faster-whisper is not installed and no executor is given
+        """
+        if executor is None and not local_whisper_available():
+            raise ImportError("The local transcription backend requires faster-whisper (pip install faster-whisper)")
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.workers = workers
+        self.beam_size = beam_size
+        self._executor = executor or ProcessPoolExecutor(
+            max_workers=workers,
+            # spawn: forked children would inherit the event loop and open sockets
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_size, compute_type, cpu_threads)
+        )
+
+    @property
+    def model(self) -> str:
+        return f"faster-whisper-{self.model_size}-{self.compute_type}"
+
+    @property
+    def max_concurrency(self) -> int:
+        return self.workers
+
+    async def transcribe(self, upload: AudioUpload, language: Optional[str] = None) -> TranscriptionResult:
+        _, file, _ = upload
+        file.seek(0)
+        audio = file.read()
+        file.seek(0)
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self._executor, _transcribe_in_worker, audio, language, self.beam_size)
+        return TranscriptionResult(**result)
+
+    async def close(self):
+        global local_whisper_backend
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if local_whisper_backend is self:
+            local_whisper_backend = None
+
+
+# Global local backend - the process pool is shared by all jobs
+local_whisper_backend = None
+
+def get_local_whisper_backend() -> LocalWhisperBackend:
+    """Get or create the global LocalWhisperBackend instance."""
+    global local_whisper_backend
+    if local_whisper_backend is None:
+        local_whisper_backend = LocalWhisperBackend(
+            model_size=settings.transcription_local_model,
+            compute_type=settings.transcription_local_compute_type,
+            workers=settings.transcription_local_workers,
+            cpu_threads=settings.transcription_local_cpu_threads
+        )
+    return local_whisper_backend
@@ -0,0 +1,121 @@
+"""
+Transcription result cache keyed by audio content hash.
+
+The same master re-uploaded, or shared by several projects, is transcribed
+once: results are stored in the transcription_cache table under the SHA-256
+of the audio bytes plus the Whisper model and language they were produced with.
+"""
+import logging
+from typing import Any, Dict, Optional
+
+from app.models_pydantic import TranscriptionResult
+from app.services.response_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionCache:
+    """
+    Two-tier cache of TranscriptionResults: an in-process LRU in front of the
+    transcription_cache table (shared by the API and workers).
+
+    Store errors are logged and treated as misses; a cache outage never fails
+    a transcription.
+    """
+
+    def __init__(self, store=None, lru_size: int = 64):
+        """
+        Args:
+            store: Object with get_cached_transcription(key) and
+                save_cached_transcription(row) (defaults to supabase_service)
+            lru_size: Entries kept in memory
+        """
+        self._store = store
+        self._lru = LRUCache(max_entries=lru_size)
+        self._stats = {"hits_memory": 0, "hits_store": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    @property
+    def store(self):
+        if self._store is None:
+            from app.services.supabase import supabase_service
+            self._store = supabase_service
+        return self._store
+
+    @staticmethod
+    def make_key(content_sha256: str, model: str, language: Optional[str] = None) -> str:
+        """Cache key; changing the model or language hint yields a different entry."""
+        return f"{content_sha256}:{model}:{language or 'auto'}"
+
+    def get(self, content_sha256: str, model: str, language: Optional[str] = None) -> Optional[TranscriptionResult]:
+        """
+        Look up a cached transcription.
+
+        Returns:
+            TranscriptionResult on a hit, None on a miss
+        """
+        key = self.make_key(content_sha256, model, language)
+        found, result = self._lru.get(key)
+        if found:
+            self._stats["hits_memory"] += 1
+            return result
+
+        try:
+            row = self.store.get_cached_transcription(key)
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Transcription cache lookup failed: {e}")
+            row = None
+
+        if not row:
+            self._stats["misses"] += 1
+            return None
+
+        result = TranscriptionResult(**row["result_json"])
+        self._lru.set(key, result)
+        self._stats["hits_store"] += 1
+        return result
+
+    def set(
+        self,
+        content_sha256: str,
+        model: str,
+        result: TranscriptionResult,
+        language: Optional[str] = None,
+        audio_duration: Optional[float] = None
+    ):
+        """Store a transcription for later uploads of the same audio."""
+        key = self.make_key(content_sha256, model, language)
+        self._lru.set(key, result)
+        try:
+            self.store.save_cached_transcription({
+                "cache_key": key,
+                "content_sha256": content_sha256,
+                "model": model,
+                "language": language or "auto",
+                "audio_duration": audio_duration,
+                "result_json": result.model_dump()
+            })
+            self._stats["stores"] += 1
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Transcription cache store failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits_memory"] + self._stats["hits_store"] + self._stats["misses"]
+        hits = self._stats["hits_memory"] + self._stats["hits_store"]
+        return {
+            **self._stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._lru)
+        }
+
+
+# Global cache instance - will be initialized when needed
+transcription_cache = None
+
+def get_transcription_cache() -> TranscriptionCache:
+    """Get or create the global TranscriptionCache instance."""
+    global transcription_cache
+    if transcription_cache is None:
+        transcription_cache = TranscriptionCache()
+    return transcription_cache
@@ -0,0 +1,177 @@
+"""
+Segment-level storage for edited transcriptions.
+
+Until a transcription is first patched, projects.transcription_data is the
+source of truth. The first patch seeds the transcription_segments table; from
+then on each edit writes only the segments it changed, guarded by the
+project's transcription_version (optimistic concurrency).
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.models_pydantic import TranscriptionResult
+from app.utils.segment_patch import (
+    SegmentPatchResult, apply_segment_operations, segments_from_transcription, transcription_from_segments
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionVersionConflict(Exception):
+    """The transcription changed since the client read it."""
+
+    def __init__(self, expected_version: int, current_version: Optional[int] = None):
+        self.expected_version = expected_version
+        self.current_version = current_version
+        detail = f" (now {current_version})" if current_version is not None else ""
+        super().__init__(f"Transcription was modified: expected version {expected_version}{detail}")
+
+
+def _to_row(segment: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "segment_id": segment["segment_id"],
+        "seq": segment["seq"],
+        "start_s": segment["start"],
+        "end_s": segment["end"],
+        "text": segment["text"]
+    }
+
+
+def _from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "segment_id": row["segment_id"],
+        "seq": row["seq"],
+        "start": row["start_s"],
+        "end": row["end_s"],
+        "text": row["text"]
+    }
+
+
+class TranscriptionSegmentStore:
+    """Reads and patches a project's transcription at segment granularity."""
+
+    def __init__(self, db=None):
+        """
+        Args:
+            db: Object with get_transcription_segments(project_id) and
+                patch_transcription_segments(...) (defaults to supabase_service)
+        """
+        self._db = db
+
+    @property
+    def db(self):
+        if self._db is None:
+            from app.services.supabase import supabase_service
+            self._db = supabase_service
+        return self._db
+
+    @staticmethod
+    def version(project: Dict[str, Any]) -> int:
+        return project.get('transcription_version') or 0
+
+    def load_segments(self, project: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Current segments with segment_id and seq, from the table or the blob."""
+        if project.get('transcription_segments_stored'):
+            return [_from_row(row) for row in self.db.get_transcription_segments(project['id'])]
+        transcription = project.get('transcription_data') or {}
+        return segments_from_transcription(transcription.get('segments') or [])
+
+    def get_transcription(self, project: Dict[str, Any]) -> Optional[TranscriptionResult]:
+        """The project's current transcription, whichever store holds it."""
+        if project.get('transcription_segments_stored'):
+            return TranscriptionResult(**transcription_from_segments(self.load_segments(project)))
+        if project.get('transcription_data'):
+            return TranscriptionResult(**project['transcription_data'])
+        return None
+
+    def apply_patch(
+        self,
+        project: Dict[str, Any],
+        expected_version: int,
+        operations: List[Any]
+    ) -> Tuple[int, SegmentPatchResult]:
+        """
+        Apply segment operations and persist only what changed.
+
+        Args:
+            project: Project row
+            expected_version: transcription_version the client last read
+            operations: SegmentOperation models
+
+        Returns:
+            (new version, patch result)
+
+        Raises:
+            TranscriptionVersionConflict: If the version no longer matches
+            SegmentPatchError: If an operation is invalid
+        """
+        current_version = self.version(project)
+        if current_version != expected_version:
+            raise TranscriptionVersionConflict(expected_version, current_version)
+
+        result = apply_segment_operations(self.load_segments(project), operations)
+
+        if project.get('transcription_segments_stored'):
+            upserts = list(result.changed.values())
+            deletes = sorted(result.deleted)
+        else:
+            # First edit: seed every segment once
+            upserts, deletes = result.segments, []
+
+        try:
+            new_version = self.db.patch_transcription_segments(
+                project['id'], expected_version, [_to_row(segment) for segment in upserts], deletes
+            )
+        except Exception as e:
+            if 'version conflict' in str(e):
+                raise TranscriptionVersionConflict(expected_version)
+            raise
+
+        logger.info(
+            f"Patched transcription of project {project['id']} to version {new_version}: "
+            f"{len(upserts)} rows written, {len(deletes)} deleted"
+        )
+        return new_version, result
+
+    def replace(self, project: Dict[str, Any], expected_version: Optional[int], transcription: TranscriptionResult) -> int:
+        """
+        Replace the whole transcription, making the blob authoritative again.
+
+        Args:
+            project: Project row
+            expected_version: transcription_version the client last read, or
+                None to save unconditionally
+            transcription: The edited transcription
+
+        Returns:
+            The new version
+
+        Raises:
+            TranscriptionVersionConflict: If the version no longer matches
+        """
+        current_version = self.version(project)
+        if expected_version is not None and current_version != expected_version:
+            raise TranscriptionVersionConflict(expected_version, current_version)
+
+        try:
+            new_version = self.db.replace_transcription(
+                project['id'], expected_version, transcription.model_dump(), transcription.text
+            )
+        except Exception as e:
+            if 'version conflict' in str(e):
+                raise TranscriptionVersionConflict(expected_version)
+            raise
+
+        logger.info(f"Replaced transcription of project {project['id']} at version {new_version}")
+        return new_version
+
+
+# Global store instance - will be initialized when needed
+transcription_segment_store = None
+
+def get_transcription_segment_store() -> TranscriptionSegmentStore:
+    """Get or create the global TranscriptionSegmentStore instance."""
+    global transcription_segment_store
+    if transcription_segment_store is None:
+        transcription_segment_store = TranscriptionSegmentStore()
+    return transcription_segment_store
@@ -3,14 +3,13 @@ Video generation service using Replicate API with ByteDance SeeDance.
 Supports image-to-video generation for music videos.
 """
 import os
-import asyncio
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable
 from datetime import datetime
 import logging
 
-import replicate
 from app.models_pydantic import VisualPrompt, SceneSelection
 from app.config import settings, ModelConfig
+from app.services.replicate_client import AsyncReplicateClient, Prediction, get_replicate_client
 
 logger = logging.getLogger(__name__)
 
@@ -31,8 +30,11 @@ class VideoGenerationService:
         if not self.api_token:
             raise ValueError("Replicate API token is required")
 
-        # Initialize Replicate client
-        self.client = replicate.Client(api_token=self.api_token)
+        # Shared async Replicate client (predictions are polled, not run on a thread)
+        if self.api_token == settings.replicate_api_token:
+            self.client = get_replicate_client()
+        else:
+            self.client = AsyncReplicateClient(api_token=self.api_token)
 
         # Current model configuration
         self.current_model = ModelConfig.video_model
@@ -73,7 +75,9 @@ class VideoGenerationService:
         image_url: str,
         motion_prompt: str,
         scene: SceneSelection,
-        custom_params: Optional[Dict[str, Any]] = None
+        custom_params: Optional[Dict[str, Any]] = None,
+        tracking: Optional[Dict[str, Any]] = None,
+        on_prediction: Optional[Callable[[Prediction], Any]] = None
     ) -> Dict[str, Any]:
         """
         Generate video from image and motion prompt using ByteDance SeeDance.
@@ -83,6 +87,8 @@ class VideoGenerationService:
             motion_prompt: Motion description for video generation
             scene: Scene information for metadata
             custom_params: Optional parameters to override defaults
+            tracking: Extra fields stored with the prediction record (e.g. project_id)
+            on_prediction: Called with the prediction as soon as it is created
 
         Returns:
             Dictionary with generation results and metadata
@@ -111,12 +117,14 @@ class VideoGenerationService:
             # Generate video using Replicate
             start_time = datetime.now()
 
-            # Run the prediction
-            output = await asyncio.to_thread(
-                self.client.run,
+            # Create the prediction and wait for it without holding a thread
+            prediction = await self.client.run(
                 self.current_model,
-                input=params
+                params,
+                tracking={"kind": "video", "scene_id": scene.scene_id, **(tracking or {})},
+                on_created=on_prediction
             )
+            output = prediction.output
 
             end_time = datetime.now()
             duration = (end_time - start_time).total_seconds()
@@ -129,6 +137,7 @@ class VideoGenerationService:
                 "video_urls": video_urls,
                 "generation_metadata": {
                     "model": self.current_model,
+                    "prediction_id": prediction.id,
                     "scene_id": scene.scene_id,
                     "image_url": image_url,
                     "motion_prompt": motion_prompt,
@@ -3,13 +3,22 @@ OpenAI Whisper integration service for audio transcription.
 Provides high-accuracy speech-to-text with precise timestamps.
 """
 import asyncio
-from typing import BinaryIO, List, Dict, Any
+import io
+from typing import BinaryIO, Callable, List, Dict, Any, Optional
 from pathlib import Path
 import logging
 
+import numpy as np
 from openai import AsyncOpenAI
 from app.models_pydantic import TranscriptionResult
 from app.config import settings
+from app.services.audio_chunking import SAMPLE_RATE, decode_to_pcm, encode_wav, frame_energy, plan_chunks, slice_chunk, stitch_segments
+from app.services.audio_probe import AudioProbeError, probe_fileobj
+from app.services.audio_transcode import AudioTranscoder, TranscodeReport, get_audio_transcoder
+from app.services.vocal_activity import VocalActivityReport, remove_inactive_audio
+from app.services.transcription_backends import (
+    BACKENDS, APITranscriptionBackend, TranscriptionBackend, get_local_whisper_backend, segments_from_response
+)
 
 logger = logging.getLogger(__name__)
 
@@ -31,8 +40,16 @@ class WhisperService:
     # Pricing: $0.006 per minute
     COST_PER_MINUTE = 0.006
 
-    def __init__(self, api_key: str = None):
+    # Whisper model (part of the transcription cache key)
+    MODEL = "whisper-1"
+
+    # Whisper API upload limit
+    MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+
+    def __init__(self, api_key: str = None, transcoder: Optional[AudioTranscoder] = None):
         """Initialize Whisper service with OpenAI API key."""
+        self._transcoder = transcoder
+        self._backends: Dict[str, TranscriptionBackend] = {}
         if api_key:
             self.api_key = api_key
         else:
@@ -79,30 +96,8 @@ class WhisperService:
             audio_file.seek(0)  # Ensure we're at the beginning
 
             # Call Whisper API with verbose response for timestamps
-            response = await self.client.audio.transcriptions.create(
-                model="whisper-1",
-                file=(filename, audio_file, "audio/mpeg"),
-                response_format="verbose_json",
-                language=language
-            )
-
-            # Convert API response to our model
-            segments = []
-            if hasattr(response, 'segments') and response.segments:
-                for segment in response.segments:
-                    # Handle both dict and object formats
-                    if isinstance(segment, dict):
-                        segments.append({
-                            "start": segment.get("start", 0),
-                            "end": segment.get("end", 0),
-                            "text": segment.get("text", "")
-                        })
-                    else:
-                        segments.append({
-                            "start": getattr(segment, "start", 0),
-                            "end": getattr(segment, "end", 0),
-                            "text": getattr(segment, "text", "")
-                        })
+            response = await self._request_transcription((filename, audio_file, "audio/mpeg"), language)
+            segments = self._segments_from_response(response)
 
             result = TranscriptionResult(
                 text=response.text,
@@ -118,6 +113,216 @@ class WhisperService:
             logger.error(f"Transcription failed for {filename}: {str(e)}")
             raise
 
+    async def _request_transcription(self, file: tuple, language: str = None):
+        """Single Whisper API call returning the verbose_json response."""
+        return await self.get_backend("api").request(file, language)
+
+    @staticmethod
+    def _segments_from_response(response) -> List[Dict[str, Any]]:
+        """Convert API response segments (dicts or objects) to plain dicts."""
+        return segments_from_response(response)
+
+    def get_backend(self, name: Optional[str] = None) -> TranscriptionBackend:
+        """
+        Resolve a transcription backend.
+
+        Args:
+            name: "api" or "local" (defaults to settings.transcription_backend)
+
+        Raises:
+            ValueError: If the backend is unknown
+            ImportError: If the local backend's dependencies are missing
+        """
+        name = name or settings.transcription_backend
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown transcription backend: {name}. Supported: {BACKENDS}")
+        if name not in self._backends:
+            if name == "api":
+                self._backends[name] = APITranscriptionBackend(self.client, model=self.MODEL)
+            else:
+                self._backends[name] = get_local_whisper_backend()
+        return self._backends[name]
+
+    async def close(self):
+        """Shut down backends this service started (e.g. local worker processes)."""
+        for backend in self._backends.values():
+            await backend.close()
+        self._backends.clear()
+
+    @property
+    def decodes_audio(self) -> bool:
+        """Whether transcribe() works on decoded samples (for chunking or vocal activity detection)."""
+        return settings.transcription_chunking_enabled or settings.transcription_vad_enabled
+
+    @property
+    def transcoder(self) -> Optional[AudioTranscoder]:
+        """Pre-transcoder for uploads (None when disabled in settings)."""
+        if self._transcoder is None and settings.transcription_pretranscode_enabled:
+            self._transcoder = get_audio_transcoder()
+        return self._transcoder
+
+    async def transcribe(
+        self,
+        audio_file: BinaryIO,
+        filename: str,
+        language: str = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        transcode_callback: Optional[Callable[[TranscodeReport], None]] = None,
+        backend: Optional[str] = None,
+        activity_callback: Optional[Callable[[VocalActivityReport], None]] = None,
+        samples: Optional[np.ndarray] = None
+    ) -> TranscriptionResult:
+        """
+        Transcribe audio, splitting long tracks into chunks transcribed in parallel.
+
+        Audio shorter than transcription_chunk_min_seconds, or audio that can't
+        be decoded locally (no ffmpeg), goes through transcribe_audio in one
+        request as long as it fits the upload limit. Every upload is first
+        pre-transcoded to compact 16 kHz mono audio when ffmpeg is available
+        (remote backends only). Long instrumental or silent spans are cut out
+        first when the audio can be decoded, and segment times mapped back.
+
+        Args:
+            audio_file: Audio file buffer
+            filename: Original filename for format detection
+            language: Optional language hint (ISO-639-1)
+            progress_callback: Called with (chunks_done, chunks_total) as chunks finish
+            transcode_callback: Called with the job's TranscodeReport once uploads finish
+            backend: Transcription backend ("api" or "local"; defaults to settings)
+            activity_callback: Called with the VocalActivityReport when detection ran
+            samples: The audio already decoded with decode_to_pcm (decoded here if omitted)
+
+        Returns:
+            TranscriptionResult with segment times on the full-song timeline
+        """
+        if not self.validate_audio_file(filename):
+            raise ValueError(f"Unsupported audio format. Supported: {self.SUPPORTED_FORMATS}")
+
+        engine = self.get_backend(backend)
+        transcoder = self.transcoder if engine.remote else None
+        report = transcoder.new_report() if transcoder else TranscodeReport()
+        result = await self._transcribe(
+            audio_file, filename, language, progress_callback, engine, transcoder, report, activity_callback, samples
+        )
+        if transcode_callback:
+            transcode_callback(report)
+        return result
+
+    async def _transcribe_single(
+        self,
+        audio_file: BinaryIO,
+        filename: str,
+        language: Optional[str],
+        engine: TranscriptionBackend,
+        transcoder: Optional[AudioTranscoder],
+        report: TranscodeReport
+    ) -> TranscriptionResult:
+        """One request, uploading the pre-transcoded audio when it is smaller."""
+        if not engine.remote:
+            return await engine.transcribe((filename, audio_file, ""), language)
+        transcoded = await transcoder.transcode(audio_file, filename, report) if transcoder else None
+        if transcoded is None:
+            return await self.transcribe_audio(audio_file, filename, language)
+        try:
+            return await self.transcribe_audio(transcoded.file, transcoded.filename, language)
+        finally:
+            transcoded.close()
+
+    async def _transcribe(
+        self,
+        audio_file: BinaryIO,
+        filename: str,
+        language: Optional[str],
+        progress_callback: Optional[Callable[[int, int], None]],
+        engine: TranscriptionBackend,
+        transcoder: Optional[AudioTranscoder],
+        report: TranscodeReport,
+        activity_callback: Optional[Callable[[VocalActivityReport], None]] = None,
+        samples: Optional[np.ndarray] = None
+    ) -> TranscriptionResult:
+        audio_file.seek(0, 2)
+        fits_one_request = not engine.remote or audio_file.tell() <= self.MAX_UPLOAD_BYTES
+        audio_file.seek(0)
+
+        if not self.decodes_audio:
+            return await self._transcribe_single(audio_file, filename, language, engine, transcoder, report)
+
+        if samples is None:
+            try:
+                samples = await decode_to_pcm(audio_file, suffix=Path(filename).suffix)
+            except Exception as e:
+                if not fits_one_request:
+                    raise Exception(f"Audio exceeds the {self.MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit and could not be split: {e}")
+                logger.warning(f"Local decoding unavailable, using a single request: {e}")
+                return await self._transcribe_single(audio_file, filename, language, engine, transcoder, report)
+
+        # Cut long instrumental/silent spans; segment times are mapped back at the end
+        timeline = None
+        if settings.transcription_vad_enabled:
+            samples, timeline, activity = remove_inactive_audio(
+                samples,
+                min_skip_seconds=settings.transcription_vad_min_skip_seconds,
+                pad_seconds=settings.transcription_vad_pad_seconds,
+                threshold=settings.transcription_vad_threshold
+            )
+            if activity_callback:
+                activity_callback(activity)
+            if not activity.skipped_seconds:
+                timeline = None
+
+        duration = len(samples) / SAMPLE_RATE
+        use_chunks = settings.transcription_chunking_enabled and (
+            duration >= settings.transcription_chunk_min_seconds or not fits_one_request
+        )
+        if not use_chunks:
+            if timeline is None:
+                return await self._transcribe_single(audio_file, filename, language, engine, transcoder, report)
+            condensed = io.BytesIO(encode_wav(samples))
+            result = await self._transcribe_single(
+                condensed, f"{Path(filename).stem}.wav", language, engine, transcoder, report
+            )
+            return TranscriptionResult(text=result.text, segments=timeline.map_segments(result.segments))
+
+        chunks = plan_chunks(
+            frame_energy(samples),
+            target_seconds=settings.transcription_chunk_seconds,
+            search_seconds=settings.transcription_chunk_search_seconds,
+            overlap_seconds=settings.transcription_chunk_overlap_seconds
+        )
+        logger.info(f"Transcribing {filename} ({duration:.0f}s) in {len(chunks)} chunks")
+
+        semaphore = asyncio.Semaphore(engine.max_concurrency)
+        completed = 0
+
+        async def transcribe_chunk(chunk) -> List[Dict[str, Any]]:
+            nonlocal completed
+            upload = (f"chunk_{chunk.index}.wav", io.BytesIO(encode_wav(slice_chunk(samples, chunk))), "audio/wav")
+            transcoded = await transcoder.transcode(upload[1], upload[0], report) if transcoder else None
+            if transcoded:
+                upload = (transcoded.filename, transcoded.file, transcoded.content_type)
+            try:
+                async with semaphore:
+                    chunk_result = await engine.transcribe(upload, language)
+            finally:
+                if transcoded:
+                    transcoded.close()
+            completed += 1
+            if progress_callback:
+                progress_callback(completed, len(chunks))
+            return chunk_result.segments
+
+        chunk_results = await asyncio.gather(*[transcribe_chunk(chunk) for chunk in chunks])
+        segments = stitch_segments(list(zip(chunks, chunk_results)))
+        if timeline is not None:
+            segments = timeline.map_segments(segments)
+
+        result = TranscriptionResult(
+            text=" ".join(segment["text"].strip() for segment in segments if segment["text"].strip()),
+            segments=segments
+        )
+        logger.info(f"Chunked transcription completed. Segments: {len(result.segments)}")
+        return result
+
     def validate_audio_file(self, filename: str) -> bool:
         """
         Validate if audio file format is supported.
@@ -149,26 +354,27 @@ class WhisperService:
 
     async def get_audio_duration(self, audio_file: BinaryIO) -> float:
         """
-        Estimate audio duration (placeholder - would need audio analysis library).
+        Get audio duration from the file headers.
 
         Args:
             audio_file: Audio file buffer
 
         Returns:
-            Estimated duration in minutes
-
-        Note:
-            This is a placeholder. In production, you'd use a library like
-            python-ffmpeg, librosa, or mutagen to get actual duration.
+            Duration in minutes (estimated from file size at ~1 MB per minute
+            if the headers can't be parsed)
         """
-        # Placeholder estimation based on file size
-        audio_file.seek(0, 2)  # Seek to end
-        file_size_mb = audio_file.tell() / (1024 * 1024)
-        audio_file.seek(0)  # Reset to beginning
+        try:
+            probe = await probe_fileobj(audio_file)
+            if probe.duration:
+                return probe.duration / 60.0
+        except AudioProbeError as e:
+            logger.warning(f"Could not read audio duration from headers: {e}")
 
         # Rough estimation: ~1MB per minute for compressed audio
-        estimated_minutes = file_size_mb
-        return estimated_minutes
+        audio_file.seek(0, 2)
+        size = audio_file.tell()
+        audio_file.seek(0)
+        return size / (1024 * 1024)
 
 
 # Global service instance - will be initialized when needed
@@ -0,0 +1,241 @@
+"""
+Tolerant JSON extraction for LLM outputs.
+
+Finds the first JSON value in a completion (ignoring markdown fences and
+surrounding prose), repairs common defects such as trailing commas and
+truncated output, and validates the result against a Pydantic model.
+"""
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar, Union
+
+from pydantic import BaseModel
+
+try:
+    import orjson
+
+    def fast_loads(text: str) -> Any:
+        return orjson.loads(text)
+except ImportError:  # pragma: no cover - orjson is in requirements, fall back to the stdlib
+    orjson = None
+
+    def fast_loads(text: str) -> Any:
+        return json.loads(text)
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JSONExtractionError(Exception):
+    """No parseable JSON could be recovered from an LLM response."""
+
+
+class ExtractionStats:
+    """Counters describing how LLM responses had to be recovered."""
+
+    OUTCOMES = ("clean", "extracted", "repaired", "truncated", "failed")
+
+    def __init__(self):
+        self._counts = {outcome: 0 for outcome in self.OUTCOMES}
+
+    def record(self, outcome: str):
+        self._counts[outcome] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = sum(self._counts.values())
+        return {
+            **self._counts,
+            "total": total,
+            "parser": "orjson" if orjson is not None else "json",
+            "recovered_ratio": round((total - self._counts["clean"] - self._counts["failed"]) / total, 4) if total else 0.0
+        }
+
+
+# Process-wide counters (reported under /health/openrouter)
+extraction_stats = ExtractionStats()
+
+
+def _strip_fences(content: str) -> str:
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.split("\n", 1)[1] if "\n" in content else content[3:]
+        if content.lower().startswith("json"):
+            content = content[4:]
+    if content.rstrip().endswith("```"):
+        content = content.rstrip()[:-3]
+    return content.strip()
+
+
+def _is_safe_cut(stack: List[str]) -> bool:
+    """Whether the brackets open at a position sit between complete outer elements."""
+    return len(stack) == 1 or stack == ["{", "["]
+
+
+def _scan_first_value(text: str) -> Tuple[str, bool, Optional[Tuple[int, List[str]]]]:
+    """
+    Locate the first JSON object/array in text.
+
+    Returns:
+        (candidate text, complete?, last safe cut point). The cut point is an
+        index where everything before it is a sequence of complete elements,
+        paired with the brackets still open there; it is used to salvage
+        truncated output. Cuts are only taken between top-level fields or
+        between elements of the outermost array (the root array, or an array
+        held directly by the root object), so a half-written element is
+        dropped rather than kept with missing fields - even when the cut
+        would otherwise land after an array nested inside it.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return "", False, None
+    start = min(starts)
+
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    cut: Optional[Tuple[int, List[str]]] = None
+
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append(char)
+        elif char in "}]":
+            if not stack:
+                break
+            stack.pop()
+            if not stack:
+                return text[start:i + 1], True, None
+            if _is_safe_cut(stack):
+                cut = (i + 1 - start, list(stack))
+        elif char == "," and _is_safe_cut(stack):
+            cut = (i - start, list(stack))
+
+    return text[start:], False, cut
+
+
+def _remove_trailing_commas(text: str) -> str:
+    """Drop commas that directly precede a closing bracket (outside strings)."""
+    out = []
+    in_string = False
+    escape = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == ",":
+            j = i + 1
+            while j < len(text) and text[j] in " \t\r\n":
+                j += 1
+            if j < len(text) and text[j] in "}]":
+                i += 1
+                continue
+        out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def extract_json(content: str) -> Tuple[Any, str]:
+    """
+    Recover the first JSON value from an LLM completion.
+
+    Args:
+        content: Raw completion text
+
+    Returns:
+        (parsed value, outcome) where outcome is one of "clean", "extracted",
+        "repaired" or "truncated"
+
+    Raises:
+        JSONExtractionError: If nothing parseable could be recovered
+    """
+    text = _strip_fences(content or "")
+    try:
+        return fast_loads(text), "clean"
+    except ValueError:
+        pass
+
+    candidate, complete, cut = _scan_first_value(text)
+    if not candidate:
+        raise JSONExtractionError(f"Invalid JSON response from AI: no JSON object found in: {content[:500]}")
+
+    if complete:
+        try:
+            return fast_loads(candidate), "extracted"
+        except ValueError:
+            pass
+        try:
+            return fast_loads(_remove_trailing_commas(candidate)), "repaired"
+        except ValueError as e:
+            raise JSONExtractionError(f"Invalid JSON response from AI: {content[:500]} | Error: {e}")
+
+    # Truncated: keep the complete elements before the last safe cut and close what is open
+    if cut is None:
+        raise JSONExtractionError(f"Invalid JSON response from AI: truncated before any complete element: {content[:500]}")
+    index, open_brackets = cut
+    salvaged = candidate[:index] + "".join(_CLOSERS[b] for b in reversed(open_brackets))
+    try:
+        return fast_loads(_remove_trailing_commas(salvaged)), "truncated"
+    except ValueError as e:
+        raise JSONExtractionError(f"Invalid JSON response from AI: could not repair truncated output: {content[:500]} | Error: {e}")
+
+
+def parse_llm_json(
+    content: str,
+    model: Optional[Type[M]] = None,
+    fill_defaults: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+) -> Union[M, Any]:
+    """
+    Extract, repair and validate JSON from an LLM completion.
+
+    Args:
+        content: Raw completion text
+        model: Pydantic model to validate against (returns the raw value if None)
+        fill_defaults: Applied to truncated objects to fill fields lost with the
+            tail of the response (e.g. summary fields after a scenes array)
+
+    Returns:
+        Validated model instance, or the parsed value
+
+    Raises:
+        JSONExtractionError: If no JSON could be recovered
+        pydantic.ValidationError: If the JSON does not match the model
+    """
+    try:
+        data, outcome = extract_json(content)
+    except JSONExtractionError:
+        extraction_stats.record("failed")
+        raise
+
+    extraction_stats.record(outcome)
+    if outcome != "clean":
+        logger.info(f"LLM JSON recovered ({outcome})")
+        print(f"🩹 Recovered LLM JSON ({outcome})")
+
+    if outcome == "truncated" and fill_defaults is not None and isinstance(data, dict):
+        data = fill_defaults(data)
+
+    if model is None:
+        return data
+    return model(**data)
@@ -0,0 +1,106 @@
+"""
+Incremental JSON parsing for streamed LLM completions.
+Emits the elements of one array as soon as each element is complete.
+"""
+import json
+import re
+from typing import Any, Dict, List
+
+
+class IncrementalArrayParser:
+    """
+    Extract complete objects from a named JSON array while text is still arriving.
+
+    Feed completion deltas with feed(); each call returns the objects of
+    `array_key` that became complete with that delta. Only brace/bracket depth
+    and string state are tracked, so partial input never raises.
+
+    Example:
+        parser = IncrementalArrayParser("selected_scenes")
+        for delta in deltas:
+            for scene in parser.feed(delta):
+                ...
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self._array_start_pattern = re.compile(r'"' + re.escape(array_key) + r'"\s*:\s*\[')
+        self._buffer = ""
+        self._pos = 0             # Next buffer index to scan
+        self._in_array = False
+        self._array_done = False
+        self._depth = 0           # Nesting depth relative to the array
+        self._in_string = False
+        self._escape = False
+        self._object_start = -1
+        self.objects_emitted = 0
+
+    @property
+    def text(self) -> str:
+        """All text fed so far."""
+        return self._buffer
+
+    @property
+    def array_complete(self) -> bool:
+        """True once the closing bracket of the array has been seen."""
+        return self._array_done
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Append a chunk of completion text.
+
+        Args:
+            chunk: Next piece of streamed text
+
+        Returns:
+            Objects from the array that were completed by this chunk
+        """
+        self._buffer += chunk
+        completed = []
+
+        if self._array_done:
+            return completed
+
+        if not self._in_array:
+            match = self._array_start_pattern.search(self._buffer)
+            if not match:
+                return completed
+            self._in_array = True
+            self._pos = match.end()
+
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            char = buffer[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._object_start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0 and char == "]":
+                    self._array_done = True
+                    i += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0 and char == "}" and self._object_start >= 0:
+                    try:
+                        completed.append(json.loads(buffer[self._object_start:i + 1]))
+                        self.objects_emitted += 1
+                    except json.JSONDecodeError:
+                        # Malformed element - leave it to the final full parse
+                        pass
+                    self._object_start = -1
+            i += 1
+
+        self._pos = i
+        return completed
@@ -0,0 +1,182 @@
+"""
+Segment-level edit operations on a transcription.
+
+Segments carry a stable segment_id and a fractional seq used for ordering, so
+splitting inserts a row between two neighbours without renumbering the rest
+and every operation touches only the segments it names:
+
+- edit_text:  replace one segment's text
+- set_timing: set one segment's start and/or end
+- shift:      move several segments by an offset in seconds
+- split:      cut one segment in two at a character position (and time)
+- merge:      join adjacent segments into the first one
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+
+class SegmentPatchError(ValueError):
+    """An operation can't be applied (unknown segment, bad timing, non-adjacent merge...)."""
+
+
+@dataclass
+class SegmentPatchResult:
+    """Final segments plus exactly what changed."""
+    segments: List[Dict[str, Any]]
+    changed: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    deleted: Set[int] = field(default_factory=set)
+
+
+def segments_from_transcription(segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Give Whisper segments ids and ordering keys (position in the list)."""
+    return [
+        {
+            "segment_id": i,
+            "seq": float(i),
+            "start": float(segment.get("start", 0) or 0),
+            "end": float(segment.get("end", 0) or 0),
+            "text": segment.get("text", "")
+        }
+        for i, segment in enumerate(segments)
+    ]
+
+
+def _op_value(operation: Any, name: str, default: Any = None) -> Any:
+    if isinstance(operation, dict):
+        return operation.get(name, default)
+    value = getattr(operation, name, default)
+    return default if value is None else value
+
+
+def _check_timing(segment: Dict[str, Any]):
+    if segment["start"] < 0 or segment["end"] < segment["start"]:
+        raise SegmentPatchError(
+            f"Segment {segment['segment_id']} would span {segment['start']:.3f}s-{segment['end']:.3f}s"
+        )
+
+
+def apply_segment_operations(segments: List[Dict[str, Any]], operations: List[Any]) -> SegmentPatchResult:
+    """
+    Apply operations in order.
+
+    Args:
+        segments: Stored segments (segment_id, seq, start, end, text), any order
+        operations: SegmentOperation models or equivalent dicts
+
+    Returns:
+        SegmentPatchResult with segments sorted by seq; changed and deleted
+        reflect the net effect, so a segment edited then merged away is only deleted
+
+    Raises:
+        SegmentPatchError: If any operation is invalid (nothing is applied)
+    """
+    ordered = sorted((dict(segment) for segment in segments), key=lambda s: s["seq"])
+    by_id = {segment["segment_id"]: segment for segment in ordered}
+    original_ids = set(by_id)
+    next_id = max(by_id, default=-1) + 1
+    result = SegmentPatchResult(segments=ordered)
+
+    def get(segment_id: Optional[int]) -> Dict[str, Any]:
+        if segment_id not in by_id:
+            raise SegmentPatchError(f"Unknown segment {segment_id}")
+        return by_id[segment_id]
+
+    def position_of(segment: Dict[str, Any]) -> int:
+        return next(i for i, candidate in enumerate(ordered) if candidate is segment)
+
+    def touch(segment: Dict[str, Any]):
+        _check_timing(segment)
+        result.changed[segment["segment_id"]] = segment
+
+    for number, operation in enumerate(operations):
+        op = _op_value(operation, "op")
+        try:
+            if op == "edit_text":
+                segment = get(_op_value(operation, "segment_id"))
+                segment["text"] = _op_value(operation, "text", "")
+                touch(segment)
+
+            elif op == "set_timing":
+                segment = get(_op_value(operation, "segment_id"))
+                segment["start"] = float(_op_value(operation, "start", segment["start"]))
+                segment["end"] = float(_op_value(operation, "end", segment["end"]))
+                touch(segment)
+
+            elif op == "shift":
+                offset = float(_op_value(operation, "offset", 0.0))
+                for segment_id in _op_value(operation, "segment_ids", []):
+                    segment = get(segment_id)
+                    segment["start"] += offset
+                    segment["end"] += offset
+                    touch(segment)
+
+            elif op == "split":
+                segment = get(_op_value(operation, "segment_id"))
+                text = segment["text"]
+                text_index = _op_value(operation, "text_index")
+                if text_index is None or not 0 < text_index < len(text):
+                    raise SegmentPatchError(f"text_index must fall inside the text of segment {segment['segment_id']}")
+                # Default cut time: proportional to the character position
+                at = _op_value(operation, "at")
+                if at is None:
+                    at = segment["start"] + (segment["end"] - segment["start"]) * text_index / len(text)
+                if not segment["start"] <= at <= segment["end"]:
+                    raise SegmentPatchError(f"Split time {at:.3f}s is outside segment {segment['segment_id']}")
+
+                position = position_of(segment)
+                following = ordered[position + 1]["seq"] if position + 1 < len(ordered) else segment["seq"] + 2.0
+                new_segment = {
+                    "segment_id": next_id,
+                    "seq": (segment["seq"] + following) / 2,
+                    "start": float(at),
+                    "end": segment["end"],
+                    "text": text[text_index:].lstrip()
+                }
+                next_id += 1
+                segment["text"] = text[:text_index].rstrip()
+                segment["end"] = float(at)
+                ordered.insert(position + 1, new_segment)
+                by_id[new_segment["segment_id"]] = new_segment
+                touch(segment)
+                touch(new_segment)
+
+            elif op == "merge":
+                segment_ids = _op_value(operation, "segment_ids", [])
+                if len(segment_ids) < 2:
+                    raise SegmentPatchError("merge needs at least two segment_ids")
+                merged = [get(segment_id) for segment_id in segment_ids]
+                positions = [position_of(segment) for segment in merged]
+                if positions != list(range(positions[0], positions[0] + len(positions))):
+                    raise SegmentPatchError("merge segment_ids must be adjacent and in order")
+
+                first = merged[0]
+                first["text"] = " ".join(s["text"].strip() for s in merged if s["text"].strip())
+                first["start"] = min(s["start"] for s in merged)
+                first["end"] = max(s["end"] for s in merged)
+                for segment in merged[1:]:
+                    del ordered[position_of(segment)]
+                    del by_id[segment["segment_id"]]
+                    result.changed.pop(segment["segment_id"], None)
+                    result.deleted.add(segment["segment_id"])
+                touch(first)
+
+            else:
+                raise SegmentPatchError(f"Unknown operation {op!r}")
+        except SegmentPatchError as e:
+            raise SegmentPatchError(f"Operation {number} ({op}): {e}")
+
+    # A segment created by a split and merged away in the same patch never existed
+    result.deleted &= original_ids
+    return result
+
+
+def transcription_from_segments(segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """TranscriptionResult-shaped dict ({"text", "segments"}) from stored segments."""
+    ordered = sorted(segments, key=lambda s: s["seq"])
+    return {
+        "text": " ".join(segment["text"].strip() for segment in ordered if segment["text"].strip()),
+        "segments": [
+            {"id": segment["segment_id"], "start": segment["start"], "end": segment["end"], "text": segment["text"]}
+            for segment in ordered
+        ]
+    }
@@ -0,0 +1,137 @@
+"""
+Sorted interval index over transcription segments and scenes.
+
+Segments and scenes are stored as parallel NumPy arrays sorted by start time,
+with a running maximum of end times, so point and range lookups are binary
+searches instead of walks over the transcription JSON:
+
+    index = TimelineIndex.build(transcription_data["segments"], scenes)
+    index.segment_at(42.5)              # segment being sung at 42.5s
+    index.segments_overlapping(30, 45)  # lyrics inside a scene being dragged
+    index.scenes_covering(42.5)         # scene(s) under the playhead
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class IntervalIndex:
+    """
+    Immutable index of [start, end) intervals.
+
+    Queries return positions in the original sequence. Intervals may overlap;
+    a point query then returns the latest-starting interval containing it.
+    """
+
+    def __init__(self, intervals: Sequence[Tuple[float, float]]):
+        """
+        Args:
+            intervals: (start, end) pairs in any order
+        """
+        starts = np.fromiter((start for start, _ in intervals), dtype=np.float64, count=len(intervals))
+        ends = np.fromiter((end for _, end in intervals), dtype=np.float64, count=len(intervals))
+        order = np.argsort(starts, kind="stable")
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.positions = order.astype(np.int64)
+        # Non-decreasing, so "first interval that could still reach t" is a binary search too
+        self.max_ends = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def end(self) -> float:
+        return float(self.max_ends[-1]) if len(self) else 0.0
+
+    def _candidates(self, start: float, end: float, inclusive_end: bool) -> Tuple[int, int]:
+        """Sorted-order range whose intervals may overlap [start, end)."""
+        high = int(np.searchsorted(self.starts, end, side="right" if inclusive_end else "left"))
+        low = int(np.searchsorted(self.max_ends, start, side="right"))
+        return low, high
+
+    def at(self, t: float) -> Optional[int]:
+        """Position of the latest-starting interval with start <= t < end."""
+        low, high = self._candidates(t, t, inclusive_end=True)
+        for i in range(high - 1, low - 1, -1):
+            if self.ends[i] > t:
+                return int(self.positions[i])
+        return None
+
+    def covering(self, t: float) -> List[int]:
+        """Positions of every interval with start <= t < end, in start order."""
+        low, high = self._candidates(t, t, inclusive_end=True)
+        return [int(self.positions[i]) for i in range(low, high) if self.ends[i] > t]
+
+    def overlapping(self, start: float, end: float) -> List[int]:
+        """Positions of intervals intersecting [start, end), in start order."""
+        if end <= start:
+            return self.covering(start)
+        low, high = self._candidates(start, end, inclusive_end=False)
+        return [int(self.positions[i]) for i in range(low, high) if self.ends[i] > start]
+
+
+def _segment_interval(segment: Any) -> Optional[Tuple[float, float]]:
+    if isinstance(segment, dict):
+        start, end = segment.get("start"), segment.get("end")
+    else:
+        start, end = getattr(segment, "start", None), getattr(segment, "end", None)
+    if not isinstance(start, (int, float)) or not isinstance(end, (int, float)):
+        return None
+    return float(start), float(max(start, end))
+
+
+class TimelineIndex:
+    """Point and range lookups over one project's transcription segments and scenes."""
+
+    def __init__(self, segments: List[Any], scenes: List[Dict[str, Any]]):
+        """
+        Args:
+            segments: Whisper segments ({"start", "end", "text"} dicts);
+                malformed entries are skipped
+            scenes: Scene rows with start_time and end_time
+        """
+        self.segments = segments
+        self.scenes = scenes
+
+        segment_intervals, self._segment_positions = [], []
+        for i, segment in enumerate(segments):
+            interval = _segment_interval(segment)
+            if interval:
+                segment_intervals.append(interval)
+                self._segment_positions.append(i)
+        self._segment_index = IntervalIndex(segment_intervals)
+
+        scene_intervals, self._scene_positions = [], []
+        for i, scene in enumerate(scenes):
+            interval = _segment_interval({"start": scene.get("start_time"), "end": scene.get("end_time")})
+            if interval:
+                scene_intervals.append(interval)
+                self._scene_positions.append(i)
+        self._scene_index = IntervalIndex(scene_intervals)
+
+    @classmethod
+    def build(cls, segments: Optional[Iterable[Any]], scenes: Optional[Iterable[Dict[str, Any]]] = None) -> "TimelineIndex":
+        return cls(list(segments or []), list(scenes or []))
+
+    @property
+    def duration(self) -> float:
+        """End of the last segment or scene."""
+        return max(self._segment_index.end, self._scene_index.end)
+
+    def segment_at(self, t: float) -> Optional[int]:
+        """Index into segments of the segment playing at t (None between lines)."""
+        position = self._segment_index.at(t)
+        return self._segment_positions[position] if position is not None else None
+
+    def segments_overlapping(self, start: float, end: float) -> List[int]:
+        """Indices into segments intersecting [start, end), in time order."""
+        return [self._segment_positions[p] for p in self._segment_index.overlapping(start, end)]
+
+    def scenes_covering(self, t: float) -> List[int]:
+        """Indices into scenes whose span contains t, in time order."""
+        return [self._scene_positions[p] for p in self._scene_index.covering(t)]
+
+    def scenes_overlapping(self, start: float, end: float) -> List[int]:
+        """Indices into scenes intersecting [start, end), in time order."""
+        return [self._scene_positions[p] for p in self._scene_index.overlapping(start, end)]
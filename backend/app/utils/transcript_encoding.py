@@ -0,0 +1,208 @@
+"""
+Compact transcript encoding for scene-selection prompts.
+
+Whisper segments are merged into timeline units that tile the whole song,
+rendered with delta (duration-only) timestamps and a dictionary of repeated
+lyric lines. Scenes returned by the model reference unit numbers, which are
+mapped back to original segment indices; their timestamps are clamped to the
+referenced units.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.models_pydantic import SceneSelection, SceneSelectionResult
+
+
+@dataclass
+class TranscriptUnit:
+    """One or more adjacent Whisper segments rendered as a single prompt line."""
+    index: int
+    text: str
+    start: float                  # Original start of the first segment
+    end: float                    # Original end of the last segment
+    span_start: float = 0.0       # Gapless span used for scene timing (tiles 0..song_duration)
+    span_end: float = 0.0
+    segment_indices: List[int] = field(default_factory=list)
+
+
+@dataclass
+class EncodedTranscript:
+    """Prompt-ready transcript text plus the mapping back to original segments."""
+    text: str
+    units: List[TranscriptUnit]
+    repeated_lines: List[str]
+    song_duration: float
+    original_chars: int
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "units": len(self.units),
+            "segments": sum(len(unit.segment_indices) for unit in self.units),
+            "repeated_lines": len(self.repeated_lines),
+            "original_chars": self.original_chars,
+            "encoded_chars": len(self.text),
+            "reduction": round(1 - len(self.text) / self.original_chars, 3) if self.original_chars else 0.0
+        }
+
+    def remap_scene(self, scene: SceneSelection, is_first: bool = False, is_last: bool = False) -> SceneSelection:
+        """
+        Map a scene's unit numbers back to original segment indices and timestamps.
+
+        Args:
+            scene: Scene as returned by the model (source_segments are unit numbers)
+            is_first: Scene opens the video; keeps an earlier model start (e.g. 0.0)
+            is_last: Scene closes the video; keeps a later model end
+
+        Returns:
+            Scene with original segment indices and the model's timing clamped
+            to the referenced units. Scenes without valid unit references are
+            returned unchanged.
+        """
+        units = [self.units[i] for i in scene.source_segments if 0 <= i < len(self.units)]
+        if not units:
+            return scene
+
+        # Keep the model's timing (it may split a long unit between scenes),
+        # clamped to the referenced units; times outside them fall back to the span
+        span_start = min(unit.span_start for unit in units)
+        span_end = max(unit.span_end for unit in units)
+        start = scene.start_time if span_start <= scene.start_time <= span_end else span_start
+        end = scene.end_time if span_start <= scene.end_time <= span_end else span_end
+        if end <= start:
+            start, end = span_start, span_end
+        if is_first:
+            start = min(start, scene.start_time)
+        if is_last:
+            end = max(end, scene.end_time)
+
+        segment_indices = sorted({i for unit in units for i in unit.segment_indices})
+        return scene.model_copy(update={
+            "start_time": round(start, 2),
+            "end_time": round(end, 2),
+            "duration": round(end - start, 2),
+            "source_segments": segment_indices
+        })
+
+    def remap_result(self, result: SceneSelectionResult) -> SceneSelectionResult:
+        """Remap every scene in a scene selection result."""
+        scenes = result.selected_scenes
+        remapped = [
+            self.remap_scene(scene, is_first=(i == 0), is_last=(i == len(scenes) - 1))
+            for i, scene in enumerate(scenes)
+        ]
+        average = sum(scene.duration for scene in remapped) / len(remapped) if remapped else result.average_scene_length
+        return result.model_copy(update={
+            "selected_scenes": remapped,
+            "average_scene_length": round(average, 2)
+        })
+
+
+def _normalize_line(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def render_segments_verbose(segments: List[Dict[str, Any]]) -> List[str]:
+    """The original one-line-per-segment rendering (used to measure savings)."""
+    lines = []
+    for i, segment in enumerate(segments):
+        if isinstance(segment, dict) and 'text' in segment and 'start' in segment and 'end' in segment:
+            lines.append(f"Segment {i}: {segment['start']:.1f}s-{segment['end']:.1f}s: {segment['text']}")
+        else:
+            lines.append(f"Segment {i}: {segment}")
+    return lines
+
+
+def encode_transcript(
+    segments: List[Dict[str, Any]],
+    song_duration: Optional[float] = None,
+    merge_min_seconds: float = 2.0,
+    merge_max_seconds: float = 8.0,
+    marker_every: int = 10,
+    min_repeat_chars: int = 20
+) -> EncodedTranscript:
+    """
+    Encode Whisper segments compactly for the scene-selection prompt.
+
+    Args:
+        segments: Whisper segments ({"start", "end", "text"} dicts)
+        song_duration: Song length; defaults to the last segment's end
+        merge_min_seconds: Segments shorter than this are merged into a neighbour
+        merge_max_seconds: Merging never builds a unit longer than this
+        marker_every: Emit an absolute time marker every N units
+        min_repeat_chars: Shortest line worth putting in the repeated-lines dictionary
+
+    Returns:
+        EncodedTranscript with prompt text and the unit-to-segment mapping
+    """
+    original_chars = len("\n".join(render_segments_verbose(segments)))
+
+    # 1. Units from well-formed segments; text of malformed ones is folded into the previous unit
+    units: List[TranscriptUnit] = []
+    for i, segment in enumerate(segments):
+        if not isinstance(segment, dict):
+            continue
+        text = _normalize_line(str(segment.get('text', '')))
+        if 'start' not in segment or 'end' not in segment:
+            if units and text:
+                units[-1].text = f"{units[-1].text} {text}".strip()
+                units[-1].segment_indices.append(i)
+            continue
+        units.append(TranscriptUnit(
+            index=len(units), text=text,
+            start=float(segment['start']), end=float(segment['end']),
+            segment_indices=[i]
+        ))
+
+    # 2. Merge very short units into the following one (or the previous one at the end)
+    merged: List[TranscriptUnit] = []
+    for unit in units:
+        previous = merged[-1] if merged else None
+        if (
+            previous is not None
+            and (previous.end - previous.start < merge_min_seconds or unit.end - unit.start < merge_min_seconds)
+            and unit.end - previous.start <= merge_max_seconds
+        ):
+            previous.text = f"{previous.text} {unit.text}".strip()
+            previous.end = unit.end
+            previous.segment_indices.extend(unit.segment_indices)
+        else:
+            merged.append(unit)
+
+    # 3. Gapless spans tiling 0..song_duration (silence joins the preceding unit)
+    if song_duration is None:
+        song_duration = merged[-1].end if merged else 0.0
+    for i, unit in enumerate(merged):
+        unit.index = i
+        unit.span_start = 0.0 if i == 0 else merged[i - 1].span_end
+        unit.span_end = merged[i + 1].start if i + 1 < len(merged) else max(unit.end, song_duration)
+
+    # 4. Dictionary of repeated lines (choruses, hooks)
+    counts: Dict[str, int] = {}
+    for unit in merged:
+        if len(unit.text) >= min_repeat_chars:
+            counts[unit.text] = counts.get(unit.text, 0) + 1
+    repeated_lines = [text for text, count in counts.items() if count > 1]
+    line_refs = {text: f"L{k + 1}" for k, text in enumerate(repeated_lines)}
+
+    # 5. Render: "u<i> <duration>" then text or a dictionary reference
+    lines = []
+    if repeated_lines:
+        lines.append("REPEATED LINES:")
+        lines.extend(f"{line_refs[text]}: {text}" for text in repeated_lines)
+        lines.append("")
+    lines.append("UNITS:")
+    for unit in merged:
+        if marker_every and unit.index % marker_every == 0:
+            lines.append(f"@{unit.span_start:.1f}s")
+        body = f"={line_refs[unit.text]}" if unit.text in line_refs else unit.text
+        lines.append(f"u{unit.index} {unit.span_end - unit.span_start:.1f} {body}")
+
+    return EncodedTranscript(
+        text="\n".join(lines),
+        units=merged,
+        repeated_lines=repeated_lines,
+        song_duration=song_duration,
+        original_chars=original_chars
+    )
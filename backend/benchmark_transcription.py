@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Transcription backend benchmark.
+
+Transcribes the same audio with each backend and compares throughput in
+audio-seconds per wall-second (higher is faster), plus API cost.
+
+Usage: python benchmark_transcription.py [audio_file] [--backends api local] [--runs 3]
+
+The api backend needs OPENAI_API_KEY and costs ~$0.006 per audio minute per run;
+the local backend needs faster-whisper (pip install faster-whisper).
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app.services.audio_probe import probe_fileobj
+from app.services.whisper import WhisperService
+
+DEFAULT_AUDIO = "test_assets/audio/Rio Da Yung Og - Easy Kill (Official Video).mp3"
+
+
+async def benchmark_backend(service: WhisperService, backend: str, audio_path: Path, audio_seconds: float, runs: int) -> dict:
+    """Transcribe runs times with one backend; the first local run includes model loading."""
+    timings = []
+    segments = 0
+    for run in range(runs):
+        with open(audio_path, "rb") as audio_file:
+            started = time.perf_counter()
+            result = await service.transcribe(audio_file, audio_path.name, backend=backend)
+            elapsed = time.perf_counter() - started
+        timings.append(elapsed)
+        segments = len(result.segments)
+        print(f"  run {run + 1}: {elapsed:.1f}s ({audio_seconds / elapsed:.1f} audio-s/wall-s)")
+
+    best = min(timings)
+    return {
+        "backend": backend,
+        "model": service.get_backend(backend).model,
+        "runs": timings,
+        "best_seconds": round(best, 3),
+        "audio_seconds_per_wall_second": round(audio_seconds / best, 2),
+        "segments": segments,
+        "cost_usd": round(audio_seconds / 60 * service.COST_PER_MINUTE, 4) if backend == "api" else 0.0
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare transcription backend throughput")
+    parser.add_argument("audio", nargs="?", default=DEFAULT_AUDIO)
+    parser.add_argument("--backends", nargs="+", default=["api", "local"])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    audio_path = Path(args.audio)
+    with open(audio_path, "rb") as audio_file:
+        audio_seconds = (await probe_fileobj(audio_file)).duration
+
+    print(f"🎵 {audio_path.name}: {audio_seconds:.1f}s of audio, {args.runs} runs per backend")
+
+    service = WhisperService()
+    results = []
+    for backend in args.backends:
+        print(f"\n⏳ Backend: {backend}")
+        try:
+            results.append(await benchmark_backend(service, backend, audio_path, audio_seconds, args.runs))
+        except Exception as e:
+            print(f"❌ {backend} failed: {e}")
+    await service.close()
+
+    print("\n📊 Results (best run)")
+    for result in results:
+        print(f"  {result['backend']:<6} {result['model']:<32} {result['best_seconds']:>7.1f}s "
+              f"{result['audio_seconds_per_wall_second']:>7.1f} audio-s/wall-s  ${result['cost_usd']:.4f}")
+
+    output_path = Path(f"transcription_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, "w") as f:
+        json.dump({"audio": str(audio_path), "audio_seconds": audio_seconds, "results": results}, f, indent=2)
+    print(f"\n✅ Saved to {output_path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,30 @@
+-- Migration 007: Per-call LLM metering
+-- One row per OpenRouter request attempt (written in batches by app/services/llm_metering.py)
+
+CREATE TABLE llm_call_metrics (
+  id BIGSERIAL PRIMARY KEY,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  model TEXT NOT NULL,
+  stage TEXT,
+  status TEXT NOT NULL CHECK (status IN ('ok', 'error', 'cancelled')),
+  latency_ms REAL NOT NULL,
+  ttfb_ms REAL,
+  prompt_tokens INTEGER,
+  completion_tokens INTEGER,
+  cost_usd NUMERIC(12, 8),
+  streamed BOOLEAN NOT NULL DEFAULT FALSE,
+  error TEXT,
+  -- Plain IDs, not foreign keys: rows are flushed in batches, and one row tagged
+  -- with a deleted project or job must not fail the whole batch
+  project_id UUID,
+  job_id UUID,
+  tags JSONB NOT NULL DEFAULT '{}'::jsonb
+);
+
+-- Latency regressions are tracked per stage and model over time
+CREATE INDEX idx_llm_call_metrics_stage_model_created ON llm_call_metrics(stage, model, created_at DESC);
+CREATE INDEX idx_llm_call_metrics_project_id ON llm_call_metrics(project_id);
+CREATE INDEX idx_llm_call_metrics_job_id ON llm_call_metrics(job_id);
+
+-- Written with the service key only; no end-user access
+ALTER TABLE llm_call_metrics ENABLE ROW LEVEL SECURITY;
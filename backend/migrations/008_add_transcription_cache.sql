@@ -0,0 +1,18 @@
+-- Migration 008: Transcription result cache
+-- Whisper results keyed by audio content hash, model and language hint,
+-- so re-uploads of the same audio skip transcription
+
+CREATE TABLE transcription_cache (
+  cache_key TEXT PRIMARY KEY,  -- "<sha256>:<model>:<language|auto>"
+  content_sha256 CHAR(64) NOT NULL,
+  model TEXT NOT NULL,
+  language TEXT NOT NULL DEFAULT 'auto',
+  audio_duration REAL,
+  result_json JSONB NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX idx_transcription_cache_sha256 ON transcription_cache(content_sha256);
+
+-- Shared across users, so only the backend (service key) may read or write it
+ALTER TABLE transcription_cache ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,81 @@
+-- Migration 009: Segment-level transcription storage
+-- Edits are applied per segment instead of rewriting the transcription_data
+-- blob, guarded by an optimistic version on the project
+
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS transcription_version INTEGER NOT NULL DEFAULT 0;
+-- TRUE once segments have been edited: transcription_segments rows are then
+-- authoritative and transcription_data / transcript_text are stale
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS transcription_segments_stored BOOLEAN NOT NULL DEFAULT FALSE;
+
+CREATE TABLE transcription_segments (
+  project_id UUID NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+  segment_id INTEGER NOT NULL,       -- Stable across edits; new segments get max + 1
+  seq DOUBLE PRECISION NOT NULL,     -- Ordering key; splits take the midpoint of their neighbours
+  start_s REAL NOT NULL,
+  end_s REAL NOT NULL,
+  text TEXT NOT NULL DEFAULT '',
+  version INTEGER NOT NULL,          -- transcription_version that last wrote this row
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (project_id, segment_id)
+);
+
+CREATE INDEX idx_transcription_segments_order ON transcription_segments(project_id, seq);
+
+ALTER TABLE transcription_segments ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can manage segments of their own projects" ON transcription_segments
+  FOR ALL USING (
+    EXISTS (SELECT 1 FROM projects WHERE projects.id = transcription_segments.project_id AND projects.user_id = auth.uid())
+  );
+
+-- Apply one patch atomically: bump the version only if it still matches,
+-- then delete and upsert just the segments that changed. The first patch of a
+-- transcription seeds every segment (replacing rows left from an earlier one).
+-- Raises SQLSTATE 40001 'transcription version conflict' on a stale version.
+CREATE OR REPLACE FUNCTION patch_transcription_segments(
+  p_project_id UUID,
+  p_expected_version INTEGER,
+  p_upserts JSONB,
+  p_deletes INTEGER[]
+) RETURNS INTEGER AS $$
+DECLARE
+  was_stored BOOLEAN;
+  new_version INTEGER;
+BEGIN
+  SELECT transcription_segments_stored INTO was_stored
+    FROM projects
+   WHERE id = p_project_id AND transcription_version = p_expected_version
+     FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'transcription version conflict' USING ERRCODE = '40001';
+  END IF;
+
+  UPDATE projects
+     SET transcription_version = transcription_version + 1,
+         transcription_segments_stored = TRUE,
+         transcription_edited = TRUE
+   WHERE id = p_project_id
+  RETURNING transcription_version INTO new_version;
+
+  IF was_stored THEN
+    DELETE FROM transcription_segments
+     WHERE project_id = p_project_id AND segment_id = ANY(p_deletes);
+  ELSE
+    DELETE FROM transcription_segments WHERE project_id = p_project_id;
+  END IF;
+
+  INSERT INTO transcription_segments (project_id, segment_id, seq, start_s, end_s, text, version)
+  SELECT p_project_id, s.segment_id, s.seq, s.start_s, s.end_s, s.text, new_version
+    FROM jsonb_to_recordset(p_upserts) AS s(segment_id INTEGER, seq DOUBLE PRECISION, start_s REAL, end_s REAL, text TEXT)
+  ON CONFLICT (project_id, segment_id) DO UPDATE
+     SET seq = EXCLUDED.seq,
+         start_s = EXCLUDED.start_s,
+         end_s = EXCLUDED.end_s,
+         text = EXCLUDED.text,
+         version = EXCLUDED.version,
+         updated_at = NOW();
+
+  RETURN new_version;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,18 @@
+-- Migration 010: Audio analysis features
+-- RMS envelope, beat grid and section boundaries computed once per audio
+-- content hash and shared by every project using the same audio
+
+CREATE TABLE audio_features (
+  content_sha256 CHAR(64) PRIMARY KEY,
+  version INTEGER NOT NULL,          -- Analysis version; older rows are recomputed
+  duration_seconds REAL NOT NULL,
+  tempo_bpm REAL NOT NULL DEFAULT 0, -- 0 when no steady beat was found
+  features_npz TEXT NOT NULL,        -- Base64 of the compressed .npz feature file
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Shared across users, so only the backend (service key) may read or write it
+ALTER TABLE audio_features ENABLE ROW LEVEL SECURITY;
+
+-- Links a project to its audio's features (and transcription cache entries)
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS audio_sha256 CHAR(64);
@@ -0,0 +1,22 @@
+-- Migration 011: Replicate prediction tracking
+-- Every image/video prediction is recorded when it is created, so in-flight
+-- generations can be tracked (and their results recovered) by ID
+
+CREATE TABLE replicate_predictions (
+  id TEXT PRIMARY KEY,                -- Replicate prediction ID
+  model TEXT NOT NULL,
+  kind TEXT,                          -- "image" | "video"
+  project_id UUID REFERENCES projects(id) ON DELETE SET NULL,
+  metadata JSONB NOT NULL DEFAULT '{}'::jsonb,
+  status TEXT NOT NULL,               -- starting | processing | succeeded | failed | canceled
+  output JSONB,
+  error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  completed_at TIMESTAMPTZ
+);
+
+CREATE INDEX idx_replicate_predictions_project ON replicate_predictions(project_id, created_at DESC);
+CREATE INDEX idx_replicate_predictions_open ON replicate_predictions(status) WHERE status IN ('starting', 'processing');
+
+-- Written by the backend only (service key)
+ALTER TABLE replicate_predictions ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,9 @@
+-- Migration 012: Batch image generation
+-- Images are generated from the visual prompt stored on each selected scene,
+-- so a generated image no longer needs a scene_prompts row
+
+ALTER TABLE generated_images ALTER COLUMN prompt_id DROP NOT NULL;
+ALTER TABLE generated_images ADD COLUMN IF NOT EXISTS generation_metadata JSONB;
+
+-- Completed images per scene, for skipping finished scenes when a job is re-run
+CREATE INDEX IF NOT EXISTS idx_generated_images_scene_status ON generated_images(scene_id, status);
@@ -0,0 +1,12 @@
+-- Migration 013: Rehosted generated media
+-- Replicate delivery URLs expire, so generated images and clips are copied
+-- into the project-files bucket under content-hashed paths. image_url /
+-- video_url keep the Replicate URL until the copy lands, then point at it.
+
+ALTER TABLE generated_images ADD COLUMN IF NOT EXISTS source_url TEXT;    -- Original Replicate output URL
+ALTER TABLE generated_images ADD COLUMN IF NOT EXISTS storage_path TEXT;  -- generated/<sha256 prefix>/<sha256>.<ext>
+ALTER TABLE generated_images ALTER COLUMN image_url TYPE TEXT;
+
+ALTER TABLE video_clips ADD COLUMN IF NOT EXISTS source_url TEXT;
+ALTER TABLE video_clips ADD COLUMN IF NOT EXISTS storage_path TEXT;
+ALTER TABLE video_clips ALTER COLUMN video_url TYPE TEXT;
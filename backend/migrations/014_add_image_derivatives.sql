@@ -0,0 +1,6 @@
+-- Migration 014: Image derivatives
+-- Small WebP/AVIF variants and a blurhash placeholder for scene grids,
+-- stored next to the rehosted original
+
+ALTER TABLE generated_images ADD COLUMN IF NOT EXISTS derivatives JSONB;  -- {"256": {"webp": url, "avif": url}, "768": {...}}
+ALTER TABLE generated_images ADD COLUMN IF NOT EXISTS blurhash TEXT;
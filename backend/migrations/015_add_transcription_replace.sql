@@ -0,0 +1,40 @@
+-- Migration 015: Whole-transcription saves that keep segment storage consistent
+-- PUT /transcription and a re-run transcription replace the whole transcript;
+-- both must drop the segment rows it supersedes and bump the version so a
+-- client holding the old version can't patch over the new text
+
+-- Replace the transcription atomically: bump the version (only if it still
+-- equals p_expected_version, when one is given), store the new blob and drop
+-- the segment rows it supersedes. p_edited marks a user edit rather than a
+-- fresh transcription.
+-- Raises SQLSTATE 40001 'transcription version conflict' on a stale version.
+CREATE OR REPLACE FUNCTION replace_transcription(
+  p_project_id UUID,
+  p_expected_version INTEGER,
+  p_transcription_data JSONB,
+  p_transcript_text TEXT,
+  p_edited BOOLEAN DEFAULT TRUE
+) RETURNS INTEGER AS $$
+DECLARE
+  new_version INTEGER;
+BEGIN
+  UPDATE projects
+     SET transcription_version = transcription_version + 1,
+         transcription_data = p_transcription_data,
+         transcript_text = p_transcript_text,
+         transcription_edited = p_edited,
+         transcription_segments_stored = FALSE
+   WHERE id = p_project_id
+     AND (p_expected_version IS NULL OR transcription_version = p_expected_version)
+  RETURNING transcription_version INTO new_version;
+
+  IF NOT FOUND THEN
+    RAISE EXCEPTION 'transcription version conflict' USING ERRCODE = '40001';
+  END IF;
+
+  -- The blob is authoritative again; the next patch reseeds the segments
+  DELETE FROM transcription_segments WHERE project_id = p_project_id;
+
+  RETURN new_version;
+END;
+$$ LANGUAGE plpgsql;
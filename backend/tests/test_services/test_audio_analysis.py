@@ -0,0 +1,134 @@
+"""
+Tests for the cached audio analysis stage.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import io
+
+import numpy as np
+import pytest
+
+from app.models_pydantic import SceneSelection
+from app.services.audio_analysis import AudioAnalysisService, AudioFeatures, analyze_audio
+from app.services.audio_chunking import SAMPLE_RATE, encode_wav
+
+RNG = np.random.default_rng(0)
+
+
+def _song(bpm: float = 128.0, seconds: float = 60.0, change_at: float = 30.0) -> np.ndarray:
+    """Noise-burst kick at a steady tempo; a loud high pad replaces a quiet low one at change_at."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    song = np.zeros_like(t)
+    for beat in np.arange(0.2, seconds, 60.0 / bpm):
+        start, length = int(beat * SAMPLE_RATE), 800
+        burst = np.exp(-np.arange(length) / 300) * RNG.standard_normal(length) * 0.5
+        song[start:start + length] += burst[:len(song) - start]
+    split = int(change_at * SAMPLE_RATE)
+    song[:split] += 0.05 * np.sin(2 * np.pi * 220 * t[:split])
+    song[split:] += 0.3 * np.sin(2 * np.pi * 880 * t[split:])
+    return song.astype(np.float32)
+
+
+def _scene(start: float, end: float) -> SceneSelection:
+    return SceneSelection(
+        scene_id=1, title="t", start_time=start, end_time=end, duration=end - start,
+        source_segments=[0], lyrics_excerpt="", theme="", energy_level=1,
+        visual_potential=5, narrative_importance=5, reasoning=""
+    )
+
+
+class FakeStore:
+    """In-memory stand-in for the audio_features table."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def get_audio_features(self, content_sha256):
+        return self.rows.get(content_sha256)
+
+    def save_audio_features(self, row):
+        self.rows[row["content_sha256"]] = row
+
+
+class TestAudioAnalysis:
+    """Test suite for audio feature extraction and caching."""
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("bpm", [75.0, 100.0, 128.0, 170.0])
+    def test_tempo_and_beat_grid(self, bpm):
+        """Test that the tempo is found and the beat grid stays locked to the kicks."""
+        features = analyze_audio(_song(bpm))
+
+        assert features.tempo == pytest.approx(bpm, rel=0.01)
+        kicks = 0.2 + np.arange(len(features.beats)) * 60.0 / bpm
+        assert np.max(np.abs(features.beats - kicks[:len(features.beats)])) < 0.06
+
+    @pytest.mark.unit
+    def test_section_boundary_and_energy(self):
+        """Test that the arrangement change is a section boundary and the louder section rates higher."""
+        features = analyze_audio(_song(change_at=30.0))
+
+        assert len(features.sections) == 3
+        assert features.sections[1] == pytest.approx(30.0, abs=0.6)
+        quiet, loud = features.section_list()
+        assert loud["energy_level"] > quiet["energy_level"]
+
+    @pytest.mark.unit
+    def test_arrhythmic_audio_has_no_beats(self):
+        """Test that steady noise yields no tempo and a single section."""
+        features = analyze_audio((0.1 * RNG.standard_normal(30 * SAMPLE_RATE)).astype(np.float32))
+
+        assert features.tempo == 0.0
+        assert len(features.beats) == 0
+        assert list(features.sections) == [0.0, 30.0]
+
+    @pytest.mark.unit
+    def test_feature_file_round_trip(self):
+        """Test the .npz round trip, its size, and that other versions are rejected."""
+        features = analyze_audio(_song())
+        data = features.to_bytes()
+
+        loaded = AudioFeatures.from_bytes(data)
+        assert len(data) < 20 * 1024
+        assert loaded.summary() == features.summary()
+        np.testing.assert_array_equal(loaded.beats, features.beats)
+
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr("app.services.audio_analysis.FEATURES_VERSION", 99)
+            with pytest.raises(ValueError):
+                AudioFeatures.from_bytes(data)
+
+    @pytest.mark.unit
+    def test_align_scene_snaps_cuts_to_beats(self):
+        """Test that interior cuts move to the nearest beat and the song's ends are kept."""
+        features = AudioFeatures(
+            duration=20.0, tempo=120.0, rms=np.ones(625, dtype=np.float16),
+            beats=np.arange(0.1, 20.0, 0.5, dtype=np.float32), sections=np.array([0.0, 20.0], dtype=np.float32)
+        )
+
+        middle = features.align_scene(_scene(5.3, 9.9))
+        assert (middle.start_time, middle.end_time, middle.duration) == (5.1, 10.1, 5.0)
+
+        edges = features.align_scene(_scene(0.0, 20.0))
+        assert (edges.start_time, edges.end_time) == (0.0, 20.0)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_analyzed_once_per_audio_hash(self):
+        """Test that concurrent jobs share one analysis and later lookups come from the store."""
+        store = FakeStore()
+        service = AudioAnalysisService(store=store, executor=ThreadPoolExecutor(max_workers=1))
+        audio = encode_wav(_song(seconds=20.0))
+
+        first, second = await asyncio.gather(
+            service.start("abc", io.BytesIO(audio), ".wav"),
+            service.start("abc", io.BytesIO(audio), ".wav")
+        )
+        features = await first
+        assert await second is features
+        assert service.get_stats()["analyzed"] == 1
+        assert store.rows["abc"]["tempo_bpm"] == pytest.approx(128.0, rel=0.01)
+
+        cached = await AudioAnalysisService(store=store, executor=ThreadPoolExecutor(max_workers=1)).start("abc", io.BytesIO(b""))
+        assert (await cached).summary() == features.summary()
+        await service.close()
@@ -0,0 +1,103 @@
+"""
+Tests for audio chunking and chunked parallel transcription.
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+import io
+
+import numpy as np
+import pytest
+
+from app.services.audio_chunking import SAMPLE_RATE, AudioChunk, encode_wav, frame_energy, plan_chunks, stitch_segments
+from app.services.whisper import WhisperService
+
+
+def _tone_with_gaps(seconds: float, gaps: list) -> np.ndarray:
+    """A 220 Hz tone with silent (start, end) gaps."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    samples = (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    for start, end in gaps:
+        samples[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)] = 0.0
+    return samples
+
+
+class TestAudioChunking:
+    """Test suite for chunk planning and segment stitching."""
+
+    @pytest.mark.unit
+    def test_cuts_land_in_quiet_stretches(self):
+        """Test that cut points are placed in silent gaps near each target."""
+        samples = _tone_with_gaps(200.0, [(58.0, 59.5), (121.0, 122.0)])
+
+        chunks = plan_chunks(frame_energy(samples), target_seconds=60.0, search_seconds=8.0, overlap_seconds=2.0)
+
+        assert len(chunks) == 3
+        assert 58.0 <= chunks[0].keep_end <= 59.5
+        assert 121.0 <= chunks[1].keep_end <= 122.0
+        assert chunks[1].start == pytest.approx(chunks[0].keep_end - 2.0)
+        assert chunks[-1].keep_end == pytest.approx(200.0)
+
+    @pytest.mark.unit
+    def test_stitch_offsets_and_dedupes_overlap(self):
+        """Test timestamp correction and removal of the line transcribed by both neighbours."""
+        first = AudioChunk(index=0, start=0.0, end=62.0, keep_start=0.0, keep_end=60.0)
+        second = AudioChunk(index=1, start=58.0, end=120.0, keep_start=60.0, keep_end=120.0)
+        results = [
+            (first, [{"start": 50.0, "end": 59.8, "text": "hold on"}, {"start": 59.9, "end": 61.5, "text": " tail"}]),
+            (second, [{"start": 0.5, "end": 1.6, "text": "Hold on!"}, {"start": 2.0, "end": 3.5, "text": "tail"},
+                      {"start": 4.0, "end": 6.0, "text": "next line"}])
+        ]
+
+        segments = stitch_segments(results)
+
+        assert [segment["text"] for segment in segments] == ["hold on", "tail", "next line"]
+        assert (segments[1]["start"], segments[1]["end"]) == (60.0, 61.5)
+        assert segments[2]["start"] == 62.0
+
+
+class TestChunkedTranscription:
+    """Test suite for WhisperService.transcribe with chunking."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_long_audio_is_transcribed_in_parallel_chunks(self):
+        """Test that each chunk is sent separately and segments come back on the song timeline."""
+        client = MagicMock()
+        requested = []
+
+        async def create(**kwargs):
+            name = kwargs["file"][0]
+            requested.append(name)
+            return MagicMock(text=name, segments=[{"start": 5.0, "end": 8.0, "text": name}])
+
+        client.audio.transcriptions.create = AsyncMock(side_effect=create)
+        with patch('app.services.whisper.AsyncOpenAI', return_value=client):
+            service = WhisperService(api_key="test-api-key")
+
+        audio = io.BytesIO(encode_wav(_tone_with_gaps(200.0, [(58.0, 59.5), (121.0, 122.0)])))
+        progress = []
+
+        with patch('app.services.audio_chunking.ffmpeg_available', return_value=False):
+            result = await service.transcribe(audio, "song.wav", progress_callback=lambda done, total: progress.append((done, total)))
+
+        assert sorted(requested) == ["chunk_0.wav", "chunk_1.wav", "chunk_2.wav"]
+        assert progress[-1] == (3, 3)
+        assert [segment["text"] for segment in result.segments] == ["chunk_0.wav", "chunk_1.wav", "chunk_2.wav"]
+        assert result.segments[0]["start"] == 5.0
+        assert 60.0 < result.segments[1]["start"] < 66.0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_predecoded_samples_are_not_decoded_again(self):
+        """Test that samples decoded by the caller are chunked directly, without a second decode."""
+        client = MagicMock()
+        client.audio.transcriptions.create = AsyncMock(
+            side_effect=lambda **kwargs: MagicMock(text="", segments=[{"start": 5.0, "end": 8.0, "text": kwargs["file"][0]}])
+        )
+        with patch('app.services.whisper.AsyncOpenAI', return_value=client):
+            service = WhisperService(api_key="test-api-key")
+
+        samples = _tone_with_gaps(200.0, [(58.0, 59.5), (121.0, 122.0)])
+        with patch('app.services.whisper.decode_to_pcm', new=AsyncMock(side_effect=AssertionError("decoded twice"))):
+            result = await service.transcribe(io.BytesIO(b"encoded mp3"), "song.mp3", samples=samples)
+
+        assert len(result.segments) == 3
@@ -0,0 +1,70 @@
+"""
+Tests for streaming audio downloads to spooled temp files.
+"""
+import hashlib
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.audio_download import AudioTooLargeError, download_to_spooled_file
+
+AUDIO = bytes(range(256)) * 8192  # 2 MB
+
+
+class TestAudioDownload:
+    """Test suite for download_to_spooled_file."""
+
+    @staticmethod
+    async def _start_server() -> TestServer:
+        """Serve AUDIO with Content-Length and as a chunked response without it."""
+        async def sized(request):
+            return web.Response(body=AUDIO, content_type="audio/mpeg")
+
+        async def chunked(request):
+            response = web.StreamResponse()
+            response.enable_chunked_encoding()
+            await response.prepare(request)
+            for start in range(0, len(AUDIO), 65536):
+                await response.write(AUDIO[start:start + 65536])
+            await response.write_eof()
+            return response
+
+        app = web.Application()
+        app.router.add_get("/song.mp3", sized)
+        app.router.add_get("/stream.mp3", chunked)
+        server = TestServer(app)
+        await server.start_server()
+        return server
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_hashes_and_spills_to_disk(self):
+        """Test that the hash and size are computed on the fly and large files leave memory."""
+        server = await self._start_server()
+        try:
+            audio = await download_to_spooled_file(
+                str(server.make_url("/song.mp3")), max_bytes=len(AUDIO), spool_bytes=1024 * 1024, chunk_bytes=65536
+            )
+        finally:
+            await server.close()
+
+        try:
+            assert audio.sha256 == hashlib.sha256(AUDIO).hexdigest()
+            assert audio.size_bytes == len(AUDIO)
+            assert audio.on_disk
+            assert audio.file.read() == AUDIO
+        finally:
+            audio.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_byte_cap_with_and_without_content_length(self):
+        """Test that the cap is enforced from the header and, when absent, while streaming."""
+        server = await self._start_server()
+        try:
+            for path in ("/song.mp3", "/stream.mp3"):
+                with pytest.raises(AudioTooLargeError):
+                    await download_to_spooled_file(str(server.make_url(path)), max_bytes=len(AUDIO) - 1)
+        finally:
+            await server.close()
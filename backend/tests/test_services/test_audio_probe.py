@@ -0,0 +1,115 @@
+"""
+Tests for header-based audio probing (MP3, M4A, WAV, FLAC) and HTTP Range reads.
+"""
+import struct
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.audio_chunking import encode_wav
+from app.services.audio_probe import probe_bytes, probe_url, sniff_format
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, stereo: 417-byte frames of 1152 samples
+MP3_HEADER = b"\xff\xfb\x90\x00"
+MP3_FRAME = MP3_HEADER + b"\x00" * 413
+
+
+def _id3(size: int) -> bytes:
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b"ID3\x04\x00\x00" + syncsafe + b"\x00" * size
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def _m4a(seconds: int, mdat_bytes: int) -> bytes:
+    """ftyp, a large mdat, then moov (the layout that defeats streaming readers)."""
+    mvhd = _box(b"mvhd", b"\x00\x00\x00\x00" + struct.pack(">IIII", 0, 0, 1000, seconds * 1000) + b"\x00" * 80)
+    mp4a = _box(b"mp4a", b"\x00" * 6 + b"\x00\x01" + b"\x00" * 8 + struct.pack(">HHHHI", 2, 16, 0, 0, 44100 << 16))
+    moov = _box(b"moov", mvhd + _box(b"trak", _box(b"stsd", b"\x00" * 8 + mp4a)))
+    return _box(b"ftyp", b"M4A \x00\x00\x00\x00isom") + _box(b"mdat", b"\x00" * mdat_bytes) + moov
+
+
+class TestAudioProbe:
+    """Test suite for probe_bytes and format sniffing."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_mp3_cbr_by_frame_scanning(self):
+        """Test CBR duration from frame scanning, skipping ID3v2 and ID3v1 tags."""
+        data = _id3(2000) + MP3_FRAME * 500 + b"TAG" + b"\x00" * 125
+
+        probe = await probe_bytes(data)
+
+        assert (probe.format, probe.sample_rate, probe.channels, probe.bitrate) == ("mp3", 44100, 2, 128000)
+        assert probe.exact
+        assert probe.duration == pytest.approx(500 * 417 * 8 / 128000)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_mp3_vbr_from_xing_header(self):
+        """Test exact VBR duration from the Xing frame count."""
+        xing = MP3_HEADER + b"\x00" * 32 + b"Xing" + struct.pack(">III", 3, 10000, 4_000_000)
+        data = xing + b"\x00" * (417 - len(xing)) + MP3_FRAME * 10
+
+        probe = await probe_bytes(data)
+
+        assert probe.duration == pytest.approx(10000 * 1152 / 44100)
+        assert probe.exact
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_wav_and_flac(self):
+        """Test WAV fmt/data chunks and FLAC STREAMINFO."""
+        wav = await probe_bytes(encode_wav([0.0] * 16000 * 3))
+        assert (wav.format, wav.duration, wav.sample_rate, wav.channels) == ("wav", 3.0, 16000, 1)
+
+        packed = (48000 << 44) | (1 << 41) | (15 << 36) | (48000 * 90)
+        flac = b"fLaC" + b"\x80\x00\x00\x22" + b"\x00" * 10 + packed.to_bytes(8, "big") + b"\x00" * 16
+        probe = await probe_bytes(flac)
+        assert (probe.format, probe.duration, probe.sample_rate, probe.channels) == ("flac", 90.0, 48000, 2)
+
+    @pytest.mark.unit
+    def test_sniffs_content_not_extension(self):
+        """Test magic-byte detection."""
+        assert sniff_format(_m4a(1, 10)[:64]) == "m4a"
+        assert sniff_format(b"OggS\x00\x02") == "ogg"
+        assert sniff_format(b"<html>") == "unknown"
+
+    @staticmethod
+    async def _start_server(data: bytes, served: list) -> TestServer:
+        """Start a server honouring single Range requests and recording bytes sent."""
+        async def handler(request):
+            range_header = request.headers.get("Range")
+            start, end = (int(part) for part in range_header[len("bytes="):].split("-"))
+            end = min(end, len(data) - 1)
+            served.append(end - start + 1)
+            return web.Response(
+                status=206, body=data[start:end + 1],
+                headers={"Content-Range": f"bytes {start}-{end}/{len(data)}"}
+            )
+
+        app = web.Application()
+        app.router.add_get("/song.mp3", handler)
+        server = TestServer(app)
+        await server.start_server()
+        return server
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_url_probe_reads_only_headers(self):
+        """Test that an M4A with moov after 20 MB of media is probed from a few KB."""
+        data = _m4a(seconds=245, mdat_bytes=20 * 1024 * 1024)
+        served = []
+        server = await self._start_server(data, served)
+
+        try:
+            probe = await probe_url(str(server.make_url("/song.mp3")))
+        finally:
+            await server.close()
+
+        assert (probe.format, probe.duration, probe.sample_rate, probe.channels) == ("m4a", 245.0, 44100, 2)
+        assert probe.size_bytes == len(data)
+        assert sum(served) < 100 * 1024
@@ -0,0 +1,90 @@
+"""
+Tests for audio pre-transcoding before Whisper uploads.
+"""
+import asyncio
+import io
+import sys
+
+import pytest
+
+from app.services.audio_transcode import AudioTranscoder, TranscodeReport
+
+# Stands in for ffmpeg: streams stdin to stdout keeping every 8th byte
+DOWNSAMPLE = [
+    sys.executable, "-c",
+    "import sys\n"
+    "while True:\n"
+    "    chunk = sys.stdin.buffer.read(65536)\n"
+    "    if not chunk: break\n"
+    "    sys.stdout.buffer.write(chunk[::8])\n"
+]
+
+
+class TestAudioTranscoder:
+    """Test suite for AudioTranscoder."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_streams_through_encoder_and_reports_savings(self):
+        """Test pipe streaming of a multi-megabyte file and the per-job report."""
+        source = io.BytesIO(bytes(range(256)) * 16384)  # 4 MB
+        transcoder = AudioTranscoder(command=DOWNSAMPLE, upload_bytes_per_second=1024 * 1024)
+        report = transcoder.new_report()
+
+        transcoded = await transcoder.transcode(source, "song.wav", report)
+
+        try:
+            assert transcoded.filename == "song.mp3"
+            assert transcoded.file.read() == source.getvalue()[::8]
+            assert source.tell() == 0
+        finally:
+            transcoded.close()
+
+        assert report.files == 1
+        assert report.reduction_ratio == 8.0
+        assert report.time_saved_seconds == pytest.approx(3.5 - report.transcode_seconds)
+        assert transcoder.get_stats()["transcoded_bytes"] == 512 * 1024
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failures_fall_back_to_original(self):
+        """Test that a failing or missing encoder yields None rather than an error."""
+        report = TranscodeReport()
+
+        failing = AudioTranscoder(command=[sys.executable, "-c", "import sys; sys.exit(3)"])
+        assert await failing.transcode(io.BytesIO(b"x" * 1000), "song.mp3", report) is None
+        assert failing.get_stats()["failures"] == 1
+
+        growing = AudioTranscoder(command=[sys.executable, "-c", "import sys; sys.stdout.write('y' * 5000)"])
+        assert await growing.transcode(io.BytesIO(b"x" * 1000), "song.mp3", report) is None
+
+        assert report.skipped == 2
+        assert report.files == 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        """Test that no more than max_concurrency encoders run at once."""
+        transcoder = AudioTranscoder(command=DOWNSAMPLE, max_concurrency=2)
+        running = 0
+        peak = 0
+        encode = transcoder._encode
+
+        async def tracked(*args):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            try:
+                return await encode(*args)
+            finally:
+                running -= 1
+
+        transcoder._encode = tracked
+        results = await asyncio.gather(*[
+            transcoder.transcode(io.BytesIO(b"\x01" * 100000), f"chunk_{i}.wav") for i in range(6)
+        ])
+
+        assert peak == 2
+        assert all(result.transcoded_bytes == 12500 for result in results)
+        for result in results:
+            result.close()
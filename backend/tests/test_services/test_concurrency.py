@@ -0,0 +1,94 @@
+"""
+Tests for the adaptive (AIMD) concurrency limiter guarding LLM calls.
+"""
+import asyncio
+import time
+import pytest
+
+from app.services.concurrency import AdaptiveConcurrencyLimiter, parse_retry_after
+
+
+class ThrottledError(Exception):
+    def __init__(self, status: int, retry_after: float = None):
+        super().__init__(f"OpenRouter API error {status}: slow down")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Test suite for AdaptiveConcurrencyLimiter (local gate only, no Redis)."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_limits_concurrent_calls(self):
+        """Test that no more than `limit` calls run at once and the rest queue."""
+        limiter = AdaptiveConcurrencyLimiter(name="test", initial_limit=3, max_limit=3)
+        running = 0
+        peak = 0
+
+        async def call():
+            nonlocal running, peak
+            async with limiter.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*[call() for _ in range(12)])
+
+        stats = limiter.get_stats()
+        assert peak == 3
+        assert stats["acquired"] == 12
+        assert stats["in_flight"] == 0
+        assert stats["queue_depth"] == 0
+        assert stats["wait_ms_max"] > 0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_aimd_adjusts_limit(self):
+        """Test additive increase on success and multiplicative decrease on 429/5xx."""
+        limiter = AdaptiveConcurrencyLimiter(name="test", initial_limit=4, max_limit=16, decrease_interval=0)
+
+        # +1/limit per success: a little over one window of successes adds one slot
+        for _ in range(6):
+            async with limiter.slot():
+                pass
+        assert limiter.limit == 5
+
+        with pytest.raises(ThrottledError):
+            async with limiter.slot():
+                raise ThrottledError(429)
+        assert limiter.limit == 2
+
+        # Errors without an upstream status leave the limit alone
+        with pytest.raises(ValueError):
+            async with limiter.slot():
+                raise ValueError("bad prompt")
+        assert limiter.limit == 2
+        assert limiter.get_stats()["throttled"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_retry_after_pauses_new_calls(self):
+        """Test that a Retry-After delay holds back the next acquisition."""
+        limiter = AdaptiveConcurrencyLimiter(name="test", initial_limit=4)
+
+        with pytest.raises(ThrottledError):
+            async with limiter.slot():
+                raise ThrottledError(503, retry_after=0.1)
+
+        started = time.monotonic()
+        async with limiter.slot():
+            pass
+
+        assert time.monotonic() - started >= 0.09
+        assert limiter.get_stats()["cooldowns"] == 1
+
+    @pytest.mark.unit
+    def test_parse_retry_after(self):
+        """Test delta-seconds, HTTP-date and invalid Retry-After values."""
+        assert parse_retry_after("7") == 7.0
+        assert parse_retry_after("9999") == 300.0
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+        assert parse_retry_after("soon") is None
+        assert parse_retry_after(None) is None
@@ -0,0 +1,90 @@
+"""
+Tests for the pooled HTTP session shared by outbound API clients.
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.http_pool import PooledHTTPSession
+
+
+class TestPooledHTTPSession:
+    """Test suite for PooledHTTPSession."""
+
+    @staticmethod
+    async def _start_server() -> TestServer:
+        """Start a local HTTP server answering every request with a small JSON body."""
+        async def handler(request):
+            return web.json_response({"ok": True})
+
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", handler)
+        server = TestServer(app)
+        await server.start_server()
+        return server
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_session_is_reused(self):
+        """Test that the same session is returned on repeated calls."""
+        pool = PooledHTTPSession(name="test")
+
+        first = await pool.get_session()
+        second = await pool.get_session()
+
+        assert first is second
+        await pool.close()
+        assert pool.get_stats()["open"] is False
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_connections_are_kept_alive(self):
+        """Test that sequential requests reuse one keep-alive connection."""
+        server = await self._start_server()
+        pool = PooledHTTPSession(name="test", limit_per_host=4)
+        session = await pool.get_session()
+
+        for _ in range(3):
+            async with session.get(str(server.make_url("/ping"))) as response:
+                assert response.status == 200
+                await response.json()
+
+        stats = pool.get_stats()
+        assert stats["requests"] == 3
+        assert stats["connections_created"] == 1
+        assert stats["connections_reused"] == 2
+        assert stats["idle_connections"] == 1
+        assert stats["active_connections"] == 0
+        assert stats["reuse_ratio"] == pytest.approx(2 / 3, abs=1e-3)
+
+        await pool.close()
+        await server.close()
+
+    @pytest.mark.unit
+    def test_session_from_old_loop_is_closed(self):
+        """Test that moving to a new event loop closes the old session and its connections."""
+        pool = PooledHTTPSession(name="test")
+
+        async def open_session():
+            server = await self._start_server()
+            session = await pool.get_session()
+            async with session.get(str(server.make_url("/ping"))) as response:
+                await response.json()
+            await server.close()
+            return session
+
+        old_loop = asyncio.new_event_loop()
+        old_session = old_loop.run_until_complete(open_session())
+        connector = old_session.connector
+        old_loop.close()
+
+        new_loop = asyncio.new_event_loop()
+        try:
+            new_session = new_loop.run_until_complete(pool.get_session())
+            assert new_session is not old_session
+            assert old_session.closed and connector.closed
+            new_loop.run_until_complete(pool.close())
+        finally:
+            new_loop.close()
@@ -0,0 +1,179 @@
+"""
+Tests for batch image generation jobs.
+"""
+import asyncio
+import copy
+
+import pytest
+
+from app.services.image_batch import ImageBatchService
+from app.services.replicate_client import Prediction
+
+PROJECT_ID = "00000000-0000-0000-0000-000000000001"
+
+
+def _scene(n: int, prompted: bool = True):
+    return {
+        "id": f"scene-{n}",
+        "scene_id": n,
+        "prompt_status": "completed" if prompted else "pending",
+        "visual_prompt_data": {
+            "scene_id": n, "image_prompt": f"prompt {n}", "style_notes": "", "negative_prompt": "",
+            "setting": "", "shot_type": "", "mood": "", "color_palette": ""
+        } if prompted else None
+    }
+
+
+class FakeDB:
+    """In-memory stand-in for the project, scene, image and job tables."""
+
+    def __init__(self, scenes, images=None):
+        self.scenes = scenes
+        self.images = list(images or [])
+        self.jobs = []
+        self.job_updates = []
+
+    def get_project(self, project_id):
+        return {"id": PROJECT_ID, "selected_reference_images": {"artist-1": "https://ref/a.jpg"}}
+
+    def get_project_scenes(self, project_id):
+        return self.scenes
+
+    def get_project_images(self, project_id):
+        return self.images
+
+    def get_project_jobs(self, project_id):
+        return self.jobs
+
+    def create_image(self, image_data):
+        row = {"id": f"image-{len(self.images)}", **image_data}
+        self.images.append(row)
+        return row
+
+    def update_job(self, job_id, updates):
+        self.job_updates.append(copy.deepcopy(updates))
+
+
+class FakeRehost:
+    """Records the images handed off for rehosting."""
+
+    def __init__(self):
+        self.images = []
+
+    def rehost_image_in_background(self, image):
+        self.images.append(image)
+
+
+class FakeImageService:
+    """Records concurrency and fails the scenes it is told to."""
+
+    def __init__(self, fail_scenes=()):
+        self.fail_scenes = set(fail_scenes)
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+
+    async def generate_image_from_prompt(self, visual_prompt, reference_image_url=None, tracking=None, on_prediction=None):
+        self.calls.append((visual_prompt.scene_id, reference_image_url, tracking))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            on_prediction(Prediction(id=f"p{visual_prompt.scene_id}", status="starting"))
+            await asyncio.sleep(0.01)
+            if visual_prompt.scene_id in self.fail_scenes:
+                raise Exception("Image generation failed: NSFW content detected")
+            return {
+                "image_urls": [f"https://replicate.delivery/{visual_prompt.scene_id}.png"],
+                "generation_metadata": {"prediction_id": f"p{visual_prompt.scene_id}"}
+            }
+        finally:
+            self.active -= 1
+
+
+class TestImageBatchService:
+    """Test suite for ImageBatchService."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_generates_prompted_scenes_under_concurrency_cap(self):
+        """Test that only prompted scenes are generated, at most `concurrency` at once, each persisted."""
+        db = FakeDB([_scene(n) for n in range(1, 9)] + [_scene(9, prompted=False)])
+        images = FakeImageService()
+        rehost = FakeRehost()
+        service = ImageBatchService(db=db, image_service=images, concurrency=3, rehost=rehost)
+
+        progress = await service.run(PROJECT_ID, "job-1")
+
+        assert images.peak == 3
+        assert sorted(call[0] for call in images.calls) == list(range(1, 9))
+        assert all(call[1] == "https://ref/a.jpg" and call[2]["job_id"] == "job-1" for call in images.calls)
+        assert len(db.images) == 8 and all(image["status"] == "completed" for image in db.images)
+        assert db.images[0]["replicate_prediction_id"].startswith("p")
+        assert rehost.images == db.images
+        assert (progress["total"], progress["completed"], progress["failed"]) == (8, 8, 0)
+        assert "scene-9" not in progress["scenes"]
+
+        final = db.job_updates[-1]
+        assert (final["status"], final["progress"]) == ("completed", 100)
+        scene_1 = final["payload_json"]["scenes"]["scene-1"]
+        image_1 = next(image for image in db.images if image["scene_id"] == "scene-1")
+        assert scene_1 == {"scene_id": 1, "status": "completed", "prediction_id": "p1", "image_id": image_1["id"]}
+        assert not service.is_running(PROJECT_ID)
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_per_scene_progress(self):
+        """Test that each scene is reported generating (with its prediction ID) before it completes."""
+        db = FakeDB([_scene(1), _scene(2)])
+        service = ImageBatchService(db=db, image_service=FakeImageService(), concurrency=1, rehost=FakeRehost())
+
+        await service.run(PROJECT_ID, "job-1")
+
+        states = [update["payload_json"]["scenes"]["scene-2"] for update in db.job_updates]
+        statuses = [state["status"] for state in states]
+        assert statuses.index("pending") < statuses.index("generating") < statuses.index("completed")
+        assert any(state.get("prediction_id") == "p2" and state["status"] == "generating" for state in states)
+        assert [update["progress"] for update in db.job_updates if "progress" in update][-1] == 100
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_resubmitting_skips_scenes_with_images(self):
+        """Test that a partially failed job can be re-run and only retries the failed scenes."""
+        db = FakeDB([_scene(n) for n in range(1, 5)])
+        first = await ImageBatchService(db=db, image_service=FakeImageService(fail_scenes={2, 4}), concurrency=2, rehost=FakeRehost()).run(PROJECT_ID, "job-1")
+
+        assert (first["completed"], first["failed"]) == (2, 2)
+        assert first["scenes"]["scene-2"]["status"] == "failed" and "NSFW" in first["scenes"]["scene-2"]["error"]
+        assert db.job_updates[-1]["status"] == "failed"
+
+        retry_images = FakeImageService()
+        second = await ImageBatchService(db=db, image_service=retry_images, concurrency=2, rehost=FakeRehost()).run(PROJECT_ID, "job-2")
+
+        assert sorted(call[0] for call in retry_images.calls) == [2, 4]
+        assert (second["total"], second["completed"], second["skipped"]) == (2, 2, 2)
+        assert second["scenes"]["scene-1"]["status"] == "skipped"
+        assert len(db.images) == 4
+        assert db.job_updates[-1]["status"] == "completed"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_claim_rejects_duplicate_jobs(self):
+        """Test that a project can only be claimed once, including when another worker's job is active."""
+        db = FakeDB([_scene(1)])
+        service = ImageBatchService(db=db, image_service=FakeImageService(), concurrency=1, rehost=FakeRehost())
+
+        assert service.claim(PROJECT_ID)
+        assert not service.claim(PROJECT_ID)
+        await service.run(PROJECT_ID, "job-1")
+        assert not service.is_running(PROJECT_ID)
+
+        db.jobs = [
+            {"id": "job-1", "type": "generate_images", "status": "completed"},
+            {"id": "job-0", "type": "transcribe", "status": "running"}
+        ]
+        assert service.claim(PROJECT_ID)
+        service.release(PROJECT_ID)
+
+        db.jobs.append({"id": "job-2", "type": "generate_images", "status": "pending"})
+        assert not service.claim(PROJECT_ID)
+        assert not service.is_running(PROJECT_ID)
@@ -0,0 +1,122 @@
+"""
+Tests for the image generation result cache.
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.models_pydantic import VisualPrompt
+from app.services.image_cache import ImageResultCache
+from app.services.image_generation import ImageGenerationService
+from app.services.replicate_client import Prediction
+from app.services.response_cache import ResponseCache
+
+
+def _prompt(scene_id: int = 1, text: str = "neon alley at night") -> VisualPrompt:
+    return VisualPrompt(
+        scene_id=scene_id, image_prompt=text, style_notes="", negative_prompt="blurry",
+        setting="", shot_type="", mood="", color_palette=""
+    )
+
+
+class FakeReplicateClient:
+    """Counts predictions instead of calling Replicate."""
+
+    def __init__(self):
+        self.runs = 0
+
+    async def run(self, model, input, tracking=None, on_created=None, timeout=None):
+        self.runs += 1
+        await asyncio.sleep(0.01)
+        return Prediction(id=f"p{self.runs}", status="succeeded", model=model, output=[f"https://replicate.delivery/{self.runs}.png"])
+
+
+async def _reference_server(images: dict) -> TestServer:
+    async def serve(request):
+        return web.Response(body=images[request.match_info["name"]])
+
+    app = web.Application()
+    app.router.add_get("/{name}", serve)
+    server = TestServer(app)
+    await server.start_server()
+    return server
+
+
+def _service(cache: ImageResultCache) -> ImageGenerationService:
+    service = ImageGenerationService(api_token="test-token", result_cache=cache)
+    service.client = FakeReplicateClient()
+    return service
+
+
+class TestImageResultCache:
+    """Test suite for cached image generation."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_identical_request_is_served_from_cache(self):
+        """Test that a repeated request skips Replicate and reports a cache hit for the new scene."""
+        cache = ImageResultCache(response_cache=ResponseCache(namespace="test-images"))
+        service = _service(cache)
+
+        first = await service.generate_image_from_prompt(_prompt(scene_id=1))
+        second = await service.generate_image_from_prompt(_prompt(scene_id=7))
+
+        assert service.client.runs == 1
+        assert second["image_urls"] == first["image_urls"]
+        assert (first["generation_metadata"]["cache_hit"], second["generation_metadata"]["cache_hit"]) == (False, True)
+        assert second["generation_metadata"]["scene_id"] == 7
+
+        await cache.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_key_covers_prompt_and_parameters(self):
+        """Test that a different prompt, seed or aspect ratio is a miss and concurrent duplicates share one run."""
+        cache = ImageResultCache(response_cache=ResponseCache(namespace="test-images"))
+        service = _service(cache)
+
+        await asyncio.gather(*[service.generate_image_from_prompt(_prompt()) for _ in range(5)])
+        assert service.client.runs == 1
+
+        await service.generate_image_from_prompt(_prompt(text="rooftop at dawn"))
+        await service.generate_image_from_prompt(_prompt(), custom_params={"seed": 42})
+        await service.generate_image_from_prompt(_prompt(), custom_params={"aspect_ratio": "9:16"})
+        assert service.client.runs == 4
+
+        await cache.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_force_new_variation_replaces_cached_image(self):
+        """Test that forcing a new variation always generates and later requests get the new image."""
+        cache = ImageResultCache(response_cache=ResponseCache(namespace="test-images"))
+        service = _service(cache)
+
+        await service.generate_image_from_prompt(_prompt())
+        forced = await service.generate_image_from_prompt(_prompt(), force_new_variation=True)
+        again = await service.generate_image_from_prompt(_prompt())
+
+        assert service.client.runs == 2
+        assert again["image_urls"] == forced["image_urls"]
+
+        await cache.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_reference_image_keyed_by_content(self):
+        """Test that reference images are keyed by their bytes, not their URL."""
+        server = await _reference_server({"a.jpg": b"artist photo", "copy.jpg": b"artist photo", "b.jpg": b"other photo"})
+        cache = ImageResultCache(response_cache=ResponseCache(namespace="test-images"))
+        service = _service(cache)
+
+        await service.generate_image_from_prompt(_prompt(), reference_image_url=str(server.make_url("/a.jpg")))
+        await service.generate_image_from_prompt(_prompt(), reference_image_url=str(server.make_url("/copy.jpg")))
+        assert service.client.runs == 1
+
+        await service.generate_image_from_prompt(_prompt(), reference_image_url=str(server.make_url("/b.jpg")))
+        assert service.client.runs == 2
+
+        await cache.close()
+        await server.close()
@@ -0,0 +1,112 @@
+"""
+Tests for derivative images and blurhash placeholders.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.image_derivatives import BASE83_CHARS, ImageDerivativesService, blurhash_encode, render_derivatives
+
+
+def _png(width: int = 1280, height: int = 720) -> bytes:
+    gradient = np.linspace(0, 255, width, dtype=np.uint8)
+    rgb = np.stack([np.tile(gradient, (height, 1))] * 3, axis=-1)
+    output = BytesIO()
+    Image.fromarray(rgb).save(output, format="PNG")
+    return output.getvalue()
+
+
+def _base83_decode(text: str) -> int:
+    value = 0
+    for char in text:
+        value = value * 83 + BASE83_CHARS.index(char)
+    return value
+
+
+class FakeDB:
+    def __init__(self):
+        self.images = {}
+
+    def update_image(self, image_id, data):
+        self.images.setdefault(image_id, {}).update(data)
+
+
+class FakeStorage:
+    """Serves the original and keeps uploads in memory."""
+
+    def __init__(self, original: bytes):
+        self.original = original
+        self.objects = {}
+
+    async def download(self, url):
+        return self.original
+
+    async def upload(self, path, data, content_type):
+        self.objects[path] = (data, content_type)
+        return f"https://storage.example/{path}"
+
+
+class TestImageDerivatives:
+    """Test suite for the derivatives stage."""
+
+    @pytest.mark.unit
+    def test_variants_sizes_and_formats(self):
+        """Test that each variant keeps 16:9, fits its size and decodes in its format."""
+        rendered = render_derivatives(_png())
+
+        assert sorted(rendered["variants"]) == ["256.avif", "256.webp", "768.avif", "768.webp"]
+        for name, data in rendered["variants"].items():
+            size, ext = name.split(".")
+            image = Image.open(BytesIO(data))
+            assert image.format == ext.upper()
+            assert image.size == (int(size), int(size) * 9 // 16)
+        assert len(rendered["variants"]["256.webp"]) < len(_png()) // 10
+
+    @pytest.mark.unit
+    def test_blurhash_of_solid_colour(self):
+        """Test the blurhash layout, that a flat image keeps its colour as DC, and parity with the reference encoder."""
+        rgb = np.full((18, 32, 3), (200, 40, 90), dtype=np.uint8)
+
+        blurhash = blurhash_encode(rgb, 4, 3)
+
+        assert len(blurhash) == 4 + 2 * 4 * 3
+        assert _base83_decode(blurhash[0]) == 3 + 2 * 9
+        assert _base83_decode(blurhash[2:6]) == (200 << 16) + (40 << 8) + 90
+        # Same string as the reference (woltapp) encoder
+        assert blurhash == "LAM_Ai=2fQ=2||o2fQo2fQfQfQfQ"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_derivatives_stored_next_to_original(self):
+        """Test that variants are uploaded beside the original and recorded on the image row."""
+        storage = FakeStorage(_png())
+        db = FakeDB()
+        service = ImageDerivativesService(db=db, storage=storage, executor=ThreadPoolExecutor(max_workers=1))
+
+        update = await service.create_for_image("img-1", "https://storage.example/generated/ab/abc.png", "generated/ab/abc.png")
+
+        assert sorted(storage.objects) == [
+            "generated/ab/abc_256.avif", "generated/ab/abc_256.webp", "generated/ab/abc_768.avif", "generated/ab/abc_768.webp"
+        ]
+        assert storage.objects["generated/ab/abc_256.webp"][1] == "image/webp"
+        assert db.images["img-1"] == update
+        assert update["derivatives"]["768"]["avif"] == "https://storage.example/generated/ab/abc_768.avif"
+        assert len(update["blurhash"]) == 28
+        assert service.get_stats()["images"] == 1
+
+        await service.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_unreadable_image_is_logged_not_raised(self):
+        """Test that a corrupt original leaves the row untouched."""
+        db = FakeDB()
+        service = ImageDerivativesService(db=db, storage=FakeStorage(b"not an image"), executor=ThreadPoolExecutor(max_workers=1))
+
+        assert await service.create_for_image("img-1", "https://x/y.png", "generated/ab/abc.png") is None
+        assert db.images == {} and service.get_stats()["failed"] == 1
+
+        await service.close()
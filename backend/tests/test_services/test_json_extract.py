@@ -0,0 +1,107 @@
+"""
+Tests for tolerant JSON extraction from LLM completions.
+"""
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from app.models_pydantic import VisualPrompt
+from app.services.openrouter import OpenRouterService
+from app.utils.json_extract import ExtractionStats, JSONExtractionError, extract_json, parse_llm_json
+
+
+PROMPT = {
+    "scene_id": 1, "image_prompt": "A neon street, {night}", "style_notes": "", "negative_prompt": "",
+    "setting": "street", "shot_type": "wide", "mood": "tense", "color_palette": "blue"
+}
+
+
+def _scene_json(scene_id: int) -> str:
+    return (
+        f'{{"scene_id": {scene_id}, "title": "Scene {scene_id}", "start_time": 0, "end_time": 10, "duration": 10, '
+        f'"source_segments": [0], "lyrics_excerpt": "", "theme": "", "energy_level": 5, '
+        f'"visual_potential": 5, "narrative_importance": 5, "reasoning": ""}}'
+    )
+
+
+class TestJSONExtract:
+    """Test suite for extract_json and parse_llm_json."""
+
+    @pytest.mark.unit
+    def test_fenced_and_prose_wrapped_json(self):
+        """Test that fences and surrounding prose are ignored."""
+        assert extract_json('```json\n{"a": 1}\n```') == ({"a": 1}, "clean")
+        assert extract_json('Sure! Here you go:\n{"a": "}", "b": [1, 2]}\nHope this helps.') == ({"a": "}", "b": [1, 2]}, "extracted")
+
+    @pytest.mark.unit
+    def test_trailing_commas_are_repaired(self):
+        """Test that commas before closing brackets are removed outside strings."""
+        data, outcome = extract_json('{"a": [1, 2,], "b": "x,]",}')
+
+        assert outcome == "repaired"
+        assert data == {"a": [1, 2], "b": "x,]"}
+
+    @pytest.mark.unit
+    def test_truncated_array_keeps_complete_elements(self):
+        """Test that a response cut off mid-element keeps the elements before it."""
+        content = '{"items": [{"id": 1}, {"id": 2}, {"id": 3, "name": "thi'
+        data, outcome = extract_json(content)
+
+        assert outcome == "truncated"
+        assert data == {"items": [{"id": 1}, {"id": 2}]}
+
+    @pytest.mark.unit
+    def test_unrecoverable_content_raises(self):
+        """Test that content with no JSON raises JSONExtractionError."""
+        with pytest.raises(JSONExtractionError):
+            extract_json("I cannot help with that.")
+        with pytest.raises(JSONExtractionError):
+            extract_json('{"a": "never closed')
+
+    @pytest.mark.unit
+    def test_parse_validates_model(self):
+        """Test Pydantic validation of the recovered value."""
+        prompt = parse_llm_json("Here it is: " + json.dumps(PROMPT), VisualPrompt)
+        assert prompt.image_prompt == "A neon street, {night}"
+
+        with pytest.raises(ValidationError):
+            parse_llm_json('{"scene_id": 1}', VisualPrompt)
+
+    @pytest.mark.unit
+    def test_truncated_scene_selection_is_salvaged(self):
+        """Test that scene selection keeps the scenes parsed before truncation."""
+        content = '{"song_themes": ["loss"], "energy_arc": "rising", "selected_scenes": [' + _scene_json(1) + ", " + _scene_json(2) + ', {"scene_id": 3, "tit'
+        service = OpenRouterService.__new__(OpenRouterService)
+
+        result = service._parse_scene_selection(content)
+
+        assert [scene.scene_id for scene in result.selected_scenes] == [1, 2]
+        assert result.total_scenes_selected == 2
+        assert result.average_scene_length == 10
+        assert result.song_themes == ["loss"]
+
+    @pytest.mark.unit
+    def test_truncation_after_nested_array_drops_partial_scene(self):
+        """Test that a cut just after a scene's source_segments closes doesn't keep the half-written scene."""
+        content = '{"song_themes": ["loss"], "energy_arc": "rising", "selected_scenes": [' + _scene_json(1) + ', {"scene_id": 2, "source_segments": [3, 4]'
+        service = OpenRouterService.__new__(OpenRouterService)
+
+        data, outcome = extract_json(content)
+        result = service._parse_scene_selection(content)
+
+        assert outcome == "truncated"
+        assert [scene["scene_id"] for scene in data["selected_scenes"]] == [1]
+        assert [scene.scene_id for scene in result.selected_scenes] == [1]
+
+    @pytest.mark.unit
+    def test_stats_count_outcomes(self):
+        """Test the outcome counters and recovered ratio."""
+        stats = ExtractionStats()
+        for outcome in ("clean", "clean", "repaired", "failed"):
+            stats.record(outcome)
+
+        summary = stats.get_stats()
+        assert summary["total"] == 4
+        assert summary["repaired"] == 1
+        assert summary["recovered_ratio"] == 0.25
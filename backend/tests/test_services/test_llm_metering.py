@@ -0,0 +1,116 @@
+"""
+Tests for per-call LLM metering: tags, cost, aggregation and batched flushing.
+"""
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.llm_metering import LLMMeter, compute_cost, current_llm_call_tags, llm_call_tags
+from app.services.openrouter import OpenRouterService
+
+
+class TestLLMMeter:
+    """Test suite for LLMMeter and the call tag context."""
+
+    @pytest.mark.unit
+    def test_tags_nest_and_reset(self):
+        """Test that nested tag blocks merge and are undone on exit."""
+        with llm_call_tags(project_id="p1", job_id="j1"):
+            with llm_call_tags(job_id="j2", scene_id=4):
+                assert current_llm_call_tags() == {"project_id": "p1", "job_id": "j2", "scene_id": "4"}
+            assert current_llm_call_tags() == {"project_id": "p1", "job_id": "j1"}
+        assert current_llm_call_tags() == {}
+
+    @pytest.mark.unit
+    def test_record_cost_and_aggregates(self):
+        """Test cost from the price table, reported cost precedence and per stage/model totals."""
+        assert compute_cost("openai/gpt-4o-mini", 1_000_000, 1_000_000) == pytest.approx(0.75)
+        assert compute_cost("unknown/model", 100, 100) is None
+
+        meter = LLMMeter(sink="none")
+        with llm_call_tags(project_id="p1", job_id="j1", scene_id=3):
+            record = meter.record("openai/gpt-4o-mini", "visual_prompt", "ok", 800.0, ttfb_ms=200.0,
+                                  usage={"prompt_tokens": 1000, "completion_tokens": 500})
+        meter.record("openai/gpt-4o-mini", "visual_prompt", "ok", 1200.0,
+                     usage={"prompt_tokens": 10, "completion_tokens": 10, "cost": 0.5})
+        meter.record("openai/gpt-4o-mini", "visual_prompt", "error", 50.0, error="OpenRouter API error 503")
+
+        assert (record.project_id, record.job_id, record.tags) == ("p1", "j1", {"scene_id": "3"})
+        assert record.cost_usd == pytest.approx(0.00045)
+
+        stats = meter.get_stats()["by_stage_model"]["visual_prompt/openai/gpt-4o-mini"]
+        assert stats["calls"] == 3
+        assert stats["errors"] == 1
+        assert stats["completion_tokens"] == 510
+        assert stats["cost_usd"] == pytest.approx(0.50045)
+        assert stats["ttfb_p50_ms"] == 200.0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_batches_flush_to_writer(self):
+        """Test automatic flushing at batch_size and counting of failed batches."""
+        written = []
+
+        async def writer(rows):
+            written.append(rows)
+
+        meter = LLMMeter(writer=writer, batch_size=3)
+        for _ in range(3):
+            meter.record("m", "scene_selection", "ok", 100.0)
+        await asyncio.sleep(0)
+        await meter.close()
+
+        assert [len(rows) for rows in written] == [3]
+        assert written[0][0]["stage"] == "scene_selection"
+
+        async def failing_writer(rows):
+            raise Exception("table unavailable")
+
+        meter = LLMMeter(writer=failing_writer)
+        meter.record("m", "scene_selection", "ok", 100.0)
+        assert await meter.flush() == 0
+        assert meter.get_stats()["flush_failures"] == 1
+        assert meter.get_stats()["buffered"] == 0
+
+    @staticmethod
+    async def _start_server() -> TestServer:
+        """Start a server answering chat completions with a usage block."""
+        async def handler(request):
+            body = await request.json()
+            assert body["usage"] == {"include": True}
+            return web.json_response({
+                "choices": [{"message": {"content": "ok"}}],
+                "usage": {"prompt_tokens": 120, "completion_tokens": 30, "cost": 0.0001}
+            })
+
+        app = web.Application()
+        app.router.add_post("/chat/completions", handler)
+        server = TestServer(app)
+        await server.start_server()
+        return server
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_service_meters_each_call(self):
+        """Test that an OpenRouter call is recorded with its stage, tags, tokens and timings."""
+        server = await self._start_server()
+        meter = LLMMeter(sink="none")
+        service = OpenRouterService(api_key="test-key", meter=meter)
+        service.base_url = str(server.make_url("")).rstrip("/")
+        payload = {"model": "openai/gpt-4o-mini", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 10}
+
+        try:
+            with llm_call_tags(project_id="p1", job_id="j1"):
+                await service._post_with_retry_policy(payload, stage="motion_prompt")
+        finally:
+            await service.close()
+            await server.close()
+
+        stats = service.get_stats()["metering"]
+        call = stats["by_stage_model"]["motion_prompt/openai/gpt-4o-mini"]
+        assert call["calls"] == 1
+        assert call["prompt_tokens"] == 120
+        assert call["cost_usd"] == pytest.approx(0.0001)
+        assert call["ttfb_p50_ms"] <= call["latency_p50_ms"]
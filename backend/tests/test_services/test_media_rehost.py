@@ -0,0 +1,185 @@
+"""
+Tests for rehosting generated media into storage.
+"""
+import asyncio
+import hashlib
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.image_cache import ImageResultCache
+from app.services.media_rehost import MediaRehostService, RehostError
+from app.services.response_cache import ResponseCache
+
+
+class FakeDB:
+    """In-memory stand-in for the generated_images and video_clips tables."""
+
+    def __init__(self):
+        self.images = {}
+        self.clips = {}
+
+    def update_image(self, image_id, data):
+        self.images.setdefault(image_id, {}).update(data)
+
+    def update_video_clip(self, clip_id, data):
+        self.clips.setdefault(clip_id, {}).update(data)
+
+
+class FakeDerivatives:
+    """Records the stored images handed to the derivatives stage."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def create_for_image(self, image_id, url, storage_path):
+        self.calls.append((image_id, url, storage_path))
+
+
+class FakeOrigin:
+    """Serves Replicate-style outputs and enough of the Storage API to rehost them."""
+
+    def __init__(self, files, delay: float = 0.0):
+        self.files = files
+        self.delay = delay
+        self.objects = {}
+        self.active_downloads = 0
+        self.peak_downloads = 0
+
+    async def download(self, request):
+        name = request.match_info["name"]
+        if name not in self.files:
+            return web.Response(status=404)
+        self.active_downloads += 1
+        self.peak_downloads = max(self.peak_downloads, self.active_downloads)
+        try:
+            response = web.StreamResponse(headers={"Content-Type": "image/png"})
+            await response.prepare(request)
+            data = self.files[name]
+            for i in range(0, len(data), 1000):
+                await response.write(data[i:i + 1000])
+                await asyncio.sleep(self.delay)
+            await response.write_eof()
+            return response
+        finally:
+            self.active_downloads -= 1
+
+    async def upload(self, request):
+        assert request.headers["Authorization"] == "Bearer service-key"
+        self.objects[request.match_info["path"]] = await request.read()
+        return web.json_response({"Key": request.match_info["path"]})
+
+    async def move(self, request):
+        body = await request.json()
+        if body["sourceKey"] not in self.objects:
+            return web.json_response({"statusCode": "404", "error": "not_found", "message": "Object does not exist"}, status=400)
+        if body["destinationKey"] in self.objects:
+            return web.json_response({"error": "Duplicate", "message": "The resource already exists"}, status=409)
+        self.objects[body["destinationKey"]] = self.objects.pop(body["sourceKey"])
+        return web.json_response({"message": "Successfully moved"})
+
+    async def delete(self, request):
+        for prefix in (await request.json())["prefixes"]:
+            self.objects.pop(prefix, None)
+        return web.json_response([])
+
+    async def start(self) -> TestServer:
+        app = web.Application()
+        app.router.add_get("/delivery/{name}", self.download)
+        app.router.add_post("/storage/v1/object/move", self.move)
+        app.router.add_post("/storage/v1/object/{bucket}/{path:.*}", self.upload)
+        app.router.add_delete("/storage/v1/object/{bucket}", self.delete)
+        server = TestServer(app)
+        await server.start_server()
+        return server
+
+
+def _service(server: TestServer, db: FakeDB, **kwargs) -> MediaRehostService:
+    kwargs.setdefault("derivatives", FakeDerivatives())
+    return MediaRehostService(db=db, storage_url=str(server.make_url("")), storage_key="service-key", bucket="project-files", **kwargs)
+
+
+class TestMediaRehostService:
+    """Test suite for MediaRehostService."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_image_rehosted_under_content_hash(self, monkeypatch):
+        """Test that an image is stored at its hash path, the row and cache entry are repointed, and duplicates dedupe."""
+        png = b"\x89PNG" + bytes(range(256)) * 40
+        origin = FakeOrigin({"a.png": png, "a-again.png": png})
+        server = await origin.start()
+        db = FakeDB()
+        service = _service(server, db)
+        cache = ImageResultCache(response_cache=ResponseCache(namespace="test-images"))
+        monkeypatch.setattr("app.services.image_cache.image_result_cache", cache)
+
+        source = str(server.make_url("/delivery/a.png"))
+        await cache.response_cache.set("key-1", {"image_urls": [source], "generation_metadata": {}})
+        stored = await service.rehost_image({"id": "img-1", "image_url": source, "generation_metadata": {"cache_key": "key-1"}})
+
+        digest = hashlib.sha256(png).hexdigest()
+        assert stored["path"] == f"generated/{digest[:2]}/{digest}.png"
+        assert origin.objects == {stored["path"]: png}
+        assert db.images["img-1"] == {"image_url": stored["url"], "source_url": source, "storage_path": stored["path"]}
+        assert service.is_rehosted(stored["url"])
+        assert (await cache.response_cache.get("key-1"))[1]["image_urls"] == [stored["url"]]
+
+        again = await service.rehost(str(server.make_url("/delivery/a-again.png")))
+        assert again["deduplicated"] and again["path"] == stored["path"]
+        assert list(origin.objects) == [stored["path"]]
+
+        # An already stored image (e.g. a cache hit on a new row) only gets derivatives
+        assert await service.rehost_image({"id": "img-2", "image_url": stored["url"]}) is None
+        assert service.derivatives.calls == [("img-1", stored["url"], stored["path"]), ("img-2", stored["url"], stored["path"])]
+        assert "img-2" not in db.images
+
+        await service.close()
+        await cache.close()
+        await server.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_background_rehosting_is_bounded(self):
+        """Test that background copies respect the concurrency cap and a failed copy leaves the row alone."""
+        origin = FakeOrigin({f"{i}.png": bytes([i]) * 5000 for i in range(10)}, delay=0.005)
+        server = await origin.start()
+        db = FakeDB()
+        service = _service(server, db, concurrency=3)
+
+        for i in range(10):
+            service.rehost_clip_in_background({"id": f"clip-{i}", "video_url": str(server.make_url(f"/delivery/{i}.png"))})
+        service.rehost_image_in_background({"id": "img-x", "image_url": str(server.make_url("/delivery/missing.png"))})
+        await service.drain()
+
+        assert origin.peak_downloads == 3
+        assert len(db.clips) == 10 and all(clip["video_url"].startswith(service.storage_url) for clip in db.clips.values())
+        assert "img-x" not in db.images
+        stats = service.get_stats()
+        assert (stats["rehosted"], stats["failed"], stats["pending"]) == (10, 1, 0)
+
+        await service.close()
+        await server.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_only_conflicts_count_as_duplicates(self):
+        """Test that a failed move is only treated as dedup when Storage reports a conflict."""
+        origin = FakeOrigin({})
+        server = await origin.start()
+        service = _service(server, FakeDB())
+
+        with pytest.raises(RehostError, match="does not exist"):
+            await service._storage_request(
+                "POST", "/object/move", allow_duplicate=True,
+                json={"bucketId": "project-files", "sourceKey": "generated/tmp/gone.png", "destinationKey": "generated/ab/ab.png"}
+            )
+
+        assert MediaRehostService._is_duplicate(409, "")
+        assert MediaRehostService._is_duplicate(400, '{"statusCode": "409", "error": "Duplicate", "message": "The resource already exists"}')
+        assert not MediaRehostService._is_duplicate(400, '{"statusCode": "404", "error": "not_found", "message": "Object does not exist"}')
+        assert not MediaRehostService._is_duplicate(500, "duplicate key value violates unique constraint")
+
+        await service.close()
+        await server.close()
@@ -0,0 +1,209 @@
+"""
+Tests for latency-aware model routing across LLM stages.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.llm_metering import LLMMeter
+from app.services.model_router import ModelRouter
+from app.services.openrouter import OpenRouterService
+
+
+STAGES = {"visual_prompt": ["deepseek", "gpt-4o-mini", "gemini-flash"]}
+
+
+class TestModelRouter:
+    """Test suite for ModelRouter."""
+
+    @pytest.mark.unit
+    def test_configured_order_without_data(self):
+        """Test that candidates keep their configured order until there is data."""
+        router = ModelRouter(STAGES)
+
+        assert router.candidates("visual_prompt") == ["deepseek", "gpt-4o-mini", "gemini-flash"]
+        with pytest.raises(ValueError):
+            router.candidates("unknown")
+
+    @pytest.mark.unit
+    def test_slow_primary_is_demoted(self):
+        """Test that a primary far slower than an alternative moves behind it."""
+        router = ModelRouter(STAGES, slow_factor=1.5, min_samples=3)
+        for _ in range(3):
+            router.record("visual_prompt", "deepseek", True, 60.0)
+            router.record("visual_prompt", "gpt-4o-mini", True, 20.0)
+
+        assert router.candidates("visual_prompt") == ["gpt-4o-mini", "gemini-flash", "deepseek"]
+
+    @pytest.mark.unit
+    def test_primary_over_latency_budget_is_demoted(self):
+        """Test that a primary over the stage's p95 budget moves behind unmeasured fallbacks."""
+        router = ModelRouter(STAGES, min_samples=3, latency_budgets={"visual_prompt": 30.0})
+        for _ in range(3):
+            router.record("visual_prompt", "deepseek", True, 45.0)
+
+        assert router.candidates("visual_prompt") == ["gpt-4o-mini", "gemini-flash", "deepseek"]
+        assert router.get_stats()["visual_prompt"]["latency_budget_s"] == 30.0
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_fallbacks_get_an_exploration_share(self):
+        """Test that every 1/explore_ratio-th call leads with the least used healthy fallback."""
+        router = ModelRouter(STAGES, explore_ratio=0.25, circuit_failures=1)
+        router.record("visual_prompt", "gemini-flash", False)
+        tried = []
+
+        async def call(model):
+            tried.append(model)
+            return model
+
+        for _ in range(8):
+            await router.run("visual_prompt", call)
+
+        # gemini-flash's circuit is open, so only gpt-4o-mini is explored
+        assert tried == ["deepseek"] * 3 + ["gpt-4o-mini"] + ["deepseek"] * 3 + ["gpt-4o-mini"]
+        assert router.get_stats()["visual_prompt"]["explorations"] == 2
+        assert router.candidates("visual_prompt") == ["deepseek", "gpt-4o-mini", "gemini-flash"]
+
+    @pytest.mark.unit
+    def test_circuit_opens_after_consecutive_failures(self):
+        """Test that a repeatedly failing model is tried last."""
+        router = ModelRouter(STAGES, circuit_failures=2)
+        router.record("visual_prompt", "deepseek", False)
+        router.record("visual_prompt", "deepseek", False)
+
+        assert router.candidates("visual_prompt")[-1] == "deepseek"
+        assert router.get_stats()["visual_prompt"]["models"]["deepseek"]["circuit_open"] is True
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_run_falls_back_on_failure(self):
+        """Test that run() moves to the next candidate when the primary fails."""
+        router = ModelRouter(STAGES)
+        tried = []
+
+        async def call(model):
+            tried.append(model)
+            if model == "deepseek":
+                raise Exception("OpenRouter API error 503: unavailable")
+            return f"prompt from {model}"
+
+        assert await router.run("visual_prompt", call) == "prompt from gpt-4o-mini"
+        assert tried == ["deepseek", "gpt-4o-mini"]
+        assert router.get_stats()["visual_prompt"]["fallbacks"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_run_raises_when_all_fail(self):
+        """Test that the last error propagates when every candidate fails."""
+        router = ModelRouter(STAGES)
+
+        async def call(model):
+            raise Exception(f"{model} down")
+
+        with pytest.raises(Exception, match="gemini-flash down"):
+            await router.run("visual_prompt", call)
+
+
+class SlowGateLimiter:
+    """Limiter whose slots take a while to acquire, like a saturated upstream budget."""
+
+    def __init__(self, wait: float):
+        self.wait = wait
+
+    @asynccontextmanager
+    async def slot(self):
+        await asyncio.sleep(self.wait)
+        yield
+
+    def has_headroom(self) -> bool:
+        return False
+
+    def get_stats(self):
+        return {}
+
+
+class TestRoutedLatency:
+    """Test suite for the latency OpenRouterService reports to its model router."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_limiter_wait_is_not_model_latency(self):
+        """Test that routed calls record each attempt's own latency, not time queued for a slot."""
+        async def handler(request):
+            return web.json_response({"choices": [{"message": {"content": "ok"}}]})
+
+        app = web.Application()
+        app.router.add_post("/chat/completions", handler)
+        server = TestServer(app)
+        await server.start_server()
+        service = OpenRouterService(api_key="test-key", limiter=SlowGateLimiter(0.3), meter=LLMMeter(sink="none"))
+        service.base_url = str(server.make_url("")).rstrip("/")
+        payload = {"messages": [{"role": "user", "content": "hi"}], "max_tokens": 10}
+
+        try:
+            await service._post_chat_completion(payload, stage="visual_prompt")
+        finally:
+            await service.close()
+            await server.close()
+
+        model = service.model_router.candidates("visual_prompt")[0]
+        p95_ms = service.model_router.get_stats()["visual_prompt"]["models"][model]["p95_ms"]
+        assert p95_ms is not None and p95_ms < 300
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_limiter_wait_is_not_prompt_batch_latency(self):
+        """Test that the prompt batcher records the attempt's own latency for its K scenes."""
+        async def handler(request):
+            return web.json_response({
+                "choices": [{"message": {"content": "ok"}}],
+                "usage": {"completion_tokens": 1200}
+            })
+
+        app = web.Application()
+        app.router.add_post("/chat/completions", handler)
+        server = TestServer(app)
+        await server.start_server()
+        service = OpenRouterService(api_key="test-key", limiter=SlowGateLimiter(0.3), meter=LLMMeter(sink="none"))
+        service.base_url = str(server.make_url("")).rstrip("/")
+        payload = {"messages": [{"role": "user", "content": "hi"}], "max_tokens": 10}
+
+        try:
+            await service._post_chat_completion(payload, stage="visual_prompt", scene_count=3)
+        finally:
+            await service.close()
+            await server.close()
+
+        [(scene_count, seconds)] = list(service.prompt_batcher._samples)
+        assert scene_count == 3
+        assert 0 < seconds < 0.3
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_visual_prompt_latency_is_per_scene(self):
+        """Test that a chunk's latency is divided by its scene count before reaching the router."""
+        async def handler(request):
+            await asyncio.sleep(0.2)
+            return web.json_response({"choices": [{"message": {"content": "ok"}}]})
+
+        app = web.Application()
+        app.router.add_post("/chat/completions", handler)
+        server = TestServer(app)
+        await server.start_server()
+        service = OpenRouterService(api_key="test-key", meter=LLMMeter(sink="none"))
+        service.base_url = str(server.make_url("")).rstrip("/")
+        payload = {"messages": [{"role": "user", "content": "hi"}], "max_tokens": 10}
+
+        try:
+            await service._post_chat_completion(payload, stage="visual_prompt", scene_count=4)
+        finally:
+            await service.close()
+            await server.close()
+
+        model = service.model_router.candidates("visual_prompt")[0]
+        p95_ms = service.model_router.get_stats()["visual_prompt"]["models"][model]["p95_ms"]
+        assert 50 <= p95_ms < 150
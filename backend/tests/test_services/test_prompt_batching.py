@@ -0,0 +1,58 @@
+"""
+Tests for chunk-size planning of visual prompt generation.
+"""
+import pytest
+
+from app.services.concurrency import AdaptiveConcurrencyLimiter
+from app.services.prompt_batching import PromptBatchPlanner, split_into_chunks
+
+
+class TestPromptBatchPlanner:
+    """Test suite for PromptBatchPlanner."""
+
+    @pytest.mark.unit
+    def test_split_into_chunks_is_even(self):
+        """Test that chunks are as few and as even as possible."""
+        chunks = split_into_chunks(list(range(10)), 4)
+
+        assert [len(chunk) for chunk in chunks] == [4, 3, 3]
+        assert [item for chunk in chunks for item in chunk] == list(range(10))
+        assert split_into_chunks([], 4) == []
+
+    @pytest.mark.unit
+    def test_individual_when_headroom_is_plentiful(self):
+        """Test that full parallelism (K=1) is chosen when every scene can run at once."""
+        planner = PromptBatchPlanner(limiter=AdaptiveConcurrencyLimiter(name="test", initial_limit=32, max_limit=32))
+
+        assert planner.chunk_size(18) == 1
+
+    @pytest.mark.unit
+    def test_batches_under_load(self):
+        """Test that scenes are batched when few concurrency slots are free."""
+        planner = PromptBatchPlanner(limiter=AdaptiveConcurrencyLimiter(name="test", initial_limit=2, max_limit=2))
+        for _ in range(5):
+            planner.record(1, 10.0)
+            planner.record(4, 16.0)
+
+        overhead, per_scene = planner.latency_model()
+        assert overhead == pytest.approx(8.0)
+        assert per_scene == pytest.approx(2.0)
+
+        assert planner.chunk_size(18) > 1
+        assert planner.get_stats()["last_plan"]["headroom"] == 2
+
+    @pytest.mark.unit
+    def test_output_token_limit_caps_chunk(self):
+        """Test that K never exceeds what fits in the output-token limit."""
+        planner = PromptBatchPlanner(limiter=None, mode="chunked", fixed_chunk_size=8, max_output_tokens=2000)
+        planner.record(2, 10.0, completion_tokens=1600)
+
+        assert planner.max_chunk_for_output_limit() == 2
+        assert planner.chunk_size(18) == 2
+
+    @pytest.mark.unit
+    def test_individual_mode_and_invalid_mode(self):
+        """Test the explicit individual mode and rejection of unknown modes."""
+        assert PromptBatchPlanner(mode="individual").chunk_size(18) == 1
+        with pytest.raises(ValueError):
+            PromptBatchPlanner(mode="batch")
@@ -0,0 +1,210 @@
+"""
+Tests for the async Replicate prediction client.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import itertools
+import threading
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.replicate_client import (
+    AsyncReplicateClient,
+    ReplicatePredictionError,
+    verify_webhook_signature,
+)
+
+
+class FakeStore:
+    """In-memory stand-in for the replicate_predictions table."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def save_replicate_prediction(self, row):
+        self.rows.setdefault(row["id"], {}).update(row)
+
+
+class FakeReplicate:
+    """Local server speaking enough of the predictions API for the client."""
+
+    def __init__(self, polls_to_finish: int = 2, final_status: str = "succeeded", throttle_first: int = 0):
+        self.polls_to_finish = polls_to_finish
+        self.final_status = final_status
+        self.throttle_first = throttle_first
+        self.predictions = {}
+        self.canceled = []
+        self.create_calls = 0
+        self._ids = itertools.count()
+
+    def _body(self, prediction_id):
+        prediction = self.predictions[prediction_id]
+        done = prediction["polls"] >= self.polls_to_finish
+        status = self.final_status if done else "processing"
+        return {
+            "id": prediction_id,
+            "status": status,
+            "output": [f"https://replicate.delivery/{prediction_id}.png"] if status == "succeeded" else None,
+            "error": "NSFW content detected" if status == "failed" else None
+        }
+
+    async def create(self, request):
+        self.create_calls += 1
+        if self.create_calls <= self.throttle_first:
+            return web.json_response({"detail": "throttled"}, status=429, headers={"Retry-After": "0"})
+        body = await request.json()
+        prediction_id = f"p{next(self._ids)}"
+        self.predictions[prediction_id] = {"polls": 0, "input": body["input"], "version": body.get("version")}
+        return web.json_response({"id": prediction_id, "status": "starting"}, status=201)
+
+    async def get(self, request):
+        prediction_id = request.match_info["id"]
+        self.predictions[prediction_id]["polls"] += 1
+        return web.json_response(self._body(prediction_id))
+
+    async def cancel(self, request):
+        self.canceled.append(request.match_info["id"])
+        return web.json_response({"id": request.match_info["id"], "status": "canceled"})
+
+    async def start(self) -> TestServer:
+        app = web.Application()
+        app.router.add_post("/predictions", self.create)
+        app.router.add_post("/models/{owner}/{name}/predictions", self.create)
+        app.router.add_get("/predictions/{id}", self.get)
+        app.router.add_post("/predictions/{id}/cancel", self.cancel)
+        server = TestServer(app)
+        await server.start_server()
+        return server
+
+
+def _client(server: TestServer, store: FakeStore, **kwargs) -> AsyncReplicateClient:
+    client = AsyncReplicateClient(api_token="test-token", store=store, poll_initial_seconds=0.01, poll_max_seconds=0.05, **kwargs)
+    client.API_BASE = str(server.make_url("")).rstrip("/")
+    return client
+
+
+class TestAsyncReplicateClient:
+    """Test suite for AsyncReplicateClient."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_hundreds_of_predictions_without_threads(self):
+        """Test that 200 concurrent predictions complete by polling with no extra threads and are recorded."""
+        fake = FakeReplicate(polls_to_finish=3)
+        server = await fake.start()
+        store = FakeStore()
+        client = _client(server, store)
+        threads_before = threading.active_count()
+
+        created = []
+        predictions = await asyncio.gather(*[
+            client.run("owner/model:abc123", {"prompt": f"scene {i}"}, tracking={"kind": "image", "scene_id": i}, on_created=created.append)
+            for i in range(200)
+        ])
+
+        assert threading.active_count() == threads_before
+        assert all(p.status == "succeeded" and p.output[0].endswith(f"{p.id}.png") for p in predictions)
+        assert len(created) == 200 and all(p.status == "starting" for p in created)
+        assert fake.predictions["p0"]["version"] == "abc123"
+        row = store.rows[predictions[0].id]
+        assert row["status"] == "succeeded" and row["kind"] == "image" and "scene_id" in row["metadata"]
+        stats = client.get_stats()
+        assert (stats["succeeded"], stats["in_flight"]) == (200, 0)
+        assert stats["polls"] == 600
+
+        await client.close()
+        await server.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_throttled_create_is_retried(self):
+        """Test that a 429 on create honours Retry-After and succeeds on the next attempt."""
+        fake = FakeReplicate(polls_to_finish=1, throttle_first=1)
+        server = await fake.start()
+        client = _client(server, FakeStore())
+
+        prediction = await client.run("owner/model", {"prompt": "x"})
+
+        assert prediction.status == "succeeded"
+        assert fake.create_calls == 2
+        assert client.get_stats()["throttled"] == 1
+
+        await client.close()
+        await server.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failed_prediction_raises_and_is_recorded(self):
+        """Test that a failed prediction raises with Replicate's error and is stored as failed."""
+        fake = FakeReplicate(polls_to_finish=1, final_status="failed")
+        server = await fake.start()
+        store = FakeStore()
+        client = _client(server, store)
+
+        with pytest.raises(ReplicatePredictionError, match="NSFW"):
+            await client.run("owner/model", {"prompt": "x"})
+
+        assert store.rows["p0"]["status"] == "failed"
+
+        await client.close()
+        await server.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_timeout_cancels_prediction(self):
+        """Test that a prediction still running at the deadline is canceled."""
+        fake = FakeReplicate(polls_to_finish=10 ** 6)
+        server = await fake.start()
+        store = FakeStore()
+        client = _client(server, store)
+
+        with pytest.raises(ReplicatePredictionError, match="timed out"):
+            await client.run("owner/model", {"prompt": "x"}, timeout=0.2)
+
+        assert fake.canceled == ["p0"]
+        assert store.rows["p0"]["status"] == "canceled"
+
+        await client.close()
+        await server.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_webhook_wakes_wait_but_output_comes_from_api(self):
+        """Test that a webhook delivery triggers an immediate poll and its payload is never trusted."""
+        fake = FakeReplicate(polls_to_finish=1)
+        server = await fake.start()
+        store = FakeStore()
+        client = _client(server, store, webhook_url="https://example.com/api/webhooks/replicate")
+
+        task = asyncio.create_task(client.run("owner/model", {"prompt": "x"}))
+        while not client._webhook_waiters:
+            await asyncio.sleep(0.01)
+
+        assert not client.resolve_webhook({"id": "p-other", "status": "succeeded", "output": ["https://evil/x.png"]})
+        assert "p-other" not in store.rows
+        assert client.resolve_webhook({"id": "p0", "status": "succeeded", "output": ["https://evil/x.png"]})
+        prediction = await asyncio.wait_for(task, timeout=5)
+
+        assert prediction.output == ["https://replicate.delivery/p0.png"]
+        assert client.get_stats()["polls"] == 1
+
+        await client.close()
+        await server.close()
+
+    @pytest.mark.unit
+    def test_webhook_signature(self):
+        """Test signature verification against a correctly signed and a tampered body."""
+        key = b"super-secret-key"
+        secret = "whsec_" + base64.b64encode(key).decode()
+        timestamp = str(int(time.time()))
+        body = b'{"id": "p0", "status": "succeeded"}'
+        digest = base64.b64encode(hmac.new(key, b"msg_1." + timestamp.encode() + b"." + body, hashlib.sha256).digest()).decode()
+
+        assert verify_webhook_signature(secret, "msg_1", timestamp, body, f"v1,{digest}")
+        assert not verify_webhook_signature(secret, "msg_1", timestamp, body + b" ", f"v1,{digest}")
+        assert not verify_webhook_signature(secret, "msg_1", str(int(time.time()) - 3600), body, f"v1,{digest}")
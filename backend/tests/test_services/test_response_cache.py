@@ -0,0 +1,134 @@
+"""
+Tests for the content-addressed response cache used under OpenRouterService.
+"""
+import asyncio
+import pytest
+
+from app.services.response_cache import ResponseCache, LRUCache
+from app.models_pydantic import VisualPrompt
+
+
+class TestResponseCache:
+    """Test suite for ResponseCache (memory tier only, no Redis)."""
+
+    @pytest.fixture
+    def cache(self):
+        return ResponseCache(namespace="test", lru_size=2, redis_url=None)
+
+    @pytest.mark.unit
+    def test_make_key_is_stable(self):
+        """Test that key order in dicts does not change the hash."""
+        key_a = ResponseCache.make_key("model", [{"role": "user", "content": "hi"}], 0.7, 1000)
+        key_b = ResponseCache.make_key("model", [{"content": "hi", "role": "user"}], 0.7, 1000)
+        key_c = ResponseCache.make_key("model", [{"role": "user", "content": "hi"}], 0.8, 1000)
+
+        assert key_a == key_b
+        assert key_a != key_c
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_identical_inflight_requests_are_coalesced(self, cache):
+        """Test that concurrent misses for one key make a single upstream call."""
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "motion prompt"
+
+        results = await asyncio.gather(*[cache.get_or_compute("k", compute) for _ in range(5)])
+
+        assert results == ["motion prompt"] * 5
+        assert calls == 1
+        assert cache.get_stats()["coalesced"] == 4
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_cached_model_round_trip(self, cache):
+        """Test that parsed Pydantic results are restored from cache."""
+        prompt = VisualPrompt(
+            scene_id=1, image_prompt="city at night", style_notes="noir",
+            negative_prompt="blur", setting="street", shot_type="wide",
+            mood="tense", color_palette="blue"
+        )
+
+        async def compute():
+            return prompt
+
+        encode = lambda value: value.model_dump()
+        decode = lambda stored: VisualPrompt(**stored)
+
+        first = await cache.get_or_compute("k", compute, encode=encode, decode=decode)
+        second = await cache.get_or_compute("k", compute, encode=encode, decode=decode)
+
+        assert first is prompt
+        assert isinstance(second, VisualPrompt)
+        assert second == prompt
+        assert cache.get_stats()["hits_memory"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_bypass_forces_fresh_result(self, cache):
+        """Test that bypass skips the cached value and refreshes it."""
+        values = iter(["first", "second"])
+
+        async def compute():
+            return next(values)
+
+        assert await cache.get_or_compute("k", compute) == "first"
+        assert await cache.get_or_compute("k", compute, bypass=True) == "second"
+        assert await cache.get_or_compute("k", compute) == "second"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_failures_are_not_cached(self, cache):
+        """Test that a failed computation is retried on the next call."""
+        attempts = 0
+
+        async def compute():
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise Exception("OpenRouter API error 500")
+            return "ok"
+
+        with pytest.raises(Exception):
+            await cache.get_or_compute("k", compute)
+
+        assert await cache.get_or_compute("k", compute) == "ok"
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_hands_over_to_a_waiter(self, cache):
+        """Test that cancelling the computing caller doesn't cancel coalesced waiters; one of them recomputes."""
+        calls = 0
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return f"prompt {calls}"
+
+        leader = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_compute("k", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        assert await asyncio.gather(*waiters) == ["prompt 2"] * 3
+        assert leader.cancelled()
+        assert calls == 2
+
+    @pytest.mark.unit
+    def test_lru_evicts_least_recently_used(self):
+        """Test LRU eviction order."""
+        lru = LRUCache(max_entries=2)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+
+        assert lru.get("a") == (True, 1)
+        assert lru.get("b") == (False, None)
+        assert lru.get("c") == (True, 3)
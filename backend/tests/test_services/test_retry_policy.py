@@ -0,0 +1,95 @@
+"""
+Tests for the retry / deadline / hedging policy used by OpenRouterService.
+"""
+import asyncio
+import pytest
+
+from app.services.retry_policy import RetryPolicy, LatencyWindow
+
+
+class UpstreamError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"OpenRouter API error {status}: error")
+        self.status = status
+        self.retryable = status == 429 or status >= 500
+
+
+class TestRetryPolicy:
+    """Test suite for RetryPolicy."""
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_retries_retryable_errors(self):
+        """Test that 5xx errors are retried and the eventual success is returned."""
+        policy = RetryPolicy(name="test", max_attempts=3, base_delay=0.001, hedging_enabled=False)
+        attempts = 0
+
+        async def call():
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                raise UpstreamError(502)
+            return "ok"
+
+        assert await policy.run(call) == "ok"
+        assert attempts == 3
+        assert policy.get_stats()["retries"] == 2
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_does_not_retry_client_errors(self):
+        """Test that non-retryable errors propagate after one attempt."""
+        policy = RetryPolicy(name="test", max_attempts=3, base_delay=0.001, hedging_enabled=False)
+        attempts = 0
+
+        async def call():
+            nonlocal attempts
+            attempts += 1
+            raise UpstreamError(400)
+
+        with pytest.raises(UpstreamError):
+            await policy.run(call)
+        assert attempts == 1
+        assert policy.get_stats()["failures"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_attempt_deadline(self):
+        """Test that a hung attempt is abandoned at its deadline and retried."""
+        policy = RetryPolicy(name="test", max_attempts=2, base_delay=0.001, attempt_timeout=0.05, hedging_enabled=False)
+        delays = iter([10.0, 0.0])
+
+        async def call():
+            await asyncio.sleep(next(delays))
+            return "ok"
+
+        assert await policy.run(call) == "ok"
+        assert policy.get_stats()["timeouts"] == 1
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_hedge_wins_over_slow_primary(self):
+        """Test that a slow call past p95 is hedged and the faster duplicate wins."""
+        policy = RetryPolicy(name="test", hedge_min_samples=5, hedge_max_ratio=1.0, attempt_timeout=5.0)
+        for _ in range(5):
+            policy._window("default").add(0.01)
+
+        delays = iter([1.0, 0.0])
+
+        async def call():
+            await asyncio.sleep(next(delays))
+            return "done"
+
+        assert await asyncio.wait_for(policy.run(call), timeout=0.5) == "done"
+        stats = policy.get_stats()
+        assert stats["hedges_launched"] == 1
+        assert stats["hedges_won"] == 1
+
+    @pytest.mark.unit
+    def test_latency_window_percentile(self):
+        """Test percentile lookup on the latency window."""
+        window = LatencyWindow()
+        assert window.percentile(0.95) is None
+        for ms in range(1, 101):
+            window.add(ms / 1000)
+        assert window.percentile(0.95) == pytest.approx(0.096)
@@ -0,0 +1,173 @@
+"""
+Tests for streamed scene selection: incremental JSON parsing and SSE handling.
+"""
+import json
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.llm_metering import LLMMeter
+from app.services.openrouter import OpenRouterService
+from app.models_pydantic import TranscriptionResult
+from app.utils.json_stream import IncrementalArrayParser
+
+
+def _scene(scene_id: int) -> dict:
+    return {
+        "scene_id": scene_id,
+        "title": f"Scene {scene_id} {{with braces}}",
+        "start_time": (scene_id - 1) * 5.0,
+        "end_time": scene_id * 5.0,
+        "duration": 5.0,
+        "source_segments": [scene_id - 1],
+        "lyrics_excerpt": "she said \"hold on]\"",
+        "theme": "hope",
+        "energy_level": 6,
+        "visual_potential": 8,
+        "narrative_importance": 7,
+        "reasoning": "Opening image"
+    }
+
+
+SELECTION = {
+    "song_themes": ["hope"],
+    "energy_arc": "rising",
+    "total_scenes_selected": 2,
+    "average_scene_length": 5.0,
+    "selected_scenes": [_scene(1), _scene(2)],
+    "reasoning_summary": "Covers the whole song"
+}
+
+
+class TestIncrementalArrayParser:
+    """Test suite for IncrementalArrayParser."""
+
+    @pytest.mark.unit
+    def test_emits_each_object_when_complete(self):
+        """Test that objects are emitted as soon as their closing brace arrives."""
+        text = json.dumps(SELECTION)
+        first_end = text.index('"Opening image"}') + len('"Opening image"}')
+        parser = IncrementalArrayParser("selected_scenes")
+
+        assert parser.feed(text[:first_end - 1]) == []
+        first = parser.feed(text[first_end - 1:first_end])
+        rest = parser.feed(text[first_end:])
+
+        assert first == [_scene(1)]
+        assert rest == [_scene(2)]
+        assert parser.array_complete
+        assert parser.text == text
+
+    @pytest.mark.unit
+    def test_handles_single_character_chunks(self):
+        """Test that strings containing brackets and escapes don't confuse depth tracking."""
+        text = "```json\n" + json.dumps(SELECTION, indent=2) + "\n```"
+        parser = IncrementalArrayParser("selected_scenes")
+
+        emitted = []
+        for char in text:
+            emitted.extend(parser.feed(char))
+
+        assert emitted == [_scene(1), _scene(2)]
+        assert parser.objects_emitted == 2
+
+
+class TestSceneSelectionStream:
+    """Test suite for OpenRouterService.select_scenes_stream against a local SSE server."""
+
+    @staticmethod
+    async def _start_server(content: str, chunk_size: int = 40) -> TestServer:
+        """Start a server streaming content as OpenRouter-style SSE chunks."""
+        async def handler(request):
+            body = await request.json()
+            assert body["stream"] is True
+
+            response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+            await response.prepare(request)
+            await response.write(b": OPENROUTER PROCESSING\n\n")
+            for i in range(0, len(content), chunk_size):
+                event = {"choices": [{"delta": {"content": content[i:i + chunk_size]}}]}
+                await response.write(f"data: {json.dumps(event)}\n\n".encode())
+            await response.write(b"data: [DONE]\n\n")
+            return response
+
+        app = web.Application()
+        app.router.add_post("/chat/completions", handler)
+        server = TestServer(app)
+        await server.start_server()
+        return server
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_stream_yields_scenes_and_result(self):
+        """Test that scenes stream out individually and the full result is cached."""
+        server = await self._start_server(json.dumps(SELECTION))
+        service = OpenRouterService(api_key="test-key", meter=LLMMeter(sink="none"))
+        service.base_url = str(server.make_url("")).rstrip("/")
+        transcription = TranscriptionResult(
+            text="hold on",
+            segments=[{"start": 0.0, "end": 5.0, "text": "hold on"}, {"start": 5.0, "end": 10.0, "text": "hold on"}]
+        )
+
+        stream = service.select_scenes_stream(transcription, song_duration=10.0)
+        scene_ids = [scene.scene_id async for scene in stream]
+
+        assert scene_ids == [1, 2]
+        assert stream.result.total_scenes_selected == 2
+
+        # A repeat request is served from the cache without streaming
+        await server.close()
+        cached = await service.select_scenes(transcription, song_duration=10.0)
+        assert cached == stream.result
+
+        await service.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_skipped_middle_scene_is_replayed_by_scene_id(self):
+        """Test that a malformed element mid-array is yielded from the full result without repeating its neighbours."""
+        selection = dict(SELECTION, total_scenes_selected=3, selected_scenes=[_scene(1), _scene(2), _scene(3)])
+        text = json.dumps(selection)
+        # A trailing comma breaks scene 2 for the incremental parser; the full parse repairs it
+        broken = text.replace('"Opening image"}, {"scene_id": 3', '"Opening image",}, {"scene_id": 3')
+        assert broken != text
+        server = await self._start_server(broken)
+        service = OpenRouterService(api_key="test-key", meter=LLMMeter(sink="none"))
+        service.base_url = str(server.make_url("")).rstrip("/")
+        transcription = TranscriptionResult(
+            text="hold on",
+            segments=[{"start": 0.0, "end": 5.0, "text": "hold on"}, {"start": 5.0, "end": 10.0, "text": "hold on"}]
+        )
+
+        stream = service.select_scenes_stream(transcription, song_duration=15.0, bypass_cache=True)
+        scene_ids = [scene.scene_id async for scene in stream]
+
+        assert scene_ids == [1, 3, 2]
+        assert [scene.scene_id for scene in stream.result.selected_scenes] == [1, 2, 3]
+
+        await server.close()
+        await service.close()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_first_scene_remapped_when_one_delta_completes_several(self):
+        """Test that the opening scene keeps its early start even when it arrives in the same delta as the next."""
+        first = dict(_scene(1), source_segments=[1], start_time=0.0, end_time=12.0, duration=12.0)
+        second = dict(_scene(2), source_segments=[1], start_time=8.0, end_time=12.0, duration=4.0)
+        server = await self._start_server(json.dumps(dict(SELECTION, selected_scenes=[first, second])), chunk_size=100000)
+        service = OpenRouterService(api_key="test-key", meter=LLMMeter(sink="none"))
+        service.base_url = str(server.make_url("")).rstrip("/")
+        transcription = TranscriptionResult(
+            text="hold on let go",
+            segments=[{"start": 3.0, "end": 5.0, "text": "hold on"}, {"start": 8.0, "end": 10.0, "text": "let go"}]
+        )
+
+        stream = service.select_scenes_stream(transcription, song_duration=12.0, bypass_cache=True)
+        scenes = [scene async for scene in stream]
+
+        assert [scene.scene_id for scene in scenes] == [1, 2]
+        assert scenes[0].start_time == 0.0
+        assert scenes[1].start_time == 8.0
+
+        await server.close()
+        await service.close()
@@ -0,0 +1,135 @@
+"""
+Tests for segment-level transcription patches.
+"""
+import pytest
+
+from app.models_pydantic import SegmentOperation, TranscriptionResult
+from app.services.transcription_segments import TranscriptionSegmentStore, TranscriptionVersionConflict
+from app.utils.segment_patch import SegmentPatchError, apply_segment_operations, segments_from_transcription
+
+WHISPER_SEGMENTS = [
+    {"start": 0.0, "end": 4.0, "text": " Hold on, hold on"},
+    {"start": 4.0, "end": 8.0, "text": " pull up in the"},
+    {"start": 8.0, "end": 10.0, "text": " coupe"},
+    {"start": 12.0, "end": 16.0, "text": " easy kill"},
+]
+
+
+class FakeSegmentTable:
+    """In-memory transcription_segments table and patch function."""
+
+    def __init__(self):
+        self.rows = {}
+        self.version = 0
+        self.calls = []
+
+    def get_transcription_segments(self, project_id):
+        return sorted(self.rows.values(), key=lambda row: row["seq"])
+
+    def patch_transcription_segments(self, project_id, expected_version, upserts, deletes):
+        if expected_version != self.version:
+            raise Exception("transcription version conflict")
+        self.calls.append((len(upserts), list(deletes)))
+        for segment_id in deletes:
+            self.rows.pop(segment_id, None)
+        for row in upserts:
+            self.rows[row["segment_id"]] = row
+        self.version += 1
+        return self.version
+
+    def replace_transcription(self, project_id, expected_version, transcription_data, transcript_text, edited=True):
+        if expected_version is not None and expected_version != self.version:
+            raise Exception("transcription version conflict")
+        self.rows = {}
+        self.blob = transcription_data
+        self.version += 1
+        return self.version
+
+
+class TestSegmentOperations:
+    """Test suite for apply_segment_operations."""
+
+    @pytest.mark.unit
+    def test_split_merge_shift_touch_only_named_segments(self):
+        """Test each operation and that only the affected segments are reported."""
+        segments = segments_from_transcription(WHISPER_SEGMENTS)
+
+        result = apply_segment_operations(segments, [
+            SegmentOperation(op="edit_text", segment_id=3, text=" easy kill!"),
+            SegmentOperation(op="split", segment_id=0, text_index=9),
+            SegmentOperation(op="merge", segment_ids=[1, 2]),
+            SegmentOperation(op="shift", segment_ids=[3], offset=-0.5),
+        ])
+
+        assert [s["text"] for s in result.segments] == [" Hold on,", "hold on", "pull up in the coupe", " easy kill!"]
+        assert [s["segment_id"] for s in result.segments] == [0, 4, 1, 3]
+        assert result.segments[1]["start"] == pytest.approx(4.0 * 9 / 17)
+        assert result.segments[2]["end"] == 10.0
+        assert result.segments[3]["start"] == 11.5
+        assert set(result.changed) == {0, 4, 1, 3}
+        assert result.deleted == {2}
+        assert segments[0]["text"] == " Hold on, hold on"  # Input is not mutated
+
+    @pytest.mark.unit
+    def test_invalid_operations_are_rejected(self):
+        """Test unknown segments, bad timing and non-adjacent merges."""
+        segments = segments_from_transcription(WHISPER_SEGMENTS)
+
+        for operation in [
+            {"op": "edit_text", "segment_id": 99, "text": "x"},
+            {"op": "set_timing", "segment_id": 1, "start": 9.0},
+            {"op": "merge", "segment_ids": [0, 2]},
+            {"op": "split", "segment_id": 2, "text_index": 40},
+        ]:
+            with pytest.raises(SegmentPatchError):
+                apply_segment_operations(segments, [operation])
+
+
+class TestTranscriptionSegmentStore:
+    """Test suite for TranscriptionSegmentStore."""
+
+    @pytest.mark.unit
+    def test_first_patch_seeds_then_writes_only_changes(self):
+        """Test seeding, incremental writes, reassembly and version conflicts."""
+        table = FakeSegmentTable()
+        store = TranscriptionSegmentStore(db=table)
+        project = {"id": "p1", "transcription_version": 0, "transcription_data": {"text": "", "segments": WHISPER_SEGMENTS}}
+
+        version, _ = store.apply_patch(project, 0, [SegmentOperation(op="edit_text", segment_id=0, text=" Hold up")])
+        project.update(transcription_version=version, transcription_segments_stored=True)
+
+        version, _ = store.apply_patch(project, 1, [SegmentOperation(op="merge", segment_ids=[1, 2])])
+        project.update(transcription_version=version)
+
+        assert table.calls == [(4, []), (1, [2])]
+        transcription = store.get_transcription(project)
+        assert transcription.text == "Hold up pull up in the coupe easy kill"
+        assert [s["id"] for s in transcription.segments] == [0, 1, 3]
+
+        with pytest.raises(TranscriptionVersionConflict):
+            store.apply_patch(project, 1, [SegmentOperation(op="edit_text", segment_id=0, text="stale")])
+        with pytest.raises(TranscriptionVersionConflict):
+            store.apply_patch({**project, "transcription_version": 1}, 1, [SegmentOperation(op="edit_text", segment_id=0, text="raced")])
+
+    @pytest.mark.unit
+    def test_replace_is_version_guarded(self):
+        """Test that a full save bumps the version, clears stored segments and rejects stale versions."""
+        table = FakeSegmentTable()
+        store = TranscriptionSegmentStore(db=table)
+        project = {"id": "p1", "transcription_version": 0, "transcription_data": {"text": "", "segments": WHISPER_SEGMENTS}}
+
+        version, _ = store.apply_patch(project, 0, [SegmentOperation(op="edit_text", segment_id=0, text=" Hold up")])
+        project.update(transcription_version=version, transcription_segments_stored=True)
+
+        edited = TranscriptionResult(text="Hold up", segments=[{"start": 0.0, "end": 4.0, "text": "Hold up"}])
+        assert store.replace(project, 1, edited) == 2
+        assert table.rows == {} and table.blob["text"] == "Hold up"
+
+        # Both a stale read and a save that raced past the read are rejected
+        with pytest.raises(TranscriptionVersionConflict):
+            store.replace({**project, "transcription_version": 2}, 1, edited)
+        with pytest.raises(TranscriptionVersionConflict):
+            store.replace(project, 1, edited)
+
+        # Clients that don't send a version save unconditionally
+        assert store.replace(project, None, edited) == 3
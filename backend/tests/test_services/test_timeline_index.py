@@ -0,0 +1,81 @@
+"""
+Tests for the timeline interval index and its per-project cache.
+"""
+import random
+
+import pytest
+
+from app.services.timeline import TimelineIndexCache
+from app.utils.timeline_index import IntervalIndex, TimelineIndex
+
+SEGMENTS = [
+    {"start": 0.0, "end": 4.0, "text": "intro"},
+    {"start": 10.0, "end": 14.0, "text": "verse"},
+    {"start": 4.0, "end": 9.5, "text": "hook"},
+    {"start": "bad", "end": None, "text": "malformed"},
+    {"start": 12.0, "end": 30.0, "text": "ad-lib"},
+]
+SCENES = [
+    {"scene_id": 1, "title": "Open", "start_time": 0.0, "end_time": 12.0},
+    {"scene_id": 2, "title": "Drop", "start_time": 11.0, "end_time": 20.0},
+]
+
+
+class TestTimelineIndex:
+    """Test suite for IntervalIndex and TimelineIndex."""
+
+    @pytest.mark.unit
+    def test_point_and_range_queries(self):
+        """Test lookups on unsorted, overlapping and malformed segments."""
+        index = TimelineIndex.build(SEGMENTS, SCENES)
+
+        assert index.segment_at(2.0) == 0
+        assert index.segment_at(4.0) == 2  # [start, end): the hook, not the intro
+        assert index.segment_at(9.7) is None
+        assert index.segment_at(13.0) == 4  # Latest-starting of two overlapping segments
+        assert index.segment_at(20.0) == 4  # Reached through a long earlier segment
+        assert index.segments_overlapping(9.0, 12.5) == [2, 1, 4]
+        assert index.scenes_covering(11.5) == [0, 1]
+        assert index.scenes_overlapping(15.0, 40.0) == [1]
+        assert index.duration == 30.0
+
+    @pytest.mark.unit
+    def test_matches_linear_scan(self):
+        """Test against a brute-force scan on random overlapping intervals."""
+        rng = random.Random(7)
+        intervals = []
+        for _ in range(300):
+            start = rng.uniform(0, 200)
+            intervals.append((start, start + rng.expovariate(1 / 5)))
+        index = IntervalIndex(intervals)
+
+        for _ in range(500):
+            a = rng.uniform(-5, 210)
+            b = a + rng.uniform(0, 20)
+            expected = {i for i, (start, end) in enumerate(intervals) if start < b and end > a}
+            assert set(index.overlapping(a, b)) == expected
+            covering = [i for i, (start, end) in enumerate(intervals) if start <= a < end]
+            assert set(index.covering(a)) == set(covering)
+            if covering:
+                assert intervals[index.at(a)][0] == max(intervals[i][0] for i in covering)
+            else:
+                assert index.at(a) is None
+
+    @pytest.mark.unit
+    def test_cache_rebuilds_only_on_change(self):
+        """Test that the index is reused until the transcription or a scene boundary changes."""
+        cache = TimelineIndexCache()
+        project = {"updated_at": "2025-01-01T00:00:00", "transcription_data": {"segments": SEGMENTS}}
+        scenes = [dict(scene) for scene in SCENES]
+
+        first = cache.get("p1", project, scenes)
+        assert cache.get("p1", project, scenes) is first
+
+        scenes[1]["end_time"] = 25.0
+        moved = cache.get("p1", project, scenes)
+        assert moved is not first
+        assert moved.scenes_covering(22.0) == [1]
+
+        edited = {**project, "updated_at": "2025-01-01T00:05:00"}
+        assert cache.get("p1", edited, scenes) is not moved
+        assert cache.get_stats() == {"hits": 1, "builds": 3, "projects": 1}
@@ -0,0 +1,100 @@
+"""
+Tests for the compact transcript encoding used in scene-selection prompts.
+"""
+import pytest
+
+from app.models_pydantic import SceneSelection, SceneSelectionResult
+from app.utils.transcript_encoding import encode_transcript
+
+
+CHORUS = "Line them up, that's a easy kill"
+
+SEGMENTS = [
+    {"start": 1.5, "end": 6.0, "text": CHORUS},
+    {"start": 6.0, "end": 7.0, "text": "yeah"},
+    {"start": 7.2, "end": 12.0, "text": "I ain't touch the trigger, but I seen the drill"},
+    {"start": 14.0, "end": 19.0, "text": CHORUS},
+    {"start": 19.0, "end": 24.0, "text": "That's why I gotta watch how I move"}
+]
+
+
+def _scene(scene_id: int, units: list, start: float, end: float) -> SceneSelection:
+    return SceneSelection(
+        scene_id=scene_id, title="Scene", start_time=start, end_time=end, duration=end - start,
+        source_segments=units, lyrics_excerpt="", theme="", energy_level=5,
+        visual_potential=5, narrative_importance=5, reasoning=""
+    )
+
+
+class TestTranscriptEncoding:
+    """Test suite for encode_transcript and the unit-to-segment mapping."""
+
+    @pytest.mark.unit
+    def test_encoding_merges_dedupes_and_shrinks(self):
+        """Test short-segment merging, the repeated-line dictionary and size reduction."""
+        encoded = encode_transcript(SEGMENTS, song_duration=26.0)
+
+        assert [unit.segment_indices for unit in encoded.units] == [[0, 1], [2], [3], [4]]
+        assert encoded.repeated_lines == []  # The first chorus was merged with "yeah"
+
+        # A chorus repeated four times is written out once
+        choruses = [{"start": 5.0 * i, "end": 5.0 * i + 5.0, "text": CHORUS} for i in range(4)]
+        repeated = encode_transcript(choruses)
+        assert repeated.repeated_lines == [CHORUS]
+        assert repeated.text.count(CHORUS) == 1
+        assert repeated.text.count("=L1") == 4
+        assert repeated.stats["encoded_chars"] < repeated.stats["original_chars"]
+
+    @pytest.mark.unit
+    def test_units_tile_the_whole_song(self):
+        """Test that unit spans run gaplessly from 0 to the song duration."""
+        encoded = encode_transcript(SEGMENTS, song_duration=26.0)
+
+        assert encoded.units[0].span_start == 0.0
+        for previous, unit in zip(encoded.units, encoded.units[1:]):
+            assert unit.span_start == previous.span_end
+        assert encoded.units[-1].span_end == 26.0
+        assert "u0 7.2 " in encoded.text
+
+    @pytest.mark.unit
+    def test_remap_restores_original_segments_and_times(self):
+        """Test that unit references map back to original segment indices and timestamps."""
+        encoded = encode_transcript(SEGMENTS, song_duration=26.0)
+        result = SceneSelectionResult(
+            song_themes=[], energy_arc="", total_scenes_selected=2, average_scene_length=0,
+            selected_scenes=[_scene(1, [0, 1], 0.0, 11.0), _scene(2, [2, 3], 11.0, 25.0)],
+            reasoning_summary=""
+        )
+
+        remapped = encoded.remap_result(result)
+        first, second = remapped.selected_scenes
+
+        assert first.source_segments == [0, 1, 2]
+        assert (first.start_time, first.end_time) == (0.0, 11.0)
+        assert second.source_segments == [3, 4]
+        assert (second.start_time, second.end_time) == (14.0, 25.0)  # 11.0 lies before unit 2
+        assert remapped.average_scene_length == 11.0
+
+    @pytest.mark.unit
+    def test_remap_keeps_scenes_that_split_one_long_unit(self):
+        """Test that scenes sharing one long unit keep their own, non-overlapping times."""
+        segments = [
+            {"start": 0.0, "end": 4.0, "text": "intro"},
+            {"start": 4.0, "end": 9.0, "text": "verse"},
+            {"start": 40.0, "end": 45.0, "text": "outro"}
+        ]
+        encoded = encode_transcript(segments, song_duration=60.0)
+        result = SceneSelectionResult(
+            song_themes=[], energy_arc="", total_scenes_selected=3, average_scene_length=0,
+            selected_scenes=[
+                _scene(1, [1], 4.0, 15.0), _scene(2, [1], 15.0, 30.0), _scene(3, [1], 30.0, 40.0)
+            ],
+            reasoning_summary=""
+        )
+
+        remapped = encoded.remap_result(result)
+
+        assert [(scene.start_time, scene.end_time) for scene in remapped.selected_scenes] == [
+            (4.0, 15.0), (15.0, 30.0), (30.0, 40.0)
+        ]
+        assert all(scene.source_segments == [1] for scene in remapped.selected_scenes)
@@ -0,0 +1,68 @@
+"""
+Tests for pluggable transcription backends.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import patch
+import io
+
+import numpy as np
+import pytest
+
+from app.services import transcription_backends
+from app.services.audio_chunking import SAMPLE_RATE, encode_wav
+from app.services.transcription_backends import LocalWhisperBackend
+from app.services.whisper import WhisperService
+
+
+class FakeWhisperModel:
+    """Stands in for faster_whisper.WhisperModel: one segment per call, sized by the input."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio, language=None, beam_size=5):
+        self.calls += 1
+        seconds = len(audio.getvalue()) / (SAMPLE_RATE * 2)
+        segment = SimpleNamespace(start=1.0, end=min(seconds, 4.0), text=f" line {self.calls}")
+        return iter([segment]), SimpleNamespace(duration=seconds)
+
+
+class TestTranscriptionBackends:
+    """Test suite for backend selection and the local backend."""
+
+    @pytest.mark.unit
+    def test_backend_selection(self):
+        """Test default and per-job selection, and clear errors for unusable backends."""
+        service = WhisperService(api_key="test-api-key")
+
+        assert service.get_backend().name == "api"
+        assert service.get_backend().model == "whisper-1"
+        with pytest.raises(ValueError):
+            service.get_backend("gpu")
+        with patch.object(transcription_backends, "local_whisper_available", return_value=False):
+            with pytest.raises(ImportError):
+                LocalWhisperBackend()
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_local_backend_chunks_without_uploading(self):
+        """Test that long audio is chunked across workers and nothing is pre-transcoded."""
+        local = LocalWhisperBackend(model_size="tiny", workers=2, executor=ThreadPoolExecutor(max_workers=2))
+        service = WhisperService(api_key="test-api-key")
+        service._backends["local"] = local
+
+        audio = io.BytesIO(encode_wav(np.full(SAMPLE_RATE * 150, 0.1, dtype=np.float32)))
+        reports = []
+
+        with patch.object(transcription_backends, "_worker_model", FakeWhisperModel(), create=True), \
+             patch("app.services.audio_chunking.ffmpeg_available", return_value=False):
+            result = await service.transcribe(audio, "song.wav", backend="local", transcode_callback=reports.append)
+
+        await local.close()
+
+        assert local.model == "faster-whisper-tiny-int8"
+        starts = [segment["start"] for segment in result.segments]
+        assert len(starts) == 3 and starts[0] == 1.0 and starts == sorted(starts)
+        assert result.text.startswith("line")
+        assert reports[0].files == 0 and reports[0].skipped == 0
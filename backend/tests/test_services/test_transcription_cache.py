@@ -0,0 +1,57 @@
+"""
+Tests for the content-hash transcription cache.
+"""
+import pytest
+
+from app.models_pydantic import TranscriptionResult
+from app.services.transcription_cache import TranscriptionCache
+
+
+class FakeStore:
+    """In-memory stand-in for the transcription_cache table."""
+
+    def __init__(self, fail: bool = False):
+        self.rows = {}
+        self.fail = fail
+
+    def get_cached_transcription(self, cache_key):
+        if self.fail:
+            raise Exception("database unavailable")
+        return self.rows.get(cache_key)
+
+    def save_cached_transcription(self, row):
+        if self.fail:
+            raise Exception("database unavailable")
+        self.rows[row["cache_key"]] = row
+
+
+RESULT = TranscriptionResult(text="hold on", segments=[{"start": 0.0, "end": 2.0, "text": "hold on"}])
+
+
+class TestTranscriptionCache:
+    """Test suite for TranscriptionCache."""
+
+    @pytest.mark.unit
+    def test_hit_across_processes_and_key_invalidation(self):
+        """Test that a stored result is found by a fresh cache, but not under another model or language."""
+        store = FakeStore()
+        TranscriptionCache(store=store).set("abc", "whisper-1", RESULT, audio_duration=2.0)
+
+        cache = TranscriptionCache(store=store)
+        assert cache.get("abc", "whisper-1") == RESULT
+        assert cache.get("abc", "whisper-1") == RESULT
+        assert cache.get("abc", "whisper-2") is None
+        assert cache.get("abc", "whisper-1", language="fr") is None
+
+        stats = cache.get_stats()
+        assert (stats["hits_store"], stats["hits_memory"], stats["misses"]) == (1, 1, 2)
+        assert store.rows["abc:whisper-1:auto"]["audio_duration"] == 2.0
+
+    @pytest.mark.unit
+    def test_store_errors_are_misses(self):
+        """Test that an unavailable store never fails the transcription."""
+        cache = TranscriptionCache(store=FakeStore(fail=True))
+
+        assert cache.get("abc", "whisper-1") is None
+        cache.set("abc", "whisper-1", RESULT)
+        assert cache.get_stats()["errors"] == 2
@@ -0,0 +1,85 @@
+"""
+Tests for vocal activity detection before transcription.
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+import io
+
+import numpy as np
+import pytest
+
+from app.services.audio_chunking import SAMPLE_RATE, encode_wav
+from app.services.vocal_activity import CondensedTimeline, detect_vocal_regions
+from app.services.whisper import WhisperService
+
+RNG = np.random.default_rng(0)
+
+
+def _voice(seconds: float) -> np.ndarray:
+    """Harmonic tone whose pitch jumps every 150 ms under a syllable-rate envelope."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitches = RNG.uniform(150, 400, size=int(seconds / 0.15) + 1)
+    phase = 2 * np.pi * np.cumsum(pitches[(t / 0.15).astype(int)]) / SAMPLE_RATE
+    harmonics = sum(np.sin(k * phase) / k for k in range(1, 8))
+    return 0.2 * harmonics * 0.5 * (1 + np.sin(2 * np.pi * 4 * t))
+
+
+def _bass(seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return 0.4 * np.sin(2 * np.pi * 55 * t) + 0.3 * np.sin(2 * np.pi * 110 * t) * (np.sin(2 * np.pi * 2 * t) > 0)
+
+
+def _hiss(seconds: float) -> np.ndarray:
+    return 0.001 * RNG.standard_normal(int(seconds * SAMPLE_RATE))
+
+
+class TestVocalActivity:
+    """Test suite for vocal region detection and timestamp mapping."""
+
+    @pytest.mark.unit
+    def test_skips_long_instrumental_and_silent_spans(self):
+        """Test that a quiet intro, a bass break and an outro are dropped but a short break is kept."""
+        song = np.concatenate([_hiss(10), _voice(20), _bass(12), _voice(15), _bass(2), _voice(5), _hiss(8)])
+
+        regions = detect_vocal_regions(song.astype(np.float32))
+
+        assert len(regions) == 2
+        (first_start, first_end), (second_start, second_end) = regions
+        assert 8.5 < first_start < 10.0 and 30.0 < first_end < 31.5
+        assert 40.5 < second_start < 42.0 and 64.0 < second_end < 65.5
+
+    @pytest.mark.unit
+    def test_timestamps_map_back_across_joins(self):
+        """Test condensed-to-original mapping, including times exactly on a join."""
+        timeline = CondensedTimeline([(10.0, 30.0), (40.0, 50.0)])
+
+        assert timeline.duration == 30.0
+        assert timeline.to_original(5.0) == 15.0
+        assert timeline.to_original(20.0) == 40.0
+        assert timeline.to_original(20.0, is_end=True) == 30.0
+        assert timeline.map_segments([{"start": 18.0, "end": 24.0, "text": "x"}]) == [{"start": 28.0, "end": 44.0, "text": "x"}]
+
+    @pytest.mark.unit
+    @pytest.mark.asyncio
+    async def test_transcribe_uploads_only_vocal_regions(self):
+        """Test that the upload is the condensed audio and segments land on the song timeline."""
+        client = MagicMock()
+        uploads = []
+
+        async def create(**kwargs):
+            uploads.append(kwargs["file"])
+            return MagicMock(text="line", segments=[{"start": 1.0, "end": 3.0, "text": "line"}])
+
+        client.audio.transcriptions.create = AsyncMock(side_effect=create)
+        with patch('app.services.whisper.AsyncOpenAI', return_value=client):
+            service = WhisperService(api_key="test-api-key")
+
+        song = np.concatenate([_hiss(12), _voice(10)]).astype(np.float32)
+        reports = []
+
+        with patch('app.services.audio_chunking.ffmpeg_available', return_value=False):
+            result = await service.transcribe(io.BytesIO(encode_wav(song)), "song.wav", activity_callback=reports.append)
+
+        uploaded_seconds = (len(uploads[0][1].getvalue()) - 44) / (2 * SAMPLE_RATE)
+        assert uploaded_seconds < 11.0
+        assert reports[0].skipped_seconds == pytest.approx(22.0 - uploaded_seconds, abs=0.01)
+        assert result.segments[0]["start"] == pytest.approx(reports[0].regions[0][0] + 1.0)